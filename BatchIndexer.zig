@@ -0,0 +1,224 @@
+//! Index a list of tar shards in-process, writing the same `.utix` and
+//! summary sidecar as the `indexer` binary.
+//!
+//! `jobs` threads each run their own xev loop and take shards one at a time
+//! off a shared counter, so large and small shards balance out. Progress is
+//! read from the scanners' byte counters while they run; nothing here blocks
+//! the caller, which polls `finished` and `join`s.
+
+const std = @import("std");
+const xev = @import("xev");
+const indexer = @import("indexer.zig");
+
+const WdsIndexingState = indexer.WdsIndexingState;
+
+const BatchIndexer = @This();
+const logger = std.log.scoped(.BatchIndexer);
+
+// kqueue (macOS) dispatches regular-file I/O to a thread pool; without one
+// every read returns EPERM. io_uring (Linux) handles file I/O in-kernel.
+const needs_thread_pool = @import("builtin").os.tag != .linux;
+
+pub const Format = WdsIndexingState.SerializationFormat;
+
+pub const Options = struct {
+    fmt: Format = .msgpack,
+    /// Strings in `--meta-rule` syntax, e.g. ".json:.caption;.size.w".
+    meta_rules: []const []const u8 = &.{},
+    /// Shards indexed at once.
+    jobs: usize = 4,
+};
+
+pub const Shard = struct {
+    path: []const u8,
+    /// Size of the tar file; 0 if it couldn't be opened.
+    size: u64 = 0,
+    /// Tar bytes scanned so far, updated by the scanner.
+    scanned: usize = 0,
+    rows: u64 = 0,
+    /// Sum of member sizes in indexed rows.
+    bytes: u64 = 0,
+    err: ?anyerror = null,
+};
+
+alloc: std.mem.Allocator,
+threaded: std.Io.Threaded,
+io: std.Io,
+arena: std.heap.ArenaAllocator,
+fmt: Format,
+rules: []const WdsIndexingState.Rule,
+shards: []Shard,
+next_shard: std.atomic.Value(usize) = .init(0),
+shards_done: std.atomic.Value(usize) = .init(0),
+cancelled: std.atomic.Value(bool) = .init(false),
+threads: []std.Thread,
+
+/// Parse the rules and start indexing `paths`, which are copied. `alloc`
+/// must be thread-safe. Pair with `join` and `deinit`.
+pub fn start(alloc: std.mem.Allocator, paths: []const []const u8, opts: Options) !*BatchIndexer {
+    const self = try alloc.create(BatchIndexer);
+    errdefer alloc.destroy(self);
+    self.* = .{
+        .alloc = alloc,
+        .threaded = .init(alloc, .{}),
+        .io = undefined,
+        .arena = .init(alloc),
+        .fmt = opts.fmt,
+        .rules = &.{},
+        .shards = &.{},
+        .threads = &.{},
+    };
+    errdefer self.threaded.deinit();
+    errdefer self.arena.deinit();
+    self.io = self.threaded.io();
+    const arena = self.arena.allocator();
+
+    self.rules = try indexer.parseMetaRules(arena, opts.meta_rules);
+    self.shards = try arena.alloc(Shard, paths.len);
+    for (self.shards, paths) |*shard, path| {
+        shard.* = .{ .path = try arena.dupe(u8, path) };
+        if (std.Io.Dir.cwd().statFile(self.io, path, .{})) |st| shard.size = st.size else |_| {}
+    }
+
+    const num_threads = @max(1, @min(opts.jobs, paths.len));
+    self.threads = try arena.alloc(std.Thread, num_threads);
+    var spawned: usize = 0;
+    errdefer {
+        self.cancelled.store(true, .release);
+        self.next_shard.store(paths.len, .release);
+        for (self.threads[0..spawned]) |t| t.join();
+    }
+    for (self.threads) |*t| {
+        t.* = try std.Thread.spawn(.{}, worker, .{self});
+        t.setName(self.io, "ultar_indexer") catch {};
+        spawned += 1;
+    }
+    return self;
+}
+
+pub fn deinit(self: *BatchIndexer) void {
+    const alloc = self.alloc;
+    self.arena.deinit();
+    self.threaded.deinit();
+    alloc.destroy(self);
+}
+
+/// Wait for every thread to finish. Safe to call once.
+pub fn join(self: *BatchIndexer) void {
+    for (self.threads) |t| t.join();
+}
+
+/// Stop after the current tar entry of each running shard; the rest are skipped.
+pub fn cancel(self: *BatchIndexer) void {
+    self.cancelled.store(true, .release);
+}
+
+pub fn finished(self: *const BatchIndexer) bool {
+    return self.shards_done.load(.acquire) == self.shards.len;
+}
+
+/// Tar bytes scanned across all shards.
+pub fn bytesScanned(self: *const BatchIndexer) u64 {
+    var total: u64 = 0;
+    for (self.shards) |*s| total += @atomicLoad(usize, &s.scanned, .monotonic);
+    return total;
+}
+
+pub fn bytesTotal(self: *const BatchIndexer) u64 {
+    var total: u64 = 0;
+    for (self.shards) |s| total += s.size;
+    return total;
+}
+
+fn worker(self: *BatchIndexer) void {
+    var thread_pool: if (needs_thread_pool) xev.ThreadPool else void = if (needs_thread_pool) .init(.{}) else {};
+    defer if (needs_thread_pool) {
+        thread_pool.shutdown();
+        thread_pool.deinit();
+    };
+    var loop = xev.Loop.init(.{
+        .thread_pool = if (needs_thread_pool) &thread_pool else null,
+    }) catch |err| {
+        logger.err("Failed to create event loop: {}", .{err});
+        self.failRemaining(err);
+        return;
+    };
+    defer loop.deinit();
+
+    while (true) {
+        const i = self.next_shard.fetchAdd(1, .monotonic);
+        if (i >= self.shards.len) return;
+        const shard = &self.shards[i];
+        if (self.cancelled.load(.acquire)) {
+            shard.err = error.Cancelled;
+        } else {
+            self.indexShard(&loop, shard) catch |err| {
+                logger.err("Indexing {s} failed: {}", .{ shard.path, err });
+                shard.err = err;
+            };
+        }
+        _ = self.shards_done.fetchAdd(1, .release);
+    }
+}
+
+/// Claim and fail every shard not yet taken.
+fn failRemaining(self: *BatchIndexer, err: anyerror) void {
+    while (true) {
+        const i = self.next_shard.fetchAdd(1, .monotonic);
+        if (i >= self.shards.len) return;
+        self.shards[i].err = err;
+        _ = self.shards_done.fetchAdd(1, .release);
+    }
+}
+
+fn indexShard(self: *BatchIndexer, loop: *xev.Loop, shard: *Shard) !void {
+    // Open the tar first so a missing shard leaves no empty index behind.
+    const tar_file = try std.Io.Dir.cwd().openFile(self.io, shard.path, .{ .mode = .read_only });
+    var tar_owned_by_scanner = false;
+    errdefer if (!tar_owned_by_scanner) tar_file.close(self.io);
+
+    var buf: [std.fs.max_path_bytes]u8 = undefined;
+    const out_path = try std.fmt.bufPrint(&buf, "{s}.utix", .{shard.path});
+    const out_file = try std.Io.Dir.cwd().createFile(self.io, out_path, .{ .truncate = true });
+    // `finalize` writes the index and sidecar even when the scan stopped
+    // early; a failed shard must not leave a short index that looks complete.
+    errdefer self.removePartialIndex(shard.path);
+    var state = WdsIndexingState.init(self.alloc, self.io, loop, out_file, self.fmt, self.rules, shard.path) catch |err| {
+        out_file.close(self.io);
+        return err;
+    };
+    var state_owned_by_scanner = false;
+    errdefer if (!state_owned_by_scanner) state.deinit();
+
+    const scanner = try self.alloc.create(indexer.Indexer);
+    defer self.alloc.destroy(scanner);
+    scanner.* = try indexer.Indexer.init(state, tar_file);
+    state_owned_by_scanner = true;
+    tar_owned_by_scanner = true;
+    defer {
+        scanner.state.deinit();
+        scanner.deinit(self.io);
+    }
+
+    scanner.state.progress_ptr = &shard.scanned;
+    scanner.state.cancel_ptr = &self.cancelled;
+    scanner.enqueueRead(loop);
+    // Runs until the scan and every chunk write of the index have completed.
+    try loop.run(.until_done);
+
+    shard.rows = scanner.state.rows;
+    shard.bytes = scanner.state.summary.total_bytes;
+    if (!scanner.state.reached_end) {
+        return if (self.cancelled.load(.acquire)) error.Cancelled else error.InvalidTar;
+    }
+}
+
+fn removePartialIndex(self: *BatchIndexer, path: []const u8) void {
+    var buf: [std.fs.max_path_bytes]u8 = undefined;
+    for ([_][]const u8{ ".utix", indexer.IndexSummary.sidecar_suffix }) |ext| {
+        const out_path = std.fmt.bufPrint(&buf, "{s}{s}", .{ path, ext }) catch return;
+        std.Io.Dir.cwd().deleteFile(self.io, out_path) catch |err| {
+            if (err != error.FileNotFound) logger.warn("failed to remove partial index {s}: {}", .{ out_path, err });
+        };
+    }
+}
@@ -0,0 +1,972 @@
+//! Read-through local disk cache for shards on slow mounts (NFS and the like).
+//!
+//! Shards are cut into `block_size` extents, each cached as one file under
+//! the cache directory with a CRC32 per `chunk_size` chunk, so a hit only
+//! reads and checks the chunks it needs. Blocks are keyed by path, size,
+//! mtime and block index; a rewritten shard never matches stale blocks.
+//!
+//! A miss reads the range straight from the source and keeps a copy of what
+//! it read. Once misses have covered a block, save for small gaps like tar
+//! headers, the populator thread fetches those gaps, writes the block to the
+//! cache and evicts with CLOCK once the cache outgrows `capacity_bytes`, so
+//! a block is never read from the source twice. A block whose reads stop
+//! short is still cached if they covered three quarters of it; sparse random
+//! reads leave their blocks uncached rather than pay for a refetch. Population is
+//! best-effort: with its queue full, blocks simply stay uncached, so it never
+//! holds up a read. Blocks left by earlier runs are indexed by `init`.
+//!
+//! Reads are served by worker threads, like `HttpRangePool`: the dataloader
+//! IO thread submits jobs and polls `takeCompleted` from its tick loop.
+
+const std = @import("std");
+
+const logger = std.log.scoped(.block_cache);
+
+pub const block_size = 4 << 20;
+pub const chunk_size = 64 << 10;
+const chunks_per_block = block_size / chunk_size;
+
+/// Blocks gathered from misses at once; each holds a `block_size` buffer.
+/// Past this, the least recently read one is queued if mostly read, else abandoned.
+const max_fills = 8;
+/// Populate requests beyond this are dropped.
+const max_pending_populates = 4;
+/// Gaps this small between misses, such as the tar headers between members
+/// and the padding at the end of an archive, count as read when deciding
+/// whether a block is worth caching. The populator fetches them from the source.
+const small_gap = 16 << 10;
+
+pub const Config = struct {
+    /// Created if missing. Borrowed only for the duration of `init`.
+    dir: []const u8,
+    /// Evict once cached blocks take more than this many bytes.
+    capacity_bytes: u64,
+    /// Worker threads, i.e. concurrent reads in flight.
+    concurrency: u16 = 4,
+};
+
+/// Identity of a shard; blocks cached from another version of the file never match.
+pub const Source = struct {
+    path: []const u8,
+    size: u64,
+    mtime_ns: i64,
+    path_hash: u64,
+
+    pub fn init(path: []const u8, stat: std.Io.File.Stat) Source {
+        return .{
+            .path = path,
+            .size = stat.size,
+            .mtime_ns = @intCast(stat.mtime.toNanoseconds()),
+            .path_hash = std.hash.Wyhash.hash(0, path),
+        };
+    }
+
+    fn blockKey(self: *const Source, block: u64) u64 {
+        var h = std.hash.Wyhash.init(0);
+        h.update(self.path);
+        h.update(std.mem.asBytes(&self.size));
+        h.update(std.mem.asBytes(&self.mtime_ns));
+        h.update(std.mem.asBytes(&block));
+        return h.final();
+    }
+
+    fn blockLen(self: *const Source, block: u64) usize {
+        return @intCast(@min(block_size, self.size - block * block_size));
+    }
+};
+
+pub const Job = struct {
+    /// Borrowed; the caller keeps `source` and `file` alive until the job is completed.
+    source: *const Source,
+    file: std.Io.File,
+    offset: u64,
+    buf: []u8,
+    request_id: u64 = 0,
+    slot: usize = 0,
+    result: error{ReadError}!void = {},
+    node: std.DoublyLinkedList.Node = .{},
+};
+
+pub const Stats = struct {
+    /// Block lookups, so a read spanning two blocks counts twice.
+    hits: u64 = 0,
+    misses: u64 = 0,
+    hit_bytes: u64 = 0,
+    miss_bytes: u64 = 0,
+    populated: u64 = 0,
+    evicted: u64 = 0,
+    /// Blocks that failed their checksum or header check and were dropped.
+    corrupt: u64 = 0,
+    /// Populate requests dropped because the queue was full.
+    dropped: u64 = 0,
+    /// Source bytes the populator read to fill gaps misses left in a block.
+    refetched_bytes: u64 = 0,
+    bytes_cached: u64 = 0,
+
+    pub fn hitRate(self: Stats) f64 {
+        const total = self.hit_bytes + self.miss_bytes;
+        if (total == 0) return 0;
+        return @as(f64, @floatFromInt(self.hit_bytes)) / @as(f64, @floatFromInt(total));
+    }
+};
+
+const Header = extern struct {
+    magic: [8]u8 = header_magic,
+    version: u32 = header_version,
+    len: u32,
+    block: u64,
+    source_size: u64,
+    source_mtime_ns: i64,
+    path_hash: u64,
+    crc: [chunks_per_block]u32,
+
+    const header_magic = "UTBLOCK\x00".*;
+    const header_version = 1;
+
+    fn matches(self: *const Header, src: *const Source, block: u64) bool {
+        return std.mem.eql(u8, &self.magic, &header_magic) and self.version == header_version and
+            self.block == block and self.source_size == src.size and
+            self.source_mtime_ns == src.mtime_ns and self.path_hash == src.path_hash and
+            self.len == src.blockLen(block);
+    }
+};
+
+const Range = struct {
+    start: usize,
+    end: usize,
+};
+
+/// The parts of one block that misses have read, gathered so the block can
+/// be cached without reading it from the source again.
+const Fill = struct {
+    key: u64,
+    block: u64,
+    /// Owned copy; the shard may be closed before the block is populated.
+    path: []u8,
+    size: u64,
+    mtime_ns: i64,
+    /// `block_size` bytes, valid where `have` says.
+    data: []u8,
+    /// Sorted, disjoint and never adjacent.
+    have: std.ArrayList(Range) = .empty,
+    last_use: u64 = 0,
+
+    fn source(self: *const Fill) Source {
+        return .{ .path = self.path, .size = self.size, .mtime_ns = self.mtime_ns, .path_hash = std.hash.Wyhash.hash(0, self.path) };
+    }
+
+    fn blockLen(self: *const Fill) usize {
+        return @intCast(@min(block_size, self.size - self.block * block_size));
+    }
+
+    fn destroy(self: *Fill, alloc: std.mem.Allocator) void {
+        alloc.free(self.path);
+        alloc.free(self.data);
+        self.have.deinit(alloc);
+        alloc.destroy(self);
+    }
+
+    fn addRange(self: *Fill, alloc: std.mem.Allocator, start: usize, end: usize) !void {
+        const items = self.have.items;
+        // Misses mostly arrive in order, so scan from the back.
+        var i = items.len;
+        while (i > 0 and items[i - 1].end >= start) i -= 1;
+        var merged: Range = .{ .start = start, .end = end };
+        var j = i;
+        while (j < items.len and items[j].start <= end) : (j += 1) {
+            merged.start = @min(merged.start, items[j].start);
+            merged.end = @max(merged.end, items[j].end);
+        }
+        try self.have.replaceRange(alloc, i, j - i, &.{merged});
+    }
+
+    /// Bytes of the block no miss has read, not counting gaps under `small_gap`.
+    fn unread(self: *const Fill) usize {
+        const len = self.blockLen();
+        var total: usize = 0;
+        var pos: usize = 0;
+        for (self.have.items) |r| {
+            if (r.start - pos >= small_gap) total += r.start - pos;
+            pos = r.end;
+        }
+        if (len - pos >= small_gap) total += len - pos;
+        return total;
+    }
+};
+
+/// A cached block, visited by the CLOCK hand.
+const Slot = struct {
+    key: u64,
+    bytes: u64,
+    referenced: bool,
+};
+
+const BlockCache = @This();
+
+alloc: std.mem.Allocator,
+io: std.Io,
+dir: std.Io.Dir,
+capacity_bytes: u64,
+threads: []std.Thread = &.{},
+populator: ?std.Thread = null,
+
+// Read jobs, guarded by `mutex`.
+mutex: std.Io.Mutex = .init,
+cond: std.Io.Condition = .init,
+pending: std.DoublyLinkedList = .{},
+done: std.DoublyLinkedList = .{},
+stopping: bool = false,
+
+// Index, populate queue and stats, guarded by `index_mutex`.
+index_mutex: std.Io.Mutex = .init,
+populate_cond: std.Io.Condition = .init,
+index: std.AutoHashMapUnmanaged(u64, u32) = .empty,
+slots: std.ArrayList(?Slot) = .empty,
+free_slots: std.ArrayList(u32) = .empty,
+hand: usize = 0,
+populate_queue: std.ArrayList(*Fill) = .empty,
+// Keys queued or being written, so a block is only populated once.
+populating: std.AutoHashMapUnmanaged(u64, void) = .empty,
+stats_: Stats = .{},
+
+// Blocks being gathered from misses, guarded by `fill_mutex`. Taken before
+// `index_mutex` when both are held.
+fill_mutex: std.Io.Mutex = .init,
+fills: std.ArrayList(*Fill) = .empty,
+fill_clock: u64 = 0,
+
+/// Submitted but not yet taken back; only touched by the submitting thread.
+in_flight: usize = 0,
+
+pub fn init(self: *BlockCache, alloc: std.mem.Allocator, io: std.Io, config: Config) !void {
+    try std.Io.Dir.cwd().createDirPath(io, config.dir);
+    self.* = .{
+        .alloc = alloc,
+        .io = io,
+        .dir = try std.Io.Dir.cwd().openDir(io, config.dir, .{ .iterate = true }),
+        .capacity_bytes = config.capacity_bytes,
+    };
+    errdefer self.dir.close(io);
+    try self.populate_queue.ensureTotalCapacity(alloc, max_pending_populates);
+    errdefer self.populate_queue.deinit(alloc);
+    try self.populating.ensureTotalCapacity(alloc, max_pending_populates + 1);
+    errdefer self.populating.deinit(alloc);
+    try self.fills.ensureTotalCapacity(alloc, max_fills);
+    errdefer self.fills.deinit(alloc);
+    errdefer {
+        self.index.deinit(alloc);
+        self.slots.deinit(alloc);
+        self.free_slots.deinit(alloc);
+    }
+    try self.scanExisting();
+
+    self.populator = try std.Thread.spawn(.{}, BlockCache.populatorMain, .{self});
+    self.populator.?.setName(io, "block_cache_fill") catch {};
+    errdefer self.stopWorkers(&.{});
+
+    const threads = try alloc.alloc(std.Thread, @max(config.concurrency, 1));
+    errdefer alloc.free(threads);
+    var started: usize = 0;
+    errdefer self.stopWorkers(threads[0..started]);
+    for (threads) |*t| {
+        t.* = try std.Thread.spawn(.{}, BlockCache.workerMain, .{self});
+        t.setName(io, "block_cache") catch {};
+        started += 1;
+    }
+    self.threads = threads;
+}
+
+pub fn deinit(self: *BlockCache) void {
+    self.stopWorkers(self.threads);
+    self.alloc.free(self.threads);
+    for (self.populate_queue.items) |fill| fill.destroy(self.alloc);
+    self.populate_queue.deinit(self.alloc);
+    for (self.fills.items) |fill| fill.destroy(self.alloc);
+    self.fills.deinit(self.alloc);
+    self.populating.deinit(self.alloc);
+    self.index.deinit(self.alloc);
+    self.slots.deinit(self.alloc);
+    self.free_slots.deinit(self.alloc);
+    self.dir.close(self.io);
+}
+
+fn stopWorkers(self: *BlockCache, threads: []std.Thread) void {
+    self.mutex.lockUncancelable(self.io);
+    self.stopping = true;
+    self.cond.broadcast(self.io);
+    self.mutex.unlock(self.io);
+    for (threads) |t| t.join();
+
+    self.index_mutex.lockUncancelable(self.io);
+    self.populate_cond.broadcast(self.io);
+    self.index_mutex.unlock(self.io);
+    if (self.populator) |t| t.join();
+    self.populator = null;
+}
+
+pub fn stats(self: *BlockCache) Stats {
+    self.index_mutex.lockUncancelable(self.io);
+    defer self.index_mutex.unlock(self.io);
+    return self.stats_;
+}
+
+pub fn submit(self: *BlockCache, job: *Job) void {
+    self.in_flight += 1;
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    self.pending.append(&job.node);
+    self.cond.signal(self.io);
+}
+
+pub fn takeCompleted(self: *BlockCache) ?*Job {
+    if (self.in_flight == 0) return null;
+    self.mutex.lockUncancelable(self.io);
+    const node = self.done.popFirst();
+    self.mutex.unlock(self.io);
+    const n = node orelse return null;
+    self.in_flight -= 1;
+    return @fieldParentPtr("node", n);
+}
+
+fn workerMain(self: *BlockCache) void {
+    // Holds the chunks a hit spans; a part never crosses a block.
+    const scratch = self.alloc.alloc(u8, block_size) catch |err| {
+        logger.err("Failed to allocate worker buffer: {}", .{err});
+        return;
+    };
+    defer self.alloc.free(scratch);
+
+    while (true) {
+        self.mutex.lockUncancelable(self.io);
+        while (self.pending.first == null and !self.stopping) {
+            self.cond.waitUncancelable(self.io, &self.mutex);
+        }
+        const node = self.pending.popFirst();
+        self.mutex.unlock(self.io);
+
+        const n = node orelse return;
+        const job: *Job = @fieldParentPtr("node", n);
+        job.result = self.serve(job, scratch) catch |err| blk: {
+            logger.err("Read {s} @ {d} (+{d}) failed: {}", .{ job.source.path, job.offset, job.buf.len, err });
+            break :blk error.ReadError;
+        };
+
+        self.mutex.lockUncancelable(self.io);
+        self.done.append(&job.node);
+        self.mutex.unlock(self.io);
+    }
+}
+
+fn serve(self: *BlockCache, job: *Job, scratch: []u8) !void {
+    const src = job.source;
+    if (job.offset + job.buf.len > src.size) return error.ReadPastEnd;
+
+    var pos: u64 = job.offset;
+    var out = job.buf;
+    while (out.len > 0) {
+        const block = pos / block_size;
+        const in_block: usize = @intCast(pos % block_size);
+        const part = out[0..@min(out.len, block_size - in_block)];
+        const key = src.blockKey(block);
+
+        if (self.lookup(key) and self.readCached(src, key, block, in_block, part, scratch)) {
+            self.countRead(.hit, part.len);
+        } else {
+            if (try job.file.readPositionalAll(self.io, part, pos) != part.len) return error.ShortRead;
+            self.countRead(.miss, part.len);
+            self.gather(src, key, block, in_block, part);
+        }
+        pos += part.len;
+        out = out[part.len..];
+    }
+}
+
+fn lookup(self: *BlockCache, key: u64) bool {
+    self.index_mutex.lockUncancelable(self.io);
+    defer self.index_mutex.unlock(self.io);
+    const i = self.index.get(key) orelse return false;
+    self.slots.items[i].?.referenced = true;
+    return true;
+}
+
+fn countRead(self: *BlockCache, kind: enum { hit, miss }, bytes: usize) void {
+    self.index_mutex.lockUncancelable(self.io);
+    defer self.index_mutex.unlock(self.io);
+    switch (kind) {
+        .hit => {
+            self.stats_.hits += 1;
+            self.stats_.hit_bytes += bytes;
+        },
+        .miss => {
+            self.stats_.misses += 1;
+            self.stats_.miss_bytes += bytes;
+        },
+    }
+}
+
+fn blockName(buf: []u8, key: u64) []const u8 {
+    return std.fmt.bufPrint(buf, "{x:0>2}/{x:0>16}.blk", .{ key >> 56, key }) catch unreachable;
+}
+
+/// Fill `part` from the cached block, verifying the chunks it spans. A block
+/// that fails any check is dropped and the read falls back to the source.
+fn readCached(self: *BlockCache, src: *const Source, key: u64, block: u64, in_block: usize, part: []u8, scratch: []u8) bool {
+    var name_buf: [32]u8 = undefined;
+    const name = blockName(&name_buf, key);
+    const file = self.dir.openFile(self.io, name, .{ .mode = .read_only }) catch {
+        // Evicted (possibly by another process) between lookup and open.
+        self.forget(key, false);
+        return false;
+    };
+    defer file.close(self.io);
+
+    var header: Header = undefined;
+    const header_ok = if (file.readPositionalAll(self.io, std.mem.asBytes(&header), 0)) |n|
+        n == @sizeOf(Header) and header.matches(src, block)
+    else |_|
+        false;
+    if (!header_ok) {
+        self.forget(key, true);
+        return false;
+    }
+
+    const first_chunk = in_block / chunk_size;
+    const end_chunk = std.math.divCeil(usize, in_block + part.len, chunk_size) catch unreachable;
+    const span_start = first_chunk * chunk_size;
+    const span = scratch[0 .. @min(end_chunk * chunk_size, header.len) - span_start];
+    const n = file.readPositionalAll(self.io, span, @sizeOf(Header) + span_start) catch 0;
+    var ok = n == span.len;
+    var chunk = first_chunk;
+    while (ok and chunk < end_chunk) : (chunk += 1) {
+        const lo = chunk * chunk_size - span_start;
+        const hi = @min(lo + chunk_size, span.len);
+        ok = std.hash.Crc32.hash(span[lo..hi]) == header.crc[chunk];
+    }
+    if (!ok) {
+        self.forget(key, true);
+        return false;
+    }
+    @memcpy(part, span[in_block - span_start ..][0..part.len]);
+    return true;
+}
+
+/// Drop `key` from the index, deleting its file if `corrupt`.
+fn forget(self: *BlockCache, key: u64, corrupt: bool) void {
+    {
+        self.index_mutex.lockUncancelable(self.io);
+        defer self.index_mutex.unlock(self.io);
+        if (corrupt) self.stats_.corrupt += 1;
+        const kv = self.index.fetchRemove(key) orelse return;
+        self.stats_.bytes_cached -= self.slots.items[kv.value].?.bytes;
+        self.slots.items[kv.value] = null;
+        self.free_slots.append(self.alloc, kv.value) catch {};
+    }
+    if (corrupt) {
+        var name_buf: [32]u8 = undefined;
+        self.dir.deleteFile(self.io, blockName(&name_buf, key)) catch {};
+    }
+}
+
+/// Keep the bytes a miss read from `block`, queueing the block for the
+/// populator once misses have read all of it but small gaps.
+fn gather(self: *BlockCache, src: *const Source, key: u64, block: u64, in_block: usize, part: []const u8) void {
+    self.fill_mutex.lockUncancelable(self.io);
+    defer self.fill_mutex.unlock(self.io);
+    if (self.cachedOrQueued(key)) return;
+
+    const fill = self.fillFor(src, key, block) catch return;
+    @memcpy(fill.data[in_block..][0..part.len], part);
+    self.fill_clock += 1;
+    fill.last_use = self.fill_clock;
+    fill.addRange(self.alloc, in_block, in_block + part.len) catch {
+        self.dropFill(fill);
+        return;
+    };
+    // Wait for the rest while it is still being read; `fillFor` queues
+    // blocks that stop short of this once their buffer is wanted.
+    if (fill.unread() > 0) return;
+    _ = self.fills.swapRemove(std.mem.indexOfScalar(*Fill, self.fills.items, fill).?);
+    self.queueFill(fill);
+}
+
+/// Hand `fill`, no longer in `fills`, to the populator.
+fn queueFill(self: *BlockCache, fill: *Fill) void {
+    self.index_mutex.lockUncancelable(self.io);
+    defer self.index_mutex.unlock(self.io);
+    if (self.populate_queue.items.len == max_pending_populates) {
+        self.stats_.dropped += 1;
+        fill.destroy(self.alloc);
+        return;
+    }
+    self.populate_queue.appendAssumeCapacity(fill);
+    self.populating.putAssumeCapacity(fill.key, {});
+    self.populate_cond.signal(self.io);
+}
+
+fn cachedOrQueued(self: *BlockCache, key: u64) bool {
+    self.index_mutex.lockUncancelable(self.io);
+    defer self.index_mutex.unlock(self.io);
+    return self.index.contains(key) or self.populating.contains(key);
+}
+
+/// The fill gathering `block`, starting one if there is none. Caller holds `fill_mutex`.
+fn fillFor(self: *BlockCache, src: *const Source, key: u64, block: u64) !*Fill {
+    for (self.fills.items) |fill| {
+        if (fill.key == key) return fill;
+    }
+    const path = try self.alloc.dupe(u8, src.path);
+    errdefer self.alloc.free(path);
+    var recycled: ?*Fill = null;
+    if (self.fills.items.len == max_fills) {
+        var stalest: usize = 0;
+        for (self.fills.items, 0..) |f, i| {
+            if (f.last_use < self.fills.items[stalest].last_use) stalest = i;
+        }
+        const f = self.fills.swapRemove(stalest);
+        // Three quarters read: the rest is cheap enough to fetch. Anything
+        // sparser is abandoned and its buffer reused.
+        if (f.unread() * 4 <= f.blockLen()) {
+            self.queueFill(f);
+        } else {
+            self.alloc.free(f.path);
+            f.path = &.{};
+            f.have.clearRetainingCapacity();
+            recycled = f;
+        }
+    }
+    const fill = recycled orelse blk: {
+        const data = try self.alloc.alloc(u8, block_size);
+        errdefer self.alloc.free(data);
+        const f = try self.alloc.create(Fill);
+        f.* = .{ .key = undefined, .block = undefined, .path = &.{}, .size = undefined, .mtime_ns = undefined, .data = data };
+        break :blk f;
+    };
+    fill.key = key;
+    fill.block = block;
+    fill.path = path;
+    fill.size = src.size;
+    fill.mtime_ns = src.mtime_ns;
+    self.fills.appendAssumeCapacity(fill);
+    return fill;
+}
+
+fn dropFill(self: *BlockCache, fill: *Fill) void {
+    _ = self.fills.swapRemove(std.mem.indexOfScalar(*Fill, self.fills.items, fill).?);
+    fill.destroy(self.alloc);
+}
+
+fn isStopping(self: *BlockCache) bool {
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    return self.stopping;
+}
+
+fn populatorMain(self: *BlockCache) void {
+    // Misses tend to walk one shard at a time; keep its handle.
+    var open_path: std.ArrayList(u8) = .empty;
+    defer open_path.deinit(self.alloc);
+    var open_file: ?std.Io.File = null;
+    defer if (open_file) |f| f.close(self.io);
+
+    while (true) {
+        self.index_mutex.lockUncancelable(self.io);
+        while (self.populate_queue.items.len == 0 and !self.isStopping()) {
+            self.populate_cond.waitUncancelable(self.io, &self.index_mutex);
+        }
+        const fill_opt: ?*Fill = if (self.populate_queue.items.len > 0) self.populate_queue.orderedRemove(0) else null;
+        self.index_mutex.unlock(self.io);
+        const fill = fill_opt orelse return;
+        defer fill.destroy(self.alloc);
+        if (self.isStopping()) {
+            self.finishPopulate(fill.key, null);
+            continue;
+        }
+
+        const len = fill.blockLen();
+        const complete = fill.have.items.len == 1 and fill.have.items[0].start == 0 and fill.have.items[0].end == len;
+        if (!complete and (open_file == null or !std.mem.eql(u8, open_path.items, fill.path))) {
+            if (open_file) |f| f.close(self.io);
+            open_file = null;
+            open_path.clearRetainingCapacity();
+            open_file = std.Io.Dir.cwd().openFile(self.io, fill.path, .{ .mode = .read_only }) catch |err| {
+                logger.debug("Not caching {s}: {}", .{ fill.path, err });
+                self.finishPopulate(fill.key, null);
+                continue;
+            };
+            open_path.appendSlice(self.alloc, fill.path) catch {};
+        }
+
+        const bytes = self.writeBlock(if (complete) null else open_file.?, fill) catch |err| {
+            logger.debug("Failed to cache block {} of {s}: {}", .{ fill.block, fill.path, err });
+            self.finishPopulate(fill.key, null);
+            continue;
+        };
+        self.finishPopulate(fill.key, bytes);
+    }
+}
+
+/// Read the gaps misses left in `fill` from `file`, then write the block to
+/// the cache. Returns the cached file size.
+fn writeBlock(self: *BlockCache, file: ?std.Io.File, fill: *Fill) !u64 {
+    const src = fill.source();
+    const len = src.blockLen(fill.block);
+    const data = fill.data[0..len];
+    var pos: usize = 0;
+    for (0..fill.have.items.len + 1) |i| {
+        const end = if (i < fill.have.items.len) fill.have.items[i].start else len;
+        if (end > pos) {
+            const gap = data[pos..end];
+            if (try file.?.readPositionalAll(self.io, gap, fill.block * block_size + pos) != gap.len) return error.ShortRead;
+            self.index_mutex.lockUncancelable(self.io);
+            self.stats_.refetched_bytes += gap.len;
+            self.index_mutex.unlock(self.io);
+        }
+        if (i < fill.have.items.len) pos = fill.have.items[i].end;
+    }
+
+    var header: Header = .{
+        .len = @intCast(len),
+        .block = fill.block,
+        .source_size = src.size,
+        .source_mtime_ns = src.mtime_ns,
+        .path_hash = src.path_hash,
+        .crc = @splat(0),
+    };
+    var chunk: usize = 0;
+    while (chunk * chunk_size < len) : (chunk += 1) {
+        header.crc[chunk] = std.hash.Crc32.hash(data[chunk * chunk_size .. @min((chunk + 1) * chunk_size, len)]);
+    }
+
+    var name_buf: [32]u8 = undefined;
+    const name = blockName(&name_buf, fill.key);
+    try self.dir.createDirPath(self.io, name[0..2]);
+    // Write-then-rename so concurrent readers never see a partial block.
+    var tmp_buf: [48]u8 = undefined;
+    var rng: [8]u8 = undefined;
+    self.io.random(&rng);
+    const tmp_name = try std.fmt.bufPrint(&tmp_buf, "{s}.{x}.tmp", .{ name, &rng });
+    {
+        const out = try self.dir.createFile(self.io, tmp_name, .{ .truncate = true });
+        defer out.close(self.io);
+        try out.writeStreamingAll(self.io, std.mem.asBytes(&header));
+        try out.writeStreamingAll(self.io, data);
+    }
+    errdefer self.dir.deleteFile(self.io, tmp_name) catch {};
+    try self.dir.rename(tmp_name, self.dir, name, self.io);
+    return @sizeOf(Header) + len;
+}
+
+/// Index a populated block (or just clear its pending mark), then evict.
+fn finishPopulate(self: *BlockCache, key: u64, bytes: ?u64) void {
+    {
+        self.index_mutex.lockUncancelable(self.io);
+        defer self.index_mutex.unlock(self.io);
+        _ = self.populating.remove(key);
+        if (bytes) |b| {
+            self.insertLocked(key, b, true) catch return;
+            self.stats_.populated += 1;
+        }
+    }
+    self.evict();
+}
+
+/// Evict until the cache fits, deleting files outside the lock.
+fn evict(self: *BlockCache) void {
+    var victims: [16]u64 = undefined;
+    while (true) {
+        self.index_mutex.lockUncancelable(self.io);
+        const n = self.evictLocked(&victims);
+        self.index_mutex.unlock(self.io);
+        for (victims[0..n]) |k| {
+            var name_buf: [32]u8 = undefined;
+            self.dir.deleteFile(self.io, blockName(&name_buf, k)) catch {};
+        }
+        if (n < victims.len) return;
+    }
+}
+
+fn insertLocked(self: *BlockCache, key: u64, bytes: u64, referenced: bool) !void {
+    const gop = try self.index.getOrPut(self.alloc, key);
+    if (gop.found_existing) return;
+    errdefer _ = self.index.remove(key);
+    const slot: Slot = .{ .key = key, .bytes = bytes, .referenced = referenced };
+    if (self.free_slots.pop()) |i| {
+        self.slots.items[i] = slot;
+        gop.value_ptr.* = i;
+    } else {
+        try self.slots.append(self.alloc, slot);
+        gop.value_ptr.* = @intCast(self.slots.items.len - 1);
+    }
+    self.stats_.bytes_cached += bytes;
+}
+
+/// CLOCK: sweep the hand, giving referenced blocks a second chance, until
+/// the cache fits. Returns the evicted keys, at most `victims.len` per call.
+fn evictLocked(self: *BlockCache, victims: []u64) usize {
+    var n: usize = 0;
+    while (self.stats_.bytes_cached > self.capacity_bytes and n < victims.len and self.index.count() > 0) {
+        if (self.hand >= self.slots.items.len) self.hand = 0;
+        const i = self.hand;
+        self.hand += 1;
+        if (self.slots.items[i]) |*slot| {
+            if (slot.referenced) {
+                slot.referenced = false;
+                continue;
+            }
+            _ = self.index.remove(slot.key);
+            self.stats_.bytes_cached -= slot.bytes;
+            self.stats_.evicted += 1;
+            victims[n] = slot.key;
+            n += 1;
+            self.slots.items[i] = null;
+            self.free_slots.append(self.alloc, @intCast(i)) catch {};
+        }
+    }
+    return n;
+}
+
+/// Index blocks left in the directory by earlier runs.
+fn scanExisting(self: *BlockCache) !void {
+    var found: usize = 0;
+    var it = self.dir.iterate();
+    while (try it.next(self.io)) |sub| {
+        if (sub.kind != .directory or sub.name.len != 2) continue;
+        var d = self.dir.openDir(self.io, sub.name, .{ .iterate = true }) catch continue;
+        defer d.close(self.io);
+        var files = d.iterate();
+        while (try files.next(self.io)) |e| {
+            if (e.kind != .file or !std.mem.endsWith(u8, e.name, ".blk")) continue;
+            const key = std.fmt.parseInt(u64, e.name[0 .. e.name.len - 4], 16) catch continue;
+            const st = d.statFile(self.io, e.name, .{}) catch continue;
+            self.index_mutex.lockUncancelable(self.io);
+            defer self.index_mutex.unlock(self.io);
+            try self.insertLocked(key, st.size, false);
+            found += 1;
+        }
+    }
+    if (found > 0) logger.info("Found {} cached blocks", .{found});
+    self.evict();
+}
+
+fn expectCounts(cache: *BlockCache, hits: u64, misses: u64) !void {
+    const s = cache.stats();
+    try std.testing.expectEqual(hits, s.hits);
+    try std.testing.expectEqual(misses, s.misses);
+}
+
+/// Wait for the populator to drain its queue.
+fn settle(cache: *BlockCache) void {
+    while (true) {
+        cache.index_mutex.lockUncancelable(cache.io);
+        const busy = cache.populating.count() > 0;
+        cache.index_mutex.unlock(cache.io);
+        if (!busy) return;
+        std.Io.sleep(cache.io, .fromMilliseconds(1), .awake) catch {};
+    }
+}
+
+fn readVia(cache: *BlockCache, src: *const Source, file: std.Io.File, offset: u64, buf: []u8) !void {
+    var job: Job = .{ .source = src, .file = file, .offset = offset, .buf = buf };
+    cache.submit(&job);
+    while (cache.takeCompleted() == null) std.Io.sleep(cache.io, .fromMicroseconds(100), .awake) catch {};
+    return job.result;
+}
+
+test "misses populate, hits verify, corruption falls back" {
+    const io = std.testing.io;
+    const alloc = std.testing.allocator;
+    var tmp = std.testing.tmpDir(.{ .iterate = true });
+    defer tmp.cleanup();
+
+    // A shard spanning two and a half blocks.
+    const data = try alloc.alloc(u8, block_size * 2 + block_size / 2);
+    defer alloc.free(data);
+    var rng = std.Random.DefaultPrng.init(1);
+    rng.fill(data);
+    try tmp.dir.writeFile(io, .{ .sub_path = "shard.tar", .data = data });
+    const root = try tmp.dir.realPathFileAlloc(io, ".", alloc);
+    defer alloc.free(root);
+    const dir = try std.fs.path.join(alloc, &.{ root, "blocks" });
+    defer alloc.free(dir);
+    // The populator reopens shards by path.
+    const shard_path = try std.fs.path.join(alloc, &.{ root, "shard.tar" });
+    defer alloc.free(shard_path);
+    const shard = try tmp.dir.openFile(io, "shard.tar", .{ .mode = .read_only });
+    defer shard.close(io);
+    const src: Source = .init(shard_path, try shard.stat(io));
+
+    var cache: BlockCache = undefined;
+    try cache.init(alloc, io, .{ .dir = dir, .capacity_bytes = 1 << 30, .concurrency = 2 });
+    defer cache.deinit();
+
+    // Whole-block reads populate from the bytes they read.
+    const whole = try alloc.alloc(u8, block_size);
+    defer alloc.free(whole);
+    for (0..3) |b| {
+        const part = whole[0..src.blockLen(b)];
+        try readVia(&cache, &src, shard, b * block_size, part);
+        try std.testing.expectEqualSlices(u8, data[b * block_size ..][0..part.len], part);
+    }
+    try expectCounts(&cache, 0, 3);
+    settle(&cache);
+    try std.testing.expectEqual(3, cache.stats().populated);
+    try std.testing.expectEqual(0, cache.stats().refetched_bytes);
+
+    var buf: [100_000]u8 = undefined;
+    // Straddles blocks 0 and 1.
+    const off = block_size - 5_000;
+    try readVia(&cache, &src, shard, off, &buf);
+    try std.testing.expectEqualSlices(u8, data[off..][0..buf.len], &buf);
+    try expectCounts(&cache, 2, 3);
+
+    // The short last block.
+    const tail = data.len - 1234;
+    try readVia(&cache, &src, shard, tail, buf[0..1234]);
+    try std.testing.expectEqualSlices(u8, data[tail..], buf[0..1234]);
+    try expectCounts(&cache, 3, 3);
+
+    // Flip a byte inside block 0's cached copy: the read still returns source data.
+    var name_buf: [32]u8 = undefined;
+    const name = try std.fmt.allocPrint(alloc, "blocks/{s}", .{blockName(&name_buf, src.blockKey(0))});
+    defer alloc.free(name);
+    const f = try tmp.dir.openFile(io, name, .{ .mode = .read_write });
+    try f.writePositionalAll(io, "X", @sizeOf(Header) + block_size - 10);
+    f.close(io);
+    try readVia(&cache, &src, shard, off, &buf);
+    try std.testing.expectEqualSlices(u8, data[off..][0..buf.len], &buf);
+    try std.testing.expectEqual(1, cache.stats().corrupt);
+}
+
+test "clock evicts down to capacity and blocks persist across instances" {
+    const io = std.testing.io;
+    const alloc = std.testing.allocator;
+    var tmp = std.testing.tmpDir(.{ .iterate = true });
+    defer tmp.cleanup();
+
+    const data = try alloc.alloc(u8, block_size * 4);
+    defer alloc.free(data);
+    @memset(data, 7);
+    try tmp.dir.writeFile(io, .{ .sub_path = "shard.tar", .data = data });
+    const root = try tmp.dir.realPathFileAlloc(io, ".", alloc);
+    defer alloc.free(root);
+    const dir = try std.fs.path.join(alloc, &.{ root, "blocks" });
+    defer alloc.free(dir);
+    const shard_path = try std.fs.path.join(alloc, &.{ root, "shard.tar" });
+    defer alloc.free(shard_path);
+    const shard = try tmp.dir.openFile(io, "shard.tar", .{ .mode = .read_only });
+    defer shard.close(io);
+    const src: Source = .init(shard_path, try shard.stat(io));
+    const cap = 2 * (@sizeOf(Header) + block_size);
+
+    {
+        var cache: BlockCache = undefined;
+        try cache.init(alloc, io, .{ .dir = dir, .capacity_bytes = cap, .concurrency = 1 });
+        defer cache.deinit();
+        const whole = try alloc.alloc(u8, block_size);
+        defer alloc.free(whole);
+        for (0..4) |b| {
+            try readVia(&cache, &src, shard, b * block_size, whole);
+            settle(&cache);
+        }
+        const s = cache.stats();
+        try std.testing.expectEqual(4, s.populated);
+        try std.testing.expectEqual(2, s.evicted);
+        try std.testing.expect(s.bytes_cached <= cap);
+    }
+
+    var cache: BlockCache = undefined;
+    try cache.init(alloc, io, .{ .dir = dir, .capacity_bytes = cap, .concurrency = 1 });
+    defer cache.deinit();
+    try std.testing.expectEqual(cap, cache.stats().bytes_cached);
+    // Survivors first, before populating the others can evict them.
+    var byte: [1]u8 = undefined;
+    for ([_]u64{ 2, 3, 0, 1 }) |b| try readVia(&cache, &src, shard, b * block_size, &byte);
+    try expectCounts(&cache, 2, 2);
+}
+
+/// `std.testing.io` with reads of one file delayed, standing in for a shard on
+/// a slow mount, and counted so a test can see what reached the source.
+const SlowSource = struct {
+    var inode: std.Io.File.INode = undefined;
+    var bytes_read: std.atomic.Value(u64) = .init(0);
+    var vtable: std.Io.VTable = undefined;
+
+    fn io(file: std.Io.File) !std.Io {
+        inode = (try file.stat(std.testing.io)).inode;
+        vtable = std.testing.io.vtable.*;
+        vtable.fileReadPositional = readPositional;
+        return .{ .userdata = std.testing.io.userdata, .vtable = &vtable };
+    }
+
+    fn readPositional(userdata: ?*anyopaque, file: std.Io.File, data: []const []u8, offset: u64) std.Io.File.ReadPositionalError!usize {
+        const inner = std.testing.io;
+        const is_source = if (file.stat(inner)) |st| st.inode == inode else |_| false;
+        if (is_source) std.Io.sleep(inner, .fromMilliseconds(2), .awake) catch {};
+        const n = try inner.vtable.fileReadPositional(userdata, file, data, offset);
+        if (is_source) _ = bytes_read.fetchAdd(n, .monotonic);
+        return n;
+    }
+};
+
+test "slow source: walked blocks fill from misses, sparse ones stay uncached" {
+    const alloc = std.testing.allocator;
+    var tmp = std.testing.tmpDir(.{ .iterate = true });
+    defer tmp.cleanup();
+
+    const data = try alloc.alloc(u8, block_size * 2);
+    defer alloc.free(data);
+    var rng = std.Random.DefaultPrng.init(2);
+    rng.fill(data);
+    try tmp.dir.writeFile(std.testing.io, .{ .sub_path = "shard.tar", .data = data });
+    const root = try tmp.dir.realPathFileAlloc(std.testing.io, ".", alloc);
+    defer alloc.free(root);
+    const dir = try std.fs.path.join(alloc, &.{ root, "blocks" });
+    defer alloc.free(dir);
+    const shard_path = try std.fs.path.join(alloc, &.{ root, "shard.tar" });
+    defer alloc.free(shard_path);
+    const shard = try tmp.dir.openFile(std.testing.io, "shard.tar", .{ .mode = .read_only });
+    defer shard.close(std.testing.io);
+    const src: Source = .init(shard_path, try shard.stat(std.testing.io));
+    const io = try SlowSource.io(shard);
+
+    var cache: BlockCache = undefined;
+    try cache.init(alloc, io, .{ .dir = dir, .capacity_bytes = 1 << 30, .concurrency = 2 });
+    defer cache.deinit();
+
+    // Walk block 0 like a tar: members with a header-sized gap between them.
+    const member = 60_000;
+    const buf = try alloc.alloc(u8, member);
+    defer alloc.free(buf);
+    var offsets: std.ArrayList(u64) = .empty;
+    defer offsets.deinit(alloc);
+    var off: u64 = 512;
+    while (off < block_size) : (off += member + 512) {
+        try readVia(&cache, &src, shard, off, buf);
+        try std.testing.expectEqualSlices(u8, data[off..][0..member], buf);
+        try offsets.append(alloc, off);
+    }
+    // A few scattered reads in block 1.
+    for (0..4) |i| {
+        const at = block_size + block_size / 2 + i * 200_000;
+        try readVia(&cache, &src, shard, at, buf[0..1024]);
+        try std.testing.expectEqualSlices(u8, data[at..][0..1024], buf[0..1024]);
+    }
+    settle(&cache);
+
+    const s = cache.stats();
+    try std.testing.expectEqual(1, s.populated);
+    try std.testing.expectEqual(0, s.hits);
+    // Only the headers were fetched again, not the block.
+    try std.testing.expect(s.refetched_bytes < block_size / 64);
+    try std.testing.expectEqual(s.miss_bytes + s.refetched_bytes, SlowSource.bytes_read.load(.monotonic));
+
+    // A second pass over block 0 never touches the source.
+    const before = SlowSource.bytes_read.load(.monotonic);
+    for (offsets.items) |o| {
+        const part = buf[0..@min(member, block_size - o)];
+        try readVia(&cache, &src, shard, o, part);
+        try std.testing.expectEqualSlices(u8, data[o..][0..part.len], part);
+    }
+    try std.testing.expectEqual(before, SlowSource.bytes_read.load(.monotonic));
+    try std.testing.expectEqual(offsets.items.len, cache.stats().hits);
+}
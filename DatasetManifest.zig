@@ -0,0 +1,327 @@
+//! Dataset manifest (`.utmf`): one file mapping global row ids across many
+//! per-shard `.utix` indexes.
+//!
+//! Layout, all integers little-endian u64 and every section 8-byte aligned:
+//!
+//! ```text
+//! header      magic "UTMANIF\x00", version, flags, num_shards, total_rows,
+//!             shards_off, strings_off, meta_index_off, meta_off
+//! cum_rows    num_shards + 1 entries; shard i holds rows [cum[i], cum[i+1])
+//! shards      num_shards × { path_off, path_len } into `strings`
+//! strings     shard paths, relative to the manifest's directory
+//! meta_index  total_rows + 1 offsets into `meta` (only with `flags.metadata`)
+//! meta        each row's `metadata` map as JSON, empty when the row has none
+//! ```
+//!
+//! Opening maps the file and checks the header, so it costs the same however
+//! many shards there are. `locate` binary-searches `cum_rows`. Entries are not
+//! scanned at open, so `shardRows` checks the pair it reads and reports
+//! `error.InvalidManifest` if they go backwards.
+
+const std = @import("std");
+
+const DatasetManifest = @This();
+
+pub const magic = "UTMANIF\x00";
+pub const format_version = 1;
+pub const file_ext = ".utmf";
+
+pub const Flags = packed struct(u64) {
+    metadata: bool = false,
+    _: u63 = 0,
+};
+
+const Header = extern struct {
+    magic: [8]u8,
+    version: u64,
+    flags: Flags,
+    num_shards: u64,
+    total_rows: u64,
+    shards_off: u64,
+    strings_off: u64,
+    meta_index_off: u64,
+    meta_off: u64,
+};
+
+const ShardRecord = extern struct {
+    path_off: u64,
+    path_len: u64,
+};
+
+pub const Location = struct {
+    shard: usize,
+    local_row: u64,
+};
+
+header: Header,
+cum_rows: []align(1) const u64,
+shards: []align(1) const ShardRecord,
+strings: []const u8,
+meta_index: []align(1) const u64,
+meta: []const u8,
+
+/// View over manifest bytes; `bytes` must outlive the result.
+pub fn parse(bytes: []const u8) !DatasetManifest {
+    if (bytes.len < @sizeOf(Header)) return error.InvalidManifest;
+    const h = std.mem.bytesToValue(Header, bytes[0..@sizeOf(Header)]);
+    if (!std.mem.eql(u8, &h.magic, magic)) return error.InvalidManifest;
+    if (h.version != format_version) return error.UnsupportedManifestVersion;
+
+    const cum_rows = try section(u64, bytes, @sizeOf(Header), h.num_shards + 1);
+    const shards = try section(ShardRecord, bytes, h.shards_off, h.num_shards);
+    const strings = try section(u8, bytes, h.strings_off, (if (h.flags.metadata) h.meta_index_off else bytes.len) -| h.strings_off);
+    const meta_index = if (h.flags.metadata) try section(u64, bytes, h.meta_index_off, h.total_rows + 1) else &.{};
+    const meta = if (h.flags.metadata) try section(u8, bytes, h.meta_off, bytes.len -| h.meta_off) else "";
+    if (cum_rows[0] != 0 or cum_rows[cum_rows.len - 1] != h.total_rows) return error.InvalidManifest;
+
+    return .{
+        .header = h,
+        .cum_rows = cum_rows,
+        .shards = shards,
+        .strings = strings,
+        .meta_index = meta_index,
+        .meta = meta,
+    };
+}
+
+fn section(comptime T: type, bytes: []const u8, off: u64, count: u64) ![]align(1) const T {
+    const len = std.math.mul(u64, count, @sizeOf(T)) catch return error.InvalidManifest;
+    const end = std.math.add(u64, off, len) catch return error.InvalidManifest;
+    if (end > bytes.len) return error.InvalidManifest;
+    return std.mem.bytesAsSlice(T, bytes[@intCast(off)..@intCast(end)]);
+}
+
+pub fn numShards(self: *const DatasetManifest) usize {
+    return self.shards.len;
+}
+
+pub fn totalRows(self: *const DatasetManifest) u64 {
+    return self.header.total_rows;
+}
+
+pub fn hasMetadata(self: *const DatasetManifest) bool {
+    return self.header.flags.metadata;
+}
+
+/// Path of shard `i`, relative to the manifest's directory.
+pub fn shardPath(self: *const DatasetManifest, i: usize) ![]const u8 {
+    const rec = self.shards[i];
+    const end = std.math.add(u64, rec.path_off, rec.path_len) catch return error.InvalidManifest;
+    if (end > self.strings.len) return error.InvalidManifest;
+    return self.strings[@intCast(rec.path_off)..@intCast(end)];
+}
+
+/// First global row id of shard `i`.
+pub fn shardStart(self: *const DatasetManifest, i: usize) u64 {
+    return self.cum_rows[i];
+}
+
+pub fn shardRows(self: *const DatasetManifest, i: usize) !u64 {
+    return std.math.sub(u64, self.cum_rows[i + 1], self.cum_rows[i]) catch error.InvalidManifest;
+}
+
+/// Shard and local row holding global row `row`, or null past the end.
+pub fn locate(self: *const DatasetManifest, row: u64) ?Location {
+    if (row >= self.header.total_rows) return null;
+    // Last shard whose first row is <= `row`; empty shards are skipped over.
+    // `cum_rows[lo] <= row` holds throughout since `parse` checks `cum_rows[0] == 0`,
+    // so a corrupt middle entry can misplace the row but never underflow.
+    var lo: usize = 0;
+    var hi: usize = self.shards.len;
+    while (hi - lo > 1) {
+        const mid = lo + (hi - lo) / 2;
+        if (self.cum_rows[mid] <= row) lo = mid else hi = mid;
+    }
+    return .{ .shard = lo, .local_row = row - self.cum_rows[lo] };
+}
+
+/// JSON metadata of global row `row`; null without metadata or when the row has none.
+pub fn metadata(self: *const DatasetManifest, row: u64) ?[]const u8 {
+    if (!self.header.flags.metadata or row >= self.header.total_rows) return null;
+    const start = self.meta_index[@intCast(row)];
+    const end = self.meta_index[@intCast(row + 1)];
+    if (start >= end or end > self.meta.len) return null;
+    return self.meta[@intCast(start)..@intCast(end)];
+}
+
+/// A manifest mapped read-only from disk.
+pub const Mapped = struct {
+    memory: []align(std.heap.page_size_min) const u8,
+    manifest: DatasetManifest,
+
+    pub fn open(io: std.Io, path: []const u8) !Mapped {
+        const file = try std.Io.Dir.cwd().openFile(io, path, .{ .mode = .read_only });
+        defer file.close(io);
+        const size = (try file.stat(io)).size;
+        if (size < @sizeOf(Header)) return error.InvalidManifest;
+
+        const memory = try std.posix.mmap(null, @intCast(size), .{ .READ = true }, .{ .TYPE = .PRIVATE }, file.handle, 0);
+        errdefer std.posix.munmap(memory);
+        return .{ .memory = memory, .manifest = try parse(memory) };
+    }
+
+    pub fn close(self: *Mapped) void {
+        std.posix.munmap(self.memory);
+    }
+};
+
+/// Accumulates shards in order and serialises the manifest.
+pub const Builder = struct {
+    alloc: std.mem.Allocator,
+    with_metadata: bool,
+    cum_rows: std.ArrayList(u64) = .empty,
+    shards: std.ArrayList(ShardRecord) = .empty,
+    strings: std.ArrayList(u8) = .empty,
+    meta_index: std.ArrayList(u64) = .empty,
+    meta: std.ArrayList(u8) = .empty,
+
+    pub fn init(alloc: std.mem.Allocator, with_metadata: bool) !Builder {
+        var b: Builder = .{ .alloc = alloc, .with_metadata = with_metadata };
+        errdefer b.deinit();
+        try b.cum_rows.append(alloc, 0);
+        if (with_metadata) try b.meta_index.append(alloc, 0);
+        return b;
+    }
+
+    pub fn deinit(self: *Builder) void {
+        self.cum_rows.deinit(self.alloc);
+        self.shards.deinit(self.alloc);
+        self.strings.deinit(self.alloc);
+        self.meta_index.deinit(self.alloc);
+        self.meta.deinit(self.alloc);
+    }
+
+    /// Start a new shard. With metadata enabled, follow with exactly one
+    /// `addRowMetadata` per row; otherwise pass the row count here.
+    pub fn addShard(self: *Builder, path: []const u8, rows: u64) !void {
+        try self.shards.ensureUnusedCapacity(self.alloc, 1);
+        try self.cum_rows.ensureUnusedCapacity(self.alloc, 1);
+        const path_off = self.strings.items.len;
+        try self.strings.appendSlice(self.alloc, path);
+        self.shards.appendAssumeCapacity(.{ .path_off = path_off, .path_len = path.len });
+        self.cum_rows.appendAssumeCapacity(try std.math.add(u64, self.cum_rows.getLast(), rows));
+    }
+
+    /// Append one row to the current shard with `json` (may be empty) as its metadata.
+    pub fn addRowMetadata(self: *Builder, json: []const u8) !void {
+        std.debug.assert(self.with_metadata and self.shards.items.len > 0);
+        try self.meta_index.ensureUnusedCapacity(self.alloc, 1);
+        try self.meta.appendSlice(self.alloc, json);
+        self.meta_index.appendAssumeCapacity(self.meta.items.len);
+        self.cum_rows.items[self.cum_rows.items.len - 1] += 1;
+    }
+
+    pub fn write(self: *const Builder, w: *std.Io.Writer) !void {
+        const total_rows = self.cum_rows.getLast();
+        if (self.with_metadata) std.debug.assert(self.meta_index.items.len == total_rows + 1);
+
+        const shards_off = @sizeOf(Header) + self.cum_rows.items.len * 8;
+        const strings_off = shards_off + self.shards.items.len * @sizeOf(ShardRecord);
+        const strings_pad = std.mem.alignForward(usize, self.strings.items.len, 8) - self.strings.items.len;
+        const meta_index_off = strings_off + self.strings.items.len + strings_pad;
+        const meta_off = meta_index_off + self.meta_index.items.len * 8;
+
+        try w.writeStruct(Header{
+            .magic = magic.*,
+            .version = format_version,
+            .flags = .{ .metadata = self.with_metadata },
+            .num_shards = self.shards.items.len,
+            .total_rows = total_rows,
+            .shards_off = shards_off,
+            .strings_off = strings_off,
+            .meta_index_off = if (self.with_metadata) meta_index_off else 0,
+            .meta_off = if (self.with_metadata) meta_off else 0,
+        }, .little);
+        try w.writeSliceEndian(u64, self.cum_rows.items, .little);
+        for (self.shards.items) |s| try w.writeStruct(s, .little);
+        try w.writeAll(self.strings.items);
+        if (self.with_metadata) {
+            try w.splatByteAll(0, strings_pad);
+            try w.writeSliceEndian(u64, self.meta_index.items, .little);
+            try w.writeAll(self.meta.items);
+        }
+    }
+};
+
+test "build, parse and locate" {
+    const alloc = std.testing.allocator;
+    var b = try Builder.init(alloc, false);
+    defer b.deinit();
+    try b.addShard("a.tar", 3);
+    try b.addShard("empty.tar", 0);
+    try b.addShard("sub/b.tar", 2);
+
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try b.write(&out.writer);
+
+    const m = try DatasetManifest.parse(out.written());
+    try std.testing.expectEqual(3, m.numShards());
+    try std.testing.expectEqual(5, m.totalRows());
+    try std.testing.expectEqualStrings("sub/b.tar", try m.shardPath(2));
+    try std.testing.expectEqual(Location{ .shard = 0, .local_row = 2 }, m.locate(2).?);
+    try std.testing.expectEqual(Location{ .shard = 2, .local_row = 0 }, m.locate(3).?);
+    try std.testing.expectEqual(Location{ .shard = 2, .local_row = 1 }, m.locate(4).?);
+    try std.testing.expectEqual(null, m.locate(5));
+    try std.testing.expectEqual(null, m.metadata(0));
+}
+
+test "metadata column" {
+    const alloc = std.testing.allocator;
+    var b = try Builder.init(alloc, true);
+    defer b.deinit();
+    try b.addShard("a.tar", 0);
+    try b.addRowMetadata("{\"w\":1}");
+    try b.addRowMetadata("");
+    try b.addShard("bb.tar", 0);
+    try b.addRowMetadata("{\"w\":3}");
+
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try b.write(&out.writer);
+
+    const m = try DatasetManifest.parse(out.written());
+    try std.testing.expectEqual(3, m.totalRows());
+    try std.testing.expectEqualStrings("bb.tar", try m.shardPath(1));
+    try std.testing.expectEqualStrings("{\"w\":1}", m.metadata(0).?);
+    try std.testing.expectEqual(null, m.metadata(1));
+    try std.testing.expectEqualStrings("{\"w\":3}", m.metadata(2).?);
+    try std.testing.expectEqual(Location{ .shard = 1, .local_row = 0 }, m.locate(2).?);
+}
+
+test "truncated manifests are rejected" {
+    const alloc = std.testing.allocator;
+    var b = try Builder.init(alloc, false);
+    defer b.deinit();
+    try b.addShard("a.tar", 1);
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try b.write(&out.writer);
+
+    const bytes = out.written();
+    try std.testing.expectError(error.InvalidManifest, DatasetManifest.parse(bytes[0 .. @sizeOf(Header) + 4]));
+    try std.testing.expectError(error.InvalidManifest, DatasetManifest.parse("not a manifest"));
+}
+
+test "row counts that go backwards are rejected" {
+    const alloc = std.testing.allocator;
+    var b = try Builder.init(alloc, false);
+    defer b.deinit();
+    try b.addShard("a.tar", 3);
+    try b.addShard("b.tar", 2);
+    try b.addShard("c.tar", 4);
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try b.write(&out.writer);
+    const bytes = out.written();
+
+    // cum_rows is [0, 3, 5, 9]; claim shard 0 holds 7 rows so shard 1 runs backwards.
+    std.mem.writeInt(u64, bytes[@sizeOf(Header) + 8 ..][0..8], 7, .little);
+    const m = try DatasetManifest.parse(bytes);
+    try std.testing.expectError(error.InvalidManifest, m.shardRows(1));
+    // Lookups stay in bounds; the row lands in a neighbouring shard.
+    for (0..9) |row| try std.testing.expect(m.locate(row).?.shard < 3);
+
+    std.mem.writeInt(u64, bytes[@sizeOf(Header)..][0..8], 1, .little);
+    try std.testing.expectError(error.InvalidManifest, DatasetManifest.parse(bytes));
+}
@@ -0,0 +1,207 @@
+//! Range-read backend for `http://` and `https://` shard URLs.
+//!
+//! A fixed set of worker threads shares one `std.http.Client`, whose
+//! connection pool keeps sockets alive between requests, so up to
+//! `concurrency` range reads are in flight at once. Each connection carries
+//! one request at a time: `std.http.Client` has no HTTP/1.1 pipelining, so
+//! concurrency comes from the number of connections, not from queueing
+//! requests on one. The dataloader IO thread submits jobs and polls
+//! `takeCompleted` from its tick loop, and never blocks on the network.
+//! Response bodies land in the caller's buffer; the client itself still
+//! allocates for connections and headers.
+
+const std = @import("std");
+
+const logger = std.log.scoped(.http_backend);
+
+pub const Config = struct {
+    /// Worker threads, i.e. concurrent requests in flight.
+    concurrency: u16 = 8,
+    /// Extra attempts after the first failure of a request.
+    max_retries: u8 = 3,
+    /// Delay before the first retry; doubled on each subsequent attempt.
+    retry_backoff_ms: u32 = 50,
+};
+
+pub fn isRemotePath(path: []const u8) bool {
+    return std.mem.startsWith(u8, path, "http://") or std.mem.startsWith(u8, path, "https://");
+}
+
+pub const Job = struct {
+    pub const Kind = enum {
+        read,
+        /// Opening a URL: a one-byte read at offset 0 into `probe_byte`,
+        /// checking that it exists and answers byte-range requests.
+        probe,
+    };
+
+    /// Borrowed; the caller keeps it alive until the job is completed.
+    url: []const u8,
+    offset: u64,
+    buf: []u8,
+    kind: Kind = .read,
+    probe_byte: [1]u8 = undefined,
+    request_id: u64 = 0,
+    slot: usize = 0,
+    result: error{ ReadError, NotFound }!void = {},
+    node: std.DoublyLinkedList.Node = .{},
+
+    /// Turn `job` into a probe of its `url`.
+    pub fn setProbe(job: *Job) void {
+        job.kind = .probe;
+        job.offset = 0;
+        job.buf = &job.probe_byte;
+    }
+};
+
+const HttpRangePool = @This();
+
+alloc: std.mem.Allocator,
+io: std.Io,
+config: Config,
+client: std.http.Client,
+threads: []std.Thread = &.{},
+
+mutex: std.Io.Mutex = .init,
+cond: std.Io.Condition = .init,
+pending: std.DoublyLinkedList = .{},
+done: std.DoublyLinkedList = .{},
+stopping: bool = false,
+
+/// Submitted but not yet taken back; only touched by the submitting thread.
+in_flight: usize = 0,
+
+pub fn init(self: *HttpRangePool, alloc: std.mem.Allocator, io: std.Io, config: Config) !void {
+    self.* = .{
+        .alloc = alloc,
+        .io = io,
+        .config = config,
+        .client = .{ .allocator = alloc, .io = io },
+    };
+    errdefer self.client.deinit();
+
+    const n = @max(config.concurrency, 1);
+    const threads = try alloc.alloc(std.Thread, n);
+    errdefer alloc.free(threads);
+    var started: usize = 0;
+    errdefer self.stopWorkers(threads[0..started]);
+    for (threads) |*t| {
+        t.* = try std.Thread.spawn(.{}, HttpRangePool.workerMain, .{self});
+        t.setName(io, "dataloader_http") catch {};
+        started += 1;
+    }
+    self.threads = threads;
+}
+
+pub fn deinit(self: *HttpRangePool) void {
+    self.stopWorkers(self.threads);
+    self.alloc.free(self.threads);
+    self.client.deinit();
+}
+
+fn stopWorkers(self: *HttpRangePool, threads: []std.Thread) void {
+    self.mutex.lockUncancelable(self.io);
+    self.stopping = true;
+    self.cond.broadcast(self.io);
+    self.mutex.unlock(self.io);
+    for (threads) |t| t.join();
+}
+
+pub fn submit(self: *HttpRangePool, job: *Job) void {
+    self.in_flight += 1;
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    self.pending.append(&job.node);
+    self.cond.signal(self.io);
+}
+
+pub fn takeCompleted(self: *HttpRangePool) ?*Job {
+    if (self.in_flight == 0) return null;
+    self.mutex.lockUncancelable(self.io);
+    const node = self.done.popFirst();
+    self.mutex.unlock(self.io);
+    const n = node orelse return null;
+    self.in_flight -= 1;
+    return @fieldParentPtr("node", n);
+}
+
+fn workerMain(self: *HttpRangePool) void {
+    while (true) {
+        self.mutex.lockUncancelable(self.io);
+        while (self.pending.first == null and !self.stopping) {
+            self.cond.waitUncancelable(self.io, &self.mutex);
+        }
+        const node = self.pending.popFirst();
+        self.mutex.unlock(self.io);
+
+        const n = node orelse return;
+        const job: *Job = @fieldParentPtr("node", n);
+        job.result = if (self.fetchRangeRetrying(job.url, job.offset, job.buf)) {} else |err| blk: {
+            logger.err("GET {s} @ {d} (+{d}) failed: {}", .{ job.url, job.offset, job.buf.len, err });
+            break :blk if (err == error.HttpNotFound) error.NotFound else error.ReadError;
+        };
+
+        self.mutex.lockUncancelable(self.io);
+        self.done.append(&job.node);
+        self.mutex.unlock(self.io);
+    }
+}
+
+fn fetchRangeRetrying(self: *HttpRangePool, url: []const u8, offset: u64, buf: []u8) !void {
+    var backoff_ms: u64 = self.config.retry_backoff_ms;
+    var attempt: usize = 0;
+    while (true) : (attempt += 1) {
+        if (fetchRange(&self.client, url, offset, buf)) {
+            return;
+        } else |err| {
+            if (attempt >= self.config.max_retries or !isRetryable(err)) return err;
+            logger.warn("GET {s} @ {d} failed ({}), retry {d}/{d}", .{ url, offset, err, attempt + 1, self.config.max_retries });
+            std.Io.sleep(self.io, .fromMilliseconds(@intCast(backoff_ms)), .awake) catch {};
+            backoff_ms *|= 2;
+        }
+    }
+}
+
+fn isRetryable(err: anyerror) bool {
+    return switch (err) {
+        error.HttpNotFound,
+        error.HttpBadStatus,
+        error.HttpRangeNotSupported,
+        error.UriMissingHost,
+        error.UnsupportedUriScheme,
+        => false,
+        else => true,
+    };
+}
+
+/// Read exactly `buf.len` bytes at `offset` with a single `Range` request.
+fn fetchRange(client: *std.http.Client, url: []const u8, offset: u64, buf: []u8) !void {
+    if (buf.len == 0) return;
+
+    var range_buf: [64]u8 = undefined;
+    const range = std.fmt.bufPrint(&range_buf, "bytes={d}-{d}", .{ offset, offset + buf.len - 1 }) catch unreachable;
+
+    var req = try client.request(.GET, try std.Uri.parse(url), .{
+        // Compressed bodies can't be range-addressed.
+        .headers = .{ .accept_encoding = .{ .override = "identity" } },
+        .extra_headers = &.{.{ .name = "range", .value = range }},
+    });
+    defer req.deinit();
+    try req.sendBodiless();
+
+    var redirect_buf: [8 * 1024]u8 = undefined;
+    var response = try req.receiveHead(&redirect_buf);
+    switch (response.head.status) {
+        .partial_content => {},
+        // A server that ignores `Range` answers 200 with the whole file; only its prefix is usable.
+        .ok => if (offset != 0) return error.HttpRangeNotSupported,
+        .not_found => return error.HttpNotFound,
+        else => |status| return if (@intFromEnum(status) >= 500) error.HttpServerError else error.HttpBadStatus,
+    }
+
+    const reader = response.reader(&.{});
+    reader.readSliceAll(buf) catch |err| switch (err) {
+        error.ReadFailed => return response.bodyErr().?,
+        error.EndOfStream => return error.HttpShortRead,
+    };
+}
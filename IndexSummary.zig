@@ -0,0 +1,131 @@
+//! Per-shard totals the indexer writes next to each index as
+//! `<tar>.utix.summary.json`, so shards can be balanced across ranks without
+//! reading every `.utix`.
+//!
+//! ```json
+//! {"version":1,"rows":3,"total_bytes":4096,"tar_bytes":10240,
+//!  "keys":{".jpg":{"count":3,"bytes":4000},".txt":{"count":3,"bytes":96}},
+//!  "row_size_hist":[[1024,2],[2048,1]]}
+//! ```
+//!
+//! `total_bytes` sums entry payloads; `tar_bytes` is the offset just past the
+//! last indexed entry. `row_size_hist` pairs the lower bound of each
+//! power-of-two bucket with its row count; empty buckets are omitted.
+
+const std = @import("std");
+
+const IndexSummary = @This();
+
+pub const sidecar_suffix = ".utix.summary.json";
+pub const format_version = 1;
+
+pub const KeyStats = struct {
+    count: u64 = 0,
+    bytes: u64 = 0,
+};
+
+rows: u64 = 0,
+total_bytes: u64 = 0,
+tar_bytes: u64 = 0,
+keys: std.StringArrayHashMapUnmanaged(KeyStats) = .empty,
+/// Bucket 0 holds empty rows; bucket i > 0 holds sizes in [2^(i-1), 2^i).
+row_size_hist: [65]u64 = @splat(0),
+
+pub fn deinit(self: *IndexSummary, alloc: std.mem.Allocator) void {
+    for (self.keys.keys()) |k| alloc.free(k);
+    self.keys.deinit(alloc);
+}
+
+pub fn addEntry(self: *IndexSummary, alloc: std.mem.Allocator, key: []const u8, size: u64) !void {
+    const gop = try self.keys.getOrPut(alloc, key);
+    if (!gop.found_existing) {
+        gop.key_ptr.* = alloc.dupe(u8, key) catch |err| {
+            self.keys.swapRemoveAt(gop.index);
+            return err;
+        };
+        gop.value_ptr.* = .{};
+    }
+    gop.value_ptr.count += 1;
+    gop.value_ptr.bytes += size;
+}
+
+/// Close a row whose entries were passed to `addEntry`.
+pub fn finishRow(self: *IndexSummary, row_bytes: u64, end_offset: u64) void {
+    self.rows += 1;
+    self.total_bytes += row_bytes;
+    self.tar_bytes = @max(self.tar_bytes, end_offset);
+    self.row_size_hist[bucket(row_bytes)] += 1;
+}
+
+fn bucket(size: u64) usize {
+    return 64 - @as(usize, @clz(size));
+}
+
+fn bucketLowerBound(i: usize) u64 {
+    return if (i == 0) 0 else @as(u64, 1) << @intCast(i - 1);
+}
+
+pub fn write(self: *const IndexSummary, w: *std.Io.Writer) !void {
+    var json: std.json.Stringify = .{ .writer = w };
+    try json.beginObject();
+    try json.objectField("version");
+    try json.write(format_version);
+    try json.objectField("rows");
+    try json.write(self.rows);
+    try json.objectField("total_bytes");
+    try json.write(self.total_bytes);
+    try json.objectField("tar_bytes");
+    try json.write(self.tar_bytes);
+
+    try json.objectField("keys");
+    try json.beginObject();
+    for (self.keys.keys(), self.keys.values()) |k, v| {
+        try json.objectField(k);
+        try json.write(v);
+    }
+    try json.endObject();
+
+    try json.objectField("row_size_hist");
+    try json.beginArray();
+    for (self.row_size_hist, 0..) |count, i| {
+        if (count == 0) continue;
+        try json.write([2]u64{ bucketLowerBound(i), count });
+    }
+    try json.endArray();
+    try json.endObject();
+    try w.writeByte('\n');
+}
+
+/// Write `<tar_path>.utix.summary.json`.
+pub fn writeSidecar(self: *const IndexSummary, io: std.Io, tar_path: []const u8) !void {
+    var path_buf: [std.fs.max_path_bytes]u8 = undefined;
+    const path = try std.fmt.bufPrint(&path_buf, "{s}" ++ sidecar_suffix, .{tar_path});
+
+    var file = try std.Io.Dir.cwd().createFile(io, path, .{ .truncate = true });
+    defer file.close(io);
+    var buf: [4096]u8 = undefined;
+    var fw = file.writer(io, &buf);
+    try self.write(&fw.interface);
+    try fw.interface.flush();
+}
+
+test "summary json" {
+    const alloc = std.testing.allocator;
+    var s: IndexSummary = .{};
+    defer s.deinit(alloc);
+
+    try s.addEntry(alloc, ".jpg", 1500);
+    try s.addEntry(alloc, ".txt", 10);
+    s.finishRow(1510, 2048);
+    try s.addEntry(alloc, ".jpg", 3000);
+    s.finishRow(3000, 6144);
+    s.finishRow(0, 6144);
+
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try s.write(&out.writer);
+    try std.testing.expectEqualStrings(
+        \\{"version":1,"rows":3,"total_bytes":4510,"tar_bytes":6144,"keys":{".jpg":{"count":2,"bytes":4500},".txt":{"count":1,"bytes":10}},"row_size_hist":[[0,1],[1024,1],[2048,1]]}
+        \\
+    , out.written());
+}
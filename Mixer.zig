@@ -0,0 +1,183 @@
+//! Weighted choice over row sources for mixed datasets.
+//!
+//! Turns come from a seeded PRNG in proportion to the weights. By default a
+//! source with no row ready when its turn comes lends the turn to one that
+//! has: the lender is owed a turn, served as soon as it has a row, and the
+//! borrower skips its next scheduled turn. When no source has a row, the
+//! consumer takes one from whichever produces first, as a loan from the
+//! scheduled source. The ratios hold over time while a slow source never
+//! stalls the others, but the exact sequence depends on timing. In deterministic mode the consumer blocks on every scheduled
+//! source, so a seed and weight vector always give the same sequence.
+//! Exhausted sources drop out and the rest keep their relative weights.
+
+const std = @import("std");
+
+const Mixer = @This();
+
+pub const SourceStats = struct {
+    rows: u64 = 0,
+    bytes: u64 = 0,
+    /// Time the consumer spent blocked on this source's turns.
+    wait_ns: u64 = 0,
+    /// Turns this source had no row ready for and lent to another.
+    lent: u64 = 0,
+    exhausted: bool = false,
+};
+
+alloc: std.mem.Allocator,
+prng: std.Random.DefaultPrng,
+/// Zeroed once a source is exhausted.
+weights: []f64,
+stats: []SourceStats,
+/// Sources with a non-zero weight left.
+active: usize,
+/// Block on every scheduled source instead of lending its turn.
+deterministic: bool,
+/// Turns owed to a source (positive) or taken ahead of schedule (negative).
+credit: []i64,
+
+pub fn init(alloc: std.mem.Allocator, weights: []const f64, seed: u64, deterministic: bool) !Mixer {
+    var active: usize = 0;
+    for (weights) |w| {
+        if (!std.math.isFinite(w) or w < 0) return error.InvalidWeights;
+        if (w > 0) active += 1;
+    }
+    if (active == 0) return error.InvalidWeights;
+
+    const owned = try alloc.dupe(f64, weights);
+    errdefer alloc.free(owned);
+    const stats = try alloc.alloc(SourceStats, weights.len);
+    errdefer alloc.free(stats);
+    @memset(stats, .{});
+    const credit = try alloc.alloc(i64, weights.len);
+    @memset(credit, 0);
+
+    return .{
+        .alloc = alloc,
+        .prng = .init(seed),
+        .weights = owned,
+        .stats = stats,
+        .active = active,
+        .deterministic = deterministic,
+        .credit = credit,
+    };
+}
+
+pub fn deinit(self: *Mixer) void {
+    self.alloc.free(self.weights);
+    self.alloc.free(self.stats);
+    self.alloc.free(self.credit);
+}
+
+/// Source whose turn is next, or null once all are exhausted. Turns of
+/// sources that already borrowed one are skipped.
+pub fn pick(self: *Mixer) ?usize {
+    while (self.active > 0) {
+        const i = self.prng.random().weightedIndex(f64, self.weights);
+        if (self.credit[i] >= 0) return i;
+        self.credit[i] += 1;
+    }
+    return null;
+}
+
+/// `from` had no row ready for its turn and `to` took it instead.
+pub fn lend(self: *Mixer, from: usize, to: usize) void {
+    self.credit[from] += 1;
+    self.credit[to] -= 1;
+    self.stats[from].lent += 1;
+}
+
+/// A source owed a turn took it.
+pub fn repay(self: *Mixer, source: usize) void {
+    self.credit[source] -= 1;
+}
+
+/// Whether `source` is owed a turn and should be offered one before the next pick.
+pub fn owed(self: *const Mixer, source: usize) bool {
+    return self.credit[source] > 0 and self.weights[source] > 0;
+}
+
+pub fn exhaust(self: *Mixer, source: usize) void {
+    if (self.weights[source] > 0) {
+        self.weights[source] = 0;
+        self.active -= 1;
+    }
+    // Turns it was owed go back to the schedule.
+    self.credit[source] = 0;
+    self.stats[source].exhausted = true;
+}
+
+pub fn record(self: *Mixer, source: usize, bytes: u64, wait_ns: u64) void {
+    const s = &self.stats[source];
+    s.rows += 1;
+    s.bytes += bytes;
+    s.wait_ns += wait_ns;
+}
+
+test "same seed gives the same sequence" {
+    const weights = [_]f64{ 1, 2, 3 };
+    var a = try Mixer.init(std.testing.allocator, &weights, 7, true);
+    defer a.deinit();
+    var b = try Mixer.init(std.testing.allocator, &weights, 7, true);
+    defer b.deinit();
+
+    for (0..1000) |_| try std.testing.expectEqual(a.pick(), b.pick());
+}
+
+test "picks follow the weights" {
+    var m = try Mixer.init(std.testing.allocator, &.{ 3, 1, 0 }, 42, false);
+    defer m.deinit();
+
+    var counts = [_]usize{ 0, 0, 0 };
+    for (0..20_000) |_| counts[m.pick().?] += 1;
+
+    try std.testing.expectEqual(0, counts[2]);
+    const ratio = @as(f64, @floatFromInt(counts[0])) / @as(f64, @floatFromInt(counts[1]));
+    try std.testing.expect(ratio > 2.8 and ratio < 3.2);
+}
+
+test "exhausted sources drop out" {
+    var m = try Mixer.init(std.testing.allocator, &.{ 1, 1 }, 0, false);
+    defer m.deinit();
+
+    m.exhaust(0);
+    for (0..100) |_| try std.testing.expectEqual(1, m.pick().?);
+    m.exhaust(1);
+    try std.testing.expectEqual(null, m.pick());
+    try std.testing.expect(m.stats[0].exhausted and m.stats[1].exhausted);
+}
+
+test "invalid weights are rejected" {
+    const alloc = std.testing.allocator;
+    try std.testing.expectError(error.InvalidWeights, Mixer.init(alloc, &.{}, 0, false));
+    try std.testing.expectError(error.InvalidWeights, Mixer.init(alloc, &.{ 0, 0 }, 0, false));
+    try std.testing.expectError(error.InvalidWeights, Mixer.init(alloc, &.{ 1, -1 }, 0, false));
+    try std.testing.expectError(error.InvalidWeights, Mixer.init(alloc, &.{std.math.nan(f64)}, 0, false));
+}
+
+test "lent turns are paid back and keep the ratios" {
+    var m = try Mixer.init(std.testing.allocator, &.{ 1, 1 }, 3, false);
+    defer m.deinit();
+
+    // Source 0 is never ready on its turn for the first 100 picks.
+    var counts = [_]usize{ 0, 0 };
+    for (0..100) |_| {
+        const i = m.pick().?;
+        if (i == 0) m.lend(0, 1);
+        counts[1] += 1;
+    }
+    const debt = m.credit[0];
+    try std.testing.expect(debt > 0);
+    try std.testing.expectEqual(@as(u64, @intCast(debt)), m.stats[0].lent);
+
+    // Once it catches up it is served what it is owed, and source 1 skips as many turns.
+    while (m.owed(0)) {
+        m.repay(0);
+        counts[0] += 1;
+    }
+    for (0..10_000) |_| counts[m.pick().?] += 1;
+    const ratio = @as(f64, @floatFromInt(counts[0])) / @as(f64, @floatFromInt(counts[1]));
+    try std.testing.expect(ratio > 0.95 and ratio < 1.05);
+    try std.testing.expectEqual(0, m.credit[0]);
+    try std.testing.expectEqual(0, m.credit[1]);
+}
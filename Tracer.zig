@@ -0,0 +1,292 @@
+//! Opt-in pipeline tracing, exported in the Chrome trace event format
+//! (chrome://tracing, ui.perfetto.dev).
+//!
+//! Each `Track` is a fixed ring of events. Several threads may record into
+//! the same track (Python threads and `Mixer` both consume rows), so a writer
+//! reserves a slot with an atomic increment, fills it, and then publishes it
+//! by storing the slot's sequence number. Readers copy a slot only while its
+//! sequence is stable, so `write` skips events still being written instead
+//! of emitting them torn. Nothing allocates or locks once tracing is on; a
+//! full ring overwrites its oldest events, so a trace always covers the most
+//! recent stretch of the run. A writer that laps one still filling its slot
+//! drops its event.
+
+const std = @import("std");
+
+const Tracer = @This();
+
+pub const default_events_per_track = 1 << 16;
+
+pub const Track = enum(u8) {
+    /// Lua generator and request submission: whoever calls `nextRow`.
+    lua,
+    /// The dataloader IO thread.
+    io,
+    /// Whoever takes rows and hands them back: Python, `Mixer`.
+    consumer,
+};
+
+pub const Name = enum(u8) {
+    /// Span: one resume of the row generator; `detail` is what it yielded for.
+    lua_resume,
+    /// Async span: request enqueued until its response is sent; `id` is the request id.
+    request,
+    /// Instant: the IO thread dequeued a request.
+    submit,
+    /// Instant: the Lua side received a response.
+    response,
+    /// Async span: row finished by the script until reclaimed; `id` is the row sequence number.
+    row,
+    /// Instant: `nextRow` returned the row.
+    row_ready,
+    /// Span: a consumer blocked waiting for a row.
+    next_row,
+    /// Instant: a consumer took the row.
+    row_handed,
+};
+
+const Phase = enum(u8) { span, instant, begin, end };
+
+const Event = struct {
+    ts_ns: u64,
+    dur_ns: u64 = 0,
+    id: u64 = 0,
+    /// Static string.
+    detail: []const u8 = "",
+    name: Name,
+    phase: Phase,
+};
+
+const Slot = struct {
+    /// Even: `(i + 1) * 2` once event `i` is published, 0 before any.
+    /// Odd: a writer is filling the slot.
+    seq: std.atomic.Value(u64) = .init(0),
+    event: Event = undefined,
+};
+
+const Ring = struct {
+    slots: []Slot,
+    head: std.atomic.Value(u64) = .init(0),
+
+    /// Copy of event `i`, or null if it was overwritten or is still being written.
+    fn read(self: *Ring, i: u64) ?Event {
+        const slot = &self.slots[i & (self.slots.len - 1)];
+        const published = (i + 1) * 2;
+        if (slot.seq.load(.acquire) != published) return null;
+        const ev = slot.event;
+        // A read-modify-write orders the copy above before this check.
+        if (slot.seq.fetchAdd(0, .acq_rel) != published) return null;
+        return ev;
+    }
+};
+
+io: std.Io,
+origin: std.Io.Clock.Timestamp,
+rings: [std.meta.fields(Track).len]Ring,
+
+/// `events_per_track` is rounded up to a power of two.
+pub fn init(alloc: std.mem.Allocator, io: std.Io, events_per_track: usize) !Tracer {
+    const cap = try std.math.ceilPowerOfTwo(usize, @max(events_per_track, 2));
+    var self: Tracer = .{
+        .io = io,
+        .origin = std.Io.Clock.Timestamp.now(io, .awake),
+        .rings = undefined,
+    };
+    var n: usize = 0;
+    errdefer for (self.rings[0..n]) |r| alloc.free(r.slots);
+    for (&self.rings) |*r| {
+        r.* = .{ .slots = try alloc.alloc(Slot, cap) };
+        @memset(r.slots, .{});
+        n += 1;
+    }
+    return self;
+}
+
+pub fn deinit(self: *Tracer, alloc: std.mem.Allocator) void {
+    for (self.rings) |r| alloc.free(r.slots);
+}
+
+/// Nanoseconds since `init`; pass to `span` as its start.
+pub fn now(self: *const Tracer) u64 {
+    const ns = self.origin.durationTo(std.Io.Clock.Timestamp.now(self.io, .awake)).raw.nanoseconds;
+    return @intCast(@max(0, ns));
+}
+
+fn record(self: *Tracer, track: Track, ev: Event) void {
+    const ring = &self.rings[@intFromEnum(track)];
+    const i = ring.head.fetchAdd(1, .monotonic);
+    const slot = &ring.slots[i & (ring.slots.len - 1)];
+    const prev = slot.seq.load(.monotonic);
+    if (prev & 1 != 0) return;
+    if (slot.seq.cmpxchgStrong(prev, prev | 1, .acquire, .monotonic) != null) return;
+    slot.event = ev;
+    slot.seq.store((i + 1) * 2, .release);
+}
+
+/// A span from `start_ns` (see `now`) until now.
+pub fn span(self: *Tracer, track: Track, name: Name, start_ns: u64, detail: []const u8) void {
+    const t = self.now();
+    self.record(track, .{ .ts_ns = start_ns, .dur_ns = t -| start_ns, .detail = detail, .name = name, .phase = .span });
+}
+
+pub fn instant(self: *Tracer, track: Track, name: Name, id: u64, detail: []const u8) void {
+    self.record(track, .{ .ts_ns = self.now(), .id = id, .detail = detail, .name = name, .phase = .instant });
+}
+
+/// Open an async span; `end` with the same `name` and `id` closes it, from any track.
+pub fn begin(self: *Tracer, track: Track, name: Name, id: u64, detail: []const u8) void {
+    self.record(track, .{ .ts_ns = self.now(), .id = id, .detail = detail, .name = name, .phase = .begin });
+}
+
+pub fn end(self: *Tracer, track: Track, name: Name, id: u64) void {
+    self.record(track, .{ .ts_ns = self.now(), .id = id, .name = name, .phase = .end });
+}
+
+const JsonArgs = struct {
+    name: ?[]const u8 = null,
+    id: ?u64 = null,
+    detail: ?[]const u8 = null,
+};
+
+const JsonEvent = struct {
+    name: []const u8,
+    cat: []const u8 = "ultar",
+    ph: []const u8,
+    ts: f64 = 0,
+    dur: ?f64 = null,
+    /// Instant scope; "t" keeps the marker on its thread.
+    s: ?[]const u8 = null,
+    id: ?u64 = null,
+    pid: u32 = 1,
+    tid: u8,
+    args: JsonArgs = .{},
+};
+
+fn us(ns: u64) f64 {
+    return @as(f64, @floatFromInt(ns)) / 1000.0;
+}
+
+/// Write the retained events as a Chrome trace JSON object.
+pub fn write(self: *Tracer, w: *std.Io.Writer) !void {
+    var json: std.json.Stringify = .{ .writer = w, .options = .{ .emit_null_optional_fields = false } };
+    try json.beginObject();
+    try json.objectField("displayTimeUnit");
+    try json.write("ms");
+    try json.objectField("traceEvents");
+    try json.beginArray();
+    for (&self.rings, 0..) |*ring, t| {
+        const tid: u8 = @intCast(t);
+        try json.write(JsonEvent{ .name = "thread_name", .ph = "M", .tid = tid, .args = .{ .name = @tagName(@as(Track, @enumFromInt(tid))) } });
+
+        const head = ring.head.load(.acquire);
+        const n = @min(head, ring.slots.len);
+        for (head - n..head) |i| {
+            const ev = ring.read(i) orelse continue;
+            var out: JsonEvent = .{ .name = @tagName(ev.name), .ph = undefined, .ts = us(ev.ts_ns), .tid = tid };
+            if (ev.detail.len > 0) out.args.detail = ev.detail;
+            switch (ev.phase) {
+                .span => {
+                    out.ph = "X";
+                    out.dur = us(ev.dur_ns);
+                },
+                .instant => {
+                    out.ph = "i";
+                    out.s = "t";
+                    out.args.id = ev.id;
+                },
+                .begin, .end => {
+                    out.ph = if (ev.phase == .begin) "b" else "e";
+                    out.cat = @tagName(ev.name);
+                    out.id = ev.id;
+                },
+            }
+            try json.write(out);
+        }
+    }
+    try json.endArray();
+    try json.endObject();
+    try w.writeByte('\n');
+}
+
+/// Write the trace to `path`.
+pub fn dump(self: *Tracer, path: []const u8) !void {
+    var file = try std.Io.Dir.cwd().createFile(self.io, path, .{ .truncate = true });
+    defer file.close(self.io);
+    var buf: [64 << 10]u8 = undefined;
+    var fw = file.writer(self.io, &buf);
+    try self.write(&fw.interface);
+    try fw.interface.flush();
+}
+
+test "chrome trace json" {
+    const alloc = std.testing.allocator;
+    var tracer = try Tracer.init(alloc, std.testing.io, 4);
+    defer tracer.deinit(alloc);
+
+    const t0 = tracer.now();
+    tracer.begin(.lua, .request, 7, "read_block");
+    tracer.instant(.io, .submit, 7, "read_block");
+    tracer.end(.io, .request, 7);
+    tracer.span(.lua, .lua_resume, t0, "add_entry");
+    // Overflows the 4-event ring; the oldest consumer events are dropped.
+    for (0..6) |i| tracer.instant(.consumer, .row_handed, i, "");
+
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try tracer.write(&out.writer);
+
+    const parsed = try std.json.parseFromSlice(std.json.Value, alloc, out.written(), .{});
+    defer parsed.deinit();
+    const events = parsed.value.object.get("traceEvents").?.array.items;
+    // 3 thread names, 2 lua, 2 io, 4 of 6 consumer events.
+    try std.testing.expectEqual(@as(usize, 11), events.len);
+
+    const begin_ev = events[1].object;
+    try std.testing.expectEqualStrings("request", begin_ev.get("name").?.string);
+    try std.testing.expectEqualStrings("b", begin_ev.get("ph").?.string);
+    try std.testing.expectEqual(@as(i64, 7), begin_ev.get("id").?.integer);
+
+    const resume_ev = events[2].object;
+    try std.testing.expectEqualStrings("X", resume_ev.get("ph").?.string);
+    try std.testing.expectEqualStrings("add_entry", resume_ev.get("args").?.object.get("detail").?.string);
+
+    const first_handed = events[7].object;
+    try std.testing.expectEqualStrings("consumer", events[6].object.get("args").?.object.get("name").?.string);
+    try std.testing.expectEqual(@as(i64, 2), first_handed.get("args").?.object.get("id").?.integer);
+}
+
+test "concurrent writers on one track never tear events" {
+    const alloc = std.testing.allocator;
+    var tracer = try Tracer.init(alloc, std.testing.io, 1 << 10);
+    defer tracer.deinit(alloc);
+
+    const details = [_][]const u8{ "a", "bb", "ccc", "dddd" };
+    const Writer = struct {
+        fn run(t: *Tracer, base: u64) void {
+            for (0..20_000) |k| {
+                const id = base + k;
+                t.instant(.consumer, .row_handed, id, details[id % details.len]);
+            }
+        }
+    };
+    var threads: [4]std.Thread = undefined;
+    for (&threads, 0..) |*th, n| th.* = try std.Thread.spawn(.{}, Writer.run, .{ &tracer, n * 1_000_000 });
+    for (threads) |th| th.join();
+
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    try tracer.write(&out.writer);
+    const parsed = try std.json.parseFromSlice(std.json.Value, alloc, out.written(), .{});
+    defer parsed.deinit();
+
+    var handed: usize = 0;
+    for (parsed.value.object.get("traceEvents").?.array.items) |ev| {
+        if (!std.mem.eql(u8, ev.object.get("name").?.string, "row_handed")) continue;
+        const args = ev.object.get("args").?.object;
+        const id: u64 = @intCast(args.get("id").?.integer);
+        try std.testing.expectEqualStrings(details[id % details.len], args.get("detail").?.string);
+        handed += 1;
+    }
+    // The ring holds the last 1024; only events a lapping writer dropped are missing.
+    try std.testing.expect(handed > 0 and handed <= 1 << 10);
+}
@@ -71,6 +71,18 @@ pub fn build(b: *std.Build) void {
     indexer.root_module.addImport("msgpack", msgpack_module);
     b.installArtifact(indexer);
 
+    const manifest_tool = b.addExecutable(.{
+        .name = "ultar_manifest",
+        .root_module = b.createModule(.{
+            .root_source_file = b.path("build_manifest.zig"),
+            .target = target,
+            .optimize = optimize,
+        }),
+    });
+    manifest_tool.root_module.addImport("clap", clap.module("clap"));
+    manifest_tool.root_module.addImport("msgpack", msgpack_module);
+    b.installArtifact(manifest_tool);
+
     const lib_dataloader = b.addLibrary(.{
         .name = "dataloader",
         .linkage = .dynamic,
@@ -85,6 +97,7 @@ pub fn build(b: *std.Build) void {
     });
     lib_dataloader.root_module.addImport("xev", xev.module("xev"));
     lib_dataloader.root_module.addImport("zlua", zlua.module("zlua"));
+    lib_dataloader.root_module.addImport("msgpack", msgpack_module);
     b.installArtifact(lib_dataloader);
 
     // Reused by the Python bindings library below.
@@ -97,6 +110,8 @@ pub fn build(b: *std.Build) void {
     });
     lua_dataloader_mod.addImport("xev", xev.module("xev"));
     lua_dataloader_mod.addImport("zlua", zlua.module("zlua"));
+    // Shared with `indexer.zig`, which `build_index` compiles in.
+    lua_dataloader_mod.addImport("msgpack", msgpack_module);
 
     if (build_python) {
         buildPythonBindings(b, target, optimize, lua_dataloader_mod, python_exe);
@@ -159,14 +174,16 @@ pub fn build(b: *std.Build) void {
     const copy_python_scripts = b.addSystemCommand(&.{
         "sh",
         "-c",
-        "mkdir -p python/scripts && cp -f zig-out/bin/indexer python/scripts/indexer && cp -f zig-out/bin/ultar_httpd python/scripts/ultar_httpd && chmod 755 python/scripts/indexer python/scripts/ultar_httpd",
+        "mkdir -p python/scripts && cp -f zig-out/bin/indexer python/scripts/indexer && cp -f zig-out/bin/ultar_httpd python/scripts/ultar_httpd && cp -f zig-out/bin/ultar_manifest python/scripts/ultar_manifest && chmod 755 python/scripts/indexer python/scripts/ultar_httpd python/scripts/ultar_manifest",
     });
     copy_python_scripts.step.dependOn(&b.addInstallArtifact(indexer, .{}).step);
+    copy_python_scripts.step.dependOn(&b.addInstallArtifact(manifest_tool, .{}).step);
     copy_python_scripts.step.dependOn(&b.addInstallArtifact(webapp, .{}).step);
     python_step.dependOn(&copy_python_scripts.step);
 
-    const cli_step = b.step("cli", "Build CLI tools (indexer, ultar_httpd)");
+    const cli_step = b.step("cli", "Build CLI tools (indexer, ultar_manifest, ultar_httpd)");
     cli_step.dependOn(&b.addInstallArtifact(indexer, .{}).step);
+    cli_step.dependOn(&b.addInstallArtifact(manifest_tool, .{}).step);
     cli_step.dependOn(&b.addInstallArtifact(webapp, .{}).step);
 
     const run_step = b.step("run", "Run the web application");
@@ -0,0 +1,132 @@
+//! `ultar_manifest`: merge per-shard `.utix` indexes into one dataset manifest.
+
+const std = @import("std");
+const clap = @import("clap");
+const msgpack = @import("msgpack");
+
+const DatasetManifest = @import("DatasetManifest.zig");
+const IndexSummary = @import("IndexSummary.zig");
+const utix = @import("ultar_httpd/utix.zig");
+
+const logger = std.log.scoped(.manifest);
+
+pub fn main(init: std.process.Init) !void {
+    const allocator = init.gpa;
+    const io = init.io;
+
+    var stderr_buffer: [1024]u8 = undefined;
+    var stderr_writer = std.Io.File.stderr().writer(io, &stderr_buffer);
+    const stderr = &stderr_writer.interface;
+    defer stderr.flush() catch @panic("Error flushing stderr");
+
+    const params = comptime clap.parseParamsComptime(
+        \\-h, --help           Display this help and exit.
+        \\-o, --output <FILE>  Manifest to write (e.g. dataset.utmf).
+        \\--metadata           Merge each row's metadata column into the manifest.
+        \\<FILE>...            Indexed tar files, in global row order.
+        \\
+    );
+
+    const parsers = comptime .{
+        .FILE = clap.parsers.string,
+    };
+
+    var diag = clap.Diagnostic{};
+    var res = clap.parse(clap.Help, &params, parsers, init.minimal.args, .{
+        .diagnostic = &diag,
+        .allocator = allocator,
+    }) catch |err| {
+        diag.report(stderr, err) catch {};
+        return err;
+    };
+    defer res.deinit();
+
+    if (res.args.help != 0 or res.args.output == null)
+        return clap.help(stderr, clap.Help, &params, .{});
+
+    const out_path = res.args.output.?;
+    const with_metadata = res.args.metadata != 0;
+
+    const cwd = try std.Io.Dir.cwd().realPathFileAlloc(io, ".", allocator);
+    defer allocator.free(cwd);
+    const out_dir = std.fs.path.dirname(out_path) orelse ".";
+
+    var builder = try DatasetManifest.Builder.init(allocator, with_metadata);
+    defer builder.deinit();
+
+    for (res.positionals[0]) |tar_path| {
+        const rel = try std.fs.path.relative(allocator, cwd, null, out_dir, tar_path);
+        defer allocator.free(rel);
+
+        if (with_metadata) {
+            try builder.addShard(rel, 0);
+            _ = try scanIndex(allocator, io, tar_path, &builder);
+        } else {
+            try builder.addShard(rel, try countRows(allocator, io, tar_path));
+        }
+    }
+
+    // Write-then-rename so readers never map a half-written manifest.
+    const tmp_path = try std.mem.concat(allocator, u8, &.{ out_path, ".tmp" });
+    defer allocator.free(tmp_path);
+    {
+        const file = std.Io.Dir.cwd().createFile(io, tmp_path, .{ .truncate = true }) catch |err| {
+            logger.err("Error opening output file {s}: {}", .{ tmp_path, err });
+            return err;
+        };
+        defer file.close(io);
+        var buf: [64 * 1024]u8 = undefined;
+        var fw = file.writer(io, &buf);
+        try builder.write(&fw.interface);
+        try fw.interface.flush();
+    }
+    try std.Io.Dir.cwd().rename(tmp_path, std.Io.Dir.cwd(), out_path, io);
+
+    logger.info("Wrote {s}: {} shards, {} rows", .{ out_path, builder.shards.items.len, builder.cum_rows.getLast() });
+}
+
+/// Row count from the indexer's summary, falling back to scanning the `.utix`.
+fn countRows(alloc: std.mem.Allocator, io: std.Io, tar_path: []const u8) !u64 {
+    const summary_path = try std.mem.concat(alloc, u8, &.{ tar_path, IndexSummary.sidecar_suffix });
+    defer alloc.free(summary_path);
+    if (std.Io.Dir.cwd().readFileAlloc(io, summary_path, alloc, .limited(1 << 20))) |bytes| {
+        defer alloc.free(bytes);
+        const parsed = std.json.parseFromSlice(struct { rows: u64 }, alloc, bytes, .{ .ignore_unknown_fields = true }) catch |err| {
+            logger.warn("Ignoring unreadable summary {s}: {}", .{ summary_path, err });
+            return scanIndex(alloc, io, tar_path, null);
+        };
+        defer parsed.deinit();
+        return parsed.value.rows;
+    } else |_| {
+        return scanIndex(alloc, io, tar_path, null);
+    }
+}
+
+/// Count the rows of `<tar_path>.utix`, appending their metadata to `builder` if given.
+fn scanIndex(alloc: std.mem.Allocator, io: std.Io, tar_path: []const u8, builder: ?*DatasetManifest.Builder) !u64 {
+    const idx_path = try std.mem.concat(alloc, u8, &.{ tar_path, ".utix" });
+    defer alloc.free(idx_path);
+    const file = std.Io.Dir.cwd().openFile(io, idx_path, .{ .mode = .read_only }) catch |err| {
+        logger.err("Error opening index {s}: {}", .{ idx_path, err });
+        return err;
+    };
+    defer file.close(io);
+
+    var read_buf: [64 * 1024]u8 = undefined;
+    var reader = file.readerStreaming(io, &read_buf);
+    var scanner = msgpack.Scanner.init(&reader.interface, alloc);
+    defer scanner.deinit();
+    var row_arena = std.heap.ArenaAllocator.init(alloc);
+    defer row_arena.deinit();
+
+    var rows: u64 = 0;
+    while (true) : (rows += 1) {
+        _ = row_arena.reset(.retain_capacity);
+        const row = (utix.readEntry(row_arena.allocator(), &scanner, .{ .metadata = builder != null }) catch |err| {
+            logger.err("Error reading {s} at row {}: {}", .{ idx_path, rows, err });
+            return err;
+        }) orelse break;
+        if (builder) |b| try b.addRowMetadata(row.metadata orelse "");
+    }
+    return rows;
+}
@@ -1,6 +1,9 @@
 const std = @import("std");
 const xev = @import("xev");
 const concurrent_ring = @import("concurrent_ring.zig");
+const HttpRangePool = @import("HttpRangePool.zig");
+pub const BlockCache = @import("BlockCache.zig");
+pub const Tracer = @import("Tracer.zig");
 
 const logger = std.log.scoped(.dataloader);
 const wlog = std.log.scoped(.dataloader_io_thread);
@@ -21,6 +24,59 @@ pub const FileHandle = packed struct {
 const max_file_slots = std.math.maxInt(u20);
 const max_generation = std.math.maxInt(u20);
 
+pub const HttpConfig = HttpRangePool.Config;
+
+/// Tail-latency controls for local reads. `http://` reads have their own
+/// retries (`HttpConfig`) and are not affected.
+pub const ReadPolicy = struct {
+    /// Fail reads still outstanding after this long with `ReadTimeout`; 0 disables.
+    deadline_ms: u64 = 0,
+    /// Reissue a read still outstanding after the observed p99 latency; the first copy to land wins.
+    hedge: bool = false,
+
+    fn active(self: ReadPolicy) bool {
+        return self.deadline_ms > 0 or self.hedge;
+    }
+};
+
+/// A local file mapped read-only in full, shared by its slot and by every row
+/// entry viewing into it. Unmapped once the last reference is released, from
+/// whichever thread that happens on.
+pub const MappedFile = struct {
+    memory: []align(std.heap.page_size_min) const u8,
+    refs: std.atomic.Value(u32) = .init(1),
+    alloc: std.mem.Allocator,
+    // Range last passed to madvise; only the thread building rows touches it.
+    advised_lo: u64 = 0,
+    advised_hi: u64 = 0,
+
+    // Sequential entries share one madvise per window instead of one each.
+    const prefetch_window = 4 << 20;
+
+    pub fn retain(self: *MappedFile) void {
+        _ = self.refs.fetchAdd(1, .monotonic);
+    }
+
+    pub fn release(self: *MappedFile) void {
+        if (self.refs.fetchSub(1, .acq_rel) != 1) return;
+        std.posix.munmap(self.memory);
+        self.alloc.destroy(self);
+    }
+
+    /// Ask the kernel to start paging `[offset, offset + len)` in, along with
+    /// the window after it.
+    pub fn prefetch(self: *MappedFile, offset: u64, len: usize) void {
+        if (offset >= self.advised_lo and offset + len <= self.advised_hi) return;
+        const start = std.mem.alignBackward(u64, offset, std.heap.pageSize());
+        const end = @min(offset + @max(len, prefetch_window), self.memory.len);
+        if (end <= start) return;
+        self.advised_lo = start;
+        self.advised_hi = end;
+        const ptr: [*]align(std.heap.page_size_min) u8 = @alignCast(@constCast(self.memory.ptr + @as(usize, @intCast(start))));
+        std.posix.madvise(ptr, @intCast(end - start), std.posix.MADV.WILLNEED) catch {};
+    }
+};
+
 pub const ReadBlockReq = struct {
     base: u64,
     file: FileHandle,
@@ -33,11 +89,26 @@ pub const Request = union(enum) {
     },
     close_file: FileHandle,
     read_block: ReadBlockReq,
+    /// Takes effect only before the first `http://` file is opened.
+    configure_http: HttpConfig,
+    /// Applies to reads issued after it.
+    configure_reads: ReadPolicy,
+    /// Serve local files opened after this through `cache`. Borrowed; the
+    /// caller keeps it alive until the worker has been joined.
+    configure_cache: *BlockCache,
+    /// Map local files opened after this and answer their opens with
+    /// `open_mapped`. Files served through the block cache are not mapped.
+    configure_mmap: bool,
     drain: struct {},
 };
 
 pub const ResponsePayload = union(enum) {
     open_file: FileHandle,
+    /// The file is open and mapped; the receiver owns one reference to `mapped`.
+    open_mapped: struct {
+        file: FileHandle,
+        mapped: *MappedFile,
+    },
     read_block: struct {},
 };
 
@@ -50,6 +121,8 @@ pub const LoaderError = error{
     TooManyOpenFiles,
     InvalidFileHandle,
     ReadError,
+    ReadTimeout,
+    RemoteOpenFailed,
 } || std.Io.File.OpenError || std.mem.Allocator.Error;
 
 fn path_checksum(path: []const u8) u8 {
@@ -64,8 +137,69 @@ const XevReq = struct {
     req: ReadBlockReq,
     c: xev.Completion = undefined,
     request_id: u64 = 0,
+    // Set for attempts of a `TrackedRead`, which read into `scratch`.
+    tracked: ?*TrackedRead = null,
+    scratch: []u8 = &.{},
+    issued_at: std.Io.Clock.Timestamp = undefined,
+};
+
+/// A read under a `ReadPolicy`. Every attempt reads into its own scratch
+/// buffer and the first one to land is copied out, so an attempt finishing
+/// after a timeout or a hedge can't write into a buffer the client reused.
+const TrackedRead = struct {
+    req: ReadBlockReq,
+    request_id: u64,
+    issued_at: std.Io.Clock.Timestamp,
+    node: std.DoublyLinkedList.Node = .{},
+    // Attempts still in the event loop; the read is freed once this drops to 0.
+    attempts: u8 = 0,
+    hedged: bool = false,
+    responded: bool = false,
+};
+
+/// Log2 histogram of local read latencies in microseconds, used to pick the hedge delay.
+const LatencyHistogram = struct {
+    const num_buckets = 40;
+    /// Samples needed before `quantile` answers.
+    const min_samples = 100;
+    /// Counts are halved past this many samples so the estimate follows drift.
+    const max_samples = 1 << 16;
+
+    buckets: [num_buckets]u64 = @splat(0),
+    count: u64 = 0,
+
+    fn record(self: *LatencyHistogram, us: u64) void {
+        self.buckets[@min(std.math.log2_int(u64, us | 1), num_buckets - 1)] += 1;
+        self.count += 1;
+        if (self.count >= max_samples) {
+            self.count = 0;
+            for (&self.buckets) |*b| {
+                b.* /= 2;
+                self.count += b.*;
+            }
+        }
+    }
+
+    /// Upper bound in microseconds of the bucket holding quantile `q`.
+    fn quantile(self: *const LatencyHistogram, q: f64) ?u64 {
+        if (self.count < min_samples) return null;
+        const target: u64 = @intFromFloat(@ceil(q * @as(f64, @floatFromInt(self.count))));
+        var seen: u64 = 0;
+        for (self.buckets, 0..) |n, i| {
+            seen += n;
+            if (seen >= target) return @as(u64, 2) << @intCast(i);
+        }
+        return @as(u64, 2) << (num_buckets - 1);
+    }
 };
 
+/// Hedging a read that only lost a scheduling slot wastes IO; never hedge sooner than this.
+const min_hedge_delay_us = 1000;
+
+fn elapsedUs(from: std.Io.Clock.Timestamp, to: std.Io.Clock.Timestamp) u64 {
+    return @intCast(@max(0, @divTrunc(from.durationTo(to).raw.nanoseconds, std.time.ns_per_us)));
+}
+
 pub const LoaderCtx = struct {
     const Self = @This();
 
@@ -101,7 +235,10 @@ pub const LoaderCtx = struct {
     req_cnt: u64 = 0,
     is_running: bool = false,
     is_draining: bool = false,
-    last_slot: usize = 0,
+    // Slots below `fresh_slot` have been used; the freed ones wait in `free_slots`.
+    // Its capacity is kept at `fresh_slot` so releasing a slot never allocates.
+    free_slots: std.ArrayList(u32) = .empty,
+    fresh_slot: usize = 0,
 
     debug_max_req_id: u64 = std.math.maxInt(u64),
     tick: u64 = 0,
@@ -109,18 +246,49 @@ pub const LoaderCtx = struct {
 
     req_mem_pool: std.heap.MemoryPool(XevReq),
 
+    // Slots opened from `http://` URLs hold their URL here instead of a file.
+    // The worker pool is only spun up on the first remote open.
+    remote_urls: std.AutoHashMapUnmanaged(u32, []u8) = .empty,
+    http_config: HttpRangePool.Config = .{},
+    http_pool: ?*HttpRangePool = null,
+    http_job_pool: std.heap.MemoryPool(HttpRangePool.Job),
+
+    read_policy: ReadPolicy = .{},
+    // Reads issued under `read_policy`, oldest first.
+    tracked_reads: std.DoublyLinkedList = .{},
+    tracked_pool: std.heap.MemoryPool(TrackedRead),
+    latency: LatencyHistogram = .{},
+
+    // Local files opened while `block_cache` is set read through it.
+    block_cache: ?*BlockCache = null,
+    cache_sources: std.AutoHashMapUnmanaged(u32, *BlockCache.Source) = .empty,
+    cache_job_pool: std.heap.MemoryPool(BlockCache.Job),
+
+    // Local files opened while `mmap_files` is set are mapped; the slot holds one reference.
+    mmap_files: bool = false,
+    mapped_slots: std.AutoHashMapUnmanaged(u32, *MappedFile) = .empty,
+
+    // Set before `start` when tracing is on; owned by the caller.
+    tracer: ?*Tracer = null,
+
+    fn isSlotFree(self: *Self, slot: usize) bool {
+        return self.file_slots[0..][slot] == null and !self.remote_urls.contains(@intCast(slot));
+    }
+
+    /// Take a free slot. It must be filled and claimed, or given back with `releaseSlot`.
     fn findFreeFileSlot(self: *Self) !FileHandle {
-        // Linear scan: open/close is rare relative to reads.
-        for (0..max_file_slots) |offset| {
-            const i = (self.last_slot + offset) % max_file_slots;
-            const f = self.file_slots[0..][i];
-            if (f == null) {
-                self.last_slot = (i + 1) % max_file_slots;
-                return .{ .idx = @intCast(i), .generation = 0, .path_checksum = 0 };
-            }
-        }
+        const i: usize = self.free_slots.pop() orelse blk: {
+            if (self.fresh_slot == max_file_slots) return LoaderError.TooManyOpenFiles;
+            try self.free_slots.ensureTotalCapacity(self.alloc, self.fresh_slot + 1);
+            self.fresh_slot += 1;
+            break :blk self.fresh_slot - 1;
+        };
+        std.debug.assert(self.isSlotFree(i));
+        return .{ .idx = @intCast(i), .generation = 0, .path_checksum = 0 };
+    }
 
-        return LoaderError.TooManyOpenFiles;
+    fn releaseSlot(self: *Self, slot: usize) void {
+        self.free_slots.appendAssumeCapacity(@intCast(slot));
     }
 
     fn checkFilehandle(self: *Self, file: FileHandle) !void {
@@ -130,7 +298,7 @@ pub const LoaderCtx = struct {
         const checksums = self.file_slots_checksum[0..];
 
         if (slot >= file_slots.len) return LoaderError.InvalidFileHandle;
-        if (file_slots[slot] == null) return LoaderError.InvalidFileHandle;
+        if (self.isSlotFree(slot)) return LoaderError.InvalidFileHandle;
         if (generations[slot] != file.generation or checksums[slot] != file.path_checksum) {
             logger.warn("File handle {} is corrupted, current generation: {}, checksum: {}", .{ file, generations[slot], checksums[slot] });
             return LoaderError.InvalidFileHandle;
@@ -150,6 +318,7 @@ pub const LoaderCtx = struct {
 
             break;
         }
+        if (self.tracer) |t| t.end(.io, .request, req_id);
     }
 
     fn xevReadCb(
@@ -165,23 +334,135 @@ pub const LoaderCtx = struct {
         const xreq: *XevReq = @fieldParentPtr("c", c);
         const slot: usize = xreq.req.file.idx;
         const request_id = xreq.request_id;
+        const expected = xreq.req.result_buffer.len;
 
-        const actual = r catch {
+        if (xreq.tracked) |t| {
+            self.finishAttempt(t, xreq, r);
             self.fileDecRef(slot);
+            self.alloc.free(xreq.scratch);
             self.req_mem_pool.destroy(xreq);
+            return .disarm;
+        }
+
+        self.fileDecRef(slot);
+        self.req_mem_pool.destroy(xreq);
+
+        const actual = r catch {
             self.sendResponseSynced(request_id, LoaderError.ReadError);
             return .disarm;
         };
-        self.fileDecRef(slot);
+        if (actual != expected) {
+            wlog.err("Req {}: short read, {} of {} bytes", .{ request_id, actual, expected });
+            self.sendResponseSynced(request_id, LoaderError.ReadError);
+            return .disarm;
+        }
+
+        self.sendResponseSynced(request_id, .{ .read_block = .{} });
+        return .disarm;
+    }
 
-        if (actual != xreq.req.result_buffer.len) {
-            std.debug.panic("Unhandled error: {} != {}", .{ actual, xreq.req.result_buffer.len });
+    fn submitTrackedRead(self: *Self, req_id: u64, read_req: ReadBlockReq) void {
+        const t = self.tracked_pool.create(self.alloc) catch |err| {
+            self.sendResponseSynced(req_id, err);
+            return;
+        };
+        t.* = .{
+            .req = read_req,
+            .request_id = req_id,
+            .issued_at = std.Io.Clock.Timestamp.now(self.io, .awake),
+        };
+        self.startAttempt(t) catch |err| {
+            self.tracked_pool.destroy(t);
+            self.sendResponseSynced(req_id, err);
+            return;
+        };
+        self.tracked_reads.append(&t.node);
+    }
+
+    /// Issue one more pread for `t` into a fresh scratch buffer.
+    fn startAttempt(self: *Self, t: *TrackedRead) LoaderError!void {
+        const slot: usize = t.req.file.idx;
+        const scratch = try self.alloc.alloc(u8, t.req.result_buffer.len);
+        errdefer self.alloc.free(scratch);
+        const xreq = try self.req_mem_pool.create(self.alloc);
+        xreq.* = .{
+            .req = t.req,
+            .request_id = t.request_id,
+            .tracked = t,
+            .scratch = scratch,
+            .issued_at = std.Io.Clock.Timestamp.now(self.io, .awake),
+        };
+
+        self.fileAddRef(slot);
+        t.attempts += 1;
+        self.xfile_slots[slot].pread(
+            &self.loop,
+            &xreq.c,
+            .{ .slice = scratch },
+            t.req.base,
+            Self,
+            self,
+            Self.xevReadCb,
+        );
+    }
+
+    fn finishAttempt(self: *Self, t: *TrackedRead, xreq: *XevReq, r: xev.ReadError!usize) void {
+        t.attempts -= 1;
+        const landed = if (r) |n| n == xreq.scratch.len else |_| false;
+        if (landed) {
+            self.latency.record(elapsedUs(xreq.issued_at, std.Io.Clock.Timestamp.now(self.io, .awake)));
         }
 
-        self.sendResponseSynced(xreq.request_id, .{ .read_block = .{} });
+        if (!t.responded) {
+            if (landed) {
+                @memcpy(t.req.result_buffer, xreq.scratch);
+                t.responded = true;
+                self.sendResponseSynced(t.request_id, .{ .read_block = .{} });
+            } else if (t.attempts == 0) {
+                t.responded = true;
+                self.sendResponseSynced(t.request_id, LoaderError.ReadError);
+            }
+        }
 
-        self.req_mem_pool.destroy(xreq);
-        return .disarm;
+        if (t.attempts == 0) {
+            self.tracked_reads.remove(&t.node);
+            self.tracked_pool.destroy(t);
+        }
+    }
+
+    /// Time out and hedge outstanding tracked reads.
+    fn checkTrackedReads(self: *Self) void {
+        if (self.tracked_reads.first == null) return;
+        const now = std.Io.Clock.Timestamp.now(self.io, .awake);
+        const deadline_us = self.read_policy.deadline_ms * std.time.us_per_ms;
+        const hedge_after_us: ?u64 = if (!self.read_policy.hedge)
+            null
+        else if (self.latency.quantile(0.99)) |p99|
+            @max(p99, min_hedge_delay_us)
+        else
+            null;
+
+        var node = self.tracked_reads.first;
+        while (node) |n| : (node = n.next) {
+            const t: *TrackedRead = @fieldParentPtr("node", n);
+            if (t.responded) continue;
+            const waited_us = elapsedUs(t.issued_at, now);
+
+            if (deadline_us > 0 and waited_us >= deadline_us) {
+                wlog.warn("Req {}: read timed out after {}ms (file = {}, base = {}, size = {})", .{ t.request_id, waited_us / std.time.us_per_ms, t.req.file, t.req.base, t.req.result_buffer.len });
+                t.responded = true;
+                self.sendResponseSynced(t.request_id, LoaderError.ReadTimeout);
+                continue;
+            }
+            if (hedge_after_us) |delay_us| {
+                if (!t.hedged and waited_us >= delay_us) {
+                    t.hedged = true;
+                    self.startAttempt(t) catch |err| {
+                        wlog.warn("Req {}: failed to hedge read: {}", .{ t.request_id, err });
+                    };
+                }
+            }
+        }
     }
 
     fn fileAddRef(self: *Self, slot: usize) void {
@@ -193,40 +474,240 @@ pub const LoaderCtx = struct {
         std.debug.assert(self.file_refcount[0..][slot] > 0);
         self.file_refcount[0..][slot] -= 1;
         if (self.file_refcount[0..][slot] == 0) {
-            const f = self.file_slots[0..][slot] orelse unreachable;
-            f.close(self.io);
-            self.file_slots[0..][slot] = null;
+            if (self.file_slots[0..][slot]) |f| {
+                f.close(self.io);
+                self.file_slots[0..][slot] = null;
+                if (self.cache_sources.fetchRemove(@intCast(slot))) |kv| self.freeCacheSource(kv.value);
+                if (self.mapped_slots.fetchRemove(@intCast(slot))) |kv| kv.value.release();
+            } else {
+                const kv = self.remote_urls.fetchRemove(@intCast(slot)) orelse unreachable;
+                self.alloc.free(kv.value);
+            }
+            self.releaseSlot(slot);
+        }
+    }
+
+    /// Stamp a freshly filled slot with a new generation and return its handle.
+    fn claimSlot(self: *Self, slot: usize, path: []const u8) FileHandle {
+        const checksum = path_checksum(path);
+        self.file_refcount[slot] = 1;
+        self.file_slots_generation[slot] += 1; // gen 0 is reserved to catch errors
+        self.file_slots_checksum[slot] = checksum;
+        const gen = self.file_slots_generation[slot];
+        if (gen > max_generation) @panic("Open file generation overflow");
+        return .{ .idx = @intCast(slot), .generation = @intCast(gen), .path_checksum = checksum };
+    }
+
+    /// Start opening `url` into `slot`. A worker probes it off the IO
+    /// thread; `pollRemoteReads` answers `req_id` once the probe completes.
+    fn openRemote(self: *Self, req_id: u64, slot: usize, url: []const u8) LoaderError!void {
+        const pool = self.http_pool orelse blk: {
+            const p = try self.alloc.create(HttpRangePool);
+            errdefer self.alloc.destroy(p);
+            p.init(self.alloc, self.io, self.http_config) catch |err| {
+                wlog.err("Failed to start HTTP workers: {}", .{err});
+                return LoaderError.RemoteOpenFailed;
+            };
+            self.http_pool = p;
+            break :blk p;
+        };
+
+        const job = try self.http_job_pool.create(self.alloc);
+        errdefer self.http_job_pool.destroy(job);
+        const owned = try self.alloc.dupe(u8, url);
+        errdefer self.alloc.free(owned);
+        // Holding the URL keeps the slot reserved while the probe runs.
+        try self.remote_urls.put(self.alloc, @intCast(slot), owned);
+        job.* = .{ .url = owned, .offset = 0, .buf = &.{}, .request_id = req_id, .slot = slot };
+        job.setProbe();
+        pool.submit(job);
+    }
+
+    /// Finish an `openRemote` whose probe has completed.
+    fn finishRemoteOpen(self: *Self, request_id: u64, slot: usize, result: error{ ReadError, NotFound }!void) void {
+        if (result) {
+            const url = self.remote_urls.get(@intCast(slot)) orelse unreachable;
+            self.sendResponseSynced(request_id, .{ .open_file = self.claimSlot(slot, url) });
+        } else |err| {
+            // Fail at open rather than on the first read if the URL is wrong.
+            const kv = self.remote_urls.fetchRemove(@intCast(slot)) orelse unreachable;
+            wlog.err("Failed to open {s}: {}", .{ kv.value, err });
+            self.alloc.free(kv.value);
+            self.releaseSlot(slot);
+            self.sendResponseSynced(request_id, switch (err) {
+                error.NotFound => LoaderError.FileNotFound,
+                error.ReadError => LoaderError.RemoteOpenFailed,
+            });
+        }
+    }
+
+    fn submitRemoteRead(self: *Self, req_id: u64, read_req: ReadBlockReq) void {
+        const slot: usize = read_req.file.idx;
+        const pool = self.http_pool orelse unreachable;
+        const job = self.http_job_pool.create(self.alloc) catch |err| {
+            self.sendResponseSynced(req_id, err);
+            return;
+        };
+        job.* = .{
+            .url = self.remote_urls.get(@intCast(slot)) orelse unreachable,
+            .offset = read_req.base,
+            .buf = read_req.result_buffer,
+            .request_id = req_id,
+            .slot = slot,
+        };
+        self.fileAddRef(slot);
+        pool.submit(job);
+    }
+
+    fn pollRemoteReads(self: *Self) void {
+        const pool = self.http_pool orelse return;
+        while (pool.takeCompleted()) |job| {
+            const request_id = job.request_id;
+            const result = job.result;
+            const slot = job.slot;
+            const kind = job.kind;
+            self.http_job_pool.destroy(job);
+            if (kind == .probe) {
+                self.finishRemoteOpen(request_id, slot, result);
+                continue;
+            }
+            self.fileDecRef(slot);
+            if (result) {
+                self.sendResponseSynced(request_id, .{ .read_block = .{} });
+            } else |_| {
+                self.sendResponseSynced(request_id, LoaderError.ReadError);
+            }
+        }
+    }
+
+    fn remoteInFlight(self: *Self) usize {
+        const pool = self.http_pool orelse return 0;
+        return pool.in_flight;
+    }
+
+    /// Register a freshly opened local file with the block cache. Files that
+    /// can't be stat'ed are read directly.
+    fn addCacheSource(self: *Self, slot: usize, f: std.Io.File, path: []const u8) void {
+        const stat = f.stat(self.io) catch |err| {
+            wlog.warn("Not caching {s}: {}", .{ path, err });
+            return;
+        };
+        const src = self.alloc.create(BlockCache.Source) catch return;
+        const owned = self.alloc.dupe(u8, path) catch {
+            self.alloc.destroy(src);
+            return;
+        };
+        src.* = .init(owned, stat);
+        self.cache_sources.put(self.alloc, @intCast(slot), src) catch self.freeCacheSource(src);
+    }
+
+    /// Map a freshly opened local file into `slot`. Returns null, and the file
+    /// is read as usual, if it is empty or can't be mapped.
+    fn mapFile(self: *Self, slot: usize, f: std.Io.File, path: []const u8) ?*MappedFile {
+        const stat = f.stat(self.io) catch |err| {
+            wlog.warn("Not mapping {s}: {}", .{ path, err });
+            return null;
+        };
+        if (stat.size == 0) return null;
+        self.mapped_slots.ensureUnusedCapacity(self.alloc, 1) catch return null;
+        const m = self.alloc.create(MappedFile) catch return null;
+        const memory = std.posix.mmap(null, @intCast(stat.size), .{ .READ = true }, .{ .TYPE = .PRIVATE }, f.handle, 0) catch |err| {
+            wlog.warn("Not mapping {s}: {}", .{ path, err });
+            self.alloc.destroy(m);
+            return null;
+        };
+        m.* = .{ .memory = memory, .alloc = self.alloc };
+        self.mapped_slots.putAssumeCapacity(@intCast(slot), m);
+        return m;
+    }
+
+    fn freeCacheSource(self: *Self, src: *BlockCache.Source) void {
+        self.alloc.free(src.path);
+        self.alloc.destroy(src);
+    }
+
+    fn submitCachedRead(self: *Self, req_id: u64, read_req: ReadBlockReq, src: *const BlockCache.Source) void {
+        const slot: usize = read_req.file.idx;
+        const cache = self.block_cache orelse unreachable;
+        const job = self.cache_job_pool.create(self.alloc) catch |err| {
+            self.sendResponseSynced(req_id, err);
+            return;
+        };
+        job.* = .{
+            .source = src,
+            .file = self.file_slots[slot].?,
+            .offset = read_req.base,
+            .buf = read_req.result_buffer,
+            .request_id = req_id,
+            .slot = slot,
+        };
+        self.fileAddRef(slot);
+        cache.submit(job);
+    }
+
+    fn pollCachedReads(self: *Self) void {
+        const cache = self.block_cache orelse return;
+        while (cache.takeCompleted()) |job| {
+            const request_id = job.request_id;
+            const result = job.result;
+            self.fileDecRef(job.slot);
+            self.cache_job_pool.destroy(job);
+            if (result) {
+                self.sendResponseSynced(request_id, .{ .read_block = .{} });
+            } else |_| {
+                self.sendResponseSynced(request_id, LoaderError.ReadError);
+            }
         }
     }
 
+    fn cacheInFlight(self: *Self) usize {
+        const cache = self.block_cache orelse return 0;
+        return cache.in_flight;
+    }
+
     fn handleReq(self: *Self, req_id: u64, req: Request) void {
+        if (self.tracer) |t| t.instant(.io, .submit, req_id, @tagName(req));
         switch (req) {
             .open_file => |open_req| {
                 wlog.debug("Req {}: open_file: file = {s}", .{ req_id, open_req.file_path });
 
-                var h = self.findFreeFileSlot() catch |err| {
+                const h = self.findFreeFileSlot() catch |err| {
                     self.sendResponseSynced(req_id, err);
                     return;
                 };
 
+                if (HttpRangePool.isRemotePath(open_req.file_path)) {
+                    self.openRemote(req_id, h.idx, open_req.file_path) catch |err| {
+                        self.releaseSlot(h.idx);
+                        self.sendResponseSynced(req_id, err);
+                    };
+                    return;
+                }
+
                 const f = std.Io.Dir.cwd().openFile(self.io, open_req.file_path, .{ .mode = .read_only }) catch |err| {
+                    self.releaseSlot(h.idx);
                     self.sendResponseSynced(req_id, err);
                     return;
                 };
                 const xf = xev.File.init(f) catch unreachable;
 
                 const slot: usize = h.idx;
-                const checksum = path_checksum(open_req.file_path);
                 self.file_slots[slot] = f;
                 self.xfile_slots[slot] = xf;
-                self.file_refcount[slot] = 1;
-                self.file_slots_generation[slot] += 1; // gen 0 is reserved to catch errors
-                self.file_slots_checksum[slot] = checksum;
-                const gen = self.file_slots_generation[slot];
-                if (gen > max_generation) @panic("Open file generation overflow");
-                h = .{ .idx = @intCast(slot), .generation = @intCast(gen), .path_checksum = checksum };
-
-                self.sendResponseSynced(req_id, .{ .open_file = h });
+                if (self.block_cache != null) {
+                    self.addCacheSource(slot, f, open_req.file_path);
+                } else if (self.mmap_files) {
+                    if (self.mapFile(slot, f, open_req.file_path)) |m| {
+                        m.retain(); // for the receiver
+                        self.sendResponseSynced(req_id, .{ .open_mapped = .{
+                            .file = self.claimSlot(slot, open_req.file_path),
+                            .mapped = m,
+                        } });
+                        return;
+                    }
+                }
+
+                self.sendResponseSynced(req_id, .{ .open_file = self.claimSlot(slot, open_req.file_path) });
             },
 
             .close_file => |file_handle| {
@@ -251,6 +732,18 @@ pub const LoaderCtx = struct {
                 };
 
                 const slot: usize = read_req.file.idx;
+                if (self.file_slots[slot] == null) {
+                    self.submitRemoteRead(req_id, read_req);
+                    return;
+                }
+                if (self.cache_sources.get(@intCast(slot))) |src| {
+                    self.submitCachedRead(req_id, read_req, src);
+                    return;
+                }
+                if (self.read_policy.active()) {
+                    self.submitTrackedRead(req_id, read_req);
+                    return;
+                }
                 const xf = self.xfile_slots[slot];
 
                 var xreq = self.req_mem_pool.create(self.alloc) catch |err| {
@@ -273,6 +766,30 @@ pub const LoaderCtx = struct {
                 );
             },
 
+            .configure_http => |config| {
+                if (self.http_pool != null) {
+                    wlog.warn("HTTP backend already started; ignoring configure", .{});
+                    return;
+                }
+                self.http_config = config;
+            },
+
+            .configure_reads => |policy| {
+                self.read_policy = policy;
+            },
+
+            .configure_cache => |cache| {
+                if (self.block_cache != null) {
+                    wlog.warn("Block cache already configured; ignoring configure", .{});
+                    return;
+                }
+                self.block_cache = cache;
+            },
+
+            .configure_mmap => |enabled| {
+                self.mmap_files = enabled;
+            },
+
             .drain => {
                 self.is_draining = true;
             },
@@ -295,7 +812,10 @@ pub const LoaderCtx = struct {
             self.loop.run(.no_wait) catch |err| {
                 std.debug.panic("Error in event loop: {}", .{err});
             };
-            if (self.loop.active == 0) {
+            self.pollRemoteReads();
+            self.checkTrackedReads();
+            self.pollCachedReads();
+            if (self.loop.active == 0 and self.remoteInFlight() == 0 and self.cacheInFlight() == 0) {
                 if (self.is_draining) {
                     wlog.debug("No more requests & IO loop drained.", .{});
                     self.is_running = false;
@@ -347,6 +867,8 @@ pub const LoaderCtx = struct {
             self.req_cnt -= 1; // Safe rollback: SPSC, only this thread writes req_cnt.
             return null;
         };
+        // Only these get a response to close the span.
+        if (self.tracer) |t| if (req == .open_file or req == .read_block) t.begin(.lua, .request, req_id, @tagName(req));
         return req_id;
     }
 
@@ -419,11 +941,29 @@ pub const LoaderCtx = struct {
         self.req_cnt = 0;
         self.is_running = false;
         self.is_draining = false;
-        self.last_slot = 0;
+        self.free_slots = .empty;
+        self.fresh_slot = 0;
         self.debug_max_req_id = std.math.maxInt(u64);
         self.tick = 0;
         self.debug_max_tick = std.math.maxInt(u64);
         self.req_mem_pool = try std.heap.MemoryPool(XevReq).initCapacity(alloc, 16);
+        errdefer self.req_mem_pool.deinit(alloc);
+        self.remote_urls = .empty;
+        self.http_config = .{};
+        self.http_pool = null;
+        self.http_job_pool = try std.heap.MemoryPool(HttpRangePool.Job).initCapacity(alloc, 16);
+        errdefer self.http_job_pool.deinit(alloc);
+        self.read_policy = .{};
+        self.tracked_reads = .{};
+        self.tracked_pool = try std.heap.MemoryPool(TrackedRead).initCapacity(alloc, 16);
+        errdefer self.tracked_pool.deinit(alloc);
+        self.latency = .{};
+        self.block_cache = null;
+        self.cache_sources = .empty;
+        self.cache_job_pool = try std.heap.MemoryPool(BlockCache.Job).initCapacity(alloc, 16);
+        self.mmap_files = false;
+        self.mapped_slots = .empty;
+        self.tracer = null;
     }
 
     pub fn deinit(self: *Self) void {
@@ -436,6 +976,27 @@ pub const LoaderCtx = struct {
             self.thread_pool.deinit();
         }
         self.req_mem_pool.deinit(self.alloc);
+        if (self.http_pool) |p| {
+            p.deinit();
+            self.alloc.destroy(p);
+        }
+        self.http_job_pool.deinit(self.alloc);
+        self.tracked_pool.deinit(self.alloc);
+        self.cache_job_pool.deinit(self.alloc);
+        var src_it = self.cache_sources.valueIterator();
+        while (src_it.next()) |src| self.freeCacheSource(src.*);
+        self.cache_sources.deinit(self.alloc);
+        var map_it = self.mapped_slots.valueIterator();
+        while (map_it.next()) |m| m.*.release();
+        self.mapped_slots.deinit(self.alloc);
+        for (self.file_slots[0..self.fresh_slot]) |*f| {
+            if (f.*) |file| file.close(self.io);
+            f.* = null;
+        }
+        self.free_slots.deinit(self.alloc);
+        var it = self.remote_urls.valueIterator();
+        while (it.next()) |url| self.alloc.free(url.*);
+        self.remote_urls.deinit(self.alloc);
     }
 };
 
@@ -525,3 +1086,124 @@ test "invalid file handle index is rejected" {
         }),
     );
 }
+
+test "closed slots are reused with a new generation" {
+    const io = std.testing.io;
+
+    const f = try std.Io.Dir.cwd().createFile(io, "testfile_reuse.tar", .{ .truncate = true });
+    f.close(io);
+    defer std.Io.Dir.cwd().deleteFile(io, "testfile_reuse.tar") catch {};
+
+    var debug_alloc = std.heap.DebugAllocator(.{}).init;
+    defer _ = debug_alloc.deinit();
+
+    const ctx = try debug_alloc.allocator().create(LoaderCtx);
+    defer debug_alloc.allocator().destroy(ctx);
+    try ctx.initInPlace(debug_alloc.allocator());
+    try ctx.start(io);
+    defer ctx.deinit();
+
+    _ = ctx.sendSynced(.{ .open_file = .{ .file_path = "testfile_reuse.tar" } });
+    const first = (try ctx.recvSynced().payload).open_file;
+    _ = ctx.sendSynced(.{ .close_file = first });
+    _ = ctx.sendSynced(.{ .open_file = .{ .file_path = "testfile_reuse.tar" } });
+    const second = (try ctx.recvSynced().payload).open_file;
+
+    try std.testing.expectEqual(first.idx, second.idx);
+    try std.testing.expectEqual(first.generation + 1, second.generation);
+    ctx.join();
+    try std.testing.expectError(LoaderError.InvalidFileHandle, ctx.checkFilehandle(first));
+}
+
+test "mapped files outlive their slot" {
+    const io = std.testing.io;
+
+    const f = try std.Io.Dir.cwd().createFile(io, "testfile_mmap.tar", .{ .truncate = true });
+    try f.writeStreamingAll(io, "0123456789");
+    f.close(io);
+    defer std.Io.Dir.cwd().deleteFile(io, "testfile_mmap.tar") catch {};
+
+    var debug_alloc = std.heap.DebugAllocator(.{}).init;
+    defer _ = debug_alloc.deinit();
+
+    const ctx = try debug_alloc.allocator().create(LoaderCtx);
+    defer debug_alloc.allocator().destroy(ctx);
+    try ctx.initInPlace(debug_alloc.allocator());
+    try ctx.start(io);
+    defer ctx.deinit();
+
+    _ = ctx.sendSynced(.{ .configure_mmap = true });
+    _ = ctx.sendSynced(.{ .open_file = .{ .file_path = "testfile_mmap.tar" } });
+    const opened = (try ctx.recvSynced().payload).open_mapped;
+    try std.testing.expectEqualStrings("0123456789", opened.mapped.memory);
+
+    // Closing the slot drops only its own reference.
+    _ = ctx.sendSynced(.{ .close_file = opened.file });
+    ctx.join();
+    opened.mapped.prefetch(3, 4);
+    try std.testing.expectEqualStrings("3456", opened.mapped.memory[3..7]);
+    opened.mapped.release();
+}
+
+test "latency histogram quantiles" {
+    var h: LatencyHistogram = .{};
+    try std.testing.expectEqual(null, h.quantile(0.99));
+    for (0..990) |_| h.record(100);
+    for (0..10) |_| h.record(50_000);
+    // 100us lands in [64, 128), 50ms in [32768, 65536).
+    try std.testing.expectEqual(128, h.quantile(0.5));
+    try std.testing.expectEqual(128, h.quantile(0.99));
+    try std.testing.expectEqual(65536, h.quantile(0.999));
+    h.record(0);
+    try std.testing.expectEqual(1, h.buckets[0]);
+}
+
+test "reads under a read policy land in the result buffer" {
+    const builtin = @import("builtin");
+
+    if (builtin.os.tag != .linux) {
+        return error.SkipZigTest;
+    }
+
+    const io = std.testing.io;
+
+    const f = try std.Io.Dir.cwd().createFile(io, "testfile_policy.tar", .{ .truncate = true });
+    defer std.Io.Dir.cwd().deleteFile(io, "testfile_policy.tar") catch {};
+    var rng = std.Random.DefaultPrng.init(7);
+    var ref: [4096]u8 = undefined;
+    rng.fill(&ref);
+    try f.writeStreamingAll(io, &ref);
+    f.close(io);
+
+    var debug_alloc = std.heap.DebugAllocator(.{}).init;
+    defer _ = debug_alloc.deinit();
+
+    const ctx = try debug_alloc.allocator().create(LoaderCtx);
+    defer debug_alloc.allocator().destroy(ctx);
+    try ctx.initInPlace(debug_alloc.allocator());
+    try ctx.start(io);
+    defer ctx.deinit();
+
+    _ = ctx.sendSynced(.{ .configure_reads = .{ .deadline_ms = 10_000, .hedge = true } });
+    _ = ctx.sendSynced(.{ .open_file = .{ .file_path = "testfile_policy.tar" } });
+    const file = (try ctx.recvSynced().payload).open_file;
+
+    var buf: [4096]u8 = undefined;
+    for (0..8) |i| {
+        @memset(&buf, 0);
+        const base = i * 512;
+        const rid = ctx.sendSynced(.{ .read_block = .{ .file = file, .base = base, .result_buffer = buf[base..] } });
+        const resp = ctx.recvSynced();
+        try std.testing.expectEqual(rid, resp.request_id);
+        _ = try resp.payload;
+        try std.testing.expectEqualSlices(u8, ref[base..], buf[base..]);
+    }
+
+    // Reading past EOF is an error, not a panic.
+    _ = ctx.sendSynced(.{ .read_block = .{ .file = file, .base = 4000, .result_buffer = &buf } });
+    try std.testing.expectError(LoaderError.ReadError, ctx.recvSynced().payload);
+
+    _ = ctx.sendSynced(.{ .close_file = file });
+    ctx.join();
+    try std.testing.expectEqual(null, ctx.tracked_reads.first);
+}
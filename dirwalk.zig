@@ -0,0 +1,347 @@
+//! Recursive directory listing with name filters and an optional listing
+//! cache, for building shard lists in `init_ctx`.
+//!
+//! Directories are read in large batches through `Dir.Reader`, and only
+//! entries the filesystem reports without a type are stat'ed. Paths come back
+//! absolute and sorted, so every rank sees the same order.
+//!
+//! With a cache file, a listing records the mtime of every directory it read.
+//! The next walk stats just those directories; if none changed it returns the
+//! cached paths without listing anything, which keeps thousands of ranks
+//! starting at once from re-walking a shared filesystem. Adding, removing or
+//! renaming an entry bumps its directory's mtime, so any of those rescans.
+
+const std = @import("std");
+
+const logger = std.log.scoped(.dirwalk);
+
+pub const Options = struct {
+    /// Descend into subdirectories.
+    recursive: bool = true,
+    /// Keep only names ending in this, e.g. ".tar".
+    ext: []const u8 = "",
+    /// Keep only names matching this pattern; `*` matches any run of
+    /// characters and `?` any one.
+    glob: []const u8 = "",
+    /// Listing cache file, written atomically; null disables caching. Keep it
+    /// outside the walked tree, or writing it changes the mtime it records.
+    cache_path: ?[]const u8 = null,
+};
+
+pub const Listing = struct {
+    arena: std.heap.ArenaAllocator,
+    paths: []const []const u8,
+    /// The paths came from `cache_path` without listing any directory.
+    from_cache: bool = false,
+
+    pub fn deinit(self: *Listing) void {
+        self.arena.deinit();
+    }
+};
+
+const cache_magic = "ultar-dirwalk 1";
+
+/// Entries asked of the `Io` per read; the reader buffer holds their names.
+const batch_entries = 256;
+const reader_buffer_len = 64 << 10;
+
+const DirStamp = struct {
+    /// Relative to the root; "" is the root itself.
+    rel: []const u8,
+    mtime_ns: i64,
+};
+
+/// Shell-style match of `name` against `pattern` (`*` and `?`).
+pub fn globMatch(pattern: []const u8, name: []const u8) bool {
+    var p: usize = 0;
+    var n: usize = 0;
+    // Where to resume after the last `*` if the rest fails to match.
+    var star: ?usize = null;
+    var star_n: usize = 0;
+    while (n < name.len) {
+        if (p < pattern.len and (pattern[p] == '?' or pattern[p] == name[n])) {
+            p += 1;
+            n += 1;
+        } else if (p < pattern.len and pattern[p] == '*') {
+            star = p;
+            star_n = n;
+            p += 1;
+        } else if (star) |s| {
+            p = s + 1;
+            star_n += 1;
+            n = star_n;
+        } else {
+            return false;
+        }
+    }
+    while (p < pattern.len and pattern[p] == '*') p += 1;
+    return p == pattern.len;
+}
+
+fn keep(opts: Options, name: []const u8) bool {
+    if (!std.mem.endsWith(u8, name, opts.ext)) return false;
+    return opts.glob.len == 0 or globMatch(opts.glob, name);
+}
+
+/// Identifies the walk a cache file was written for.
+fn fingerprint(base: []const u8, opts: Options) u64 {
+    var h = std.hash.Wyhash.init(0);
+    h.update(base);
+    h.update(&.{0});
+    h.update(opts.ext);
+    h.update(&.{0});
+    h.update(opts.glob);
+    h.update(&.{@intFromBool(opts.recursive)});
+    return h.final();
+}
+
+fn joinRel(alloc: std.mem.Allocator, dir: []const u8, name: []const u8) ![]const u8 {
+    if (dir.len == 0) return alloc.dupe(u8, name);
+    return std.fs.path.join(alloc, &.{ dir, name });
+}
+
+/// List the files under `root` that pass `opts`' filters.
+pub fn walk(alloc: std.mem.Allocator, io: std.Io, root: []const u8, opts: Options) !Listing {
+    var listing: Listing = .{ .arena = .init(alloc), .paths = &.{} };
+    errdefer listing.deinit();
+    const arena = listing.arena.allocator();
+
+    var buf: [std.Io.Dir.max_path_bytes]u8 = undefined;
+    const base_n = try std.Io.Dir.cwd().realPathFile(io, root, &buf);
+    const base = try arena.dupe(u8, buf[0..base_n]);
+    const fp = fingerprint(base, opts);
+
+    if (opts.cache_path) |cache_path| {
+        if (loadCache(arena, io, cache_path, base, fp)) |paths| {
+            listing.paths = paths;
+            listing.from_cache = true;
+            return listing;
+        }
+    }
+
+    var dirs: std.ArrayList(DirStamp) = .empty;
+    var files: std.ArrayList([]const u8) = .empty;
+    try scan(arena, io, base, opts, &dirs, &files);
+    std.sort.block([]const u8, files.items, {}, lessThan);
+
+    if (opts.cache_path) |cache_path| storeCache(alloc, io, cache_path, fp, dirs.items, files.items);
+
+    const paths = try arena.alloc([]const u8, files.items.len);
+    for (paths, files.items) |*p, rel| p.* = try std.fs.path.join(arena, &.{ base, rel });
+    listing.paths = paths;
+    return listing;
+}
+
+fn lessThan(_: void, a: []const u8, b: []const u8) bool {
+    return std.mem.lessThan(u8, a, b);
+}
+
+/// Collect `base`'s matching files (relative to `base`) and every directory read.
+fn scan(arena: std.mem.Allocator, io: std.Io, base: []const u8, opts: Options, dirs: *std.ArrayList(DirStamp), files: *std.ArrayList([]const u8)) !void {
+    const reader_buf = try arena.alignedAlloc(u8, .of(usize), reader_buffer_len);
+    var entries: [batch_entries]std.Io.Dir.Entry = undefined;
+
+    var stack: std.ArrayList([]const u8) = .empty;
+    try stack.append(arena, "");
+    while (stack.pop()) |rel| {
+        const is_root = rel.len == 0;
+        var dir = (if (is_root)
+            std.Io.Dir.openDirAbsolute(io, base, .{ .iterate = true })
+        else
+            std.Io.Dir.openDirAbsolute(io, try std.fs.path.join(arena, &.{ base, rel }), .{ .iterate = true })) catch |err| {
+            if (is_root) return err;
+            logger.warn("Failed to open subdir {s}/{s} ({}), skipping subtree", .{ base, rel, err });
+            continue;
+        };
+        defer dir.close(io);
+
+        // Stamp before listing: a change made while we read bumps the mtime
+        // past what we record, so the next walk rescans.
+        const st = try dir.stat(io);
+        try dirs.append(arena, .{ .rel = rel, .mtime_ns = @intCast(st.mtime.toNanoseconds()) });
+
+        var reader: std.Io.Dir.Reader = .init(dir, reader_buf);
+        while (true) {
+            const n = try reader.read(io, &entries);
+            if (n == 0) {
+                if (reader.state == .finished) break;
+                continue;
+            }
+            for (entries[0..n]) |entry| {
+                const kind = if (entry.kind == .unknown)
+                    (dir.statFile(io, entry.name, .{ .follow_symlinks = false }) catch continue).kind
+                else
+                    entry.kind;
+                switch (kind) {
+                    .directory => if (opts.recursive) try stack.append(arena, try joinRel(arena, rel, entry.name)),
+                    // Symlinks are listed, never followed into.
+                    .file, .sym_link => if (keep(opts, entry.name)) try files.append(arena, try joinRel(arena, rel, entry.name)),
+                    else => {},
+                }
+            }
+        }
+    }
+}
+
+/// The cached paths if `cache_path` was written for this walk and none of
+/// its directories changed since.
+fn loadCache(arena: std.mem.Allocator, io: std.Io, cache_path: []const u8, base: []const u8, fp: u64) ?[]const []const u8 {
+    const bytes = std.Io.Dir.cwd().readFileAlloc(io, cache_path, arena, .limited(1 << 30)) catch |err| {
+        if (err != error.FileNotFound) logger.debug("listing cache {s} unreadable: {}", .{ cache_path, err });
+        return null;
+    };
+    var lines = std.mem.splitScalar(u8, bytes, '\n');
+    var header_buf: [cache_magic.len + 17]u8 = undefined;
+    const header = std.fmt.bufPrint(&header_buf, cache_magic ++ " {x:0>16}", .{fp}) catch unreachable;
+    if (!std.mem.eql(u8, lines.first(), header)) return null;
+
+    var paths: std.ArrayList([]const u8) = .empty;
+    while (lines.next()) |line| {
+        if (line.len < 2 or line[1] != ' ') continue;
+        const rest = line[2..];
+        switch (line[0]) {
+            'd' => {
+                const sp = std.mem.indexOfScalar(u8, rest, ' ') orelse return null;
+                const mtime_ns = std.fmt.parseInt(i64, rest[0..sp], 10) catch return null;
+                const dir_path = std.fs.path.join(arena, &.{ base, rest[sp + 1 ..] }) catch return null;
+                const st = std.Io.Dir.cwd().statFile(io, dir_path, .{}) catch return null;
+                if (st.kind != .directory or st.mtime.toNanoseconds() != mtime_ns) return null;
+            },
+            'f' => paths.append(arena, std.fs.path.join(arena, &.{ base, rest }) catch return null) catch return null,
+            else => return null,
+        }
+    }
+    return paths.items;
+}
+
+/// Write the listing for the next walk. Failures are logged and otherwise ignored.
+fn storeCache(alloc: std.mem.Allocator, io: std.Io, cache_path: []const u8, fp: u64, dirs: []const DirStamp, files: []const []const u8) void {
+    storeCacheImpl(alloc, io, cache_path, fp, dirs, files) catch |err| {
+        logger.debug("listing cache write {s} failed: {}", .{ cache_path, err });
+    };
+}
+
+fn storeCacheImpl(alloc: std.mem.Allocator, io: std.Io, cache_path: []const u8, fp: u64, dirs: []const DirStamp, files: []const []const u8) !void {
+    var out: std.Io.Writer.Allocating = .init(alloc);
+    defer out.deinit();
+    const w = &out.writer;
+    try w.print(cache_magic ++ " {x:0>16}\n", .{fp});
+    for (dirs) |d| {
+        if (std.mem.indexOfScalar(u8, d.rel, '\n') != null) return error.UnsupportedName;
+        try w.print("d {d} {s}\n", .{ d.mtime_ns, if (d.rel.len == 0) "." else d.rel });
+    }
+    for (files) |f| {
+        if (std.mem.indexOfScalar(u8, f, '\n') != null) return error.UnsupportedName;
+        try w.print("f {s}\n", .{f});
+    }
+
+    var d = try std.Io.Dir.cwd().openDir(io, std.fs.path.dirname(cache_path) orelse ".", .{});
+    defer d.close(io);
+    const name = std.fs.path.basename(cache_path);
+    var tmp_buf: [std.fs.max_name_bytes]u8 = undefined;
+    var rng: [8]u8 = undefined;
+    io.random(&rng);
+    const tmp_name = try std.fmt.bufPrint(&tmp_buf, "{s}.{x}.tmp", .{ name, &rng });
+    {
+        var f = try d.createFile(io, tmp_name, .{ .truncate = true });
+        defer f.close(io);
+        try f.writeStreamingAll(io, out.written());
+    }
+    errdefer d.deleteFile(io, tmp_name) catch {};
+    try d.rename(tmp_name, d, name, io);
+}
+
+const testing = std.testing;
+
+test "glob" {
+    try testing.expect(globMatch("*.tar", "shard-000.tar"));
+    try testing.expect(globMatch("shard-??.tar", "shard-07.tar"));
+    try testing.expect(globMatch("*-*-*", "a-b-c"));
+    try testing.expect(globMatch("", ""));
+    try testing.expect(!globMatch("*.tar", "shard.tar.utix"));
+    try testing.expect(!globMatch("shard-??.tar", "shard-7.tar"));
+    try testing.expect(!globMatch("a*b", "acbd"));
+}
+
+fn touch(io: std.Io, dir: std.Io.Dir, path: []const u8) !void {
+    var f = try dir.createFile(io, path, .{});
+    f.close(io);
+}
+
+test "walk filters, recurses and caches" {
+    const alloc = testing.allocator;
+    const io = testing.io;
+    var tmp = testing.tmpDir(.{});
+    defer tmp.cleanup();
+    try tmp.dir.createDirPath(io, "data/a/deep");
+    try tmp.dir.createDirPath(io, "data/b");
+    try touch(io, tmp.dir, "data/top.tar");
+    try touch(io, tmp.dir, "data/top.tar.utix");
+    try touch(io, tmp.dir, "data/a/deep/x.tar");
+    try touch(io, tmp.dir, "data/b/y.tar");
+    try touch(io, tmp.dir, "data/b/skip.txt");
+
+    const base = try tmp.dir.realPathFileAlloc(io, "data", alloc);
+    defer alloc.free(base);
+    const cache_path = try std.fs.path.join(alloc, &.{ base, "..", "listing" });
+    defer alloc.free(cache_path);
+
+    {
+        var flat = try walk(alloc, io, base, .{ .recursive = false, .ext = ".tar" });
+        defer flat.deinit();
+        try testing.expectEqual(@as(usize, 1), flat.paths.len);
+        try testing.expect(std.mem.endsWith(u8, flat.paths[0], "/data/top.tar"));
+    }
+
+    const opts: Options = .{ .glob = "*.tar", .cache_path = cache_path };
+    var first = try walk(alloc, io, base, opts);
+    defer first.deinit();
+    try testing.expect(!first.from_cache);
+    try testing.expectEqual(@as(usize, 3), first.paths.len);
+    try testing.expect(std.mem.endsWith(u8, first.paths[0], "/data/a/deep/x.tar"));
+    try testing.expect(std.mem.endsWith(u8, first.paths[1], "/data/b/y.tar"));
+    try testing.expect(std.mem.endsWith(u8, first.paths[2], "/data/top.tar"));
+
+    var second = try walk(alloc, io, base, opts);
+    defer second.deinit();
+    try testing.expect(second.from_cache);
+    try testing.expectEqual(first.paths.len, second.paths.len);
+    for (first.paths, second.paths) |a, b| try testing.expectEqualStrings(a, b);
+
+    // Other filters don't reuse the listing.
+    var other = try walk(alloc, io, base, .{ .ext = ".txt", .cache_path = cache_path });
+    defer other.deinit();
+    try testing.expect(!other.from_cache);
+    try testing.expectEqual(@as(usize, 1), other.paths.len);
+}
+
+test "a changed directory invalidates the cache" {
+    const alloc = testing.allocator;
+    const io = testing.io;
+    var tmp = testing.tmpDir(.{});
+    defer tmp.cleanup();
+    try tmp.dir.createDirPath(io, "data/a");
+    try touch(io, tmp.dir, "data/a/x.tar");
+
+    const base = try tmp.dir.realPathFileAlloc(io, "data", alloc);
+    defer alloc.free(base);
+    const cache_path = try std.fs.path.join(alloc, &.{ base, "..", "listing" });
+    defer alloc.free(cache_path);
+
+    var first = try walk(alloc, io, base, .{ .cache_path = cache_path });
+    first.deinit();
+
+    // Timestamps may be too coarse to see the new file's mtime bump this
+    // quickly, so alter the recorded stamp instead.
+    var cache = try tmp.dir.readFileAlloc(io, "listing", alloc, .unlimited);
+    defer alloc.free(cache);
+    const pos = std.mem.indexOf(u8, cache, "d ").?;
+    cache[pos + 2] = if (cache[pos + 2] == '1') '2' else '1';
+    try tmp.dir.writeFile(io, .{ .sub_path = "listing", .data = cache });
+    try touch(io, tmp.dir, "data/a/y.tar");
+
+    var second = try walk(alloc, io, base, .{ .cache_path = cache_path });
+    defer second.deinit();
+    try testing.expect(!second.from_cache);
+    try testing.expectEqual(@as(usize, 2), second.paths.len);
+}
@@ -6,6 +6,8 @@ const tardefs = @import("tardefs.zig");
 const scanners = @import("scanners.zig");
 const M = @import("msgpack");
 const OStream = @import("XevOstream.zig");
+const meta_extract = @import("meta_extract.zig");
+pub const IndexSummary = @import("IndexSummary.zig");
 
 const index_ext = "utix";
 
@@ -24,7 +26,7 @@ pub fn main(init: std.process.Init) !void {
         \\-h, --help           Display this help and exit.
         \\--fmt <STR>          Output format (msgpack / jsonl).
         \\-f, --file <FILE>... Tar file(s) to index (compatibility; positional FILEs are preferred).
-        \\--meta-rule <STR>... Metadata rule(s) "KEY:QLIST".
+        \\--meta-rule <STR>... Metadata rule(s) "KEY:QLIST", e.g. ".json:.caption;.size.w" or ".cls:.".
         \\<FILE>...            Tar file(s) to index.
         \\
     );
@@ -79,35 +81,7 @@ pub fn main(init: std.process.Init) !void {
 
     var cli_arena = std.heap.ArenaAllocator.init(allocator);
     defer cli_arena.deinit();
-    const cli_alloc = cli_arena.allocator();
-
-    const meta_rule_args: []const []const u8 = @field(res.args, "meta-rule");
-    var rule_list: std.ArrayListUnmanaged(WdsIndexingState.Rule) = .empty;
-    for (meta_rule_args) |rule_str| {
-        const colon = std.mem.indexOfScalar(u8, rule_str, ':') orelse {
-            logger.err("Invalid --meta-rule format (expected KEY:QLIST): {s}", .{rule_str});
-            diag.report(stderr, error.InvalidRuleFormat) catch {};
-            return error.InvalidRuleFormat;
-        };
-        const meta_key_src = rule_str[0..colon];
-        for (rule_list.items) |existing| {
-            if (std.mem.eql(u8, existing.meta_key, meta_key_src)) {
-                logger.err("Duplicate --meta-rule key: {s}", .{meta_key_src});
-                return error.DuplicateMetaRule;
-            }
-        }
-        const meta_key = try cli_alloc.dupe(u8, meta_key_src);
-        const qpart = rule_str[colon + 1 ..];
-        var qlist: std.ArrayListUnmanaged([]const u8) = .empty;
-        var qiter = std.mem.splitScalar(u8, qpart, ';');
-        while (qiter.next()) |q| if (q.len > 0) {
-            const qd = try cli_alloc.dupe(u8, q);
-            try qlist.append(cli_alloc, qd);
-        };
-        const queries = try qlist.toOwnedSlice(cli_alloc);
-        try rule_list.append(cli_alloc, .{ .meta_key = meta_key, .queries = queries });
-    }
-    const rules = try rule_list.toOwnedSlice(cli_alloc);
+    const rules = try parseMetaRules(cli_arena.allocator(), @field(res.args, "meta-rule"));
 
     // kqueue (macOS) needs a thread pool to service regular-file I/O,
     // otherwise every read returns EPERM. io_uring on Linux handles file
@@ -141,6 +115,40 @@ pub fn main(init: std.process.Init) !void {
     try loop.run(.until_done);
 }
 
+/// Parse `--meta-rule` strings ("KEY:QLIST", queries separated by `;`) into
+/// rules allocated from `arena`.
+pub fn parseMetaRules(arena: std.mem.Allocator, rule_strs: []const []const u8) ![]const WdsIndexingState.Rule {
+    var rule_list: std.ArrayListUnmanaged(WdsIndexingState.Rule) = .empty;
+    for (rule_strs) |rule_str| {
+        const colon = std.mem.indexOfScalar(u8, rule_str, ':') orelse {
+            logger.err("Invalid --meta-rule format (expected KEY:QLIST): {s}", .{rule_str});
+            return error.InvalidRuleFormat;
+        };
+        const meta_key_src = rule_str[0..colon];
+        for (rule_list.items) |existing| {
+            if (std.mem.eql(u8, existing.meta_key, meta_key_src)) {
+                logger.err("Duplicate --meta-rule key: {s}", .{meta_key_src});
+                return error.DuplicateMetaRule;
+            }
+        }
+        const meta_key = try arena.dupe(u8, meta_key_src);
+        const qpart = rule_str[colon + 1 ..];
+        var qlist: std.ArrayListUnmanaged([]const u8) = .empty;
+        var qiter = std.mem.splitScalar(u8, qpart, ';');
+        while (qiter.next()) |q| if (q.len > 0) {
+            const qd = try arena.dupe(u8, q);
+            try qlist.append(arena, qd);
+        };
+        if (qlist.items.len > meta_extract.max_queries) {
+            logger.err("--meta-rule {s} has more than {} queries", .{ meta_key, meta_extract.max_queries });
+            return error.InvalidRuleFormat;
+        }
+        const queries = try qlist.toOwnedSlice(arena);
+        try rule_list.append(arena, .{ .meta_key = meta_key, .queries = queries });
+    }
+    return rule_list.toOwnedSlice(arena);
+}
+
 pub const IndexMetadataError = error{
     RowTooLarge,
     EntryTooLarge,
@@ -172,7 +180,7 @@ pub const WdsIndexingState = struct {
         sizes: []const u32,
     };
 
-    const Rule = struct {
+    pub const Rule = struct {
         meta_key: []const u8,
         queries: []const []const u8,
     };
@@ -191,36 +199,6 @@ pub const WdsIndexingState = struct {
         jsonl: JsonSer,
     };
 
-    fn getValueForQuery(root: std.json.Value, query: []const u8) std.json.Value {
-        if (query.len == 0) return root;
-        var current = root;
-        var rest = if (query.len > 0 and query[0] == '.') query[1..] else query;
-        while (rest.len > 0) {
-            const dot_pos = std.mem.indexOfScalar(u8, rest, '.');
-            var seg = if (dot_pos) |d| rest[0..d] else rest;
-            rest = if (dot_pos) |d| rest[d + 1 ..] else "";
-            var key = seg;
-            var arr_idx: ?usize = null;
-            if (std.mem.indexOfScalar(u8, seg, '[')) |b| {
-                key = seg[0..b];
-                if (std.mem.indexOfScalar(u8, seg, ']')) |c| {
-                    const idxs = seg[b + 1 .. c];
-                    arr_idx = std.fmt.parseInt(usize, idxs, 10) catch return .null;
-                } else return .null;
-            }
-            if (key.len > 0) {
-                if (current != .object) return .null;
-                current = current.object.get(key) orelse return .null;
-            }
-            if (arr_idx) |i| {
-                if (current != .array) return .null;
-                if (i >= current.array.items.len) return .null;
-                current = current.array.items[i];
-            }
-        }
-        return current;
-    }
-
     fn emitJsonValue(self: *Self, pack: *MsgpackSer, v: std.json.Value) !void {
         switch (v) {
             .null => try pack.addNil(),
@@ -290,6 +268,9 @@ pub const WdsIndexingState = struct {
     /// Atomic monotonic tar-input byte offset; null disables reporting.
     progress_ptr: ?*usize = null,
 
+    /// Polled before each tar entry; once true the scan stops early.
+    cancel_ptr: ?*const std.atomic.Value(bool) = null,
+
     /// Set once by `doneCb`; null disables completion signaling.
     done_event_ptr: ?*std.Io.Event = null,
 
@@ -300,6 +281,16 @@ pub const WdsIndexingState = struct {
     /// Guards `finalize` against re-entry.
     finalized: bool = false,
 
+    /// Set once the end-of-archive marker is reached; false after an error or cancel.
+    reached_end: bool = false,
+
+    /// `input_path` opened on the first metadata read and kept for the rest of the scan.
+    meta_file: ?std.Io.File = null,
+    meta_file_failed: bool = false,
+
+    /// Written to `<input_path>.utix.summary.json` by `finalize`.
+    summary: IndexSummary = .{},
+
     row_buf: std.ArrayListUnmanaged(Entry),
     row_arena: std.heap.ArenaAllocator,
     meta_buf: std.ArrayListUnmanaged(MetaEntry),
@@ -332,6 +323,20 @@ pub const WdsIndexingState = struct {
         self.row_buf.deinit(self.gpa);
         self.row_arena.deinit();
         self.meta_buf.deinit(self.gpa);
+        self.summary.deinit(self.gpa);
+        if (self.meta_file) |f| f.close(self.io);
+    }
+
+    fn metaFile(self: *Self) ?std.Io.File {
+        if (self.meta_file) |f| return f;
+        if (self.meta_file_failed) return null;
+        const path = self.input_path orelse return null;
+        self.meta_file = std.Io.Dir.cwd().openFile(self.io, path, .{ .mode = .read_only }) catch |e| {
+            logger.warn("meta open failed for {s}: {}", .{ path, e });
+            self.meta_file_failed = true;
+            return null;
+        };
+        return self.meta_file;
     }
 
     fn writeRowMsgPack(self: *Self) !void {
@@ -420,6 +425,14 @@ pub const WdsIndexingState = struct {
             .jsonl => try self.writeRowJsonl(),
         }
 
+        var row_bytes: u64 = 0;
+        var row_end: u64 = self.current_row_base;
+        for (self.row_buf.items) |e| {
+            try self.summary.addEntry(self.gpa, e.key, e.size);
+            row_bytes += e.size;
+            row_end = @max(row_end, self.current_row_base + e.offset_from_base + e.size);
+        }
+        self.summary.finishRow(row_bytes, row_end);
         self.rows += 1;
     }
 
@@ -451,26 +464,22 @@ pub const WdsIndexingState = struct {
                 if (std.mem.eql(u8, r.meta_key, entry_key)) {
                     self.current_row_has_meta_match = true;
                     blk: {
-                        const path = self.input_path orelse break :blk;
-                        const file = std.Io.Dir.cwd().openFile(self.io, path, .{ .mode = .read_only }) catch |e| {
-                            logger.warn("meta open failed for {s}: {}", .{ path, e });
-                            break :blk;
-                        };
-                        defer file.close(self.io);
-                        const blob = self.row_arena.allocator().alloc(u8, size) catch break :blk;
+                        const file = self.metaFile() orelse break :blk;
+                        const arena = self.row_arena.allocator();
+                        const blob = arena.alloc(u8, size) catch break :blk;
                         const got = std.Io.File.readPositionalAll(file, self.io, blob, offset) catch |e| {
                             logger.warn("meta read failed for {s}: {}", .{ entry_key, e });
                             break :blk;
                         };
                         if (got != size) break :blk;
-                        const root = std.json.parseFromSliceLeaky(std.json.Value, self.row_arena.allocator(), blob[0..got], .{}) catch |e| {
-                            logger.warn("meta json parse failed for {s}: {}", .{ entry_key, e });
+                        const values = arena.alloc(std.json.Value, r.queries.len) catch break :blk;
+                        meta_extract.extract(M, arena, meta_extract.formatForKey(entry_key), blob, r.queries, values) catch |e| {
+                            logger.warn("meta parse failed for {s}: {}", .{ entry_key, e });
                             break :blk;
                         };
-                        for (r.queries) |q| {
-                            const v = getValueForQuery(root, q);
-                            const qd = self.row_arena.allocator().dupe(u8, q) catch break :blk;
-                            self.meta_buf.append(self.gpa, .{ .query = qd, .value = v }) catch break :blk;
+                        self.meta_buf.ensureUnusedCapacity(self.gpa, r.queries.len) catch break :blk;
+                        for (r.queries, values) |q, v| {
+                            self.meta_buf.appendAssumeCapacity(.{ .query = q, .value = v });
                         }
                     }
                     break;
@@ -501,6 +510,9 @@ pub const WdsIndexingState = struct {
         self.ostream.interface.flush() catch |err| {
             logger.err("Error while flushing output file: {}", .{err});
         };
+        if (self.input_path) |path| self.summary.writeSidecar(self.io, path) catch |err| {
+            logger.err("Error writing index summary for {s}: {}", .{ path, err });
+        };
     }
 
     /// Scanner terminal hook; idempotent.
@@ -516,6 +528,10 @@ pub const WdsIndexingState = struct {
         offset: usize,
         size: usize,
     ) bool {
+        if (state.cancel_ptr) |c| if (c.load(.acquire)) {
+            logger.info("Indexing cancelled after {} rows", .{state.rows});
+            return false;
+        };
         if (header) |h| {
             var buf: [1024]u8 = undefined;
 
@@ -548,6 +564,7 @@ pub const WdsIndexingState = struct {
             if (state.progress_ptr) |p| @atomicStore(usize, p, offset + size, .monotonic);
         } else {
             if (state.progress_ptr) |p| @atomicStore(usize, p, offset, .monotonic);
+            state.reached_end = true;
             state.finalize();
             logger.info("End of tar file, {} rows", .{state.rows});
         }
@@ -0,0 +1,30 @@
+---@meta
+
+---@class ultar.MemoOptions
+---@field max_age? integer Recompute once the entry is older than this many seconds
+---@field version? string|integer Bump to invalidate entries written by older scripts
+
+---@class ultar.cache
+---Local on-disk cache shared by loaders on the same machine.
+---The directory is `$ULTAR_CACHE_DIR`; caching is off while it is unset or empty.
+---Entries are never evicted.
+---@field dir string? Absolute cache directory, nil when caching is disabled
+local cache = {}
+
+---Hex digest of the given strings, for building memo names.
+---@param ... string
+---@return string
+function cache.key(...) end
+
+---Return the stored value for `name`, or call `fn`, store its result and return it.
+---Values may be nil, booleans, finite numbers, strings and tables of those.
+---Typical use is memoising a shard list built with `ultar.scandir` in `init_ctx`.
+---Calls `fn` directly when caching is disabled.
+---@generic T
+---@param name string Unique name; include anything the result depends on
+---@param fn fun(): T
+---@param opts? ultar.MemoOptions
+---@return T
+function cache.memo(name, fn, opts) end
+
+return cache
@@ -12,17 +12,24 @@ local loader = {}
 
 ---Open a file for reading.
 ---This is a yielding operation - it will suspend the coroutine until the file is opened.
----@param path string Absolute path to the file
+---With `max_open_files` configured, reopening a recently closed path returns
+---the cached handle without yielding.
+---`http://` and `https://` URLs are read with HTTP range requests, e.g.
+---`http://host:3000/map_file?file=shard.tar` against ultar_httpd.
+---@param path string Absolute path to the file, or an HTTP(S) URL
 ---@return ultar.FileHandle handle Opaque file handle for use with other loader methods
 function loader:open_file(path) end
 
 ---Close a previously opened file.
+---With `max_open_files` configured, the handle is kept open for reuse and only
+---closed once it is the least recently used over the limit.
 ---@param handle ultar.FileHandle The file handle returned by open_file
 ---@return nil
 function loader:close_file(handle) end
 
 ---Add an entry to the current row being built.
 ---Call this multiple times to add entries, then call finish_row().
+---On a file opened with `mmap` configured this does not yield.
 ---@param handle ultar.FileHandle File handle containing the data
 ---@param key string Entry key name (e.g., ".json", ".png")
 ---@param offset integer Byte offset in the file where the entry data starts
@@ -30,12 +37,109 @@ function loader:close_file(handle) end
 ---@return nil
 function loader:add_entry(handle, key, offset, size) end
 
+---Add an entry holding only part of a tar member, e.g. one tensor of a safetensors file.
+---Reads bytes `[start, start + len)` of the member at `offset`, clamped to its `size`.
+---@param handle ultar.FileHandle File handle containing the data
+---@param key string Entry key name
+---@param offset integer Byte offset of the member's data in the file
+---@param size integer Size of the member's data in bytes
+---@param start integer Offset of the range within the member
+---@param len? integer Length of the range (default: the rest of the member)
+---@return nil
+function loader:add_entry_range(handle, key, offset, size, start, len) end
+
+---Read bytes without adding them to the row, e.g. an image header to decide
+---whether the sample is worth fetching. Yields until the read completes,
+---except on files opened with `mmap` configured.
+---@param handle ultar.FileHandle File handle containing the data
+---@param offset integer Byte offset in the file
+---@param len integer Number of bytes to read; keep within the member
+---@return string? bytes The bytes read, or nil if the read failed
+function loader:peek(handle, offset, len) end
+
 ---Add in-memory bytes entry (synchronous, no yield/IO). Mix with add_entry before finish_row. Binary-safe.
 ---@param key string Entry key name (e.g., ".synthetic")
 ---@param data string Raw bytes content (binary safe, may contain \0)
 ---@return nil
 function loader:add_entry_bytes(key, data) end
 
+---@class ultar.LoaderConfig
+---@field http_concurrency? integer Concurrent HTTP range requests (default 8)
+---@field http_retries? integer Retries per failed HTTP request (default 3)
+---@field http_retry_backoff_ms? integer Delay before the first retry, doubled per attempt (default 50)
+---@field max_open_files? integer Cache closed handles, keeping at most this many open (default 0, no cache)
+---@field read_deadline_ms? integer Fail local reads still pending after this long with `ReadTimeout` (default 0, no deadline)
+---@field hedge_reads? boolean Reissue local reads still pending after the observed p99 latency (default false)
+---@field out_of_order? boolean Return rows as soon as they finish instead of in `finish_row` order (default false)
+---@field on_read_error? "fail"|"skip_row"|"drop_entry" What a failed read does to its row (default "fail", ends iteration)
+---@field cache_dir? string Cache blocks of local shards in this directory (read-through, off by default)
+---@field cache_size_mb? integer Evict cached blocks beyond this size (default 65536)
+---@field cache_threads? integer Threads serving reads through the cache (default 4)
+---@field mmap? boolean Map local files opened afterwards; add_entry on them returns without yielding (default false)
+
+---Tune the loader. HTTP settings only take effect before the first URL is opened.
+---@param config ultar.LoaderConfig
+---@return nil
+function loader:configure(config) end
+
+---@class ultar.ReadFailure
+---@field err string Error name, e.g. "ReadTimeout" or "ReadError"
+---@field key string Entry key
+---@field handle ultar.FileHandle
+---@field offset integer
+---@field size integer
+
+---@class ultar.CacheStats
+---@field hits integer Block lookups served from the cache
+---@field misses integer Block lookups read from the source
+---@field hit_bytes integer
+---@field miss_bytes integer
+---@field hit_rate number Fraction of bytes served from the cache
+---@field populated integer Blocks copied into the cache
+---@field evicted integer
+---@field corrupt integer Cached blocks dropped after a failed checksum
+---@field dropped integer Blocks left uncached because the fill queue was full
+---@field refetched_bytes integer Source bytes read to fill gaps between misses in a cached block
+---@field bytes_cached integer
+
+---Block cache counters, or nil without `cache_dir` (synchronous).
+---@return ultar.CacheStats?
+function loader:cache_stats() end
+
+---Failed reads seen since the last call, oldest first (synchronous).
+---Only reads skipped or dropped under `on_read_error` are reported.
+---@return ultar.ReadFailure[]
+function loader:read_errors() end
+
+---@class ultar.LoaderBatch
+---Batched entry emission. Under LuaJIT, add() and finish_row() write straight
+---into a native buffer and only flush() (or a full buffer) yields. Other
+---runtimes fall back to the per-call API, so scripts stay portable.
+local LoaderBatch = {}
+
+---Intern an entry key; pass the result to add().
+---@param key string Entry key name (e.g., ".jpg")
+---@return any key_id
+function LoaderBatch:key(key) end
+
+---@param handle ultar.FileHandle
+---@param key_id any Value returned by key()
+---@param offset integer Byte offset in the file
+---@param size integer Size in bytes
+function LoaderBatch:add(handle, key_id, offset, size) end
+
+---Close the current row after the entries added so far.
+function LoaderBatch:finish_row() end
+
+---Submit buffered entries. Required before close_file(), add_entry(),
+---add_entry_bytes() or finish_row() on the loader itself. Entries still
+---buffered when the generator returns are submitted then.
+function LoaderBatch:flush() end
+
+---Create a batch emitter.
+---@return ultar.LoaderBatch
+function loader:batch() end
+
 ---Finish the current row and make it available to Python.
 ---After calling this, start building a new row with add_entry() calls.
 ---@return nil
@@ -0,0 +1,41 @@
+---@meta
+
+---@class ultar.Manifest
+---A mapped `.utmf` dataset manifest built by `ultar_manifest`.
+---Global row ids and shard indices are 0-based.
+local Manifest = {}
+
+---@return integer
+function Manifest:num_shards() end
+
+---@return integer
+function Manifest:num_rows() end
+
+---Shard `i`: its path (resolved against the manifest's directory), first global row and row count.
+---@param i integer
+---@return string? path
+---@return integer first_row
+---@return integer rows
+function Manifest:shard(i) end
+
+---Where global row `row` lives; nil past the end.
+---@param row integer
+---@return string? path Shard tar path
+---@return integer local_row Row within the shard's `.utix`
+---@return integer shard Shard index
+function Manifest:locate(row) end
+
+---Metadata merged with `ultar_manifest --metadata`, as a JSON string.
+---@param row integer
+---@return string?
+function Manifest:meta(row) end
+
+---@class ultar.manifest
+local manifest = {}
+
+---Map a manifest file. Cost does not depend on the number of shards.
+---@param path string
+---@return ultar.Manifest
+function manifest.open(path) end
+
+return manifest
@@ -14,6 +14,12 @@ local ScanCtx = {}
 ---@return fun(): string? iterator Iterator function returning full paths
 function ScanCtx:iter() end
 
+---@class ultar.WalkOptions
+---@field recursive? boolean Descend into subdirectories (default true)
+---@field ext? string Keep only file names ending in this, e.g. ".tar"
+---@field glob? string Keep only file names matching this `*`/`?` pattern
+---@field cache? string|boolean Listing cache file, or true for one in `ultar.cache`'s directory
+
 ---@class ultar.scandir
 ---Directory scanner module
 local scandir = {}
@@ -23,5 +29,12 @@ local scandir = {}
 ---@return ultar.ScanCtx ctx Scanner context with iter() method
 function scandir.open(path) end
 
+---List the files under a directory, sorted by path.
+---With `cache`, the listing is reused while no directory's mtime has changed.
+---@param path string Directory to walk
+---@param opts? ultar.WalkOptions
+---@return string[] paths Absolute paths of matching files and symlinks
+function scandir.walk(path, opts) end
+
 return scandir
 
@@ -0,0 +1,73 @@
+---@meta
+
+---@class ultar.IndexKeyStats
+---@field count integer Rows with this key
+---@field bytes integer Payload bytes under this key
+
+---@class ultar.IndexSummary
+---@field version integer
+---@field rows integer
+---@field total_bytes integer Sum of entry payload sizes
+---@field tar_bytes integer Offset just past the last indexed entry
+---@field keys table<string, ultar.IndexKeyStats>
+---@field row_size_hist integer[][] `{lower_bound, count}` pairs over power-of-two row sizes
+
+---@class ultar.RowRange
+---@field path string
+---@field start_row integer First row, 0-based
+---@field end_row integer One past the last row
+
+---@class ultar.ShardCursor
+---Rows of an epoch not read yet; plain data, so it can be checkpointed.
+---@field epoch integer
+---@field remaining integer[][] Sorted `{lo, hi}` positions in the epoch's row space
+
+---@class ultar.sharding
+---Split shards across ranks by bytes using the indexer's `<tar>.utix.summary.json`
+---files. Matches `ultar_dataloader.sharding` in Python.
+local sharding = {}
+
+---Load the summary the indexer wrote for `tar_path`.
+---@param tar_path string
+---@return ultar.IndexSummary
+function sharding.summary(tar_path) end
+
+---Whole shards for `rank`, greedily balanced by bytes; returned in input order.
+---@param paths string[]
+---@param rank integer
+---@param world_size integer
+---@return string[]
+function sharding.assign_shards(paths, rank, world_size) end
+
+---Row ranges for `rank` covering an equal slice of the total bytes.
+---Rows within a shard are assumed to be of similar size.
+---@param paths string[]
+---@param rank integer
+---@param world_size integer
+---@return ultar.RowRange[]
+function sharding.assign_row_ranges(paths, rank, world_size) end
+
+---A cursor covering every row of `paths` for `epoch`.
+---@param paths string[]
+---@param epoch? integer Default 0
+---@return ultar.ShardCursor
+function sharding.epoch_cursor(paths, epoch) end
+
+---Contiguous row ranges for `rank`: an equal slice of the rows `cursor` has
+---left, with shards in an order shuffled by the epoch. `world_size` need not
+---match the one that produced the cursor.
+---@param paths string[]
+---@param rank integer
+---@param world_size integer
+---@param cursor ultar.ShardCursor
+---@return ultar.RowRange[]
+function sharding.partition_rows(paths, rank, world_size, cursor) end
+
+---The cursor after each of `world_size` ranks read `consumed` rows of its ranges.
+---@param cursor ultar.ShardCursor
+---@param world_size integer
+---@param consumed integer
+---@return ultar.ShardCursor
+function sharding.advance_cursor(cursor, world_size, consumed) end
+
+return sharding
@@ -8,6 +8,46 @@
 ---@field offset integer Base byte offset of this row in the tar file
 local UtixRow = {}
 
+---@class ultar.UtixRowView
+---Reused native row returned by `UtixReader:rows()`. Accessors read decoded
+---native memory, so they allocate nothing on the Lua heap. The same object is
+---overwritten on every iteration step; copy out anything you need to keep.
+---`#row` is the number of entries.
+local UtixRowView = {}
+
+---@param key string Entry key (e.g., ".jpg")
+---@return boolean
+function UtixRowView:has(key) end
+
+---@param key string Entry key
+---@return integer? size Entry size in bytes, or nil if absent
+function UtixRowView:size(key) end
+
+---@param key string Entry key
+---@return integer? offset Entry offset relative to the row's tar record
+function UtixRowView:rel_offset(key) end
+
+---@param key string Entry key
+---@return integer? offset Absolute byte offset of the entry in the tar file
+function UtixRowView:abs_offset(key) end
+
+---@param key string Metadata field (e.g., ".width")
+---@return string|number|boolean|nil value Scalar metadata value, or nil
+function UtixRowView:meta(key) end
+
+---@param i integer 1-based entry index
+---@return string? key
+function UtixRowView:key(i) end
+
+---@return integer offset Base byte offset of this row in the tar file
+function UtixRowView:base_offset() end
+
+---@return string
+function UtixRowView:str_idx() end
+
+---@return integer
+function UtixRowView:iidx() end
+
 ---@class ultar.UtixReader
 ---Iterator-capable reader for .utix (msgpack) index files
 local UtixReader = {}
@@ -16,6 +56,10 @@ local UtixReader = {}
 ---@return fun(): ultar.UtixRow? iterator Iterator function returning rows
 function UtixReader:iter() end
 
+---Iterate over rows without building Lua tables; yields one reused row view.
+---@return fun(): ultar.UtixRowView? iterator
+function UtixReader:rows() end
+
 ---@class ultar.utix
 ---UTIX/msgpack index file reader module
 local utix = {}
@@ -2,8 +2,14 @@ const std = @import("std");
 const zlua = @import("zlua");
 const Lua = @import("zlua").Lua;
 const lua_rt = @import("lua_rt.zig");
+const script_cache = @import("script_cache.zig");
 const dataloader = @import("dataloader.zig");
 const LoaderCtx = dataloader.LoaderCtx;
+const Tracer = dataloader.Tracer;
+const MappedFile = dataloader.MappedFile;
+pub const Mixer = @import("Mixer.zig");
+pub const BatchIndexer = @import("BatchIndexer.zig");
+pub const partition = @import("partition.zig");
 
 const logger = std.log.scoped(.lua_dataloader);
 
@@ -147,10 +153,84 @@ pub const LuaLoaderSpec = extern struct {
     config_keys: [*c]const [*c]const u8 = null,
     config_values: [*c]const [*c]const u8 = null,
     config_count: c_uint = 0,
+    /// Record a pipeline trace for `ultarDumpTrace`. `ULTAR_TRACE=1` turns it on for every loader.
+    trace: bool = false,
 };
 
 const c_u8ptr = [*c]const u8;
 
+/// One record of the FFI batch buffer; layout mirrors `ultar_batch_entry` in `batch_lua_src`.
+pub const BatchEntry = extern struct {
+    handle: u64,
+    offset: u64,
+    size: u32,
+    /// Index into the interned key table, or `batch_finish_row`.
+    key_id: u32,
+};
+
+pub const batch_capacity = 256;
+const batch_finish_row = std.math.maxInt(u32);
+
+/// Filled directly by LuaJIT FFI code; Zig only reads it while the generator is suspended.
+pub const FfiBatch = extern struct {
+    len: u32 = 0,
+    cap: u32 = batch_capacity,
+    entries: [batch_capacity]BatchEntry = undefined,
+};
+
+// Installs `loader:batch()`. Under LuaJIT, `add`/`finish_row` write into the
+// native `FfiBatch` and only `flush` (or a full buffer) yields; elsewhere it
+// falls back to the regular per-call API so scripts stay portable.
+const batch_lua_src =
+    \\local loader, batch_ptr, cap = ...
+    \\local ok, ffi = pcall(require, "ffi")
+    \\if not ok then
+    \\    function loader:batch()
+    \\        local b = {}
+    \\        function b:key(k) return k end
+    \\        function b:add(handle, key, offset, size) loader:add_entry(handle, key, offset, size) end
+    \\        function b:finish_row() loader:finish_row() end
+    \\        function b:flush() end
+    \\        return b
+    \\    end
+    \\    return
+    \\end
+    \\ffi.cdef(string.format([[
+    \\typedef struct { uint64_t handle; uint64_t offset; uint32_t size; uint32_t key_id; } ultar_batch_entry;
+    \\typedef struct { uint32_t len; uint32_t cap; ultar_batch_entry entries[%d]; } ultar_batch;
+    \\]], cap))
+    \\local buf = ffi.cast("ultar_batch *", batch_ptr)
+    \\local finish_row = 0xFFFFFFFF
+    \\local function push(handle, key_id, offset, size)
+    \\    local n = buf.len
+    \\    local e = buf.entries[n]
+    \\    e.handle = handle
+    \\    e.offset = offset
+    \\    e.size = size
+    \\    e.key_id = key_id
+    \\    buf.len = n + 1
+    \\    if n + 1 == cap then loader:batch_flush() end
+    \\end
+    \\function loader:batch()
+    \\    local key_ids = {}
+    \\    local b = {}
+    \\    function b:key(k)
+    \\        local id = key_ids[k]
+    \\        if id == nil then
+    \\            id = loader:key_id(k)
+    \\            key_ids[k] = id
+    \\        end
+    \\        return id
+    \\    end
+    \\    function b:add(handle, key_id, offset, size) push(handle, key_id, offset, size) end
+    \\    function b:finish_row() push(0, finish_row, 0, 0) end
+    \\    function b:flush()
+    \\        if buf.len > 0 then loader:batch_flush() end
+    \\    end
+    \\    return b
+    \\end
+;
+
 pub const LoadedRow = extern struct {
     keys: [*c]c_u8ptr = null,
     data: [*c]c_u8ptr = null,
@@ -158,10 +238,49 @@ pub const LoadedRow = extern struct {
     num_keys: c_uint = 0,
 };
 
+/// Caller-owned buffers that reads for one key land in, registered with
+/// `ultarRegisterStaging` before iteration starts. `add_entry` claims a free
+/// buffer large enough for the entry and the row hands it back when reclaimed.
+/// Only the generator claims; any thread may release.
+const StagingPool = struct {
+    const max_buffers = 64;
+
+    buffers: []const []u8,
+    // Bit `i` is set while `buffers[i]` is free.
+    free: std.atomic.Value(u64),
+
+    fn claim(self: *StagingPool, size: usize) ?u32 {
+        var mask = self.free.load(.acquire);
+        while (true) {
+            var candidates = mask;
+            const i: u6 = while (candidates != 0) : (candidates &= candidates - 1) {
+                const bit: u6 = @intCast(@ctz(candidates));
+                if (self.buffers[bit].len >= size) break bit;
+            } else return null;
+            mask = self.free.cmpxchgWeak(mask, mask & ~(@as(u64, 1) << i), .acquire, .acquire) orelse return i;
+        }
+    }
+
+    fn release(self: *StagingPool, i: u32) void {
+        _ = self.free.fetchOr(@as(u64, 1) << @intCast(i), .release);
+    }
+};
+
 const Row = struct {
     const Entry = struct {
         key: [:0]const u8,
         data: []u8,
+        // Set when `data` views into a mapped file rather than the arena; holds a reference.
+        mapped: ?*MappedFile = null,
+        // Set when `data` is a claimed staging buffer rather than the arena.
+        staged: ?Staged = null,
+        // Read failed under `on_read_error = "drop_entry"`; left out of the loaded row.
+        dropped: bool = false,
+    };
+
+    const Staged = struct {
+        pool: *StagingPool,
+        index: u32,
     };
 
     node: std.DoublyLinkedList.Node = .{},
@@ -169,6 +288,10 @@ const Row = struct {
     ext_row: LoadedRow = .{},
     entries: std.ArrayListUnmanaged(Entry),
     num_fullfilled: usize = 0,
+    // Order in which the script finished the row; identifies it in traces.
+    seq: u64 = 0,
+    // A read failed under `on_read_error = "skip_row"`; recycled instead of returned.
+    skip: bool = false,
 
     pub fn initAlloc(base_alloc: std.mem.Allocator) !*Row {
         var r = try base_alloc.create(Row);
@@ -176,21 +299,99 @@ const Row = struct {
         r.arena = std.heap.ArenaAllocator.init(base_alloc);
         r.entries = try std.ArrayListUnmanaged(Entry).initCapacity(r.arena.allocator(), 8);
         r.num_fullfilled = 0;
+        r.skip = false;
         return r;
     }
 
     pub fn deinit(self: *Row) void {
+        self.releaseRefs();
         self.arena.deinit();
     }
 
+    /// Drop the row's references to mapped files and hand back its staging
+    /// buffers. Safe from any thread.
+    pub fn releaseRefs(self: *Row) void {
+        for (self.entries.items) |*e| {
+            if (e.mapped) |m| {
+                e.mapped = null;
+                m.release();
+            }
+            if (e.staged) |st| {
+                e.staged = null;
+                st.pool.release(st.index);
+            }
+        }
+    }
+
     pub fn reset(self: *Row) !void {
+        self.releaseRefs();
         self.ext_row = .{};
         _ = self.arena.reset(.retain_capacity);
         self.entries = try std.ArrayListUnmanaged(Entry).initCapacity(self.arena.allocator(), 8);
         self.num_fullfilled = 0;
+        self.skip = false;
     }
 };
 
+/// What a failed read does to its row, set with `loader:configure{ on_read_error = ... }`.
+const ReadErrorPolicy = enum {
+    /// End iteration with the error.
+    fail,
+    /// Drop the whole row.
+    skip_row,
+    /// Return the row without the failed entry.
+    drop_entry,
+};
+
+/// A read that failed without ending iteration, reported by `loader:read_errors()`.
+const ReadFailure = struct {
+    err: anyerror,
+    key: []u8,
+    handle: u64,
+    offset: u64,
+    size: u32,
+};
+
+/// Per-phase wall time of `LuaDataLoader.init`, logged once it completes.
+const StartupTimes = struct {
+    io_thread_ns: u64 = 0,
+    lua_state_ns: u64 = 0,
+    modules_ns: u64 = 0,
+    compile_ns: u64 = 0,
+    bytecode_cache_hit: bool = false,
+    chunk_ns: u64 = 0,
+    init_ctx_ns: u64 = 0,
+
+    pub fn format(self: StartupTimes, w: *std.Io.Writer) std.Io.Writer.Error!void {
+        const ms = 1e-6;
+        const total = self.io_thread_ns + self.lua_state_ns + self.modules_ns + self.compile_ns + self.chunk_ns + self.init_ctx_ns;
+        try w.print("total={d:.2}ms io_thread={d:.2}ms lua_state={d:.2}ms modules={d:.2}ms compile={d:.2}ms ({s}) chunk={d:.2}ms init_ctx={d:.2}ms", .{
+            @as(f64, @floatFromInt(total)) * ms,
+            @as(f64, @floatFromInt(self.io_thread_ns)) * ms,
+            @as(f64, @floatFromInt(self.lua_state_ns)) * ms,
+            @as(f64, @floatFromInt(self.modules_ns)) * ms,
+            @as(f64, @floatFromInt(self.compile_ns)) * ms,
+            if (self.bytecode_cache_hit) "bytecode cache hit" else "compiled",
+            @as(f64, @floatFromInt(self.chunk_ns)) * ms,
+            @as(f64, @floatFromInt(self.init_ctx_ns)) * ms,
+        });
+    }
+};
+
+fn traceFromEnv() bool {
+    const v = std.c.getenv("ULTAR_TRACE") orelse return false;
+    const s = std.mem.span(v);
+    return s.len > 0 and !std.mem.eql(u8, s, "0");
+}
+
+/// Nanoseconds since `t`; advances `t` to now.
+fn lap(io: std.Io, t: *std.Io.Clock.Timestamp) u64 {
+    const now = std.Io.Clock.Timestamp.now(io, .awake);
+    const ns = t.durationTo(now).raw.nanoseconds;
+    t.* = now;
+    return @intCast(@max(0, ns));
+}
+
 pub const LuaDataLoader = struct {
     const Self = @This();
 
@@ -219,6 +420,26 @@ pub const LuaDataLoader = struct {
             // state
             entry: ?*Row.Entry = null,
         },
+        configure: struct {
+            // Sent in turn and cleared; the yield resolves once all are null.
+            http: ?dataloader.HttpConfig = null,
+            reads: ?dataloader.ReadPolicy = null,
+            cache: ?*dataloader.BlockCache = null,
+            mmap: ?bool = null,
+        },
+        batch_flush: struct {
+            // state
+            pos: u32 = 0,
+            entry: ?*Row.Entry = null,
+        },
+        peek: struct {
+            // args
+            file_handle: u64,
+            offset: u64,
+            // state; `buf` is ours until the read completes
+            buf: []u8,
+            sent_rid: u64 = 0,
+        },
         generic: struct {},
     };
 
@@ -249,7 +470,52 @@ pub const LuaDataLoader = struct {
     free_list: std.DoublyLinkedList = .{},
     num_floating_rows: usize = 0,
 
-    load_rid_to_row: std.AutoArrayHashMapUnmanaged(u64, *Row),
+    pending_reads: std.AutoArrayHashMapUnmanaged(u64, PendingRead),
+
+    // Set by `loader:configure{ out_of_order = true }`: hand out any finished
+    // row instead of only the oldest, so one slow read doesn't hold back the queue.
+    out_of_order: bool = false,
+    on_read_error: ReadErrorPolicy = .fail,
+    // Last policy sent to the IO thread; `configure` only overrides the fields it names.
+    read_policy: dataloader.ReadPolicy = .{},
+    // Set by `loader:configure{ cache_dir = ... }`; the IO thread borrows it.
+    block_cache: ?*dataloader.BlockCache = null,
+    // Open handles the IO thread mapped -> our reference to the mapping.
+    // `add_entry` on these builds the entry in place instead of reading.
+    mapped_files: std.AutoHashMapUnmanaged(u64, *MappedFile) = .empty,
+    // Key -> buffers registered by the consumer; fixed once iteration starts.
+    staging: std.StringHashMapUnmanaged(*StagingPool) = .empty,
+    // Set by the first `nextRow`; staging can't be registered after.
+    started: bool = false,
+    // Failures not yet collected by `loader:read_errors()`, oldest first.
+    read_failures: std.ArrayList(ReadFailure) = .empty,
+
+    ffi_batch: FfiBatch = .{},
+    // Keys referenced by `BatchEntry.key_id`, interned via `loader:key_id`.
+    batch_keys: std.ArrayList([:0]const u8) = .empty,
+    batch_key_ids: std.StringHashMapUnmanaged(u32) = .empty,
+
+    // Handle cache, enabled by `loader:configure{ max_open_files = N }`. Closed
+    // handles stay open in `idle_files` and are handed back by the next open of
+    // the same path; the least recently closed go once more than N are open.
+    max_open_files: usize = 0,
+    // Handles held by the script -> owned path. Only tracked while caching.
+    live_files: std.AutoHashMapUnmanaged(u64, []u8) = .empty,
+    idle_files: std.StringHashMapUnmanaged(*IdleFile) = .empty,
+    // Least recently closed first.
+    idle_lru: std.DoublyLinkedList = .{},
+    // Evicted handles whose close_file hasn't fit in the request ring yet.
+    pending_closes: std.ArrayList(u64) = .empty,
+
+    // Set once async iteration starts; from then on only the pump calls nextRow.
+    pump: ?*AsyncPump = null,
+
+    // See `script_cache`; null when caching is disabled.
+    cache_dir: ?[]u8 = null,
+
+    // Null unless tracing was asked for; shared with the IO thread.
+    tracer: ?*Tracer = null,
+    rows_finished: u64 = 0,
 
     last_instant: std.Io.Clock.Timestamp,
     last_log_instant: std.Io.Clock.Timestamp,
@@ -258,12 +524,84 @@ pub const LuaDataLoader = struct {
     samples_count: u64 = 0,
 
     const max_floating_rows: usize = 16;
+    // Further failures are only logged until the script collects these.
+    const max_read_failures: usize = 1024;
+
+    /// Where a read_block response lands.
+    const PendingRead = struct {
+        row: *Row,
+        entry: u32,
+        file_handle: u64,
+        offset: u64,
+        size: u32,
+    };
+
+    const IdleFile = struct {
+        path: []u8,
+        handle: u64,
+        node: std.DoublyLinkedList.Node = .{},
+    };
+
+    fn openFileCount(self: *Self) usize {
+        return self.live_files.count() + self.idle_files.count();
+    }
+
+    /// Keep a handle the script closed open for reuse. Takes ownership of `path`.
+    fn parkIdleFile(self: *Self, path: []u8, handle: u64) !void {
+        errdefer self.alloc.free(path);
+        const idle = try self.alloc.create(IdleFile);
+        errdefer self.alloc.destroy(idle);
+        idle.* = .{ .path = path, .handle = handle };
+        try self.idle_files.put(self.alloc, path, idle);
+        self.idle_lru.append(&idle.node);
+    }
+
+    /// Queue closes for idle handles until `reserve` more opens fit under `max_open_files`.
+    fn evictIdleFiles(self: *Self, reserve: usize) !void {
+        while (self.openFileCount() + reserve > self.max_open_files) {
+            try self.pending_closes.ensureUnusedCapacity(self.alloc, 1);
+            const node = self.idle_lru.popFirst() orelse break;
+            const idle: *IdleFile = @fieldParentPtr("node", node);
+            _ = self.idle_files.remove(idle.path);
+            self.pending_closes.appendAssumeCapacity(idle.handle);
+            self.dropMapping(idle.handle);
+            self.alloc.free(idle.path);
+            self.alloc.destroy(idle);
+        }
+    }
+
+    /// Release our reference to `handle`'s mapping, if it has one, before closing it.
+    fn dropMapping(self: *Self, handle: u64) void {
+        if (self.mapped_files.fetchRemove(handle)) |kv| kv.value.release();
+    }
+
+    /// Batched entries must reach the row before anything issued through the per-call API.
+    fn checkBatchFlushed(self: *Self) !void {
+        if (self.ffi_batch.len != 0) {
+            logger.err("loader has {} unflushed batch entries; call batch:flush() first", .{self.ffi_batch.len});
+            return error.LuaError;
+        }
+    }
 
     fn gOpenFile(lua: *Lua) !i32 {
         const loader = try lua.toUserdata(Self, 1);
         // Safe to borrow: Lua yields immediately after, keeping the string pinned.
         const file_path = try lua.toString(2);
 
+        if (loader.idle_files.get(file_path)) |idle| {
+            try loader.live_files.ensureUnusedCapacity(loader.alloc, 1);
+            _ = loader.idle_files.remove(file_path);
+            loader.idle_lru.remove(&idle.node);
+            loader.live_files.putAssumeCapacity(idle.handle, idle.path);
+            const handle = idle.handle;
+            loader.alloc.destroy(idle);
+
+            lua.pushBoolean(true);
+            lua_rt.pushUnsigned64(lua, handle);
+            return 2;
+        }
+        if (loader.max_open_files > 0) try loader.evictIdleFiles(1);
+
         loader.u_yielded_from = .{
             .open_file = .{
                 .file = file_path,
@@ -275,7 +613,21 @@ pub const LuaDataLoader = struct {
 
     fn gCloseFile(lua: *Lua) !i32 {
         const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
         const handle: u64 = try lua_rt.toUnsigned64(lua, 2);
+
+        if (loader.live_files.fetchRemove(handle)) |kv| {
+            if (loader.max_open_files > 0 and !loader.idle_files.contains(kv.value)) {
+                try loader.parkIdleFile(kv.value, handle);
+                try loader.evictIdleFiles(0);
+
+                lua.pushBoolean(true);
+                return 1;
+            }
+            loader.alloc.free(kv.value);
+        }
+        loader.dropMapping(handle);
+
         loader.u_yielded_from = .{
             .close_file = .{
                 .file_handle = handle,
@@ -286,13 +638,43 @@ pub const LuaDataLoader = struct {
 
     fn gAddEntry(lua: *Lua) !i32 {
         const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
         const handle: u64 = try lua_rt.toUnsigned64(lua, 2);
         // Safe to borrow: Lua yields immediately after, keeping the string pinned.
         const key = try lua.toString(3);
         const offset: u64 = @intFromFloat(try lua.toNumber(4));
         const size: u32 = try lua_rt.toUnsigned(lua, 5);
+        return loader.addEntry(lua, handle, key, offset, size);
+    }
 
-        loader.u_yielded_from = .{
+    /// `loader:add_entry_range(handle, key, offset, size, start[, len])`: an
+    /// entry holding only bytes `[start, start + len)` of the member at
+    /// `offset`, clamped to its `size`; `len` defaults to the rest of it.
+    fn gAddEntryRange(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
+        const handle: u64 = try lua_rt.toUnsigned64(lua, 2);
+        const key = try lua.toString(3);
+        const offset: u64 = @intFromFloat(try lua.toNumber(4));
+        const size: u32 = try lua_rt.toUnsigned(lua, 5);
+        const start: u32 = try lua_rt.toUnsigned(lua, 6);
+        if (start > size) {
+            logger.err("add_entry_range: start {} is past the member's {} bytes", .{ start, size });
+            return error.LuaError;
+        }
+        const len: u32 = if (lua.isNoneOrNil(7)) size - start else @min(try lua_rt.toUnsigned(lua, 7), size - start);
+        return loader.addEntry(lua, handle, key, offset + start, len);
+    }
+
+    fn addEntry(self: *Self, lua: *Lua, handle: u64, key: [:0]const u8, offset: u64, size: u32) !i32 {
+        if (self.mapped_files.get(handle)) |m| {
+            const row = self.in_progress_row orelse @panic("No in-progress row while trying to .add_entry");
+            try self.addMappedEntry(row, m, handle, key, offset, size);
+            lua.pushBoolean(true);
+            return 1;
+        }
+
+        self.u_yielded_from = .{
             .add_entry = .{
                 .file_handle = handle,
                 .key = key,
@@ -304,15 +686,231 @@ pub const LuaDataLoader = struct {
         return 0;
     }
 
+    /// `loader:peek(handle, offset, len)` -> the `len` bytes at `offset` as a
+    /// string, outside any row, or nil if the read fails. For deciding from a
+    /// member's first bytes whether to add it.
+    fn gPeek(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
+        const handle: u64 = try lua_rt.toUnsigned64(lua, 2);
+        const offset: u64 = @intFromFloat(try lua.toNumber(3));
+        const len: u32 = try lua_rt.toUnsigned(lua, 4);
+
+        if (len == 0) {
+            lua.pushBoolean(true);
+            _ = lua.pushString("");
+            return 2;
+        }
+        if (loader.mapped_files.get(handle)) |m| {
+            lua.pushBoolean(true);
+            if (offset <= m.memory.len and len <= m.memory.len - offset) {
+                _ = lua.pushString(m.memory[@intCast(offset)..][0..len]);
+            } else {
+                lua.pushNil();
+            }
+            return 2;
+        }
+
+        loader.u_yielded_from = .{
+            .peek = .{
+                .file_handle = handle,
+                .offset = offset,
+                .buf = try loader.alloc.alloc(u8, len),
+            },
+        };
+        return 0;
+    }
+
+    fn gConfigure(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        if (!lua.isTable(2)) {
+            logger.err("loader:configure expects a table", .{});
+            return error.LuaError;
+        }
+
+        if (lua.getField(2, "max_open_files") != .nil) {
+            loader.max_open_files = try lua_rt.toUnsigned(lua, -1);
+            try loader.evictIdleFiles(0);
+        }
+        lua.pop(1);
+
+        if (lua.getField(2, "out_of_order") != .nil) {
+            loader.out_of_order = lua.toBoolean(-1);
+        }
+        lua.pop(1);
+
+        if (lua.getField(2, "on_read_error") != .nil) {
+            const name = try lua.toString(-1);
+            loader.on_read_error = std.meta.stringToEnum(ReadErrorPolicy, name) orelse {
+                logger.err("on_read_error must be \"fail\", \"skip_row\" or \"drop_entry\", got \"{s}\"", .{name});
+                return error.LuaError;
+            };
+        }
+        lua.pop(1);
+
+        var reads = loader.read_policy;
+        var has_reads = false;
+        if (lua.getField(2, "read_deadline_ms") != .nil) {
+            reads.deadline_ms = try lua_rt.toUnsigned(lua, -1);
+            has_reads = true;
+        }
+        lua.pop(1);
+        if (lua.getField(2, "hedge_reads") != .nil) {
+            reads.hedge = lua.toBoolean(-1);
+            has_reads = true;
+        }
+        lua.pop(1);
+        loader.read_policy = reads;
+
+        var cache: ?*dataloader.BlockCache = null;
+        if (lua.getField(2, "cache_dir") != .nil) {
+            const dir = try lua.toString(-1);
+            if (loader.block_cache != null) {
+                logger.warn("Block cache already configured; ignoring cache_dir = {s}", .{dir});
+            } else {
+                var cache_config: dataloader.BlockCache.Config = .{ .dir = dir, .capacity_bytes = 64 << 30 };
+                if (lua.getField(2, "cache_size_mb") != .nil) {
+                    cache_config.capacity_bytes = @as(u64, try lua_rt.toUnsigned(lua, -1)) << 20;
+                }
+                lua.pop(1);
+                if (lua.getField(2, "cache_threads") != .nil) {
+                    cache_config.concurrency = @intCast(try lua_rt.toUnsigned(lua, -1));
+                }
+                lua.pop(1);
+
+                const c = try loader.alloc.create(dataloader.BlockCache);
+                errdefer loader.alloc.destroy(c);
+                c.init(loader.alloc, loader.io, cache_config) catch |err| {
+                    logger.err("Failed to open block cache {s}: {}", .{ dir, err });
+                    return error.LuaError;
+                };
+                loader.block_cache = c;
+                cache = c;
+            }
+        }
+        lua.pop(1);
+
+        var mmap: ?bool = null;
+        if (lua.getField(2, "mmap") != .nil) {
+            mmap = lua.toBoolean(-1);
+        }
+        lua.pop(1);
+
+        var config: dataloader.HttpConfig = .{};
+        var has_http = false;
+        if (lua.getField(2, "http_concurrency") != .nil) {
+            config.concurrency = @intCast(try lua_rt.toUnsigned(lua, -1));
+            has_http = true;
+        }
+        lua.pop(1);
+        if (lua.getField(2, "http_retries") != .nil) {
+            config.max_retries = @intCast(try lua_rt.toUnsigned(lua, -1));
+            has_http = true;
+        }
+        lua.pop(1);
+        if (lua.getField(2, "http_retry_backoff_ms") != .nil) {
+            config.retry_backoff_ms = try lua_rt.toUnsigned(lua, -1);
+            has_http = true;
+        }
+        lua.pop(1);
+
+        loader.u_yielded_from = if (has_http or has_reads or cache != null or mmap != null) .{ .configure = .{
+            .http = if (has_http) config else null,
+            .reads = if (has_reads) reads else null,
+            .cache = cache,
+            .mmap = mmap,
+        } } else .{ .generic = .{} };
+        return 0;
+    }
+
     fn gFinishRow(lua: *Lua) !i32 {
         const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
         try loader.newInprogressRow();
         loader.u_yielded_from = .{ .generic = .{} };
         return 0;
     }
 
+    fn gKeyId(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        const key = try lua.toString(2);
+        const gop = try loader.batch_key_ids.getOrPut(loader.alloc, key);
+        if (!gop.found_existing) {
+            errdefer _ = loader.batch_key_ids.remove(key);
+            const owned = try loader.alloc.dupeZ(u8, key);
+            errdefer loader.alloc.free(owned);
+            gop.key_ptr.* = owned;
+            gop.value_ptr.* = @intCast(loader.batch_keys.items.len);
+            try loader.batch_keys.append(loader.alloc, owned);
+        }
+        lua_rt.pushUnsigned(lua, gop.value_ptr.*);
+        return 1;
+    }
+
+    fn gReadErrors(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        const failures = loader.read_failures.items;
+        lua.createTable(@intCast(failures.len), 0); // [+p]
+        for (failures, 1..) |f, i| {
+            lua.createTable(0, 5); // [+p]
+            _ = lua.pushString(@errorName(f.err)); // [+p]
+            lua.setField(-2, "err"); // pop
+            _ = lua.pushString(f.key); // [+p]
+            lua.setField(-2, "key"); // pop
+            lua_rt.pushUnsigned64(lua, f.handle); // [+p]
+            lua.setField(-2, "handle"); // pop
+            lua.pushNumber(@floatFromInt(f.offset)); // [+p]
+            lua.setField(-2, "offset"); // pop
+            lua_rt.pushUnsigned(lua, f.size); // [+p]
+            lua.setField(-2, "size"); // pop
+            lua.setIndexRaw(-2, @intCast(i)); // pop
+        }
+        for (failures) |f| loader.alloc.free(f.key);
+        loader.read_failures.clearRetainingCapacity();
+        return 1;
+    }
+
+    fn gCacheStats(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        const cache = loader.block_cache orelse {
+            lua.pushNil();
+            return 1;
+        };
+        const stats = cache.stats();
+        lua.createTable(0, 10); // [+p]
+        inline for (std.meta.fields(dataloader.BlockCache.Stats)) |field| {
+            lua.pushNumber(@floatFromInt(@field(stats, field.name))); // [+p]
+            lua.setField(-2, field.name); // pop
+        }
+        lua.pushNumber(stats.hitRate()); // [+p]
+        lua.setField(-2, "hit_rate"); // pop
+        return 1;
+    }
+
+    fn logCacheStats(self: *Self) void {
+        const cache = self.block_cache orelse return;
+        const s = cache.stats();
+        logger.info("Block cache: hit rate {d:.1}% ({} hits, {} misses), {} MiB cached, {} populated, {} evicted, {} corrupt, {} dropped", .{
+            s.hitRate() * 100,
+            s.hits,
+            s.misses,
+            s.bytes_cached >> 20,
+            s.populated,
+            s.evicted,
+            s.corrupt,
+            s.dropped,
+        });
+    }
+
+    fn gBatchFlush(lua: *Lua) !i32 {
+        const loader = try lua.toUserdata(Self, 1);
+        loader.u_yielded_from = .{ .batch_flush = .{} };
+        return 0;
+    }
+
     fn gAddEntryBytes(lua: *Lua) !i32 {
         const loader = try lua.toUserdata(Self, 1);
+        try loader.checkBatchFlushed();
         const key = try lua.toString(2);
         const bytes = try lua.toString(3);
 
@@ -352,6 +950,32 @@ pub const LuaDataLoader = struct {
         lua.protectedCall(.{ .results = 1 }) catch |err| return lua_rt.printLuaErr(lua, err);
     }
 
+    /// Like `wrapCoyield`, but `cfn` may finish synchronously by returning `true` followed by the result.
+    inline fn wrapMaybeCoyield(lua: *Lua, global_name: [:0]const u8, comptime cfn: fn (lua: *Lua) anyerror!i32) !void {
+        var buf: [1024]u8 = undefined;
+
+        lua.pushFunction(zlua.wrap(cfn)); // [+p]
+        lua.setGlobal(global_name); // pop fn
+
+        const fmt =
+            \\return function(self, ...)
+            \\    assert(
+            \\        type(self) == "table" and type(self.c_loader) == "userdata",
+            \\        "Invalid self, use `loader:method()` not `loader.method()`"
+            \\    );
+            \\    local done, result = {s}(self.c_loader, ...)
+            \\    if done then return result end
+            \\    return coroutine.yield()
+            \\end
+        ;
+
+        const wrapped = try std.fmt.bufPrintZ(&buf, fmt, .{global_name});
+
+        lua.loadString(wrapped) catch |err| return lua_rt.printLuaErr(lua, err);
+        errdefer lua.pop(1); // pop the function
+        lua.protectedCall(.{ .results = 1 }) catch |err| return lua_rt.printLuaErr(lua, err);
+    }
+
     inline fn wrapDirect(lua: *Lua, global_name: [:0]const u8, comptime cfn: fn (lua: *Lua) anyerror!i32) !void {
         var buf: [1024]u8 = undefined;
 
@@ -377,6 +1001,9 @@ pub const LuaDataLoader = struct {
 
     fn newInprogressRow(self: *Self) !void {
         if (self.in_progress_row) |r| {
+            self.rows_finished += 1;
+            r.seq = self.rows_finished;
+            if (self.tracer) |t| t.begin(.lua, .row, r.seq, "");
             self.queue.append(&r.node);
             self.queue_len += 1;
         }
@@ -394,6 +1021,181 @@ pub const LuaDataLoader = struct {
         }
     }
 
+    /// Reserve an entry in `row` whose data will be filled by a read_block,
+    /// straight into a staging buffer when `key` has a free one.
+    fn appendPendingEntry(self: *Self, row: *Row, key: []const u8, size: u32) !*Row.Entry {
+        const row_alloc = row.arena.allocator();
+        const key_z = try row_alloc.dupeZ(u8, key);
+        try row.entries.ensureUnusedCapacity(row_alloc, 1);
+        var entry: Row.Entry = .{ .key = key_z, .data = &.{} };
+        if (self.staging.get(key)) |pool| {
+            if (pool.claim(size)) |i| {
+                entry.data = pool.buffers[i][0..size];
+                entry.staged = .{ .pool = pool, .index = i };
+            }
+        }
+        // No pool, or all of its buffers are still held by rows in flight.
+        if (entry.staged == null) entry.data = try row_alloc.alignedAlloc(u8, .fromByteUnits(32), size);
+        row.entries.appendAssumeCapacity(entry);
+        return &row.entries.items[row.entries.items.len - 1];
+    }
+
+    pub const RegisterStagingError = error{ AlreadyStarted, AlreadyRegistered, TooManyBuffers, OutOfMemory };
+
+    /// Have reads for `key` land in `buffers`, which must stay valid and
+    /// untouched by the caller while a row holds them. Only before iteration.
+    pub fn registerStaging(self: *Self, key: []const u8, buffers: []const []u8) RegisterStagingError!void {
+        if (self.started or self.pump != null) return error.AlreadyStarted;
+        if (buffers.len == 0 or buffers.len > StagingPool.max_buffers) return error.TooManyBuffers;
+        const gop = try self.staging.getOrPut(self.alloc, key);
+        if (gop.found_existing) return error.AlreadyRegistered;
+        errdefer self.staging.removeByPtr(gop.key_ptr);
+        const key_owned = try self.alloc.dupe(u8, key);
+        errdefer self.alloc.free(key_owned);
+        const pool = try self.alloc.create(StagingPool);
+        errdefer self.alloc.destroy(pool);
+        const owned = try self.alloc.dupe([]u8, buffers);
+        pool.* = .{
+            .buffers = owned,
+            .free = .init(std.math.shr(u64, std.math.maxInt(u64), StagingPool.max_buffers - buffers.len)),
+        };
+        gop.key_ptr.* = key_owned;
+        gop.value_ptr.* = pool;
+    }
+
+    /// Add an entry viewing `size` bytes at `offset` of a mapped file; nothing is
+    /// read until the consumer touches it. A range past the end of the file
+    /// fails like a short read.
+    fn addMappedEntry(self: *Self, row: *Row, m: *MappedFile, file_handle: u64, key: []const u8, offset: u64, size: u32) !void {
+        const row_alloc = row.arena.allocator();
+        const key_z = try row_alloc.dupeZ(u8, key);
+        const in_bounds = offset <= m.memory.len and size <= m.memory.len - offset;
+        // Read-only mapping; nothing writes through row data.
+        const data: []u8 = if (in_bounds) @constCast(m.memory[@intCast(offset)..][0..size]) else &.{};
+        try row.entries.append(row_alloc, .{ .key = key_z, .data = data, .mapped = if (in_bounds) m else null });
+        row.num_fullfilled += 1;
+        if (!in_bounds) {
+            return self.handleReadError(.{
+                .row = row,
+                .entry = @intCast(row.entries.items.len - 1),
+                .file_handle = file_handle,
+                .offset = offset,
+                .size = size,
+            }, dataloader.LoaderError.ReadError);
+        }
+        m.retain();
+        m.prefetch(offset, size);
+    }
+
+    /// Returns false if the request ring is full; retry on the next tick.
+    fn trySendRead(self: *Self, row: *Row, file_handle: u64, offset: u64, entry: *Row.Entry) !bool {
+        const rid = self.loader.trySend(.{
+            .read_block = .{
+                .file = @bitCast(file_handle),
+                .base = offset,
+                .result_buffer = entry.data,
+            },
+        }) orelse return false;
+        try self.pending_reads.put(self.alloc, rid, .{
+            .row = row,
+            .entry = @intCast((@intFromPtr(entry) - @intFromPtr(row.entries.items.ptr)) / @sizeOf(Row.Entry)),
+            .file_handle = file_handle,
+            .offset = offset,
+            .size = @intCast(entry.data.len),
+        });
+        return true;
+    }
+
+    /// Apply `on_read_error` to a failed read_block.
+    fn handleReadError(self: *Self, read: PendingRead, err: anyerror) !void {
+        const entry = &read.row.entries.items[read.entry];
+        logger.warn("Read of {s} failed: {} (handle = {}, offset = {}, size = {})", .{ entry.key, err, read.file_handle, read.offset, read.size });
+        switch (self.on_read_error) {
+            .fail => return err,
+            .skip_row => read.row.skip = true,
+            .drop_entry => entry.dropped = true,
+        }
+
+        if (self.read_failures.items.len >= max_read_failures) return;
+        const key = try self.alloc.dupe(u8, entry.key);
+        errdefer self.alloc.free(key);
+        try self.read_failures.append(self.alloc, .{
+            .err = err,
+            .key = key,
+            .handle = read.file_handle,
+            .offset = read.offset,
+            .size = read.size,
+        });
+    }
+
+    /// Unlink the oldest finished row, or any finished row with `out_of_order`.
+    /// Rows skipped after a failed read go straight back to the free list.
+    fn popFinishedRow(self: *Self) ?*Row {
+        var node = self.queue.first;
+        while (node) |n| {
+            node = n.next;
+            const row: *Row = @fieldParentPtr("node", n);
+
+            logger.debug("Q len: {}, row: fullfilled = {}, entries = {}", .{ self.queue_len, row.num_fullfilled, row.entries.items.len });
+
+            if (row.num_fullfilled > row.entries.items.len) {
+                @panic("Row has more fullfilled entries than total entries");
+            }
+            if (row.num_fullfilled < row.entries.items.len) {
+                if (self.out_of_order) continue;
+                return null;
+            }
+
+            self.queue.remove(n);
+            self.queue_len -= 1;
+            if (row.skip) {
+                if (self.tracer) |t| t.end(.lua, .row, row.seq);
+                row.releaseRefs();
+                self.row_buf_mutex.lockUncancelable(self.io);
+                defer self.row_buf_mutex.unlock(self.io);
+                self.free_list.append(n);
+                continue;
+            }
+            return row;
+        }
+        return null;
+    }
+
+    /// Replay the FFI batch from `state.pos`. Returns false when the request
+    /// ring or the row queue fills up; the caller retries on the next tick from
+    /// the same spot.
+    fn drainBatch(self: *Self, state: anytype) !bool {
+        const batch = &self.ffi_batch;
+        while (state.pos < batch.len) {
+            const e = batch.entries[state.pos];
+            if (e.key_id == batch_finish_row) {
+                if (self.queue_len >= self.queue_size_rows) return false;
+                try self.newInprogressRow();
+                state.pos += 1;
+                continue;
+            }
+
+            const row = self.in_progress_row orelse @panic("No in-progress row while flushing batch");
+            if (state.entry == null) {
+                if (e.key_id >= self.batch_keys.items.len) {
+                    logger.err("Batch entry {} has unknown key id {}", .{ state.pos, e.key_id });
+                    return error.InvalidBatchKey;
+                }
+                if (self.mapped_files.get(e.handle)) |m| {
+                    try self.addMappedEntry(row, m, e.handle, self.batch_keys.items[e.key_id], e.offset, e.size);
+                    state.pos += 1;
+                    continue;
+                }
+                state.entry = try self.appendPendingEntry(row, self.batch_keys.items[e.key_id], e.size);
+            }
+            if (!try self.trySendRead(row, e.handle, e.offset, state.entry.?)) return false;
+            state.entry = null;
+            state.pos += 1;
+        }
+        batch.len = 0;
+        return true;
+    }
+
     /// Pops the stack top and returns a registry reference to it.
     fn luaPopAndRef(self: *Self) !i32 {
         if (zlua.lang == .luau) {
@@ -424,13 +1226,15 @@ pub const LuaDataLoader = struct {
 
     /// Resumes the generator coroutine, or short-circuits if it is completed or has an unresolved yield.
     fn resumeGenerator(self: *Self) !zlua.ResumeStatus {
-        if (self.u_completed) {
-            return .ok;
-        }
+        // A completed generator can still have its leftover batch to drain.
         if (self.u_yielded_from != null) {
             return .yield;
         }
+        if (self.u_completed) {
+            return .ok;
+        }
 
+        const trace_start = if (self.tracer) |t| t.now() else 0;
         var status: zlua.ResumeStatus = .ok;
         if (zlua.lang == .lua54) {
             var n_results: i32 = 0;
@@ -441,11 +1245,20 @@ pub const LuaDataLoader = struct {
             status = self.lua.resumeThread(null, self.u_resume_nargs) catch |err| return self.printLuaErr(err);
         }
         self.u_resume_nargs = 0;
+        if (self.tracer) |t| {
+            const detail = if (status == .ok) "done" else if (self.u_yielded_from) |y| @tagName(y) else "yield";
+            t.span(.lua, .lua_resume, trace_start, detail);
+        }
 
         switch (status) {
             .ok => {
                 logger.info("Generator completed", .{});
                 self.u_completed = true;
+                // Entries the script never flushed still belong to its rows.
+                if (self.ffi_batch.len != 0) {
+                    self.u_yielded_from = .{ .batch_flush = .{} };
+                    return .yield;
+                }
                 return .ok;
             },
             .yield => return .yield,
@@ -453,6 +1266,7 @@ pub const LuaDataLoader = struct {
     }
 
     pub fn nextRow(self: *Self) !?*LoadedRow {
+        self.started = true;
         var wait_time_ns: u64 = 1_024; // ~1us
         const wait_time_cap: u64 = 1 << 24; // ~16ms
         while (true) {
@@ -466,6 +1280,11 @@ pub const LuaDataLoader = struct {
                 wait_time_ns = @min(wait_time_ns * 2, wait_time_cap);
             }
 
+            while (self.pending_closes.getLastOrNull()) |h| {
+                if (self.loader.trySend(.{ .close_file = @bitCast(h) }) == null) break;
+                _ = self.pending_closes.pop();
+            }
+
             if (self.u_yielded_from != null) {
                 switch (self.u_yielded_from.?) {
                     .open_file => |*f| {
@@ -481,112 +1300,130 @@ pub const LuaDataLoader = struct {
                             self.u_yielded_from = null;
                         }
                     },
+                    .configure => |*c| {
+                        if (c.http) |config| {
+                            if (self.loader.trySend(.{ .configure_http = config })) |_| c.http = null;
+                        } else if (c.reads) |policy| {
+                            if (self.loader.trySend(.{ .configure_reads = policy })) |_| c.reads = null;
+                        } else if (c.cache) |cache| {
+                            if (self.loader.trySend(.{ .configure_cache = cache })) |_| c.cache = null;
+                        } else if (c.mmap) |enabled| {
+                            if (self.loader.trySend(.{ .configure_mmap = enabled })) |_| c.mmap = null;
+                        }
+                        if (c.http == null and c.reads == null and c.cache == null and c.mmap == null) {
+                            self.u_yielded_from = null;
+                        }
+                    },
                     .add_entry => |*e| {
                         const row = self.in_progress_row orelse @panic("No in-progress row while trying to .add_entry");
                         if (e.entry == null) {
-                            const row_alloc = row.arena.allocator();
-                            const key = try row_alloc.dupeZ(u8, e.key);
-                            e.key = key;
-                            const row_data = try row_alloc.alignedAlloc(u8, .fromByteUnits(32), e.size);
-                            try row.entries.append(row_alloc, .{
-                                .key = key,
-                                .data = row_data,
-                            });
-                            e.entry = &row.entries.items[row.entries.items.len - 1];
+                            e.entry = try self.appendPendingEntry(row, e.key, e.size);
+                            e.key = e.entry.?.key;
+                        }
+                        if (try self.trySendRead(row, e.file_handle, e.offset, e.entry.?)) {
+                            self.u_yielded_from = null;
                         }
-                        if (self.loader.trySend(.{
-                            .read_block = .{
-                                .file = @bitCast(e.file_handle),
-                                .base = e.offset,
-                                .result_buffer = (e.entry orelse @panic("Entry is null in .add_entry")).data, //
-                            },
-                        })) |rid| {
+                    },
+                    .batch_flush => |*b| {
+                        if (try self.drainBatch(b)) {
                             self.u_yielded_from = null;
-                            try self.load_rid_to_row.put(self.alloc, rid, row);
                         }
                     },
+                    .peek => |*p| {
+                        if (p.sent_rid == 0) {
+                            if (self.loader.trySend(.{ .read_block = .{
+                                .file = @bitCast(p.file_handle),
+                                .base = p.offset,
+                                .result_buffer = p.buf,
+                            } })) |rid| p.sent_rid = rid;
+                        }
+                        // Cleared in the response handler once the bytes arrive.
+                    },
                     .generic => self.u_yielded_from = null,
                 }
             }
 
             while (self.loader.tryRecv()) |resp| {
+                if (self.tracer) |t| t.instant(.lua, .response, resp.request_id, "");
+                if (self.pending_reads.fetchSwapRemove(resp.request_id)) |kv| {
+                    kv.value.row.num_fullfilled += 1;
+                    _ = resp.payload catch |err| try self.handleReadError(kv.value, err);
+                    continue;
+                }
+                if (self.u_yielded_from != null and self.u_yielded_from.? == .peek and self.u_yielded_from.?.peek.sent_rid == resp.request_id) {
+                    self.resumePeeked(resp.payload);
+                    continue;
+                }
+
                 // FIXME: make some of these errors recoverable
                 const payload = try resp.payload;
 
                 switch (payload) {
-                    .open_file => |f| {
-                        if (self.u_yielded_from == null or self.u_yielded_from.? != .open_file) {
-                            return error.UnexpectedOpenFileResponse;
-                        }
-                        lua_rt.pushUnsigned64(self.lua, @bitCast(f));
-                        self.u_resume_nargs = 1;
-                        self.u_yielded_from = null;
-                    },
-                    .read_block => {
-                        const kv = self.load_rid_to_row.fetchSwapRemove(resp.request_id) orelse @panic("read_block rid not found in map");
-                        kv.value.num_fullfilled += 1;
+                    .open_file => |f| try self.resumeOpened(f),
+                    .open_mapped => |o| {
+                        self.mapped_files.put(self.alloc, @bitCast(o.file), o.mapped) catch |err| {
+                            o.mapped.release();
+                            return err;
+                        };
+                        try self.resumeOpened(o.file);
                     },
+                    .read_block => @panic("read_block rid not found in map"),
                 }
             }
 
-            if (self.queue.first) |f_node| {
-                const first: *Row = @fieldParentPtr("node", f_node);
-
-                logger.debug("Q len: {}, first: fullfilled = {}, entries = {}", .{ self.queue_len, first.num_fullfilled, first.entries.items.len });
-
-                if (first.num_fullfilled == first.entries.items.len) {
-                    const node = self.queue.popFirst() orelse unreachable;
-                    self.queue_len -= 1;
-
-                    {
-                        self.row_buf_mutex.lockUncancelable(self.io);
-                        defer self.row_buf_mutex.unlock(self.io);
-                        self.num_floating_rows += 1;
-                        if (self.num_floating_rows > Self.max_floating_rows) {
-                            std.debug.panic("Too many floating (owned by client) rows > max: {}", .{Self.max_floating_rows});
-                        }
-                    }
-                    const row: *Row = @fieldParentPtr("node", node);
-                    const alloc = row.arena.allocator();
-                    const entries = row.entries.items;
-                    var bytes: u64 = 0;
-                    row.ext_row = .{
-                        .keys = @ptrCast(try alloc.alloc(c_u8ptr, entries.len)),
-                        .data = @ptrCast(try alloc.alloc(c_u8ptr, entries.len)),
-                        .sizes = @ptrCast(try alloc.alloc(u64, entries.len)),
-                        .num_keys = @intCast(entries.len),
-                    };
-                    for (entries, 0..) |e, i| {
-                        row.ext_row.keys[i] = @ptrCast(e.key);
-                        row.ext_row.data[i] = @ptrCast(e.data);
-                        row.ext_row.sizes[i] = @intCast(e.data.len);
-                        bytes += e.data.len;
+            if (self.popFinishedRow()) |row| {
+                {
+                    self.row_buf_mutex.lockUncancelable(self.io);
+                    defer self.row_buf_mutex.unlock(self.io);
+                    self.num_floating_rows += 1;
+                    if (self.num_floating_rows > Self.max_floating_rows) {
+                        std.debug.panic("Too many floating (owned by client) rows > max: {}", .{Self.max_floating_rows});
                     }
+                }
+                const alloc = row.arena.allocator();
+                const entries = row.entries.items;
+                var num_keys: usize = 0;
+                for (entries) |e| num_keys += @intFromBool(!e.dropped);
+                var bytes: u64 = 0;
+                row.ext_row = .{
+                    .keys = @ptrCast(try alloc.alloc(c_u8ptr, num_keys)),
+                    .data = @ptrCast(try alloc.alloc(c_u8ptr, num_keys)),
+                    .sizes = @ptrCast(try alloc.alloc(u64, num_keys)),
+                    .num_keys = @intCast(num_keys),
+                };
+                var i: usize = 0;
+                for (entries) |e| {
+                    if (e.dropped) continue;
+                    row.ext_row.keys[i] = @ptrCast(e.key);
+                    row.ext_row.data[i] = @ptrCast(e.data);
+                    row.ext_row.sizes[i] = @intCast(e.data.len);
+                    bytes += e.data.len;
+                    i += 1;
+                }
 
-                    const now = std.Io.Clock.Timestamp.now(self.io, .awake);
-                    const delta_ns: i96 = self.last_instant.durationTo(now).raw.nanoseconds;
-                    self.last_instant = now;
-                    const mbps = @as(f64, @floatFromInt(bytes)) * 1e-6 / (@as(f64, @floatFromInt(delta_ns)) * 1e-9);
+                const now = std.Io.Clock.Timestamp.now(self.io, .awake);
+                const delta_ns: i96 = self.last_instant.durationTo(now).raw.nanoseconds;
+                self.last_instant = now;
+                const mbps = @as(f64, @floatFromInt(bytes)) * 1e-6 / (@as(f64, @floatFromInt(delta_ns)) * 1e-9);
 
-                    self.samples_count += 1;
-                    const smoothing_samples = @min(self.samples_count, 100);
-                    const alpha = 1.0 / @as(f64, @floatFromInt(smoothing_samples));
-                    self.mbps_smoothed = alpha * mbps + (1.0 - alpha) * self.mbps_smoothed;
+                self.samples_count += 1;
+                const smoothing_samples = @min(self.samples_count, 100);
+                const alpha = 1.0 / @as(f64, @floatFromInt(smoothing_samples));
+                self.mbps_smoothed = alpha * mbps + (1.0 - alpha) * self.mbps_smoothed;
 
-                    self.mbps_period_max = @max(self.mbps_period_max, mbps);
+                self.mbps_period_max = @max(self.mbps_period_max, mbps);
 
-                    const since_last_log_ns: i96 = self.last_log_instant.durationTo(now).raw.nanoseconds;
-                    if (since_last_log_ns >= 60 * std.time.ns_per_s) {
-                        logger.info("{d:.1} MBytes/s (Period max: {d:.1})", .{ self.mbps_smoothed, self.mbps_period_max });
-                        self.last_log_instant = now;
-                        self.mbps_period_max = 0.0;
-                    }
-
-                    logger.debug("Returning row @ {}", .{&row.ext_row});
-                    return &row.ext_row;
-                } else if (first.num_fullfilled > first.entries.items.len) {
-                    @panic("Row has more fullfilled entries than total entries");
+                const since_last_log_ns: i96 = self.last_log_instant.durationTo(now).raw.nanoseconds;
+                if (since_last_log_ns >= 60 * std.time.ns_per_s) {
+                    logger.info("{d:.1} MBytes/s (Period max: {d:.1})", .{ self.mbps_smoothed, self.mbps_period_max });
+                    self.logCacheStats();
+                    self.last_log_instant = now;
+                    self.mbps_period_max = 0.0;
                 }
+
+                if (self.tracer) |t| t.instant(.lua, .row_ready, row.seq, "");
+                logger.debug("Returning row @ {}", .{&row.ext_row});
+                return &row.ext_row;
             }
 
             if (wait_time_ns < 10_000) {
@@ -596,8 +1433,45 @@ pub const LuaDataLoader = struct {
         }
     }
 
+    /// Hand a newly opened file back to the script waiting in `open_file`.
+    fn resumeOpened(self: *Self, f: dataloader.FileHandle) !void {
+        if (self.u_yielded_from == null or self.u_yielded_from.? != .open_file) {
+            return error.UnexpectedOpenFileResponse;
+        }
+        if (self.max_open_files > 0) {
+            const path = try self.alloc.dupe(u8, self.u_yielded_from.?.open_file.file);
+            errdefer self.alloc.free(path);
+            try self.live_files.put(self.alloc, @bitCast(f), path);
+        }
+        lua_rt.pushUnsigned64(self.lua, @bitCast(f));
+        self.u_resume_nargs = 1;
+        self.u_yielded_from = null;
+    }
+
+    fn resumePeeked(self: *Self, payload: dataloader.LoaderError!dataloader.ResponsePayload) void {
+        const p = self.u_yielded_from.?.peek;
+        defer self.alloc.free(p.buf);
+        self.u_yielded_from = null;
+        if (payload) |_| {
+            _ = self.lua.pushString(p.buf);
+        } else |err| {
+            logger.warn("Peek failed: {} (handle = {}, offset = {}, size = {})", .{ err, p.file_handle, p.offset, p.buf.len });
+            self.lua.pushNil();
+        }
+        self.u_resume_nargs = 1;
+    }
+
+    /// Trace a row handed to a consumer.
+    fn traceHanded(self: *Self, c_row: *LoadedRow) void {
+        const t = self.tracer orelse return;
+        const row: *Row = @fieldParentPtr("ext_row", c_row);
+        t.instant(.consumer, .row_handed, row.seq, "");
+    }
+
     pub fn reclaimRow(self: *Self, c_row: *LoadedRow) void {
         const row: *Row = @fieldParentPtr("ext_row", c_row);
+        if (self.tracer) |t| t.end(.consumer, .row, row.seq);
+        row.releaseRefs();
 
         self.row_buf_mutex.lockUncancelable(self.io);
         defer self.row_buf_mutex.unlock(self.io);
@@ -610,21 +1484,42 @@ pub const LuaDataLoader = struct {
     fn loaderModuleLoader(lua: *Lua) !i32 {
         const self = try lua.toUserdata(Self, Lua.upvalueIndex(1));
 
-        lua.createTable(0, 5); // [+p] module table
+        lua.createTable(0, 13); // [+p] module table
 
         lua.pushLightUserdata(self); // [+p]
         lua.setField(-2, "c_loader"); // pop
 
-        try Self.wrapCoyield(lua, "loader_open_file", Self.gOpenFile); // [+p]
+        try Self.wrapMaybeCoyield(lua, "loader_open_file", Self.gOpenFile); // [+p]
         lua.setField(-2, "open_file"); // pop
-        try Self.wrapCoyield(lua, "loader_close_file", Self.gCloseFile); // [+p]
+        try Self.wrapMaybeCoyield(lua, "loader_close_file", Self.gCloseFile); // [+p]
         lua.setField(-2, "close_file"); // pop
-        try Self.wrapCoyield(lua, "loader_add_entry", Self.gAddEntry); // [+p]
+        try Self.wrapMaybeCoyield(lua, "loader_add_entry", Self.gAddEntry); // [+p]
         lua.setField(-2, "add_entry"); // pop
+        try Self.wrapMaybeCoyield(lua, "loader_add_entry_range", Self.gAddEntryRange); // [+p]
+        lua.setField(-2, "add_entry_range"); // pop
+        try Self.wrapMaybeCoyield(lua, "loader_peek", Self.gPeek); // [+p]
+        lua.setField(-2, "peek"); // pop
         try Self.wrapDirect(lua, "loader_add_entry_bytes", Self.gAddEntryBytes); // [+p]
         lua.setField(-2, "add_entry_bytes"); // pop
         try Self.wrapCoyield(lua, "loader_finish_row", Self.gFinishRow); // [+p]
         lua.setField(-2, "finish_row"); // pop
+        try Self.wrapCoyield(lua, "loader_configure", Self.gConfigure); // [+p]
+        lua.setField(-2, "configure"); // pop
+        try Self.wrapDirect(lua, "loader_key_id", Self.gKeyId); // [+p]
+        lua.setField(-2, "key_id"); // pop
+        try Self.wrapCoyield(lua, "loader_batch_flush", Self.gBatchFlush); // [+p]
+        lua.setField(-2, "batch_flush"); // pop
+        try Self.wrapDirect(lua, "loader_read_errors", Self.gReadErrors); // [+p]
+        lua.setField(-2, "read_errors"); // pop
+        try Self.wrapDirect(lua, "loader_cache_stats", Self.gCacheStats); // [+p]
+        lua.setField(-2, "cache_stats"); // pop
+
+        // batch_lua_src(module, batch_ptr, cap) installs module:batch().
+        lua.loadString(batch_lua_src) catch |err| return lua_rt.printLuaErr(lua, err); // [+p]
+        lua.pushValue(-2); // [+p] module table
+        lua.pushLightUserdata(&self.ffi_batch); // [+p]
+        lua_rt.pushUnsigned(lua, batch_capacity); // [+p]
+        lua.protectedCall(.{ .args = 3 }) catch |err| return lua_rt.printLuaErr(lua, err); // pop 4
 
         return 1;
     }
@@ -641,17 +1536,46 @@ pub const LuaDataLoader = struct {
         self.lua.pop(2); // pop preload, package
     }
 
-    fn initLua(self: *Self, spec: LuaLoaderSpec) !void {
-        self.lua.openLibs();
-        // `self` is heap-allocated, so `&self.rt` is a stable pointer for the
-        // Lua state's lifetime.
-        self.rt.init(self.lua, self.io) catch |err| return self.printLuaErr(err);
+    /// Runtime identity for the bytecode cache key; bytecode is only portable within one runtime build.
+    fn runtimeVersion(self: *Self, buf: []u8) []const u8 {
+        var w = std.Io.Writer.fixed(buf);
+        w.print("{s}/{d}", .{ @tagName(zlua.lang), @bitSizeOf(usize) }) catch {};
+        for ([_][:0]const u8{ "_VERSION", "jit" }) |name| {
+            const t = self.lua.getGlobal(name); // [+p]
+            if (t == .table) _ = self.lua.getField(-1, "version"); // [+p]
+            if (self.lua.isString(-1)) w.print("/{s}", .{self.lua.toString(-1) catch ""}) catch {};
+            self.lua.pop(if (t == .table) 2 else 1);
+        }
+        return w.buffered();
+    }
 
-        self.registerLoaderModule() catch |err| return self.printLuaErr(err);
+    /// Push the compiled spec chunk, reusing cached bytecode when possible. Returns true on a cache hit.
+    fn loadSpecChunk(self: *Self, src: [:0]const u8) !bool {
+        var version_buf: [128]u8 = undefined;
+        const parts: []const []const u8 = &.{ self.runtimeVersion(&version_buf), src };
+        const name = script_cache.key(parts) ++ ".bc".*;
+
+        // Bytecode runs unverified by the VM, so only reuse it from a directory no other user can write.
+        const code_dir: ?[]const u8 = if (self.cache_dir) |dir| blk: {
+            if (script_cache.trusted(self.io, dir)) break :blk dir;
+            logger.debug("Cache dir {s} is writable by other users; not caching bytecode", .{dir});
+            break :blk null;
+        } else null;
+
+        if (code_dir) |dir| {
+            if (script_cache.loadSealed(self.alloc, self.io, dir, &name, parts)) |bc| {
+                defer self.alloc.free(bc);
+                if (self.loadBytecode(bc)) {
+                    return true;
+                } else |_| {
+                    self.lua.pop(1); // pop error
+                    logger.debug("Discarding stale bytecode cache entry {s}", .{&name});
+                }
+            }
+        }
 
         if (zlua.lang == .luau) {
             const alloc = self.lua.allocator();
-            const src: [:0]const u8 = std.mem.span(spec.src);
             const bc = zlua.compile(alloc, src, .{}) catch |err| {
                 logger.err("Error compiling Lua source: {}", .{err});
                 return err;
@@ -659,13 +1583,59 @@ pub const LuaDataLoader = struct {
             defer alloc.free(bc);
 
             self.lua.loadBytecode("loader_spec_src", bc) catch |err| return self.printLuaErr(err);
+            if (code_dir) |dir| script_cache.storeSealed(self.alloc, self.io, dir, &name, parts, bc);
         } else {
-            const src: [:0]const u8 = std.mem.span(spec.src);
             self.lua.loadString(src) catch |err| return self.printLuaErr(err);
+            if (code_dir) |dir| {
+                // string.dump keeps debug info, so cached chunks still give line numbers.
+                _ = self.lua.getGlobal("string"); // [+p]
+                _ = self.lua.getField(-1, "dump"); // [+p]
+                self.lua.pushValue(-3); // [+p] chunk
+                if (self.lua.protectedCall(.{ .args = 1, .results = 1 })) {
+                    script_cache.storeSealed(self.alloc, self.io, dir, &name, parts, try self.lua.toString(-1));
+                } else |_| {
+                    logger.debug("string.dump failed; not caching bytecode", .{});
+                }
+                self.lua.pop(2); // pop dump result, string
+            }
+        }
+        return false;
+    }
+
+    /// Push the function for `bc`, or leave an error message on the stack and fail.
+    fn loadBytecode(self: *Self, bc: []const u8) !void {
+        if (zlua.lang == .luau) {
+            return self.lua.loadBytecode("loader_spec_src", bc);
+        }
+        _ = self.lua.getGlobal("load"); // [+p]
+        _ = self.lua.pushString(bc); // [+p]
+        _ = self.lua.pushString("=loader_spec_src"); // [+p]
+        _ = self.lua.pushString("b"); // [+p]
+        try self.lua.protectedCall(.{ .args = 3, .results = 2 }); // pop 4, push fn|nil, err
+        if (self.lua.isFunction(-2)) {
+            self.lua.pop(1); // pop nil error
+            return;
         }
+        self.lua.remove(-2); // leave the error message
+        return error.LuaError;
+    }
+
+    fn initLua(self: *Self, spec: LuaLoaderSpec, times: *StartupTimes) !void {
+        var t = std.Io.Clock.Timestamp.now(self.io, .awake);
+        self.lua.openLibs();
+        // `self` is heap-allocated, so `&self.rt` is a stable pointer for the
+        // Lua state's lifetime.
+        self.rt.init(self.lua, self.io, self.cache_dir) catch |err| return self.printLuaErr(err);
+
+        self.registerLoaderModule() catch |err| return self.printLuaErr(err);
+        times.modules_ns = lap(self.io, &t);
+
+        times.bytecode_cache_hit = try self.loadSpecChunk(std.mem.span(spec.src));
+        times.compile_ns = lap(self.io, &t);
 
         // Loader script must return a table of { init_ctx, row_generator }.
         self.lua.protectedCall(.{ .results = 1 }) catch |err| return self.printLuaErr(err);
+        times.chunk_ns = lap(self.io, &t);
 
         const table = self.lua.getTop();
         if (!self.lua.isTable(table)) {
@@ -696,6 +1666,7 @@ pub const LuaDataLoader = struct {
 
         self.lua.protectedCall(.{ .args = 3, .results = 1 }) catch |err| return self.printLuaErr(err);
         self.u_ctx = self.luaPopAndRef() catch |err| return self.printLuaErr(err);
+        times.init_ctx_ns = lap(self.io, &t);
 
         // Prime the generator coroutine; first resume calls row_generator(u_ctx).
         _ = self.lua.getIndexRaw(zlua.registry_index, self.u_loader_fn.row_generator); // [+p]
@@ -729,13 +1700,31 @@ pub const LuaDataLoader = struct {
         self.row_buf_mutex = .init;
         self.free_list = .{};
         self.num_floating_rows = 0;
-        self.load_rid_to_row = try std.AutoArrayHashMapUnmanaged(u64, *Row).init(alloc, &.{}, &.{});
+        self.pending_reads = try std.AutoArrayHashMapUnmanaged(u64, PendingRead).init(alloc, &.{}, &.{});
+        self.out_of_order = false;
+        self.on_read_error = .fail;
+        self.read_policy = .{};
+        self.block_cache = null;
+        self.mapped_files = .empty;
+        self.read_failures = .empty;
         self.last_instant = now;
         self.last_log_instant = now;
         self.mbps_smoothed = 0.0;
         self.mbps_period_max = 0.0;
         self.samples_count = 0;
-        errdefer self.load_rid_to_row.deinit(self.alloc);
+        self.ffi_batch = .{};
+        self.batch_keys = .empty;
+        self.batch_key_ids = .empty;
+        self.max_open_files = 0;
+        self.live_files = .empty;
+        self.idle_files = .empty;
+        self.idle_lru = .{};
+        self.pending_closes = .empty;
+        self.pump = null;
+        self.cache_dir = null;
+        self.tracer = null;
+        self.rows_finished = 0;
+        errdefer self.pending_reads.deinit(self.alloc);
 
         try self.newInprogressRow();
         errdefer {
@@ -745,9 +1734,28 @@ pub const LuaDataLoader = struct {
             self.in_progress_row = null;
         }
 
+        var times: StartupTimes = .{};
+        var t = now;
+
+        if (spec.trace or traceFromEnv()) {
+            const tracer = try alloc.create(Tracer);
+            errdefer alloc.destroy(tracer);
+            tracer.* = try .init(alloc, self.io, Tracer.default_events_per_track);
+            self.tracer = tracer;
+        }
+        errdefer if (self.tracer) |tracer| {
+            tracer.deinit(alloc);
+            alloc.destroy(tracer);
+        };
+
         try self.loader.initInPlace(alloc);
         errdefer self.loader.deinit();
+        self.loader.tracer = self.tracer;
         try self.loader.start(self.io);
+        times.io_thread_ns = lap(self.io, &t);
+
+        self.cache_dir = script_cache.dir(alloc, self.io);
+        errdefer if (self.cache_dir) |d| alloc.free(d);
 
         const lua_alloc = if (needs_lua_low_mmap) blk: {
             self.lua_gpa = .init;
@@ -756,15 +1764,64 @@ pub const LuaDataLoader = struct {
         } else alloc;
         self.lua = try Lua.init(lua_alloc);
         errdefer self.lua.deinit();
-        try self.initLua(spec);
+        times.lua_state_ns = lap(self.io, &t);
+        try self.initLua(spec, &times);
 
+        if (spec.debug) {
+            logger.info("Startup: {f}", .{times});
+        } else {
+            logger.debug("Startup: {f}", .{times});
+        }
         return self;
     }
 
     pub fn deinit(self: *Self) void {
-        self.load_rid_to_row.deinit(self.alloc);
+        if (self.pump) |p| {
+            p.stop();
+            self.alloc.destroy(p);
+            self.pump = null;
+        }
+        self.pending_reads.deinit(self.alloc);
+        for (self.read_failures.items) |f| self.alloc.free(f.key);
+        self.read_failures.deinit(self.alloc);
+        for (self.batch_keys.items) |k| self.alloc.free(k);
+        self.batch_keys.deinit(self.alloc);
+        self.batch_key_ids.deinit(self.alloc);
+        var live_it = self.live_files.valueIterator();
+        while (live_it.next()) |path| self.alloc.free(path.*);
+        self.live_files.deinit(self.alloc);
+        while (self.idle_lru.popFirst()) |node| {
+            const idle: *IdleFile = @fieldParentPtr("node", node);
+            self.alloc.free(idle.path);
+            self.alloc.destroy(idle);
+        }
+        self.idle_files.deinit(self.alloc);
+        self.pending_closes.deinit(self.alloc);
+        var mapped_it = self.mapped_files.valueIterator();
+        while (mapped_it.next()) |m| m.*.release();
+        self.mapped_files.deinit(self.alloc);
         self.loader.deinit();
+        // Opens answered after the last `nextRow` still carry a reference.
+        while (self.loader.tryRecv()) |resp| {
+            const payload = resp.payload catch continue;
+            if (payload == .open_mapped) payload.open_mapped.mapped.release();
+        }
+        // The IO thread is joined, so nothing still reads into a peek buffer.
+        if (self.u_yielded_from) |y| {
+            if (y == .peek) self.alloc.free(y.peek.buf);
+        }
+        // After the IO thread is joined; it borrows the cache.
+        if (self.block_cache) |c| {
+            self.logCacheStats();
+            c.deinit();
+            self.alloc.destroy(c);
+        }
+        if (self.tracer) |t| {
+            t.deinit(self.alloc);
+            self.alloc.destroy(t);
+        }
         self.lua.deinit();
+        if (self.cache_dir) |d| self.alloc.free(d);
         // Tear down the low-mmap GPA *after* lua.deinit has freed all
         // remaining GC objects back through it.
         if (needs_lua_low_mmap) _ = self.lua_gpa.deinit();
@@ -784,11 +1841,155 @@ pub const LuaDataLoader = struct {
             r.deinit();
             self.alloc.destroy(r);
         }
+        // Rows hand their staging buffers back on deinit, so pools go last.
+        var staging_it = self.staging.iterator();
+        while (staging_it.next()) |kv| {
+            self.alloc.free(kv.key_ptr.*);
+            self.alloc.free(kv.value_ptr.*.buffers);
+            self.alloc.destroy(kv.value_ptr.*);
+        }
+        self.staging.deinit(self.alloc);
 
         self.threaded.deinit();
     }
 };
 
+/// Runs `nextRow` on a background thread so an event loop can wait on a file
+/// descriptor instead of parking a thread per loader.
+///
+/// The read end of a pipe is readable whenever rows are queued or the
+/// generator has ended. The pump writes a byte when the queue turns non-empty,
+/// and `tryNext` drains the pipe when it finds the queue empty. Both happen
+/// under `mutex`, so a wakeup can't be lost between the check and the drain.
+const AsyncPump = struct {
+    pub const Status = enum(c_int) { row = 0, pending = 1, done = 2, failed = 3 };
+
+    const capacity = 4;
+
+    loader: *LuaDataLoader,
+    thread: std.Thread = undefined,
+    mutex: std.Io.Mutex = .init,
+    // Producer waits on `cond` for space; blocking consumers wait on `ready_cond` for rows.
+    cond: std.Io.Condition = .init,
+    ready_cond: std.Io.Condition = .init,
+    ready: std.DoublyLinkedList = .{},
+    ready_len: usize = 0,
+    state: Status = .pending,
+    stopping: bool = false,
+    fds: [2]std.c.fd_t = .{ -1, -1 },
+
+    fn start(self: *AsyncPump) !void {
+        if (std.c.pipe(&self.fds) != 0) return error.PipeFailed;
+        errdefer self.closeFds();
+        const nonblock: u32 = @bitCast(std.c.O{ .NONBLOCK = true });
+        const fl = std.c.fcntl(self.fds[0], std.c.F.GETFL);
+        if (fl < 0 or std.c.fcntl(self.fds[0], std.c.F.SETFL, fl | @as(c_int, @bitCast(nonblock))) < 0) return error.PipeFailed;
+
+        self.thread = try std.Thread.spawn(.{}, AsyncPump.run, .{self});
+        self.thread.setName(self.loader.io, "dataloader_pump") catch {};
+    }
+
+    fn closeFds(self: *AsyncPump) void {
+        for (&self.fds) |*fd| {
+            if (fd.* >= 0) _ = std.c.close(fd.*);
+            fd.* = -1;
+        }
+    }
+
+    /// Stop producing, join, and hand queued rows back to the loader.
+    fn stop(self: *AsyncPump) void {
+        const io = self.loader.io;
+        self.mutex.lockUncancelable(io);
+        self.stopping = true;
+        self.cond.broadcast(io);
+        self.mutex.unlock(io);
+        self.thread.join();
+
+        while (self.ready.popFirst()) |node| {
+            const row: *Row = @fieldParentPtr("node", node);
+            self.loader.reclaimRow(&row.ext_row);
+        }
+        self.ready_len = 0;
+        self.closeFds();
+    }
+
+    fn notify(self: *AsyncPump) void {
+        const b = [1]u8{1};
+        _ = std.c.write(self.fds[1], &b, 1);
+    }
+
+    fn run(self: *AsyncPump) void {
+        const io = self.loader.io;
+        while (true) {
+            self.mutex.lockUncancelable(io);
+            while (self.ready_len >= capacity and !self.stopping) {
+                self.cond.waitUncancelable(io, &self.mutex);
+            }
+            const stopping = self.stopping;
+            self.mutex.unlock(io);
+            if (stopping) return;
+
+            const result = self.loader.nextRow();
+
+            self.mutex.lockUncancelable(io);
+            defer self.mutex.unlock(io);
+            const row = result catch |err| {
+                logger.err("Error getting next row: {}", .{err});
+                self.state = .failed;
+                if (self.ready_len == 0) self.notify();
+                self.ready_cond.broadcast(io);
+                return;
+            } orelse {
+                self.state = .done;
+                if (self.ready_len == 0) self.notify();
+                self.ready_cond.broadcast(io);
+                return;
+            };
+            const r: *Row = @fieldParentPtr("ext_row", row);
+            self.ready.append(&r.node);
+            self.ready_len += 1;
+            if (self.ready_len == 1) self.notify();
+            self.ready_cond.signal(io);
+        }
+    }
+
+    /// Blocking pop; `status` is `.row`, `.done` or `.failed`.
+    fn next(self: *AsyncPump, status: *Status) ?*LoadedRow {
+        const io = self.loader.io;
+        self.mutex.lockUncancelable(io);
+        while (self.ready_len == 0 and self.state == .pending) {
+            self.ready_cond.waitUncancelable(io, &self.mutex);
+        }
+        self.mutex.unlock(io);
+        return self.tryNext(status);
+    }
+
+    /// Non-blocking pop. `.pending` means wait for the fd to become readable.
+    fn tryNext(self: *AsyncPump, status: *Status) ?*LoadedRow {
+        const io = self.loader.io;
+        self.mutex.lockUncancelable(io);
+        defer self.mutex.unlock(io);
+
+        if (self.ready.popFirst()) |node| {
+            self.ready_len -= 1;
+            self.cond.signal(io);
+            status.* = .row;
+            const row: *Row = @fieldParentPtr("node", node);
+            return &row.ext_row;
+        }
+
+        // Terminal states leave the pipe readable so every waiter wakes up.
+        if (self.state != .pending) {
+            status.* = self.state;
+            return null;
+        }
+        var buf: [64]u8 = undefined;
+        while (std.c.read(self.fds[0], &buf, buf.len) > 0) {}
+        status.* = .pending;
+        return null;
+    }
+};
+
 pub const LuaLoaderCCtx = struct {
     alloc_ctx: union(enum) {
         rel: struct {},
@@ -841,16 +2042,98 @@ pub export fn ultarDestroyLuaLoader(c: *LuaLoaderCCtx) void {
 }
 
 pub export fn ultarNextRow(c: *LuaLoaderCCtx) ?*LoadedRow {
+    if (c.loader.pump != null) {
+        logger.err("ultarNextRow called after async iteration started", .{});
+        return @ptrFromInt(0);
+    }
+    const trace_start = if (c.loader.tracer) |t| t.now() else 0;
     const row = c.loader.nextRow() catch |err| {
         logger.err("Error getting next row: {}", .{err});
         return @ptrFromInt(0);
     };
+    if (c.loader.tracer) |t| t.span(.consumer, .next_row, trace_start, "");
     if (row == null) {
         return @ptrFromInt(0);
     }
+    c.loader.traceHanded(row.?);
+    return row;
+}
+
+/// Switch the loader to async mode (idempotent) and return the readiness fd, or -1 on failure.
+/// After this, rows must be taken with `ultarAsyncTryNext`; `ultarNextRow` is off limits.
+pub export fn ultarAsyncStart(c: *LuaLoaderCCtx) c_int {
+    const loader = c.loader;
+    if (loader.pump) |p| return p.fds[0];
+
+    const p = c.alloc.create(AsyncPump) catch return -1;
+    p.* = .{ .loader = loader };
+    p.start() catch |err| {
+        logger.err("Failed to start async pump: {}", .{err});
+        c.alloc.destroy(p);
+        return -1;
+    };
+    loader.pump = p;
+    return p.fds[0];
+}
+
+/// Blocking variant of `ultarAsyncTryNext` for consumers that own a thread,
+/// such as `Mixer`. `wait_ns` receives the time spent waiting.
+pub export fn ultarAsyncNext(c: *LuaLoaderCCtx, status: *c_int, wait_ns: *u64) ?*LoadedRow {
+    const p = c.loader.pump orelse {
+        status.* = @intFromEnum(AsyncPump.Status.failed);
+        return null;
+    };
+    const start = std.Io.Clock.Timestamp.now(c.loader.io, .awake);
+    const trace_start = if (c.loader.tracer) |t| t.now() else 0;
+    var s: AsyncPump.Status = .pending;
+    const row = p.next(&s);
+    wait_ns.* = @intCast(@max(0, start.durationTo(std.Io.Clock.Timestamp.now(c.loader.io, .awake)).raw.nanoseconds));
+    status.* = @intFromEnum(s);
+    if (c.loader.tracer) |t| t.span(.consumer, .next_row, trace_start, "");
+    if (row) |r| c.loader.traceHanded(r);
     return row;
 }
 
+/// Pop a ready row without blocking; `status` is an `AsyncPump.Status`.
+pub export fn ultarAsyncTryNext(c: *LuaLoaderCCtx, status: *c_int) ?*LoadedRow {
+    const p = c.loader.pump orelse {
+        status.* = @intFromEnum(AsyncPump.Status.failed);
+        return null;
+    };
+    var s: AsyncPump.Status = .pending;
+    const row = p.tryNext(&s);
+    status.* = @intFromEnum(s);
+    if (row) |r| c.loader.traceHanded(r);
+    return row;
+}
+
+/// Register `n` caller-owned buffers that reads for `key` land in; see
+/// `LuaDataLoader.registerStaging`. Returns 0 on success, 1 once iteration
+/// has started, 2 if `key` already has buffers or `n` is 0 or over 64, 3 when
+/// out of memory.
+pub export fn ultarRegisterStaging(c: *LuaLoaderCCtx, key: [*:0]const u8, ptrs: [*]const [*]u8, lens: [*]const u64, n: usize) c_int {
+    var buffers: [StagingPool.max_buffers][]u8 = undefined;
+    if (n > buffers.len) return 2;
+    for (buffers[0..n], ptrs[0..n], lens[0..n]) |*b, p, len| b.* = p[0..@intCast(len)];
+    c.loader.registerStaging(std.mem.span(key), buffers[0..n]) catch |err| return switch (err) {
+        error.AlreadyStarted => 1,
+        error.AlreadyRegistered, error.TooManyBuffers => 2,
+        error.OutOfMemory => 3,
+    };
+    return 0;
+}
+
 pub export fn ultarReclaimRow(c: *LuaLoaderCCtx, c_row: *LoadedRow) void {
     c.loader.reclaimRow(c_row);
 }
+
+/// Write the loader's trace to `path` in Chrome trace format. Returns 0 on
+/// success, 1 if tracing is off, 2 if the file couldn't be written.
+pub export fn ultarDumpTrace(c: *LuaLoaderCCtx, path: [*:0]const u8) c_int {
+    const t = c.loader.tracer orelse return 1;
+    t.dump(std.mem.span(path)) catch |err| {
+        logger.err("Failed to write trace to {s}: {}", .{ path, err });
+        return 2;
+    };
+    return 0;
+}
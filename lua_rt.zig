@@ -1,7 +1,12 @@
 const std = @import("std");
 const zlua = @import("zlua");
 const Lua = @import("zlua").Lua;
-const msgpack = @import("msgpack.zig");
+const msgpack = @import("msgpack");
+const script_cache = @import("script_cache.zig");
+const IndexSummary = @import("IndexSummary.zig");
+const DatasetManifest = @import("DatasetManifest.zig");
+const partition = @import("partition.zig");
+const dirwalk = @import("dirwalk.zig");
 
 const logger = std.log.scoped(.lua_rt);
 
@@ -16,14 +21,17 @@ const can_use_lua_unsigned64 =
 pub const LuaRt = struct {
     lua: *Lua,
     io: std.Io,
+    /// Backs `ultar.cache`; null disables memoisation.
+    cache_dir: ?[]const u8,
 
     const rt_registry_key: [:0]const u8 = "ultar.lua_rt.rt_ptr";
 
     /// In-place init. Stashes `self` in `lua`'s registry and registers the
     /// `ultar.*` modules and userdata metatables. `self` must outlive `lua`.
-    pub fn init(self: *LuaRt, lua: *Lua, io: std.Io) !void {
+    pub fn init(self: *LuaRt, lua: *Lua, io: std.Io, cache_dir: ?[]const u8) !void {
         self.lua = lua;
         self.io = io;
+        self.cache_dir = cache_dir;
         lua.pushLightUserdata(@ptrCast(self)); // [+p]
         lua.setField(zlua.registry_index, rt_registry_key); // pop 1
         try self.registerModules();
@@ -54,6 +62,8 @@ pub const LuaRt = struct {
         lua.newTable(); // [+p]
         lua.pushFunction(zlua.wrap(MsgpackUnpacker.iter)); // [+p]
         lua.setField(-2, MsgpackUnpacker.f_iter); // pop 1
+        lua.pushFunction(zlua.wrap(MsgpackUnpacker.rows)); // [+p]
+        lua.setField(-2, MsgpackUnpacker.f_rows); // pop 1
         lua.setField(-2, "__index"); // pop 1
         if (zlua.lang != .luau) {
             lua.pushFunction(zlua.wrap(MsgpackUnpacker.luaDetor)); // [+p]
@@ -61,9 +71,40 @@ pub const LuaRt = struct {
         }
         lua.pop(1); // pop meta_table
 
+        try lua.newMetatable(UtixRow.meta_table); // [+p]
+        lua.newTable(); // [+p]
+        inline for (UtixRow.methods) |m| {
+            lua.pushFunction(zlua.wrap(m[1])); // [+p]
+            lua.setField(-2, m[0]); // pop 1
+        }
+        lua.setField(-2, "__index"); // pop 1
+        lua.pushFunction(zlua.wrap(UtixRow.lenMeta)); // [+p]
+        lua.setField(-2, "__len"); // pop 1
+        if (zlua.lang != .luau) {
+            lua.pushFunction(zlua.wrap(UtixRow.luaDetor)); // [+p]
+            lua.setField(-2, "__gc"); // pop 1
+        }
+        lua.pop(1); // pop meta_table
+
+        try lua.newMetatable(ManifestCtx.meta_table); // [+p]
+        lua.newTable(); // [+p]
+        inline for (ManifestCtx.methods) |m| {
+            lua.pushFunction(zlua.wrap(m[1])); // [+p]
+            lua.setField(-2, m[0]); // pop 1
+        }
+        lua.setField(-2, "__index"); // pop 1
+        if (zlua.lang != .luau) {
+            lua.pushFunction(zlua.wrap(ManifestCtx.luaDetor)); // [+p]
+            lua.setField(-2, "__gc"); // pop 1
+        }
+        lua.pop(1); // pop meta_table
+
         try registerPreload(lua, "ultar.utix", zlua.wrap(utixModuleLoader));
+        try registerPreload(lua, "ultar.manifest", zlua.wrap(manifestModuleLoader));
         try registerPreload(lua, "ultar.scandir", zlua.wrap(scandirModuleLoader));
         try registerPreload(lua, "ultar.debug", zlua.wrap(debugModuleLoader));
+        try registerPreload(lua, "ultar.cache", zlua.wrap(cacheModuleLoader));
+        try registerPreload(lua, "ultar.sharding", zlua.wrap(shardingModuleLoader));
     }
 };
 
@@ -350,6 +391,52 @@ fn scanDir(lua: *Lua) i32 {
     return 1;
 }
 
+/// `scandir.walk(path, opts)` -> sorted array of the file paths under `path`.
+fn scanWalk(lua: *Lua) !i32 {
+    const rt = LuaRt.fromLua(lua);
+    var arena = std.heap.ArenaAllocator.init(lua.allocator());
+    defer arena.deinit();
+    const a = arena.allocator();
+
+    const path = try a.dupe(u8, try lua.toString(1));
+    var opts: dirwalk.Options = .{};
+    var use_cache_dir = false;
+    if (lua.isTable(2)) {
+        if (lua.getField(2, "recursive") != .nil) opts.recursive = lua.toBoolean(-1);
+        lua.pop(1);
+        if (lua.getField(2, "ext") != .nil) opts.ext = try a.dupe(u8, try lua.toString(-1));
+        lua.pop(1);
+        if (lua.getField(2, "glob") != .nil) opts.glob = try a.dupe(u8, try lua.toString(-1));
+        lua.pop(1);
+        switch (lua.getField(2, "cache")) {
+            .nil => {},
+            .boolean => use_cache_dir = lua.toBoolean(-1),
+            else => opts.cache_path = try a.dupe(u8, try lua.toString(-1)),
+        }
+        lua.pop(1);
+    }
+    // `cache = true` keeps the listing in `ultar.cache`'s directory.
+    if (use_cache_dir) {
+        if (rt.cache_dir) |d| {
+            const k = script_cache.key(&.{ path, opts.ext, opts.glob, if (opts.recursive) "r" else "" });
+            opts.cache_path = try std.fmt.allocPrint(a, "{s}/scandir-{s}", .{ d, &k });
+        }
+    }
+
+    var listing = dirwalk.walk(a, rt.io, path, opts) catch |err| {
+        logger.warn("Failed to walk directory {s}: {}", .{ path, err });
+        return error.LuaFile;
+    };
+    defer listing.deinit();
+
+    lua.createTable(@intCast(listing.paths.len), 0); // [+p]
+    for (listing.paths, 1..) |p, i| {
+        _ = lua.pushString(p); // [+p]
+        lua.rawSetIndex(-2, @intCast(i)); // pop
+    }
+    return 1;
+}
+
 const MsgpackUnpacker = struct {
     const Self = @This();
 
@@ -484,10 +571,14 @@ const MsgpackUnpacker = struct {
     rt: *LuaRt,
     msgpack_file: std.Io.File,
     unpacker: Unpacker,
+    // Shares `reader` with `unpacker`; both leave it at a row boundary, so
+    // `iter()` and `rows()` can be mixed on one reader.
+    scanner: msgpack.Scanner,
     read_buf: [65536]u8 = undefined,
     reader: std.Io.File.Reader,
 
     const f_iter = "iter";
+    const f_rows = "rows";
     const meta_table = "MsgpackUnpackerMT";
     const g_new_ctx = "msgpack_unpacker";
 
@@ -495,12 +586,14 @@ const MsgpackUnpacker = struct {
         const ctx: *MsgpackUnpacker = @ptrFromInt(@intFromPtr(data));
         ctx.msgpack_file.close(ctx.rt.io);
         ctx.unpacker.ctx.deinit();
+        ctx.scanner.deinit();
     }
 
     pub fn luaDetor(lua: *Lua) !c_int {
         const ctx = try lua.toUserdata(MsgpackUnpacker, 1);
         ctx.msgpack_file.close(ctx.rt.io);
         ctx.unpacker.ctx.deinit();
+        ctx.scanner.deinit();
         return 0;
     }
 
@@ -522,6 +615,7 @@ const MsgpackUnpacker = struct {
         };
         ctx.reader = ctx.msgpack_file.readerStreaming(rt.io, &ctx.read_buf);
         ctx.unpacker = .{ .reader = &ctx.reader.interface, .ctx = UnpackerImpl.init(lua), .alloc = lua.allocator() };
+        ctx.scanner = msgpack.Scanner.init(&ctx.reader.interface, lua.allocator());
 
         _ = lua.getMetatableRegistry(MsgpackUnpacker.meta_table); // [+p]
         lua.setMetatable(-2); // pop 1
@@ -549,6 +643,311 @@ const MsgpackUnpacker = struct {
         };
         return 1;
     }
+
+    /// `reader:rows()`; like `iter()` but yields one reused `UtixRow` userdata.
+    fn rows(lua: *Lua) !i32 {
+        _ = lua.checkUserdata(Self, 1, Self.meta_table);
+        lua.pushValue(1); // [+p]
+        try UtixRow.new(lua); // [+p]
+        lua.pushClosure(zlua.wrap(Self.nextRow), 2); // pop 2 & push fn
+        return 1;
+    }
+
+    fn nextRow(lua: *Lua) !i32 {
+        const ctx = try lua.toUserdata(Self, Lua.upvalueIndex(1));
+        const row = try lua.toUserdata(UtixRow, Lua.upvalueIndex(2));
+        const more = row.decode(&ctx.scanner) catch |err| {
+            logger.err("Utix row decode failed: {}", .{err});
+            return if (err == error.OutOfMemory) error.OutOfMemory else error.LuaRuntime;
+        };
+        if (!more) return 0;
+        lua.pushValue(Lua.upvalueIndex(2)); // [+p]
+        return 1;
+    }
+};
+
+/// Native view of one `.utix` row, decoded straight from the msgpack stream.
+///
+/// `UtixReader:rows()` reuses a single instance for the whole iteration and
+/// every accessor reads native memory, so a script that only asks for a few
+/// sizes or offsets allocates nothing on the Lua heap. Entries are looked up
+/// by key with a linear scan; rows hold a handful of members.
+const UtixRow = struct {
+    const MetaValue = union(enum) {
+        nil,
+        boolean: bool,
+        int: i64,
+        uint: u64,
+        float: f64,
+        string: []const u8,
+    };
+
+    const Field = enum { str_idx, iidx, offset, keys, offsets, sizes, metadata };
+
+    arena: std.heap.ArenaAllocator,
+    str_idx: []const u8 = "",
+    iidx: u64 = 0,
+    offset: u64 = 0,
+    keys: []const []const u8 = &.{},
+    offsets: []const u64 = &.{},
+    sizes: []const u64 = &.{},
+    meta_keys: []const []const u8 = &.{},
+    meta_values: []const MetaValue = &.{},
+
+    const meta_table = "UtixRowMT";
+    const methods = .{
+        .{ "has", UtixRow.has },
+        .{ "size", UtixRow.size },
+        .{ "rel_offset", UtixRow.relOffset },
+        .{ "abs_offset", UtixRow.absOffset },
+        .{ "meta", UtixRow.meta },
+        .{ "key", UtixRow.key },
+        .{ "base_offset", UtixRow.baseOffset },
+        .{ "str_idx", UtixRow.strIdx },
+        .{ "iidx", UtixRow.iIdx },
+    };
+
+    fn new(lua: *Lua) !void {
+        const row = switch (zlua.lang) {
+            // Non-luau runtimes attach cleanup via the __gc metamethod instead.
+            .luau => lua.newUserdataDtor(UtixRow, zlua.wrap(UtixRow.luauDetor)),
+            .lua54 => lua.newUserdata(UtixRow, 0),
+            else => lua.newUserdata(UtixRow),
+        };
+        row.* = .{ .arena = .init(lua.allocator()) };
+
+        _ = lua.getMetatableRegistry(UtixRow.meta_table); // [+p]
+        lua.setMetatable(-2); // pop 1
+    }
+
+    pub fn luauDetor(data: *anyopaque) void {
+        const row: *UtixRow = @ptrFromInt(@intFromPtr(data));
+        row.arena.deinit();
+    }
+
+    pub fn luaDetor(lua: *Lua) !c_int {
+        const row = try lua.toUserdata(UtixRow, 1);
+        row.arena.deinit();
+        return 0;
+    }
+
+    /// Replace the contents with the next top-level row; false at end of stream.
+    fn decode(self: *UtixRow, scanner: *msgpack.Scanner) !bool {
+        _ = self.arena.reset(.retain_capacity);
+        const arena = self.arena;
+        self.* = .{ .arena = arena };
+        const a = self.arena.allocator();
+
+        const n = switch (try scanner.next()) {
+            .end => return false,
+            .map_begin => |count| count,
+            else => return error.InvalidFormat,
+        };
+        for (0..n) |_| {
+            // Scanner strings die on the next call, so classify the key first.
+            const field = switch (try scanner.next()) {
+                .map_key => |k| std.meta.stringToEnum(Field, k),
+                else => return error.InvalidFormat,
+            };
+            const tok = try scanner.next();
+            switch (field orelse {
+                try skipValue(scanner, tok);
+                continue;
+            }) {
+                .str_idx => switch (tok) {
+                    .string => |str| self.str_idx = try a.dupe(u8, str),
+                    else => try skipValue(scanner, tok),
+                },
+                .iidx => self.iidx = try readUint(tok),
+                .offset => self.offset = try readUint(tok),
+                .keys => {
+                    const len = switch (tok) {
+                        .array_begin => |len| len,
+                        else => return error.InvalidFormat,
+                    };
+                    const keys = try a.alloc([]const u8, len);
+                    for (keys) |*k| k.* = switch (try scanner.next()) {
+                        .string => |str| try a.dupe(u8, str),
+                        else => return error.InvalidFormat,
+                    };
+                    if (try scanner.next() != .array_end) return error.InvalidFormat;
+                    self.keys = keys;
+                },
+                .offsets, .sizes => {
+                    const len = switch (tok) {
+                        .array_begin => |len| len,
+                        else => return error.InvalidFormat,
+                    };
+                    const vals = try a.alloc(u64, len);
+                    for (vals) |*v| v.* = try readUint(try scanner.next());
+                    if (try scanner.next() != .array_end) return error.InvalidFormat;
+                    if (field.? == .offsets) self.offsets = vals else self.sizes = vals;
+                },
+                .metadata => try self.decodeMeta(scanner, tok),
+            }
+        }
+        if (try scanner.next() != .map_end) return error.InvalidFormat;
+        if (self.offsets.len != self.keys.len or self.sizes.len != self.keys.len) return error.InvalidFormat;
+        return true;
+    }
+
+    fn decodeMeta(self: *UtixRow, scanner: *msgpack.Scanner, tok: msgpack.Scanner.Token) !void {
+        const len = switch (tok) {
+            .map_begin => |len| len,
+            else => return skipValue(scanner, tok),
+        };
+        const a = self.arena.allocator();
+        const keys = try a.alloc([]const u8, len);
+        const values = try a.alloc(MetaValue, len);
+        for (keys, values) |*k, *v| {
+            k.* = switch (try scanner.next()) {
+                .map_key => |str| try a.dupe(u8, str),
+                else => return error.InvalidFormat,
+            };
+            v.* = switch (try scanner.next()) {
+                .nil => .nil,
+                .boolean => |b| .{ .boolean = b },
+                .int => |i| .{ .int = i },
+                .uint => |u| .{ .uint = u },
+                .float => |f| .{ .float = f },
+                .string => |str| .{ .string = try a.dupe(u8, str) },
+                // Nested values are only reachable through `iter()`.
+                else => |nested| blk: {
+                    try skipValue(scanner, nested);
+                    break :blk .nil;
+                },
+            };
+        }
+        if (try scanner.next() != .map_end) return error.InvalidFormat;
+        self.meta_keys = keys;
+        self.meta_values = values;
+    }
+
+    fn indexOf(haystack: []const []const u8, needle: []const u8) ?usize {
+        for (haystack, 0..) |k, i| {
+            if (std.mem.eql(u8, k, needle)) return i;
+        }
+        return null;
+    }
+
+    fn checkSelf(lua: *Lua) *UtixRow {
+        return lua.checkUserdata(UtixRow, 1, UtixRow.meta_table);
+    }
+
+    /// Index of the member named by argument 2, or null (caller pushes nil).
+    fn member(lua: *Lua) !?struct { *UtixRow, usize } {
+        const row = checkSelf(lua);
+        const i = indexOf(row.keys, try lua.toString(2)) orelse return null;
+        return .{ row, i };
+    }
+
+    fn has(lua: *Lua) !i32 {
+        lua.pushBoolean(try member(lua) != null); // [+p]
+        return 1;
+    }
+
+    fn size(lua: *Lua) !i32 {
+        const row, const i = try member(lua) orelse {
+            lua.pushNil(); // [+p]
+            return 1;
+        };
+        pushUnsigned64(lua, row.sizes[i]); // [+p]
+        return 1;
+    }
+
+    fn relOffset(lua: *Lua) !i32 {
+        const row, const i = try member(lua) orelse {
+            lua.pushNil(); // [+p]
+            return 1;
+        };
+        pushUnsigned64(lua, row.offsets[i]); // [+p]
+        return 1;
+    }
+
+    fn absOffset(lua: *Lua) !i32 {
+        const row, const i = try member(lua) orelse {
+            lua.pushNil(); // [+p]
+            return 1;
+        };
+        pushUnsigned64(lua, row.offset + row.offsets[i]); // [+p]
+        return 1;
+    }
+
+    fn meta(lua: *Lua) !i32 {
+        const row = checkSelf(lua);
+        const i = indexOf(row.meta_keys, try lua.toString(2)) orelse {
+            lua.pushNil(); // [+p]
+            return 1;
+        };
+        switch (row.meta_values[i]) { // [+p]
+            .nil => lua.pushNil(),
+            .boolean => |b| lua.pushBoolean(b),
+            .int => |v| if (v > std.math.maxInt(zlua.Integer) or v < std.math.minInt(zlua.Integer))
+                lua.pushNumber(@floatFromInt(v))
+            else
+                lua.pushInteger(@intCast(v)),
+            .uint => |v| lua.pushNumber(@floatFromInt(v)),
+            .float => |f| lua.pushNumber(f),
+            .string => |str| _ = lua.pushString(str),
+        }
+        return 1;
+    }
+
+    /// `row:key(i)`; 1-based like Lua arrays.
+    fn key(lua: *Lua) !i32 {
+        const row = checkSelf(lua);
+        const i = try toUnsigned(lua, 2);
+        if (i == 0 or i > row.keys.len) {
+            lua.pushNil(); // [+p]
+        } else {
+            _ = lua.pushString(row.keys[i - 1]); // [+p]
+        }
+        return 1;
+    }
+
+    fn baseOffset(lua: *Lua) !i32 {
+        pushUnsigned64(lua, checkSelf(lua).offset); // [+p]
+        return 1;
+    }
+
+    fn strIdx(lua: *Lua) !i32 {
+        _ = lua.pushString(checkSelf(lua).str_idx); // [+p]
+        return 1;
+    }
+
+    fn iIdx(lua: *Lua) !i32 {
+        pushUnsigned64(lua, checkSelf(lua).iidx); // [+p]
+        return 1;
+    }
+
+    fn lenMeta(lua: *Lua) !i32 {
+        pushUnsigned(lua, @intCast(checkSelf(lua).keys.len)); // [+p]
+        return 1;
+    }
+
+    fn readUint(tok: msgpack.Scanner.Token) !u64 {
+        return switch (tok) {
+            .uint => |u| u,
+            .int => |i| std.math.cast(u64, i) orelse error.InvalidFormat,
+            else => error.InvalidFormat,
+        };
+    }
+
+    /// Consume the remainder of a value whose first token is `tok`.
+    fn skipValue(scanner: *msgpack.Scanner, tok: msgpack.Scanner.Token) !void {
+        var depth: usize = switch (tok) {
+            .map_begin, .array_begin => 1,
+            else => return,
+        };
+        while (depth > 0) {
+            switch (try scanner.next()) {
+                .map_begin, .array_begin => depth += 1,
+                .map_end, .array_end => depth -= 1,
+                .end => return error.InvalidFormat,
+                else => {},
+            }
+        }
+    }
 };
 
 /// Lua loader for `ultar.utix`; returns `{ open = fn(path) }`.
@@ -559,11 +958,520 @@ fn utixModuleLoader(lua: *Lua) i32 {
     return 1;
 }
 
-/// Lua loader for `ultar.scandir`; returns `{ open = fn(path) }`.
-fn scandirModuleLoader(lua: *Lua) i32 {
+/// `cache.key(...)`: hex digest of the string arguments.
+fn cacheKey(lua: *Lua) !i32 {
+    var parts: [16][]const u8 = undefined;
+    const n: usize = @intCast(lua.getTop());
+    if (n > parts.len) {
+        logger.err("cache.key takes at most {} arguments", .{parts.len});
+        return error.LuaError;
+    }
+    for (parts[0..n], 1..) |*p, i| p.* = try lua.toString(@intCast(i));
+    const k = script_cache.key(parts[0..n]);
+    _ = lua.pushString(&k);
+    return 1;
+}
+
+// Receives the module table holding `dir` and `key`; adds `memo`.
+// Entries are Lua table constructors loaded with an empty environment.
+const cache_lua_src =
+    \\local M = ...
+    \\local function ser(v, out, depth)
+    \\    local t = type(v)
+    \\    if t == "string" then
+    \\        out[#out + 1] = string.format("%q", v)
+    \\    elseif t == "number" then
+    \\        if v ~= v or v == math.huge or v == -math.huge then
+    \\            error("cache.memo: cannot store " .. tostring(v))
+    \\        elseif math.floor(v) == v and math.abs(v) < 2 ^ 53 then
+    \\            out[#out + 1] = string.format("%d", v)
+    \\        else
+    \\            out[#out + 1] = string.format("%.17g", v)
+    \\        end
+    \\    elseif t == "boolean" or t == "nil" then
+    \\        out[#out + 1] = tostring(v)
+    \\    elseif t == "table" then
+    \\        if depth > 64 then error("cache.memo: value nested too deeply") end
+    \\        out[#out + 1] = "{"
+    \\        for k, x in pairs(v) do
+    \\            out[#out + 1] = "["
+    \\            ser(k, out, depth + 1)
+    \\            out[#out + 1] = "]="
+    \\            ser(x, out, depth + 1)
+    \\            out[#out + 1] = ","
+    \\        end
+    \\        out[#out + 1] = "}"
+    \\    else
+    \\        error("cache.memo: cannot store a " .. t)
+    \\    end
+    \\end
+    \\
+    \\function M.memo(name, fn, opts)
+    \\    opts = opts or {}
+    \\    if M.dir == nil or io == nil or loadfile == nil then return fn() end
+    \\    local path = M.dir .. "/memo-" .. M.key(name, tostring(opts.version or "")) .. ".lua"
+    \\    local chunk = loadfile(path, "t", {})
+    \\    if chunk then
+    \\        local ok, entry = pcall(chunk)
+    \\        if ok and type(entry) == "table" and type(entry.time) == "number"
+    \\            and (opts.max_age == nil or os.time() - entry.time <= opts.max_age) then
+    \\            return entry.value
+    \\        end
+    \\    end
+    \\
+    \\    local value = fn()
+    \\    local out = { "return {time=", string.format("%d", os.time()), ",value=" }
+    \\    ser(value, out, 0)
+    \\    out[#out + 1] = "}\n"
+    \\    -- Write-then-rename so ranks sharing the directory never read a partial entry.
+    \\    local tmp = path .. "." .. M.key(tostring({}), tostring(os.clock())):sub(1, 8) .. ".tmp"
+    \\    local f = io.open(tmp, "wb")
+    \\    if f then
+    \\        f:write(table.concat(out))
+    \\        f:close()
+    \\        if not os.rename(tmp, path) then os.remove(tmp) end
+    \\    end
+    \\    return value
+    \\end
+;
+
+/// Lua loader for `ultar.cache`; returns `{ dir, key = fn(...), memo = fn(name, fn, opts) }`.
+fn cacheModuleLoader(lua: *Lua) !i32 {
+    const rt = LuaRt.fromLua(lua);
+    lua.createTable(0, 3); // [+p] module table
+    if (rt.cache_dir) |d| {
+        _ = lua.pushString(d); // [+p]
+        lua.setField(-2, "dir"); // pop
+    }
+    lua.pushFunction(zlua.wrap(cacheKey)); // [+p]
+    lua.setField(-2, "key"); // pop
+
+    lua.loadString(cache_lua_src) catch |err| return printLuaErr(lua, err); // [+p]
+    lua.pushValue(-2); // [+p] module table
+    lua.protectedCall(.{ .args = 1 }) catch |err| return printLuaErr(lua, err); // pop 2
+    return 1;
+}
+
+fn pushJson(lua: *Lua, v: std.json.Value) void {
+    switch (v) {
+        .null => lua.pushNil(),
+        .bool => |b| lua.pushBoolean(b),
+        .integer => |i| lua.pushNumber(@floatFromInt(i)),
+        .float => |f| lua.pushNumber(f),
+        .number_string, .string => |str| _ = lua.pushString(str),
+        .array => |a| {
+            lua.createTable(@intCast(a.items.len), 0); // [+p]
+            for (a.items, 1..) |item, i| {
+                pushJson(lua, item); // [+p]
+                lua.setIndexRaw(-2, @intCast(i)); // pop
+            }
+        },
+        .object => |o| {
+            lua.createTable(0, @intCast(o.count())); // [+p]
+            var it = o.iterator();
+            while (it.next()) |kv| {
+                _ = lua.pushString(kv.key_ptr.*); // [+p]
+                pushJson(lua, kv.value_ptr.*); // [+p]
+                lua.setTable(-3); // pop 2
+            }
+        },
+    }
+}
+
+/// `sharding.summary(tar_path)`: the indexer's `<tar_path>.utix.summary.json` as a table.
+fn shardingSummary(lua: *Lua) !i32 {
+    const tar_path = lua.toString(1) catch |err| return printLuaErr(lua, err);
+    const rt = LuaRt.fromLua(lua);
+    const alloc = lua.allocator();
+
+    const path = try std.mem.concat(alloc, u8, &.{ tar_path, IndexSummary.sidecar_suffix });
+    defer alloc.free(path);
+    const bytes = std.Io.Dir.cwd().readFileAlloc(rt.io, path, alloc, .limited(1 << 20)) catch |err| {
+        logger.err("Failed to read index summary {s}: {} (re-run the indexer to create it)", .{ path, err });
+        return error.LuaError;
+    };
+    defer alloc.free(bytes);
+    const parsed = std.json.parseFromSlice(std.json.Value, alloc, bytes, .{}) catch |err| {
+        logger.err("Invalid index summary {s}: {}", .{ path, err });
+        return error.LuaError;
+    };
+    defer parsed.deinit();
+
+    pushJson(lua, parsed.value); // [+p]
+    return 1;
+}
+
+/// Non-negative integer argument `idx`, or error naming `what`.
+fn rowCountArg(lua: *Lua, idx: i32, what: []const u8) !u64 {
+    const f = lua.toNumber(idx) catch {
+        logger.err("sharding: {s} must be a number", .{what});
+        return error.LuaError;
+    };
+    if (!(f >= 0 and f <= max_exact_lua_handle) or @floor(f) != f) {
+        logger.err("sharding: {s} must be a non-negative integer, got {d}", .{ what, f });
+        return error.LuaError;
+    }
+    return @intFromFloat(f);
+}
+
+/// Array of non-negative integers at `idx`.
+fn rowCountArray(lua: *Lua, alloc: std.mem.Allocator, idx: i32, what: []const u8) ![]u64 {
+    const out = try alloc.alloc(u64, lua.lenRaw(idx));
+    errdefer alloc.free(out);
+    for (out, 1..) |*v, i| {
+        _ = lua.rawGetIndex(idx, @intCast(i)); // [+p]
+        defer lua.pop(1);
+        v.* = try rowCountArg(lua, -1, what);
+    }
+    return out;
+}
+
+/// Flat `{ lo1, hi1, lo2, hi2, ... }` at `idx` as intervals.
+fn intervalArray(lua: *Lua, alloc: std.mem.Allocator, idx: i32) ![]partition.Interval {
+    const flat = try rowCountArray(lua, alloc, idx, "cursor");
+    defer alloc.free(flat);
+    if (flat.len % 2 != 0) {
+        logger.err("sharding: malformed cursor", .{});
+        return error.LuaError;
+    }
+    const out = try alloc.alloc(partition.Interval, flat.len / 2);
+    for (out, 0..) |*iv, i| iv.* = .{ .lo = flat[2 * i], .hi = flat[2 * i + 1] };
+    return out;
+}
+
+fn partitionErr(err: partition.Error) error{ LuaError, OutOfMemory } {
+    switch (err) {
+        error.OutOfMemory => return error.OutOfMemory,
+        error.InvalidRank => logger.err("sharding: invalid rank for world_size", .{}),
+        error.InvalidCursor => logger.err("sharding: cursor does not fit these shards (stale checkpoint?)", .{}),
+    }
+    return error.LuaError;
+}
+
+/// `partition(rows, rank, world_size, epoch, remaining)` -> flat `{ shard, start_row, end_row, ... }`
+/// with 0-based shard indices; `remaining` is flat like `intervalArray`.
+fn shardingPartition(lua: *Lua) !i32 {
+    const alloc = lua.allocator();
+    const rows = try rowCountArray(lua, alloc, 1, "rows");
+    defer alloc.free(rows);
+    const rank = try rowCountArg(lua, 2, "rank");
+    const world_size = try rowCountArg(lua, 3, "world_size");
+    const epoch = try rowCountArg(lua, 4, "epoch");
+    const remaining = try intervalArray(lua, alloc, 5);
+    defer alloc.free(remaining);
+
+    const spans = partition.assign(alloc, rows, .{ .epoch = epoch, .remaining = remaining }, @intCast(rank), @intCast(world_size)) catch |err| return partitionErr(err);
+    defer alloc.free(spans);
+
+    lua.createTable(@intCast(spans.len * 3), 0); // [+p]
+    for (spans, 0..) |s, i| {
+        const base: zlua.Integer = @intCast(i * 3);
+        pushUnsigned64(lua, s.shard); // [+p]
+        lua.rawSetIndex(-2, base + 1); // pop
+        pushUnsigned64(lua, s.start_row); // [+p]
+        lua.rawSetIndex(-2, base + 2); // pop
+        pushUnsigned64(lua, s.end_row); // [+p]
+        lua.rawSetIndex(-2, base + 3); // pop
+    }
+    return 1;
+}
+
+/// `advance(remaining, world_size, consumed)` -> flat remaining intervals.
+fn shardingAdvance(lua: *Lua) !i32 {
+    const alloc = lua.allocator();
+    const remaining = try intervalArray(lua, alloc, 1);
+    defer alloc.free(remaining);
+    const world_size = try rowCountArg(lua, 2, "world_size");
+    const consumed = try rowCountArg(lua, 3, "consumed");
+
+    const rest = partition.advance(alloc, remaining, @intCast(world_size), consumed) catch |err| return partitionErr(err);
+    defer alloc.free(rest);
+
+    lua.createTable(@intCast(rest.len * 2), 0); // [+p]
+    for (rest, 0..) |iv, i| {
+        const base: zlua.Integer = @intCast(i * 2);
+        pushUnsigned64(lua, iv.lo); // [+p]
+        lua.rawSetIndex(-2, base + 1); // pop
+        pushUnsigned64(lua, iv.hi); // [+p]
+        lua.rawSetIndex(-2, base + 2); // pop
+    }
+    return 1;
+}
+
+// Receives the module table holding `summary`; adds the assignment helpers.
+// Must agree with `ultar_dataloader.sharding` so mixed Lua/Python jobs split
+// the same way.
+const sharding_lua_src =
+    \\local M, partition, advance = ...
+    \\
+    \\local function summaries(paths)
+    \\    local out = {}
+    \\    for i, p in ipairs(paths) do out[i] = M.summary(p) end
+    \\    return out
+    \\end
+    \\
+    \\local function check_rank(rank, world_size)
+    \\    if world_size <= 0 or rank < 0 or rank >= world_size then
+    \\        error(string.format("invalid rank %d for world_size %d", rank, world_size), 3)
+    \\    end
+    \\end
+    \\
+    \\function M.assign_shards(paths, rank, world_size)
+    \\    check_rank(rank, world_size)
+    \\    local sums = summaries(paths)
+    \\    local order = {}
+    \\    for i = 1, #paths do order[i] = i end
+    \\    table.sort(order, function(a, b)
+    \\        local ba, bb = sums[a].total_bytes, sums[b].total_bytes
+    \\        if ba ~= bb then return ba > bb end
+    \\        return a < b
+    \\    end)
+    \\    local loads, owner = {}, {}
+    \\    for r = 1, world_size do loads[r] = 0 end
+    \\    for _, i in ipairs(order) do
+    \\        local best = 1
+    \\        for r = 2, world_size do
+    \\            if loads[r] < loads[best] then best = r end
+    \\        end
+    \\        loads[best] = loads[best] + sums[i].total_bytes
+    \\        owner[i] = best - 1
+    \\    end
+    \\    local mine = {}
+    \\    for i, p in ipairs(paths) do
+    \\        if owner[i] == rank then mine[#mine + 1] = p end
+    \\    end
+    \\    return mine
+    \\end
+    \\
+    \\function M.assign_row_ranges(paths, rank, world_size)
+    \\    check_rank(rank, world_size)
+    \\    local sums = summaries(paths)
+    \\    local total = 0
+    \\    for _, s in ipairs(sums) do total = total + s.total_bytes end
+    \\    local lo = math.floor(rank * total / world_size)
+    \\    local hi = math.floor((rank + 1) * total / world_size)
+    \\    local last = rank == world_size - 1
+    \\    local out, start = {}, 0
+    \\    for i, s in ipairs(sums) do
+    \\        local b, rows = s.total_bytes, s.rows
+    \\        local first_row, end_row
+    \\        if b == 0 then
+    \\            if (lo <= start and start < hi) or (last and start >= total) then
+    \\                first_row, end_row = 0, rows
+    \\            end
+    \\        elseif start < hi and lo < start + b then
+    \\            local function row_at(pos)
+    \\                if pos >= start + b then return rows end
+    \\                return math.floor((pos - start) * rows / b)
+    \\            end
+    \\            first_row = row_at(math.max(lo, start))
+    \\            end_row = row_at(math.min(hi, start + b))
+    \\        end
+    \\        if first_row and first_row < end_row then
+    \\            out[#out + 1] = { path = paths[i], start_row = first_row, end_row = end_row }
+    \\        end
+    \\        start = start + b
+    \\    end
+    \\    return out
+    \\end
+    \\
+    \\local function flatten(remaining)
+    \\    local flat = {}
+    \\    for _, iv in ipairs(remaining) do
+    \\        flat[#flat + 1] = iv[1]
+    \\        flat[#flat + 1] = iv[2]
+    \\    end
+    \\    return flat
+    \\end
+    \\
+    \\function M.epoch_cursor(paths, epoch)
+    \\    local total = 0
+    \\    for _, s in ipairs(summaries(paths)) do total = total + s.rows end
+    \\    local remaining = {}
+    \\    if total > 0 then remaining[1] = { 0, total } end
+    \\    return { epoch = epoch or 0, remaining = remaining }
+    \\end
+    \\
+    \\function M.partition_rows(paths, rank, world_size, cursor)
+    \\    check_rank(rank, world_size)
+    \\    local rows = {}
+    \\    for i, s in ipairs(summaries(paths)) do rows[i] = s.rows end
+    \\    local flat = partition(rows, rank, world_size, cursor.epoch, flatten(cursor.remaining))
+    \\    local out = {}
+    \\    for i = 1, #flat, 3 do
+    \\        out[#out + 1] = { path = paths[flat[i] + 1], start_row = flat[i + 1], end_row = flat[i + 2] }
+    \\    end
+    \\    return out
+    \\end
+    \\
+    \\function M.advance_cursor(cursor, world_size, consumed)
+    \\    local flat = advance(flatten(cursor.remaining), world_size, consumed)
+    \\    local remaining = {}
+    \\    for i = 1, #flat, 2 do remaining[#remaining + 1] = { flat[i], flat[i + 1] } end
+    \\    return { epoch = cursor.epoch, remaining = remaining }
+    \\end
+;
+
+/// Lua loader for `ultar.sharding`; returns `{ summary, assign_shards,
+/// assign_row_ranges, epoch_cursor, partition_rows, advance_cursor }`.
+fn shardingModuleLoader(lua: *Lua) !i32 {
+    lua.createTable(0, 6); // [+p] module table
+    lua.pushFunction(zlua.wrap(shardingSummary)); // [+p]
+    lua.setField(-2, "summary"); // pop
+
+    lua.loadString(sharding_lua_src) catch |err| return printLuaErr(lua, err); // [+p]
+    lua.pushValue(-2); // [+p] module table
+    lua.pushFunction(zlua.wrap(shardingPartition)); // [+p]
+    lua.pushFunction(zlua.wrap(shardingAdvance)); // [+p]
+    lua.protectedCall(.{ .args = 3 }) catch |err| return printLuaErr(lua, err); // pop 4
+    return 1;
+}
+
+/// Userdata over a mapped `.utmf` dataset manifest. Shard indices and global
+/// row ids are 0-based; shard paths come back resolved against the manifest's
+/// directory.
+const ManifestCtx = struct {
+    mapped: DatasetManifest.Mapped,
+    dir_buf: [std.fs.max_path_bytes]u8 = undefined,
+    dir_len: usize = 0,
+
+    const meta_table = "ManifestMT";
+
+    const methods = .{
+        .{ "num_shards", ManifestCtx.numShards },
+        .{ "num_rows", ManifestCtx.numRows },
+        .{ "shard", ManifestCtx.shard },
+        .{ "locate", ManifestCtx.locate },
+        .{ "meta", ManifestCtx.meta },
+    };
+
+    pub fn luauDetor(data: *anyopaque) void {
+        const ctx: *ManifestCtx = @ptrFromInt(@intFromPtr(data));
+        ctx.mapped.close();
+    }
+
+    pub fn luaDetor(lua: *Lua) !c_int {
+        const ctx = try lua.toUserdata(ManifestCtx, 1);
+        ctx.mapped.close();
+        return 0;
+    }
+
+    fn open(lua: *Lua) !i32 {
+        const path = lua.toString(1) catch |err| return printLuaErr(lua, err);
+        const rt = LuaRt.fromLua(lua);
+        const dir = std.fs.path.dirname(path) orelse ".";
+        if (dir.len > std.fs.max_path_bytes) return error.NameTooLong;
+
+        var mapped = DatasetManifest.Mapped.open(rt.io, path) catch |err| {
+            logger.err("Failed to open manifest {s}: {}", .{ path, err });
+            return error.LuaError;
+        };
+        errdefer mapped.close();
+
+        const ctx = switch (zlua.lang) {
+            // Non-luau runtimes attach cleanup via the __gc metamethod instead.
+            .luau => lua.newUserdataDtor(ManifestCtx, zlua.wrap(ManifestCtx.luauDetor)),
+            .lua54 => lua.newUserdata(ManifestCtx, 0),
+            else => lua.newUserdata(ManifestCtx),
+        };
+        ctx.* = .{ .mapped = mapped, .dir_len = dir.len };
+        @memcpy(ctx.dir_buf[0..dir.len], dir);
+
+        _ = lua.getMetatableRegistry(ManifestCtx.meta_table); // [+p]
+        lua.setMetatable(-2); // pop 1
+        return 1;
+    }
+
+    fn checkSelf(lua: *Lua) *DatasetManifest {
+        return &lua.checkUserdata(ManifestCtx, 1, ManifestCtx.meta_table).mapped.manifest;
+    }
+
+    /// Non-negative integer argument `idx`.
+    fn indexArg(lua: *Lua, idx: i32) !u64 {
+        const f = try lua.toNumber(idx);
+        if (!(f >= 0 and f <= max_exact_lua_handle) or @floor(f) != f) {
+            logger.err("manifest: expected a non-negative integer, got {d}", .{f});
+            return error.LuaError;
+        }
+        return @intFromFloat(f);
+    }
+
+    fn pushShardPath(lua: *Lua, i: usize) !void {
+        const ctx = lua.checkUserdata(ManifestCtx, 1, ManifestCtx.meta_table);
+        const rel = try ctx.mapped.manifest.shardPath(i);
+        if (std.fs.path.isAbsolute(rel)) {
+            _ = lua.pushString(rel); // [+p]
+            return;
+        }
+        var buf: [std.fs.max_path_bytes]u8 = undefined;
+        const full = try std.fmt.bufPrint(&buf, "{s}/{s}", .{ ctx.dir_buf[0..ctx.dir_len], rel });
+        _ = lua.pushString(full); // [+p]
+    }
+
+    fn numShards(lua: *Lua) !i32 {
+        pushUnsigned64(lua, checkSelf(lua).numShards()); // [+p]
+        return 1;
+    }
+
+    fn numRows(lua: *Lua) !i32 {
+        pushUnsigned64(lua, checkSelf(lua).totalRows()); // [+p]
+        return 1;
+    }
+
+    /// `m:shard(i)` -> path, first_row, rows
+    fn shard(lua: *Lua) !i32 {
+        const m = checkSelf(lua);
+        const i = try indexArg(lua, 2);
+        if (i >= m.numShards()) {
+            lua.pushNil(); // [+p]
+            return 1;
+        }
+        try pushShardPath(lua, @intCast(i)); // [+p]
+        pushUnsigned64(lua, m.shardStart(@intCast(i))); // [+p]
+        pushUnsigned64(lua, try m.shardRows(@intCast(i))); // [+p]
+        return 3;
+    }
+
+    /// `m:locate(row)` -> path, local_row, shard; nil past the end.
+    fn locate(lua: *Lua) !i32 {
+        const m = checkSelf(lua);
+        const loc = m.locate(try indexArg(lua, 2)) orelse {
+            lua.pushNil(); // [+p]
+            return 1;
+        };
+        try pushShardPath(lua, loc.shard); // [+p]
+        pushUnsigned64(lua, loc.local_row); // [+p]
+        pushUnsigned64(lua, loc.shard); // [+p]
+        return 3;
+    }
+
+    /// `m:meta(row)` -> JSON string, or nil when the row has none.
+    fn meta(lua: *Lua) !i32 {
+        const m = checkSelf(lua);
+        if (m.metadata(try indexArg(lua, 2))) |json| {
+            _ = lua.pushString(json); // [+p]
+        } else {
+            lua.pushNil(); // [+p]
+        }
+        return 1;
+    }
+};
+
+/// Lua loader for `ultar.manifest`; returns `{ open = fn(path) }`.
+fn manifestModuleLoader(lua: *Lua) i32 {
     lua.createTable(0, 1); // [+p] module table
+    lua.pushFunction(zlua.wrap(ManifestCtx.open)); // [+p]
+    lua.setField(-2, "open"); // pop, set module.open
+    return 1;
+}
+
+/// Lua loader for `ultar.scandir`; returns `{ open = fn(path), walk = fn(path, opts) }`.
+fn scandirModuleLoader(lua: *Lua) i32 {
+    lua.createTable(0, 2); // [+p] module table
     lua.pushFunction(zlua.wrap(newScanCtx)); // [+p]
     lua.setField(-2, "open"); // pop, set module.open
+    lua.pushFunction(zlua.wrap(scanWalk)); // [+p]
+    lua.setField(-2, "walk"); // pop, set module.walk
     return 1;
 }
 
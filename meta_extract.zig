@@ -0,0 +1,321 @@
+//! Selective extraction of `--meta-rule` queries from metadata members.
+//!
+//! A query is a dotted path such as `.caption`, `.size.width` or `.tags[0]`;
+//! an empty query (or `.`) selects the whole value. JSON and msgpack members
+//! are scanned once and only the queried values are materialised, so a large
+//! caption next to a small label costs a scan, not an allocation. Scanning
+//! stops as soon as every query has been found. Msgpack is picked by a `.mpk`
+//! or `.msgpack` suffix and JSON is the default. `.txt` and `.cls` members are
+//! plain-text labels: the root query yields their trimmed text, as an integer
+//! when it parses as one.
+
+const std = @import("std");
+
+pub const Format = enum { json, msgpack, text };
+
+/// Queries per rule; active sets are tracked as a bitmask.
+pub const max_queries = 64;
+
+const Mask = u64;
+
+pub fn formatForKey(key: []const u8) Format {
+    if (std.mem.endsWith(u8, key, ".mpk") or std.mem.endsWith(u8, key, ".msgpack")) return .msgpack;
+    if (std.mem.endsWith(u8, key, ".txt") or std.mem.endsWith(u8, key, ".cls")) return .text;
+    return .json;
+}
+
+const Step = union(enum) {
+    key: []const u8,
+    index: usize,
+};
+
+/// Split a query into steps. Null when it can never match (bad index).
+fn parseQuery(arena: std.mem.Allocator, query: []const u8) !?[]const Step {
+    var steps: std.ArrayList(Step) = .empty;
+    var rest = if (query.len > 0 and query[0] == '.') query[1..] else query;
+    while (rest.len > 0) {
+        const dot_pos = std.mem.indexOfScalar(u8, rest, '.');
+        const seg = if (dot_pos) |d| rest[0..d] else rest;
+        rest = if (dot_pos) |d| rest[d + 1 ..] else "";
+        var key = seg;
+        var index: ?usize = null;
+        if (std.mem.indexOfScalar(u8, seg, '[')) |b| {
+            key = seg[0..b];
+            const c = std.mem.indexOfScalarPos(u8, seg, b, ']') orelse return null;
+            index = std.fmt.parseInt(usize, seg[b + 1 .. c], 10) catch return null;
+        }
+        if (key.len > 0) try steps.append(arena, .{ .key = key });
+        if (index) |i| try steps.append(arena, .{ .index = i });
+    }
+    return steps.items;
+}
+
+/// Walk an already materialised value along `steps`.
+fn lookup(root: std.json.Value, steps: []const Step) std.json.Value {
+    var current = root;
+    for (steps) |step| switch (step) {
+        .key => |k| {
+            if (current != .object) return .null;
+            current = current.object.get(k) orelse return .null;
+        },
+        .index => |i| {
+            if (current != .array or i >= current.array.items.len) return .null;
+            current = current.array.items[i];
+        },
+    };
+    return current;
+}
+
+fn Walker(comptime Source: type) type {
+    return struct {
+        const Self = @This();
+
+        arena: std.mem.Allocator,
+        source: Source,
+        steps: []const ?[]const Step,
+        out: []std.json.Value,
+        /// Queries not yet found; the scan ends early once this is empty.
+        pending: Mask,
+
+        /// Queries in `active` whose next step is `step`.
+        fn narrow(self: *const Self, active: Mask, depth: usize, step: Step) Mask {
+            var next: Mask = 0;
+            var it = active;
+            while (it != 0) : (it &= it - 1) {
+                const q = @ctz(it);
+                const s = self.steps[q].?;
+                if (depth < s.len and switch (s[depth]) {
+                    .key => |k| step == .key and std.mem.eql(u8, k, step.key),
+                    .index => |i| step == .index and i == step.index,
+                }) next |= @as(Mask, 1) << @intCast(q);
+            }
+            return next;
+        }
+
+        /// Store the value every query in `active` resolves to, given the value at `depth`.
+        fn resolve(self: *Self, value: std.json.Value, active: Mask, depth: usize) void {
+            var it = active;
+            while (it != 0) : (it &= it - 1) {
+                const q = @ctz(it);
+                self.out[q] = lookup(value, self.steps[q].?[depth..]);
+                self.pending &= ~(@as(Mask, 1) << @intCast(q));
+            }
+        }
+
+        fn endsHere(self: *const Self, active: Mask, depth: usize) bool {
+            var it = active;
+            while (it != 0) : (it &= it - 1) {
+                if (self.steps[@ctz(it)].?.len == depth) return true;
+            }
+            return false;
+        }
+    };
+}
+
+/// Fill `out[i]` with the value `queries[i]` selects in `blob`, `.null` when
+/// absent. Values may reference `blob` and `arena`. `msgpack` is the msgpack
+/// module, passed in so this file stays importable from any module.
+pub fn extract(
+    comptime msgpack: type,
+    arena: std.mem.Allocator,
+    format: Format,
+    blob: []const u8,
+    queries: []const []const u8,
+    out: []std.json.Value,
+) !void {
+    std.debug.assert(out.len == queries.len);
+    if (queries.len > max_queries) return error.TooManyQueries;
+    @memset(out, .null);
+
+    const steps = try arena.alloc(?[]const Step, queries.len);
+    var active: Mask = 0;
+    for (queries, steps, 0..) |q, *s, i| {
+        s.* = try parseQuery(arena, q);
+        if (s.* != null) active |= @as(Mask, 1) << @intCast(i);
+    }
+    if (active == 0) return;
+
+    switch (format) {
+        .json => {
+            var scanner = std.json.Scanner.initCompleteInput(arena, blob);
+            defer scanner.deinit();
+            var w: Walker(*std.json.Scanner) = .{ .arena = arena, .source = &scanner, .steps = steps, .out = out, .pending = active };
+            try walkJson(&w, active, 0);
+        },
+        .msgpack => {
+            var reader = std.Io.Reader.fixed(blob);
+            var scanner = msgpack.Scanner.init(&reader, arena);
+            defer scanner.deinit();
+            var w: Walker(*msgpack.Scanner) = .{ .arena = arena, .source = &scanner, .steps = steps, .out = out, .pending = active };
+            try walkMsgpack(msgpack, &w, try scanner.next(), active, 0);
+        },
+        .text => {
+            const text = std.mem.trim(u8, blob, &std.ascii.whitespace);
+            const value: std.json.Value = if (std.fmt.parseInt(i64, text, 10)) |i| .{ .integer = i } else |_| .{ .string = text };
+            for (steps, out) |s, *o| {
+                if (s != null and s.?.len == 0) o.* = value;
+            }
+        },
+    }
+}
+
+fn walkJson(w: *Walker(*std.json.Scanner), active: Mask, depth: usize) !void {
+    const s = w.source;
+    if (active == 0) return s.skipValue();
+    if (w.endsHere(active, depth)) {
+        const value = try std.json.Value.jsonParse(w.arena, s, .{ .max_value_len = s.input.len });
+        return w.resolve(value, active, depth);
+    }
+    switch (try s.peekNextTokenType()) {
+        .object_begin => {
+            _ = try s.next();
+            while (true) {
+                const key = switch (try s.nextAlloc(w.arena, .alloc_if_needed)) {
+                    .object_end => return,
+                    .string, .allocated_string => |k| k,
+                    else => return error.UnexpectedToken,
+                };
+                try walkJson(w, w.narrow(active, depth, .{ .key = key }), depth + 1);
+                if (w.pending == 0) return;
+            }
+        },
+        .array_begin => {
+            _ = try s.next();
+            var i: usize = 0;
+            while (try s.peekNextTokenType() != .array_end) : (i += 1) {
+                try walkJson(w, w.narrow(active, depth, .{ .index = i }), depth + 1);
+                if (w.pending == 0) return;
+            }
+            _ = try s.next();
+        },
+        else => try s.skipValue(),
+    }
+}
+
+fn walkMsgpack(comptime msgpack: type, w: *Walker(*msgpack.Scanner), tok: msgpack.Scanner.Token, active: Mask, depth: usize) !void {
+    const s = w.source;
+    if (active != 0 and w.endsHere(active, depth)) {
+        return w.resolve(try materialiseMsgpack(msgpack, w.arena, s, tok), active, depth);
+    }
+    switch (tok) {
+        .map_begin => while (true) {
+            const key = switch (try s.next()) {
+                .map_end => return,
+                .map_key => |k| try w.arena.dupe(u8, k),
+                else => return error.InvalidFormat,
+            };
+            try walkMsgpack(msgpack, w, try s.next(), w.narrow(active, depth, .{ .key = key }), depth + 1);
+            if (w.pending == 0) return;
+        },
+        .array_begin => {
+            var i: usize = 0;
+            while (true) : (i += 1) {
+                const item = try s.next();
+                if (item == .array_end) return;
+                try walkMsgpack(msgpack, w, item, w.narrow(active, depth, .{ .index = i }), depth + 1);
+                if (w.pending == 0) return;
+            }
+        },
+        .end, .array_end, .map_end, .map_key => return error.InvalidFormat,
+        else => {},
+    }
+}
+
+fn materialiseMsgpack(comptime msgpack: type, arena: std.mem.Allocator, s: *msgpack.Scanner, tok: msgpack.Scanner.Token) !std.json.Value {
+    return switch (tok) {
+        .nil => .null,
+        .boolean => |b| .{ .bool = b },
+        .uint => |u| if (std.math.cast(i64, u)) |i| .{ .integer = i } else .{ .number_string = try std.fmt.allocPrint(arena, "{d}", .{u}) },
+        .int => |i| .{ .integer = i },
+        .float => |f| .{ .float = f },
+        .string => |str| .{ .string = try arena.dupe(u8, str) },
+        .array_begin => |n| blk: {
+            var arr = try std.json.Array.initCapacity(arena, n);
+            while (true) {
+                const item = try s.next();
+                if (item == .array_end) break;
+                try arr.append(try materialiseMsgpack(msgpack, arena, s, item));
+            }
+            break :blk .{ .array = arr };
+        },
+        .map_begin => blk: {
+            var obj: std.json.ObjectMap = .empty;
+            while (true) {
+                const key = switch (try s.next()) {
+                    .map_end => break,
+                    .map_key => |k| try arena.dupe(u8, k),
+                    else => return error.InvalidFormat,
+                };
+                try obj.put(arena, key, try materialiseMsgpack(msgpack, arena, s, try s.next()));
+            }
+            break :blk .{ .object = obj };
+        },
+        .end, .array_end, .map_end, .map_key => error.InvalidFormat,
+    };
+}
+
+fn expectExtract(format: Format, blob: []const u8, queries: []const []const u8, expected: []const u8) !void {
+    var arena_state = std.heap.ArenaAllocator.init(std.testing.allocator);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    const out = try arena.alloc(std.json.Value, queries.len);
+    try extract(@import("msgpack.zig"), arena, format, blob, queries, out);
+    const got = try std.json.Stringify.valueAlloc(arena, out, .{});
+    try std.testing.expectEqualStrings(expected, got);
+}
+
+test "json queries" {
+    const blob =
+        \\{"caption":"a very long caption \"quoted\"","size":{"w":3,"h":[4,5]},"tags":["x","y"],"id":7}
+    ;
+    try expectExtract(.json, blob, &.{ ".id", ".size.w", ".size.h[1]", ".tags[1]", ".missing", ".tags[9]" },
+        \\[7,3,5,"y",null,null]
+    );
+    try expectExtract(.json, blob, &.{ ".size", ".size.w" },
+        \\[{"w":3,"h":[4,5]},3]
+    );
+    try expectExtract(.json, "[1,{\"a\":2}]", &.{ "[1].a", "" },
+        \\[2,[1,{"a":2}]]
+    );
+    try expectExtract(.json, "{\"a\":1}", &.{".a[x]"}, "[null]");
+}
+
+test "json scan stops once all queries are found" {
+    try expectExtract(.json, "{\"id\":1,\"rest\":[ this is not json", &.{".id"}, "[1]");
+}
+
+test "msgpack queries" {
+    const msgpack = @import("msgpack.zig");
+    var buf: std.Io.Writer.Allocating = .init(std.testing.allocator);
+    defer buf.deinit();
+    var pack: msgpack.Packer = .{ .writer = &buf.writer };
+    try pack.beginMap(3);
+    try pack.addStr("caption");
+    try pack.addStr("long text");
+    try pack.addStr("size");
+    try pack.beginArray(2);
+    try pack.addInt(u32, 640);
+    try pack.addInt(u32, 480);
+    try pack.addStr("nsfw");
+    try pack.addBool(false);
+
+    try expectExtract(.msgpack, buf.written(), &.{ ".size[0]", ".nsfw", ".size", ".nope" },
+        \\[640,false,[640,480],null]
+    );
+}
+
+test "text labels" {
+    try expectExtract(.text, "4888\n", &.{ "", ".x" }, "[4888,null]");
+    try expectExtract(.text, "  a cat \n", &.{"."}, "[\"a cat\"]");
+    try std.testing.expectEqual(Format.json, formatForKey(".meta.json"));
+    try std.testing.expectEqual(Format.msgpack, formatForKey(".mpk"));
+    try std.testing.expectEqual(Format.text, formatForKey(".cls"));
+    try std.testing.expectEqual(Format.text, formatForKey(".label.txt"));
+}
+
+test "json is the default for members without a known suffix" {
+    try std.testing.expectEqual(Format.json, formatForKey(".meta"));
+    try std.testing.expectEqual(Format.json, formatForKey(".info"));
+    try expectExtract(formatForKey(".meta"), "{\"size\":{\"w\":640}}", &.{".size.w"}, "[640]");
+}
@@ -0,0 +1,265 @@
+//! Row-granular partitioning of a set of shards across ranks, resumable at a
+//! different world size.
+//!
+//! Each epoch lays the shards' rows end to end, in a shard order shuffled by
+//! the epoch, as one global row space. A `Cursor` holds what is left of that
+//! space as sorted, disjoint intervals; an epoch starts with all of it. Rank
+//! `r` of `world_size` takes the `r`-th equal slice of the remaining rows, and
+//! `assign` maps that slice back to `(shard, start_row, end_row)` spans in
+//! read order, so each rank reads sequentially within every span.
+//!
+//! Ranks step in lockstep, so once each has read `consumed` rows of its slice
+//! `advance` derives the next cursor from that one number. A job restarted at
+//! another `world_size` slices the cursor it checkpointed and goes on without
+//! repeating or skipping a row.
+
+const std = @import("std");
+
+pub const Interval = struct {
+    lo: u64,
+    hi: u64,
+
+    fn len(self: Interval) u64 {
+        return self.hi - self.lo;
+    }
+};
+
+pub const Span = struct {
+    shard: usize,
+    start_row: u64,
+    end_row: u64,
+};
+
+pub const Cursor = struct {
+    epoch: u64,
+    /// Global row positions still to read, sorted and disjoint.
+    remaining: []const Interval,
+};
+
+pub const Error = error{ InvalidRank, InvalidCursor, OutOfMemory };
+
+/// Fill `order` with the shard visiting order for `epoch`. Checkpointed
+/// cursors depend on it, so this must not change between releases.
+pub fn shardOrder(order: []usize, epoch: u64) void {
+    for (order, 0..) |*o, i| o.* = i;
+    // splitmix64 feeding a Fisher-Yates shuffle.
+    var state = epoch;
+    var i = order.len;
+    while (i > 1) : (i -= 1) {
+        state +%= 0x9e3779b97f4a7c15;
+        var z = state;
+        z = (z ^ (z >> 30)) *% 0xbf58476d1ce4e5b9;
+        z = (z ^ (z >> 27)) *% 0x94d049bb133111eb;
+        z ^= z >> 31;
+        std.mem.swap(usize, &order[i - 1], &order[z % i]);
+    }
+}
+
+pub fn totalRows(rows: []const u64) u64 {
+    var total: u64 = 0;
+    for (rows) |r| total += r;
+    return total;
+}
+
+fn remainingRows(remaining: []const Interval) u64 {
+    var n: u64 = 0;
+    for (remaining) |iv| n += iv.len();
+    return n;
+}
+
+fn checkCursor(remaining: []const Interval, total: u64) Error!void {
+    var prev: u64 = 0;
+    for (remaining) |iv| {
+        if (iv.lo < prev or iv.hi < iv.lo or iv.hi > total) return error.InvalidCursor;
+        prev = iv.hi;
+    }
+}
+
+/// Rank `rank`'s slice `[lo, hi)` of `n` remaining rows, counted in read order.
+fn rankSlice(n: u64, rank: usize, world_size: usize) Interval {
+    const lo: u128 = @as(u128, n) * rank / world_size;
+    const hi: u128 = @as(u128, n) * (rank + 1) / world_size;
+    return .{ .lo = @intCast(lo), .hi = @intCast(hi) };
+}
+
+/// Append the global intervals holding remaining rows `[a, b)` (counted in
+/// read order), merging with the last one when they touch.
+fn appendGlobal(alloc: std.mem.Allocator, out: *std.ArrayList(Interval), remaining: []const Interval, a: u64, b: u64) !void {
+    var seen: u64 = 0;
+    for (remaining) |iv| {
+        if (seen >= b) break;
+        const next = seen + iv.len();
+        defer seen = next;
+        if (next <= a) continue;
+        const piece: Interval = .{
+            .lo = iv.lo + (@max(a, seen) - seen),
+            .hi = iv.lo + (@min(b, next) - seen),
+        };
+        if (piece.lo == piece.hi) continue;
+        if (out.items.len > 0 and out.items[out.items.len - 1].hi == piece.lo) {
+            out.items[out.items.len - 1].hi = piece.hi;
+        } else {
+            try out.append(alloc, piece);
+        }
+    }
+}
+
+/// Spans for `rank` of `world_size` over shards with `rows[i]` rows each.
+/// Shard indices refer to `rows`. Caller owns the result.
+pub fn assign(alloc: std.mem.Allocator, rows: []const u64, cursor: Cursor, rank: usize, world_size: usize) Error![]Span {
+    if (world_size == 0 or rank >= world_size) return error.InvalidRank;
+    try checkCursor(cursor.remaining, totalRows(rows));
+
+    const slice = rankSlice(remainingRows(cursor.remaining), rank, world_size);
+    var global: std.ArrayList(Interval) = .empty;
+    defer global.deinit(alloc);
+    try appendGlobal(alloc, &global, cursor.remaining, slice.lo, slice.hi);
+
+    const order = try alloc.alloc(usize, rows.len);
+    defer alloc.free(order);
+    shardOrder(order, cursor.epoch);
+
+    var spans: std.ArrayList(Span) = .empty;
+    errdefer spans.deinit(alloc);
+    // Both `global` and the shard layout are sorted, so one pass covers them.
+    var j: usize = 0;
+    var shard_start: u64 = 0;
+    for (global.items) |iv| {
+        while (j < order.len and shard_start + rows[order[j]] <= iv.lo) : (j += 1) shard_start += rows[order[j]];
+        var k = j;
+        var start = shard_start;
+        while (k < order.len and start < iv.hi) : (k += 1) {
+            const shard_end = start + rows[order[k]];
+            const lo = @max(iv.lo, start);
+            const hi = @min(iv.hi, shard_end);
+            if (lo < hi) {
+                const span: Span = .{ .shard = order[k], .start_row = lo - start, .end_row = hi - start };
+                const last = if (spans.items.len > 0) &spans.items[spans.items.len - 1] else null;
+                if (last != null and last.?.shard == span.shard and last.?.end_row == span.start_row) {
+                    last.?.end_row = span.end_row;
+                } else {
+                    try spans.append(alloc, span);
+                }
+            }
+            start = shard_end;
+        }
+    }
+    return spans.toOwnedSlice(alloc);
+}
+
+/// What remains of `remaining` after every rank of `world_size` has read the
+/// first `consumed` rows of its slice. Caller owns the result.
+pub fn advance(alloc: std.mem.Allocator, remaining: []const Interval, world_size: usize, consumed: u64) Error![]Interval {
+    if (world_size == 0) return error.InvalidRank;
+    try checkCursor(remaining, std.math.maxInt(u64));
+
+    const n = remainingRows(remaining);
+    var out: std.ArrayList(Interval) = .empty;
+    errdefer out.deinit(alloc);
+    for (0..world_size) |rank| {
+        const slice = rankSlice(n, rank, world_size);
+        try appendGlobal(alloc, &out, remaining, slice.lo +| consumed, slice.hi);
+    }
+    return out.toOwnedSlice(alloc);
+}
+
+const testing = std.testing;
+
+fn expectSpans(expected: []const Span, actual: []const Span) !void {
+    try testing.expectEqualSlices(Span, expected, actual);
+}
+
+test "ranks cover every row once" {
+    const alloc = testing.allocator;
+    const rows = [_]u64{ 7, 0, 13, 5, 1 };
+    const all = [_]Interval{.{ .lo = 0, .hi = totalRows(&rows) }};
+
+    for ([_]usize{ 1, 2, 3, 8, 40 }) |world_size| {
+        var seen = [_][13]bool{[_]bool{false} ** 13} ** rows.len;
+        for (0..world_size) |rank| {
+            const spans = try assign(alloc, &rows, .{ .epoch = 3, .remaining = &all }, rank, world_size);
+            defer alloc.free(spans);
+            for (spans) |s| {
+                try testing.expect(s.start_row < s.end_row and s.end_row <= rows[s.shard]);
+                for (s.start_row..s.end_row) |r| {
+                    try testing.expect(!seen[s.shard][r]);
+                    seen[s.shard][r] = true;
+                }
+            }
+        }
+        for (rows, seen) |n, s| for (s[0..n]) |b| try testing.expect(b);
+    }
+}
+
+test "epoch changes the shard order" {
+    var a: [16]usize = undefined;
+    var b: [16]usize = undefined;
+    shardOrder(&a, 0);
+    shardOrder(&b, 1);
+    try testing.expect(!std.mem.eql(usize, &a, &b));
+    std.mem.sort(usize, &a, {}, std.sort.asc(usize));
+    for (a, 0..) |v, i| try testing.expectEqual(i, v);
+}
+
+test "resume at a new world size" {
+    const alloc = testing.allocator;
+    const rows = [_]u64{ 10, 10, 10, 10 };
+    const total = totalRows(&rows);
+    const start = [_]Interval{.{ .lo = 0, .hi = total }};
+
+    // 4 ranks read 3 rows each, then the job comes back with 3 ranks.
+    const rest = try advance(alloc, &start, 4, 3);
+    defer alloc.free(rest);
+    try testing.expectEqualSlices(Interval, &.{
+        .{ .lo = 3, .hi = 10 },
+        .{ .lo = 13, .hi = 20 },
+        .{ .lo = 23, .hi = 30 },
+        .{ .lo = 33, .hi = 40 },
+    }, rest);
+
+    var read = [_]bool{false} ** 40;
+    for (0..4) |rank| {
+        const spans = try assign(alloc, &rows, .{ .epoch = 0, .remaining = &start }, rank, 4);
+        defer alloc.free(spans);
+        try testing.expectEqual(@as(usize, 1), spans.len);
+        for (spans[0].start_row..spans[0].start_row + 3) |r| read[spans[0].shard * 10 + r] = true;
+    }
+    for (0..3) |rank| {
+        const spans = try assign(alloc, &rows, .{ .epoch = 0, .remaining = rest }, rank, 3);
+        defer alloc.free(spans);
+        for (spans) |s| for (s.start_row..s.end_row) |r| {
+            try testing.expect(!read[s.shard * 10 + r]);
+            read[s.shard * 10 + r] = true;
+        };
+    }
+    for (read) |b| try testing.expect(b);
+
+    // Reading past the end of a slice just empties it.
+    const done = try advance(alloc, rest, 3, 100);
+    defer alloc.free(done);
+    try testing.expectEqual(@as(usize, 0), done.len);
+}
+
+test "spans stay sequential within a shard" {
+    const alloc = testing.allocator;
+    const rows = [_]u64{100};
+    const remaining = [_]Interval{ .{ .lo = 10, .hi = 20 }, .{ .lo = 20, .hi = 30 }, .{ .lo = 50, .hi = 60 } };
+    const spans = try assign(alloc, &rows, .{ .epoch = 0, .remaining = &remaining }, 0, 1);
+    defer alloc.free(spans);
+    try expectSpans(&.{
+        .{ .shard = 0, .start_row = 10, .end_row = 30 },
+        .{ .shard = 0, .start_row = 50, .end_row = 60 },
+    }, spans);
+}
+
+test "bad arguments" {
+    const alloc = testing.allocator;
+    const rows = [_]u64{5};
+    const all = [_]Interval{.{ .lo = 0, .hi = 5 }};
+    try testing.expectError(error.InvalidRank, assign(alloc, &rows, .{ .epoch = 0, .remaining = &all }, 2, 2));
+    try testing.expectError(error.InvalidRank, advance(alloc, &all, 0, 1));
+    const past_end = [_]Interval{.{ .lo = 0, .hi = 6 }};
+    try testing.expectError(error.InvalidCursor, assign(alloc, &rows, .{ .epoch = 0, .remaining = &past_end }, 0, 1));
+    const unsorted = [_]Interval{ .{ .lo = 3, .hi = 4 }, .{ .lo = 1, .hi = 2 } };
+    try testing.expectError(error.InvalidCursor, advance(alloc, &unsorted, 1, 1));
+}
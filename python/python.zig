@@ -6,7 +6,8 @@
 //! module object
 //! `-- ModuleState
 //!     |-- data_loader_type: ?*PyTypeObject
-//!     `-- loaded_row_type: ?*PyTypeObject
+//!     |-- loaded_row_type: ?*PyTypeObject
+//!     `-- mixer_type: ?*PyTypeObject
 //!
 //! DataLoaderObject
 //! |-- ob_base: PyObject          (refcount managed by Python)
@@ -32,7 +33,11 @@
 //!   It also caches its heap type pointer for the same dealloc rule. On dealloc,
 //!   it reclaims the native row to the parent's loader, then decrefs parent.
 //!
-//! - No reference cycles: LoadedRow → DataLoader (one-way ownership).
+//! - `MixerObject`: Holds incref'd references to its source `DataLoaderObject`s.
+//!   Rows it yields are parented to the source they came from, so they reclaim
+//!   to the right loader and outlive the mixer if needed.
+//!
+//! - No reference cycles: LoadedRow → DataLoader ← Mixer (one-way ownership).
 //!
 //! ## Error Handling Pattern
 //!
@@ -43,6 +48,10 @@
 //! ## Thread Safety
 //!
 //! - `ultarNextRow` releases the GIL during blocking I/O.
+//! - `ultarAsyncTryNext` never blocks on I/O, so it runs with the GIL held.
+//! - `ultarAsyncNext` blocks and releases the GIL; `Mixer` calls it only in
+//!   deterministic mode. Otherwise it polls every source's readiness fd with the
+//!   GIL released until one has a row.
 //! - `ultarReclaimRow` is called with GIL held (from `tp_dealloc`).
 //! - Native row buffer pool is protected by `row_buf_mutex` in `LuaDataLoader`.
 
@@ -53,6 +62,9 @@ const lua_dataloader = @import("lua_dataloader");
 const LuaLoaderSpec = lua_dataloader.LuaLoaderSpec;
 const LuaLoaderCCtx = lua_dataloader.LuaLoaderCCtx;
 const LoadedRow = lua_dataloader.LoadedRow;
+const Mixer = lua_dataloader.Mixer;
+const BatchIndexer = lua_dataloader.BatchIndexer;
+const partition = lua_dataloader.partition;
 
 // Import Python C API using official headers
 // We use Py_LIMITED_API 0x030b0000 (Python 3.11+) which includes Py_buffer in stable ABI
@@ -97,6 +109,7 @@ inline fn isDict(obj: ?*py.PyObject) bool {
 const ModuleState = struct {
     data_loader_type: ?*py.PyTypeObject = null,
     loaded_row_type: ?*py.PyTypeObject = null,
+    mixer_type: ?*py.PyTypeObject = null,
 };
 
 inline fn moduleState(module: *py.PyObject) *ModuleState {
@@ -125,6 +138,16 @@ const DataLoaderObject = extern struct {
     ob_base: py.PyObject,
     typ: ?*py.PyTypeObject,
     loader: ?*LuaLoaderCCtx,
+    // Buffers from `register_buffers`; null until the first call.
+    staging: ?*StagingViews,
+};
+
+/// Buffers exported to `register_buffers`, released once the native loader
+/// (and with it every row that could read into them) is gone.
+const StagingViews = struct {
+    views: std.ArrayList(py.Py_buffer) = .empty,
+    // Position of each view in the `register_buffers` call that added it.
+    indices: std.ArrayList(u32) = .empty,
 };
 
 // Our LoadedRow object (represents a single row from the dataloader)
@@ -133,6 +156,19 @@ const LoadedRowObject = extern struct {
     typ: ?*py.PyTypeObject,
     parent: ?*DataLoaderObject, // Keep reference to parent
     row: ?*LoadedRow,
+    // Entry exported by the next buffer request; set only inside `view()`.
+    view_index: py.Py_ssize_t,
+};
+
+// Our Mixer object (weighted interleaving of several DataLoaders)
+const MixerObject = extern struct {
+    ob_base: py.PyObject,
+    typ: ?*py.PyTypeObject,
+    sources: ?[*]*DataLoaderObject,
+    num_sources: usize,
+    mixer: ?*Mixer,
+    // Readiness fd of each source; -1 once it is exhausted.
+    poll_fds: ?[*]std.posix.pollfd,
 };
 
 // Slot definitions for DataLoader type
@@ -142,6 +178,7 @@ const DataLoader_slots = [_]py.PyType_Slot{
     .{ .slot = py.Py_tp_repr, .pfunc = @ptrCast(@constCast(&dataLoaderRepr)) },
     .{ .slot = py.Py_tp_iter, .pfunc = @ptrCast(@constCast(&dataLoaderIter)) },
     .{ .slot = py.Py_tp_iternext, .pfunc = @ptrCast(@constCast(&dataLoaderNext)) },
+    .{ .slot = py.Py_tp_methods, .pfunc = @ptrCast(@constCast(&DataLoader_methods)) },
     .{ .slot = py.Py_tp_doc, .pfunc = @ptrCast(@constCast("Ultar DataLoader - async Lua-scripted data loading")) },
     zeros(py.PyType_Slot), // Sentinel
 };
@@ -162,6 +199,7 @@ const LoadedRow_slots = [_]py.PyType_Slot{
     .{ .slot = py.Py_sq_length, .pfunc = @ptrCast(@constCast(&loadedRowLen)) },
     .{ .slot = py.Py_mp_length, .pfunc = @ptrCast(@constCast(&loadedRowLen)) },
     .{ .slot = py.Py_mp_subscript, .pfunc = @ptrCast(@constCast(&loadedRowSubscript)) },
+    .{ .slot = py.Py_bf_getbuffer, .pfunc = @ptrCast(@constCast(&loadedRowGetBuffer)) },
     .{ .slot = py.Py_tp_doc, .pfunc = @ptrCast(@constCast("LoadedRow - a row of data from the DataLoader")) },
     zeros(py.PyType_Slot), // Sentinel
 };
@@ -174,7 +212,64 @@ var LoadedRow_spec = py.PyType_Spec{
     .slots = @ptrCast(@constCast(&LoadedRow_slots)),
 };
 
+// Slot definitions for Mixer type
+const Mixer_slots = [_]py.PyType_Slot{
+    .{ .slot = py.Py_tp_new, .pfunc = @ptrCast(@constCast(&mixerNew)) },
+    .{ .slot = py.Py_tp_dealloc, .pfunc = @ptrCast(@constCast(&mixerDealloc)) },
+    .{ .slot = py.Py_tp_iter, .pfunc = @ptrCast(@constCast(&dataLoaderIter)) },
+    .{ .slot = py.Py_tp_iternext, .pfunc = @ptrCast(@constCast(&mixerNext)) },
+    .{ .slot = py.Py_tp_methods, .pfunc = @ptrCast(@constCast(&Mixer_methods)) },
+    .{ .slot = py.Py_tp_doc, .pfunc = @ptrCast(@constCast("Mixer - weighted interleaving of DataLoaders")) },
+    zeros(py.PyType_Slot), // Sentinel
+};
+
+var Mixer_spec = py.PyType_Spec{
+    .name = "ultar_dataloader._native.Mixer",
+    .basicsize = @sizeOf(MixerObject),
+    .itemsize = 0,
+    .flags = py.Py_TPFLAGS_DEFAULT,
+    .slots = @ptrCast(@constCast(&Mixer_slots)),
+};
+
 // Method definitions
+const Mixer_methods = [_]py.PyMethodDef{
+    .{
+        .ml_name = "stats",
+        .ml_meth = @ptrCast(&mixerStats),
+        .ml_flags = py.METH_NOARGS,
+        .ml_doc = "Return per-source stats as a list of dicts",
+    },
+    zeros(py.PyMethodDef),
+};
+
+const DataLoader_methods = [_]py.PyMethodDef{
+    .{
+        .ml_name = "_async_fd",
+        .ml_meth = @ptrCast(&dataLoaderAsyncFd),
+        .ml_flags = py.METH_NOARGS,
+        .ml_doc = "Switch to async mode and return a fd that is readable when rows are ready",
+    },
+    .{
+        .ml_name = "_try_next",
+        .ml_meth = @ptrCast(&dataLoaderTryNext),
+        .ml_flags = py.METH_NOARGS,
+        .ml_doc = "Return the next ready row, or None if none is ready yet",
+    },
+    .{
+        .ml_name = "_dump_trace",
+        .ml_meth = @ptrCast(&dataLoaderDumpTrace),
+        .ml_flags = py.METH_O,
+        .ml_doc = "Write the pipeline trace to a path in Chrome trace format",
+    },
+    .{
+        .ml_name = "register_buffers",
+        .ml_meth = @ptrCast(&dataLoaderRegisterBuffers),
+        .ml_flags = py.METH_VARARGS,
+        .ml_doc = "Have reads for a key land in the given writable buffers",
+    },
+    zeros(py.PyMethodDef),
+};
+
 const LoadedRow_methods = [_]py.PyMethodDef{
     .{
         .ml_name = "keys",
@@ -194,6 +289,18 @@ const LoadedRow_methods = [_]py.PyMethodDef{
         .ml_flags = py.METH_NOARGS,
         .ml_doc = "Return dict mapping keys to bytes",
     },
+    .{
+        .ml_name = "view",
+        .ml_meth = @ptrCast(&loadedRowView),
+        .ml_flags = py.METH_O,
+        .ml_doc = "Return a read-only memoryview of one entry, without copying",
+    },
+    .{
+        .ml_name = "staged",
+        .ml_meth = @ptrCast(&loadedRowStaged),
+        .ml_flags = py.METH_O,
+        .ml_doc = "Return the index of the registered buffer an entry was read into, or None",
+    },
     zeros(py.PyMethodDef),
 };
 
@@ -287,6 +394,7 @@ fn dataLoaderNewImpl(
     rank: c_uint,
     world_size: c_uint,
     debug: bool,
+    trace: bool,
 ) PyError!*DataLoaderObject {
     // Get and copy src string
     var src_len: py.Py_ssize_t = 0;
@@ -310,6 +418,7 @@ fn dataLoaderNewImpl(
         .config_keys = if (config) |c| @ptrCast(c.keys.ptr) else null,
         .config_values = if (config) |c| @ptrCast(c.values.ptr) else null,
         .config_count = if (config) |c| @intCast(c.keys.len) else 0,
+        .trace = trace,
     };
 
     // Allocate Python object
@@ -320,6 +429,7 @@ fn dataLoaderNewImpl(
     const self: *DataLoaderObject = @ptrCast(@alignCast(self_obj));
     self.typ = typ;
     self.loader = null;
+    self.staging = null;
     errdefer freeHeapTypeInstance(self.typ, self_obj);
 
     // Release GIL during heavy initialization
@@ -343,19 +453,21 @@ fn dataLoaderNew(typ: ?*py.PyTypeObject, args: ?*py.PyObject, kwargs: ?*py.PyObj
     var rank: c_uint = 0;
     var world_size: c_uint = 1;
     var debug: c_int = 0;
+    var trace: c_int = 0;
 
-    const kwlist = [_:null]?[*:0]const u8{ "src", "config", "rank", "world_size", "debug", null };
+    const kwlist = [_:null]?[*:0]const u8{ "src", "config", "rank", "world_size", "debug", "trace", null };
 
     if (py.PyArg_ParseTupleAndKeywords(
         args,
         kwargs,
-        "O|OIIp",
+        "O|OIIpp",
         @ptrCast(@constCast(&kwlist)),
         &src_obj,
         &config_obj,
         &rank,
         &world_size,
         &debug,
+        &trace,
     ) == 0) {
         return null;
     }
@@ -372,6 +484,7 @@ fn dataLoaderNew(typ: ?*py.PyTypeObject, args: ?*py.PyObject, kwargs: ?*py.PyObj
         rank,
         world_size,
         debug != 0,
+        trace != 0,
     ) catch |err| {
         switch (err) {
             error.PythonException => {},
@@ -390,6 +503,13 @@ fn dataLoaderClear(self: *DataLoaderObject) void {
         self.loader = null;
         lua_dataloader.ultarDestroyLuaLoader(loader);
     }
+    if (self.staging) |st| {
+        self.staging = null;
+        for (st.views.items) |*v| py.PyBuffer_Release(v);
+        st.views.deinit(std.heap.c_allocator);
+        st.indices.deinit(std.heap.c_allocator);
+        std.heap.c_allocator.destroy(st);
+    }
 }
 
 fn dataLoaderDealloc(self_obj: ?*py.PyObject) callconv(.c) void {
@@ -441,6 +561,153 @@ fn dataLoaderNext(self_obj: ?*py.PyObject) callconv(.c) ?*py.PyObject {
     };
 }
 
+fn dataLoaderAsyncFd(self_obj: ?*py.PyObject, _: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *DataLoaderObject = @ptrCast(@alignCast(self_obj));
+    const loader = self.loader orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader not initialized");
+        return null;
+    };
+    const fd = lua_dataloader.ultarAsyncStart(loader);
+    if (fd < 0) {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "Failed to start async iteration");
+        return null;
+    }
+    return py.PyLong_FromLong(fd);
+}
+
+fn dataLoaderDumpTrace(self_obj: ?*py.PyObject, path_obj: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *DataLoaderObject = @ptrCast(@alignCast(self_obj));
+    const loader = self.loader orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader not initialized");
+        return null;
+    };
+    if (!isUnicode(path_obj)) {
+        py.PyErr_SetString(py.PyExc_TypeError, "path must be a string");
+        return null;
+    }
+    var path_len: py.Py_ssize_t = 0;
+    const path = py.PyUnicode_AsUTF8AndSize(path_obj, &path_len) orelse return null;
+
+    const gil_state = py.PyEval_SaveThread();
+    const rc = lua_dataloader.ultarDumpTrace(loader, @ptrCast(path));
+    py.PyEval_RestoreThread(gil_state);
+    switch (rc) {
+        0 => {},
+        1 => {
+            py.PyErr_SetString(py.PyExc_RuntimeError, "Tracing is off; pass trace=True or set ULTAR_TRACE=1");
+            return null;
+        },
+        else => {
+            py.PyErr_SetString(py.PyExc_OSError, "Failed to write trace");
+            return null;
+        },
+    }
+    py.Py_IncRef(py.Py_None());
+    return py.Py_None();
+}
+
+fn registerBuffersImpl(self: *DataLoaderObject, key_obj: *py.PyObject, bufs_obj: *py.PyObject) PyError!void {
+    const loader = self.loader orelse return error.RuntimeError;
+    if (!isUnicode(key_obj)) return error.TypeError;
+    const key = py.PyUnicode_AsUTF8AndSize(key_obj, null) orelse return error.PythonException;
+    const n_signed = py.PySequence_Size(bufs_obj);
+    if (n_signed < 0) return error.PythonException;
+    const n: usize = @intCast(n_signed);
+
+    const alloc = std.heap.c_allocator;
+    const staging = self.staging orelse blk: {
+        const st = try alloc.create(StagingViews);
+        st.* = .{};
+        self.staging = st;
+        break :blk st;
+    };
+    try staging.views.ensureUnusedCapacity(alloc, n);
+    try staging.indices.ensureUnusedCapacity(alloc, n);
+    const first = staging.views.items.len;
+    // Give back what this call exported if the loader turns it down.
+    errdefer {
+        for (staging.views.items[first..]) |*v| py.PyBuffer_Release(v);
+        staging.views.shrinkRetainingCapacity(first);
+        staging.indices.shrinkRetainingCapacity(first);
+    }
+    for (0..n) |i| {
+        const item = py.PySequence_GetItem(bufs_obj, @intCast(i)) orelse return error.PythonException;
+        defer py.Py_DecRef(item);
+        var view: py.Py_buffer = undefined;
+        if (py.PyObject_GetBuffer(item, &view, py.PyBUF_WRITABLE | py.PyBUF_C_CONTIGUOUS) != 0) return error.PythonException;
+        staging.views.appendAssumeCapacity(view);
+        staging.indices.appendAssumeCapacity(@intCast(i));
+    }
+
+    var arena_state = std.heap.ArenaAllocator.init(alloc);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+    const ptrs = try arena.alloc([*]u8, n);
+    const lens = try arena.alloc(u64, n);
+    for (ptrs, lens, staging.views.items[first..]) |*p, *len, v| {
+        p.* = @ptrCast(v.buf orelse return error.TypeError);
+        len.* = @intCast(v.len);
+    }
+    switch (lua_dataloader.ultarRegisterStaging(loader, @ptrCast(key), ptrs.ptr, lens.ptr, n)) {
+        0 => {},
+        1 => {
+            py.PyErr_SetString(py.PyExc_RuntimeError, "register_buffers must be called before iterating");
+            return error.PythonException;
+        },
+        2 => {
+            py.PyErr_SetString(py.PyExc_ValueError, "key already has buffers, or not between 1 and 64 buffers given");
+            return error.PythonException;
+        },
+        else => return error.OutOfMemory,
+    }
+}
+
+fn dataLoaderRegisterBuffers(self_obj: ?*py.PyObject, args: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *DataLoaderObject = @ptrCast(@alignCast(self_obj));
+    var key_obj: ?*py.PyObject = null;
+    var bufs_obj: ?*py.PyObject = null;
+    if (py.PyArg_ParseTuple(args, "OO", &key_obj, &bufs_obj) == 0) return null;
+
+    registerBuffersImpl(self, key_obj.?, bufs_obj.?) catch |err| {
+        setPyError(err, "Failed to register buffers");
+        return null;
+    };
+    py.Py_IncRef(py.Py_None());
+    return py.Py_None();
+}
+
+fn dataLoaderTryNext(self_obj: ?*py.PyObject, _: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *DataLoaderObject = @ptrCast(@alignCast(self_obj));
+    const loader = self.loader orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader not initialized");
+        return null;
+    };
+
+    var status: c_int = 0;
+    const row = lua_dataloader.ultarAsyncTryNext(loader, &status) orelse {
+        switch (status) {
+            1 => {
+                py.Py_IncRef(py.Py_None());
+                return py.Py_None();
+            },
+            2 => py.PyErr_SetNone(py.PyExc_StopAsyncIteration),
+            else => py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader row generator failed"),
+        }
+        return null;
+    };
+
+    return wrapOwnedRow(self, row) catch |err| {
+        lua_dataloader.ultarReclaimRow(loader, row);
+        switch (err) {
+            error.PythonException => {},
+            error.RuntimeError => py.PyErr_SetString(py.PyExc_RuntimeError, "Failed to create LoadedRow"),
+            error.TypeError => py.PyErr_SetString(py.PyExc_TypeError, "Type error creating LoadedRow"),
+            error.OutOfMemory => py.PyErr_SetString(py.PyExc_MemoryError, "Out of memory"),
+        }
+        return null;
+    };
+}
+
 /// Wrap a native LoadedRow in a Python object. **Takes ownership of `row`.**
 ///
 /// On success: The returned Python object owns `row` and will reclaim it on dealloc.
@@ -458,6 +725,7 @@ fn wrapOwnedRow(parent: *DataLoaderObject, row: *LoadedRow) PyError!*py.PyObject
     row_obj.row = null;
     row_obj.parent = parent;
     row_obj.row = row;
+    row_obj.view_index = -1;
 
     // Keep parent alive
     py.Py_IncRef(@ptrCast(parent));
@@ -518,14 +786,8 @@ fn getEntryBytes(row: *LoadedRow, idx: usize) ?*py.PyObject {
     return py.PyBytes_FromStringAndSize(@ptrCast(data_ptr), size);
 }
 
-fn loadedRowSubscript(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c) ?*py.PyObject {
-    const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj));
-
-    const row = self.row orelse {
-        py.PyErr_SetString(py.PyExc_RuntimeError, "LoadedRow not initialized");
-        return null;
-    };
-
+/// Index of the entry `key` (an int or a str) names, or null with an exception set.
+fn entryIndex(row: *LoadedRow, key: ?*py.PyObject) ?usize {
     // Check if key is an integer (index access)
     if (isLong(key)) {
         var idx = py.PyLong_AsSsize_t(key);
@@ -536,7 +798,7 @@ fn loadedRowSubscript(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c)
             py.PyErr_SetString(py.PyExc_IndexError, "index out of range");
             return null;
         }
-        return getEntryBytes(row, @intCast(idx));
+        return @intCast(idx);
     }
 
     // String key access
@@ -553,7 +815,7 @@ fn loadedRowSubscript(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c)
         const entry_key: [*:0]const u8 = @ptrCast(row.keys[i]);
         const entry_key_slice = std.mem.span(entry_key);
         if (std.mem.eql(u8, entry_key_slice, key_slice)) {
-            return getEntryBytes(row, i);
+            return i;
         }
     }
 
@@ -561,6 +823,71 @@ fn loadedRowSubscript(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c)
     return null;
 }
 
+fn loadedRowSubscript(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj));
+
+    const row = self.row orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "LoadedRow not initialized");
+        return null;
+    };
+
+    return getEntryBytes(row, entryIndex(row, key) orelse return null);
+}
+
+/// `row.view(key)`: a memoryview straight over the entry's data, which is
+/// the row buffer or, in mmap mode, the mapped shard. The memoryview holds a
+/// reference to the row, so the data stays valid until both are gone.
+fn loadedRowView(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj.?));
+
+    const row = self.row orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "LoadedRow not initialized");
+        return null;
+    };
+
+    self.view_index = @intCast(entryIndex(row, key) orelse return null);
+    defer self.view_index = -1;
+    return py.PyMemoryView_FromObject(self_obj);
+}
+
+/// `row.staged(key)`: position of the `register_buffers` buffer the entry was
+/// read into, or None when it sits in the row's own memory. Found by address;
+/// staged entries always start at their buffer's start.
+fn loadedRowStaged(self_obj: ?*py.PyObject, key: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj.?));
+
+    const row = self.row orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "LoadedRow not initialized");
+        return null;
+    };
+    const i = entryIndex(row, key) orelse return null;
+    const data: ?*anyopaque = @ptrCast(@constCast(row.data[i]));
+    if (self.parent.?.staging) |st| {
+        for (st.views.items, st.indices.items) |v, index| {
+            if (v.buf == data) return py.PyLong_FromUnsignedLong(index);
+        }
+    }
+    py.Py_IncRef(py.Py_None());
+    return py.Py_None();
+}
+
+fn loadedRowGetBuffer(self_obj: ?*py.PyObject, view: ?*py.Py_buffer, flags: c_int) callconv(.c) c_int {
+    const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj.?));
+
+    const row = self.row orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "LoadedRow not initialized");
+        return -1;
+    };
+    if (self.view_index < 0) {
+        py.PyErr_SetString(py.PyExc_BufferError, "use LoadedRow.view(key) to get a memoryview of one entry");
+        return -1;
+    }
+
+    const i: usize = @intCast(self.view_index);
+    const data: ?*anyopaque = @ptrCast(@constCast(row.data[i]));
+    return py.PyBuffer_FillInfo(view, self_obj, data, @intCast(row.sizes[i]), 1, flags);
+}
+
 fn loadedRowKeys(self_obj: ?*py.PyObject, _: ?*py.PyObject) callconv(.c) ?*py.PyObject {
     const self: *LoadedRowObject = @ptrCast(@alignCast(self_obj.?));
 
@@ -665,8 +992,567 @@ fn loadedRowToDict(self_obj: ?*py.PyObject, _: ?*py.PyObject) callconv(.c) ?*py.
     return dict;
 }
 
+// ============================================================================
+// Mixer
+// ============================================================================
+
+fn mixerNewImpl(typ: *py.PyTypeObject, sources_obj: *py.PyObject, weights_obj: *py.PyObject, seed: u64, deterministic: bool) PyError!*MixerObject {
+    const loader_type = moduleStateFromType(typ).data_loader_type orelse return error.RuntimeError;
+    const n_raw = py.PySequence_Size(sources_obj);
+    if (n_raw < 0) return error.PythonException;
+    const n: usize = @intCast(n_raw);
+    if (py.PySequence_Size(weights_obj) != n_raw) {
+        py.PyErr_SetString(py.PyExc_ValueError, "sources and weights must have the same length");
+        return error.PythonException;
+    }
+
+    const alloc = std.heap.c_allocator;
+    const weights = try alloc.alloc(f64, n);
+    defer alloc.free(weights);
+    for (weights, 0..) |*w, i| {
+        const item = py.PySequence_GetItem(weights_obj, @intCast(i)) orelse return error.PythonException;
+        defer py.Py_DecRef(item);
+        w.* = py.PyFloat_AsDouble(item);
+        if (w.* == -1.0 and py.PyErr_Occurred() != null) return error.PythonException;
+    }
+
+    const mixer = try alloc.create(Mixer);
+    errdefer alloc.destroy(mixer);
+    mixer.* = Mixer.init(alloc, weights, seed, deterministic) catch |err| switch (err) {
+        error.OutOfMemory => return error.OutOfMemory,
+        error.InvalidWeights => {
+            py.PyErr_SetString(py.PyExc_ValueError, "weights must be finite, non-negative and not all zero");
+            return error.PythonException;
+        },
+    };
+    errdefer mixer.deinit();
+
+    const poll_fds = try alloc.alloc(std.posix.pollfd, n);
+    errdefer alloc.free(poll_fds);
+    const sources = try alloc.alloc(*DataLoaderObject, n);
+    errdefer alloc.free(sources);
+    var taken: usize = 0;
+    errdefer for (sources[0..taken]) |src| py.Py_DecRef(@ptrCast(src));
+    for (sources, poll_fds) |*src, *pfd| {
+        const item = py.PySequence_GetItem(sources_obj, @intCast(taken)) orelse return error.PythonException;
+        if (py.PyObject_IsInstance(item, @ptrCast(@alignCast(loader_type))) != 1) {
+            py.Py_DecRef(item);
+            return error.TypeError;
+        }
+        src.* = @ptrCast(@alignCast(item));
+        taken += 1;
+        const loader = src.*.loader orelse return error.RuntimeError;
+        // Each source prefetches on its own pump thread from here on.
+        const fd = lua_dataloader.ultarAsyncStart(loader);
+        if (fd < 0) return error.RuntimeError;
+        pfd.* = .{ .fd = fd, .events = std.posix.POLL.IN, .revents = 0 };
+    }
+
+    const alloc_fn = py.PyType_GetSlot(typ, py.Py_tp_alloc) orelse return error.RuntimeError;
+    const alloc_obj: *const fn (?*py.PyTypeObject, py.Py_ssize_t) callconv(.c) ?*py.PyObject = @ptrCast(@alignCast(alloc_fn));
+    const self_obj = alloc_obj(typ, 0) orelse return error.PythonException;
+
+    const self: *MixerObject = @ptrCast(@alignCast(self_obj));
+    self.typ = typ;
+    self.sources = sources.ptr;
+    self.num_sources = n;
+    self.mixer = mixer;
+    self.poll_fds = poll_fds.ptr;
+    return self;
+}
+
+fn mixerNew(typ: ?*py.PyTypeObject, args: ?*py.PyObject, kwargs: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    var sources_obj: ?*py.PyObject = null;
+    var weights_obj: ?*py.PyObject = null;
+    var seed: c_ulonglong = 0;
+    var deterministic: c_int = 0;
+
+    const kwlist = [_:null]?[*:0]const u8{ "sources", "weights", "seed", "deterministic", null };
+
+    if (py.PyArg_ParseTupleAndKeywords(
+        args,
+        kwargs,
+        "OO|Kp",
+        @ptrCast(@constCast(&kwlist)),
+        &sources_obj,
+        &weights_obj,
+        &seed,
+        &deterministic,
+    ) == 0) {
+        return null;
+    }
+
+    const self = mixerNewImpl(typ.?, sources_obj.?, weights_obj.?, seed, deterministic != 0) catch |err| {
+        setPyError(err, switch (err) {
+            error.TypeError => "sources must be DataLoader instances",
+            else => "Failed to create Mixer",
+        });
+        return null;
+    };
+    return @ptrCast(self);
+}
+
+fn mixerDealloc(self_obj: ?*py.PyObject) callconv(.c) void {
+    const self: *MixerObject = @ptrCast(@alignCast(self_obj));
+    const alloc = std.heap.c_allocator;
+
+    if (self.mixer) |mixer| {
+        self.mixer = null;
+        mixer.deinit();
+        alloc.destroy(mixer);
+    }
+    if (self.sources) |sources| {
+        self.sources = null;
+        for (sources[0..self.num_sources]) |src| py.Py_DecRef(@ptrCast(src));
+        alloc.free(sources[0..self.num_sources]);
+    }
+    if (self.poll_fds) |poll_fds| {
+        self.poll_fds = null;
+        alloc.free(poll_fds[0..self.num_sources]);
+    }
+    const typ = self.typ;
+    self.typ = null;
+    freeHeapTypeInstance(typ, self_obj);
+}
+
+/// Next row of source `i`, or null if it has none ready (`block` false) or is
+/// exhausted. Only a blocking take releases the GIL.
+fn mixerTake(self: *MixerObject, mixer: *Mixer, i: usize, block: bool) PyError!?*py.PyObject {
+    const src = self.sources.?[i];
+    const loader = src.loader orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader not initialized");
+        return error.PythonException;
+    };
+
+    var status: c_int = 0;
+    var wait_ns: u64 = 0;
+    const row = if (block) blk: {
+        const gil_state = py.PyEval_SaveThread();
+        defer py.PyEval_RestoreThread(gil_state);
+        break :blk lua_dataloader.ultarAsyncNext(loader, &status, &wait_ns);
+    } else lua_dataloader.ultarAsyncTryNext(loader, &status);
+
+    const valid_row = row orelse switch (status) {
+        1 => return null,
+        2 => {
+            mixer.stats[i].wait_ns += wait_ns;
+            mixer.exhaust(i);
+            self.poll_fds.?[i].fd = -1;
+            return null;
+        },
+        else => {
+            py.PyErr_SetString(py.PyExc_RuntimeError, "DataLoader row generator failed");
+            return error.PythonException;
+        },
+    };
+
+    var bytes: u64 = 0;
+    for (valid_row.sizes[0..valid_row.num_keys]) |size| bytes += size;
+    mixer.record(i, bytes, wait_ns);
+
+    return wrapOwnedRow(src, valid_row) catch |err| {
+        lua_dataloader.ultarReclaimRow(loader, valid_row);
+        return err;
+    };
+}
+
+fn mixerNextImpl(self: *MixerObject, mixer: *Mixer) PyError!?*py.PyObject {
+    const n = mixer.weights.len;
+    while (true) {
+        if (!mixer.deterministic) {
+            // Sources that lent turns while stalled get them back first.
+            for (0..n) |j| {
+                if (!mixer.owed(j)) continue;
+                if (try mixerTake(self, mixer, j, false)) |row| {
+                    mixer.repay(j);
+                    return row;
+                }
+            }
+        }
+
+        const i = mixer.pick() orelse return null;
+        if (mixer.deterministic) {
+            if (try mixerTake(self, mixer, i, true)) |row| return row;
+            continue;
+        }
+
+        // `i` first, then the others in turn; a row from any other is a loan from `i`.
+        while (mixer.weights[i] > 0) {
+            for (0..n) |k| {
+                const j = (i + k) % n;
+                if (mixer.weights[j] == 0) continue;
+                if (try mixerTake(self, mixer, j, false)) |row| {
+                    if (j != i) mixer.lend(i, j);
+                    return row;
+                }
+                if (mixer.weights[i] == 0) break;
+            } else try mixerWait(self, mixer, i);
+        }
+    }
+}
+
+/// Sleep until any active source's readiness fd is readable, charging the
+/// wait to `turn`. Polls with the GIL released and honours Ctrl-C between polls.
+fn mixerWait(self: *MixerObject, mixer: *Mixer, turn: usize) PyError!void {
+    const poll_fds = self.poll_fds.?[0..self.num_sources];
+    const io = (self.sources.?[turn].loader orelse return error.RuntimeError).loader.io;
+    const start = std.Io.Clock.Timestamp.now(io, .awake);
+    defer mixer.stats[turn].wait_ns += @intCast(@max(0, start.durationTo(std.Io.Clock.Timestamp.now(io, .awake)).raw.nanoseconds));
+
+    while (true) {
+        const gil_state = py.PyEval_SaveThread();
+        const polled = std.posix.poll(poll_fds, 100);
+        py.PyEval_RestoreThread(gil_state);
+        const ready = polled catch {
+            py.PyErr_SetString(py.PyExc_RuntimeError, "Failed to poll Mixer sources");
+            return error.PythonException;
+        };
+        if (ready > 0) return;
+        if (py.PyErr_CheckSignals() < 0) return error.PythonException;
+    }
+}
+
+fn mixerNext(self_obj: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *MixerObject = @ptrCast(@alignCast(self_obj));
+    const mixer = self.mixer orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "Mixer not initialized");
+        return null;
+    };
+
+    const row = mixerNextImpl(self, mixer) catch |err| {
+        setPyError(err, "Failed to create LoadedRow");
+        return null;
+    };
+    return row orelse {
+        py.PyErr_SetNone(py.PyExc_StopIteration);
+        return null;
+    };
+}
+
+fn mixerStats(self_obj: ?*py.PyObject, _: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    const self: *MixerObject = @ptrCast(@alignCast(self_obj));
+    const mixer = self.mixer orelse {
+        py.PyErr_SetString(py.PyExc_RuntimeError, "Mixer not initialized");
+        return null;
+    };
+
+    const list = py.PyList_New(@intCast(mixer.stats.len)) orelse return null;
+    for (mixer.stats, 0..) |st, i| {
+        const dict = py.PyDict_New() orelse {
+            py.Py_DecRef(list);
+            return null;
+        };
+        // PyList_SetItem steals the dict, so the list owns it from here on.
+        _ = py.PyList_SetItem(list, @intCast(i), dict);
+
+        const fields = [_]struct { [*:0]const u8, ?*py.PyObject }{
+            .{ "weight", py.PyFloat_FromDouble(mixer.weights[i]) },
+            .{ "rows", py.PyLong_FromUnsignedLongLong(st.rows) },
+            .{ "bytes", py.PyLong_FromUnsignedLongLong(st.bytes) },
+            .{ "wait_s", py.PyFloat_FromDouble(@as(f64, @floatFromInt(st.wait_ns)) * 1e-9) },
+            .{ "lent", py.PyLong_FromUnsignedLongLong(st.lent) },
+            .{ "exhausted", py.PyBool_FromLong(@intFromBool(st.exhausted)) },
+        };
+        var failed = false;
+        for (fields) |f| {
+            const value = f[1] orelse {
+                failed = true;
+                continue;
+            };
+            if (py.PyDict_SetItemString(dict, f[0], value) < 0) failed = true;
+            py.Py_DecRef(value);
+        }
+        if (failed) {
+            py.Py_DecRef(list);
+            return null;
+        }
+    }
+    return list;
+}
+
+// ============================================================================
+// Indexing
+// ============================================================================
+
+/// Copy a sequence of str into arena-allocated slices.
+fn parseStrSequence(arena: std.mem.Allocator, seq: *py.PyObject) PyError![]const []const u8 {
+    const n = py.PySequence_Size(seq);
+    if (n < 0) return error.PythonException;
+    const out = try arena.alloc([]const u8, @intCast(n));
+    for (out, 0..) |*o, i| {
+        const item = py.PySequence_GetItem(seq, @intCast(i)) orelse return error.PythonException;
+        defer py.Py_DecRef(item);
+        if (!isUnicode(item)) return error.TypeError;
+        var len: py.Py_ssize_t = 0;
+        const ptr = py.PyUnicode_AsUTF8AndSize(item, &len) orelse return error.PythonException;
+        o.* = try arena.dupe(u8, ptr[0..@intCast(len)]);
+    }
+    return out;
+}
+
+/// Cancel, wait for the indexing threads without the GIL, and free `bi`.
+fn finishBatchIndexer(bi: *BatchIndexer, cancel: bool) void {
+    if (cancel) bi.cancel();
+    const gil_state = py.PyEval_SaveThread();
+    bi.join();
+    py.PyEval_RestoreThread(gil_state);
+    bi.deinit();
+}
+
+fn buildIndexImpl(
+    paths_obj: *py.PyObject,
+    rules_obj: ?*py.PyObject,
+    fmt_str: [*:0]const u8,
+    jobs: c_uint,
+    progress: ?*py.PyObject,
+) PyError!*py.PyObject {
+    var arena_state = std.heap.ArenaAllocator.init(std.heap.c_allocator);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    const paths = try parseStrSequence(arena, paths_obj);
+    const rules = if (rules_obj != null and rules_obj != py.Py_None()) try parseStrSequence(arena, rules_obj.?) else &.{};
+    const fmt = std.meta.stringToEnum(BatchIndexer.Format, std.mem.span(fmt_str)) orelse {
+        py.PyErr_SetString(py.PyExc_ValueError, "fmt must be 'msgpack' or 'jsonl'");
+        return error.PythonException;
+    };
+
+    const bi = BatchIndexer.start(std.heap.c_allocator, paths, .{
+        .fmt = fmt,
+        .meta_rules = rules,
+        .jobs = jobs,
+    }) catch |err| switch (err) {
+        error.InvalidRuleFormat, error.DuplicateMetaRule => {
+            py.PyErr_SetString(py.PyExc_ValueError, "invalid meta rule; expected unique \"KEY:QUERY;QUERY...\" strings");
+            return error.PythonException;
+        },
+        error.OutOfMemory => return error.OutOfMemory,
+        else => return error.RuntimeError,
+    };
+
+    // Poll with the GIL released; report progress and honour Ctrl-C between polls.
+    while (true) {
+        const gil_state = py.PyEval_SaveThread();
+        for (0..10) |_| {
+            if (bi.finished()) break;
+            std.Io.sleep(bi.io, .fromNanoseconds(10 * std.time.ns_per_ms), .awake) catch {};
+        }
+        py.PyEval_RestoreThread(gil_state);
+
+        const done = bi.finished();
+        if (progress != null and progress != py.Py_None()) {
+            const ret = py.PyObject_CallFunction(progress, "KK", @as(c_ulonglong, bi.bytesScanned()), @as(c_ulonglong, bi.bytesTotal())) orelse {
+                finishBatchIndexer(bi, true);
+                return error.PythonException;
+            };
+            py.Py_DecRef(ret);
+        }
+        if (py.PyErr_CheckSignals() < 0) {
+            finishBatchIndexer(bi, true);
+            return error.PythonException;
+        }
+        if (done) break;
+    }
+    defer finishBatchIndexer(bi, false);
+
+    for (bi.shards) |shard| {
+        const err = shard.err orelse continue;
+        const path_z = try arena.dupeZ(u8, shard.path);
+        _ = py.PyErr_Format(py.PyExc_RuntimeError, "indexing %s failed: %s", path_z.ptr, @errorName(err).ptr);
+        return error.PythonException;
+    }
+
+    const list = py.PyList_New(@intCast(bi.shards.len)) orelse return error.PythonException;
+    errdefer py.Py_DecRef(list);
+    for (bi.shards, 0..) |shard, i| {
+        const dict = py.PyDict_New() orelse return error.PythonException;
+        // PyList_SetItem steals the dict, so the list owns it from here on.
+        _ = py.PyList_SetItem(list, @intCast(i), dict);
+
+        const fields = [_]struct { [*:0]const u8, ?*py.PyObject }{
+            .{ "path", py.PyUnicode_FromStringAndSize(shard.path.ptr, @intCast(shard.path.len)) },
+            .{ "rows", py.PyLong_FromUnsignedLongLong(shard.rows) },
+            .{ "bytes", py.PyLong_FromUnsignedLongLong(shard.bytes) },
+        };
+        var failed = false;
+        for (fields) |f| {
+            const value = f[1] orelse {
+                failed = true;
+                continue;
+            };
+            if (py.PyDict_SetItemString(dict, f[0], value) < 0) failed = true;
+            py.Py_DecRef(value);
+        }
+        if (failed) return error.PythonException;
+    }
+    return list;
+}
+
+fn buildIndex(_: ?*py.PyObject, args: ?*py.PyObject, kwargs: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    var paths_obj: ?*py.PyObject = null;
+    var rules_obj: ?*py.PyObject = null;
+    var fmt: [*:0]const u8 = "msgpack";
+    var jobs: c_uint = 4;
+    var progress: ?*py.PyObject = null;
+
+    const kwlist = [_:null]?[*:0]const u8{ "paths", "meta_rules", "fmt", "jobs", "progress", null };
+
+    if (py.PyArg_ParseTupleAndKeywords(
+        args,
+        kwargs,
+        "O|OsIO",
+        @ptrCast(@constCast(&kwlist)),
+        &paths_obj,
+        &rules_obj,
+        &fmt,
+        &jobs,
+        &progress,
+    ) == 0) {
+        return null;
+    }
+
+    return buildIndexImpl(paths_obj.?, rules_obj, fmt, jobs, progress) catch |err| {
+        setPyError(err, "Failed to build index");
+        return null;
+    };
+}
+
+// ============================================================================
+// Row partitioning
+// ============================================================================
+
+fn parseU64(item: *py.PyObject) PyError!u64 {
+    const v = py.PyLong_AsUnsignedLongLong(item);
+    if (v == std.math.maxInt(c_ulonglong) and py.PyErr_Occurred() != null) return error.PythonException;
+    return v;
+}
+
+fn parseU64Sequence(arena: std.mem.Allocator, seq: *py.PyObject) PyError![]u64 {
+    const n = py.PySequence_Size(seq);
+    if (n < 0) return error.PythonException;
+    const out = try arena.alloc(u64, @intCast(n));
+    for (out, 0..) |*o, i| {
+        const item = py.PySequence_GetItem(seq, @intCast(i)) orelse return error.PythonException;
+        defer py.Py_DecRef(item);
+        o.* = try parseU64(item);
+    }
+    return out;
+}
+
+/// A sequence of `(lo, hi)` pairs.
+fn parseIntervals(arena: std.mem.Allocator, seq: *py.PyObject) PyError![]partition.Interval {
+    const n = py.PySequence_Size(seq);
+    if (n < 0) return error.PythonException;
+    const out = try arena.alloc(partition.Interval, @intCast(n));
+    for (out, 0..) |*o, i| {
+        const item = py.PySequence_GetItem(seq, @intCast(i)) orelse return error.PythonException;
+        defer py.Py_DecRef(item);
+        const pair = try parseU64Sequence(arena, item);
+        if (pair.len != 2) {
+            py.PyErr_SetString(py.PyExc_ValueError, "cursor intervals must be (lo, hi) pairs");
+            return error.PythonException;
+        }
+        o.* = .{ .lo = pair[0], .hi = pair[1] };
+    }
+    return out;
+}
+
+fn setPartitionError(err: partition.Error) PyError {
+    switch (err) {
+        error.OutOfMemory => return error.OutOfMemory,
+        error.InvalidRank => py.PyErr_SetString(py.PyExc_ValueError, "invalid rank for world_size"),
+        error.InvalidCursor => py.PyErr_SetString(py.PyExc_ValueError, "cursor does not fit these shards"),
+    }
+    return error.PythonException;
+}
+
+/// List of tuples of unsigned ints; `rows[i]` is the i-th tuple.
+fn u64TupleList(comptime n: usize, rows: []const [n]u64) PyError!*py.PyObject {
+    const list = py.PyList_New(@intCast(rows.len)) orelse return error.PythonException;
+    errdefer py.Py_DecRef(list);
+    for (rows, 0..) |row, i| {
+        const tuple = py.PyTuple_New(n) orelse return error.PythonException;
+        // PyList_SetItem steals the tuple, so the list owns it from here on.
+        _ = py.PyList_SetItem(list, @intCast(i), tuple);
+        for (row, 0..) |v, j| {
+            const item = py.PyLong_FromUnsignedLongLong(v) orelse return error.PythonException;
+            _ = py.PyTuple_SetItem(tuple, @intCast(j), item);
+        }
+    }
+    return list;
+}
+
+fn partitionRowsImpl(rows_obj: *py.PyObject, rank: c_ulonglong, world_size: c_ulonglong, epoch: c_ulonglong, remaining_obj: *py.PyObject) PyError!*py.PyObject {
+    var arena_state = std.heap.ArenaAllocator.init(std.heap.c_allocator);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    const rows = try parseU64Sequence(arena, rows_obj);
+    const remaining = try parseIntervals(arena, remaining_obj);
+    const spans = partition.assign(arena, rows, .{ .epoch = epoch, .remaining = remaining }, @intCast(rank), @intCast(world_size)) catch |err| return setPartitionError(err);
+    const out = try arena.alloc([3]u64, spans.len);
+    for (out, spans) |*o, s| o.* = .{ s.shard, s.start_row, s.end_row };
+    return u64TupleList(3, out);
+}
+
+fn partitionRows(_: ?*py.PyObject, args: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    var rows_obj: ?*py.PyObject = null;
+    var rank: c_ulonglong = 0;
+    var world_size: c_ulonglong = 0;
+    var epoch: c_ulonglong = 0;
+    var remaining_obj: ?*py.PyObject = null;
+    if (py.PyArg_ParseTuple(args, "OKKKO", &rows_obj, &rank, &world_size, &epoch, &remaining_obj) == 0) return null;
+
+    return partitionRowsImpl(rows_obj.?, rank, world_size, epoch, remaining_obj.?) catch |err| {
+        setPyError(err, "Failed to partition rows");
+        return null;
+    };
+}
+
+fn advanceCursorImpl(remaining_obj: *py.PyObject, world_size: c_ulonglong, consumed: c_ulonglong) PyError!*py.PyObject {
+    var arena_state = std.heap.ArenaAllocator.init(std.heap.c_allocator);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    const remaining = try parseIntervals(arena, remaining_obj);
+    const rest = partition.advance(arena, remaining, @intCast(world_size), consumed) catch |err| return setPartitionError(err);
+    const out = try arena.alloc([2]u64, rest.len);
+    for (out, rest) |*o, iv| o.* = .{ iv.lo, iv.hi };
+    return u64TupleList(2, out);
+}
+
+fn advanceCursor(_: ?*py.PyObject, args: ?*py.PyObject) callconv(.c) ?*py.PyObject {
+    var remaining_obj: ?*py.PyObject = null;
+    var world_size: c_ulonglong = 0;
+    var consumed: c_ulonglong = 0;
+    if (py.PyArg_ParseTuple(args, "OKK", &remaining_obj, &world_size, &consumed) == 0) return null;
+
+    return advanceCursorImpl(remaining_obj.?, world_size, consumed) catch |err| {
+        setPyError(err, "Failed to advance cursor");
+        return null;
+    };
+}
+
 // Module definition
 const module_methods = [_]py.PyMethodDef{
+    .{
+        .ml_name = "build_index",
+        .ml_meth = @ptrCast(&buildIndex),
+        .ml_flags = py.METH_VARARGS | py.METH_KEYWORDS,
+        .ml_doc = "Index tar shards in-process; returns per-shard row and byte counts",
+    },
+    .{
+        .ml_name = "_partition_rows",
+        .ml_meth = @ptrCast(&partitionRows),
+        .ml_flags = py.METH_VARARGS,
+        .ml_doc = "(rows, rank, world_size, epoch, remaining) -> [(shard, start_row, end_row)]",
+    },
+    .{
+        .ml_name = "_advance_cursor",
+        .ml_meth = @ptrCast(&advanceCursor),
+        .ml_flags = py.METH_VARARGS,
+        .ml_doc = "(remaining, world_size, consumed) -> [(lo, hi)]",
+    },
     std.mem.zeroes(py.PyMethodDef),
 };
 
@@ -679,6 +1565,9 @@ fn moduleTraverse(module_obj: ?*py.PyObject, visit: py.visitproc, arg: ?*anyopaq
     if (state.loaded_row_type) |typ| {
         if (visit.?(@ptrCast(@alignCast(typ)), arg) != 0) return -1;
     }
+    if (state.mixer_type) |typ| {
+        if (visit.?(@ptrCast(@alignCast(typ)), arg) != 0) return -1;
+    }
     return 0;
 }
 
@@ -693,6 +1582,10 @@ fn moduleClear(module_obj: ?*py.PyObject) callconv(.c) c_int {
         state.loaded_row_type = null;
         py.Py_DecRef(@ptrCast(@alignCast(typ)));
     }
+    if (state.mixer_type) |typ| {
+        state.mixer_type = null;
+        py.Py_DecRef(@ptrCast(@alignCast(typ)));
+    }
     return 0;
 }
 
@@ -710,6 +1603,12 @@ fn moduleExec(module_obj: ?*py.PyObject) callconv(.c) c_int {
         return -1;
     }
 
+    state.mixer_type = @ptrCast(py.PyType_FromModuleAndSpec(module, &Mixer_spec, null));
+    if (state.mixer_type == null) {
+        _ = moduleClear(module_obj);
+        return -1;
+    }
+
     if (py.PyModule_AddObjectRef(module, "DataLoader", @ptrCast(@alignCast(state.data_loader_type))) < 0) {
         _ = moduleClear(module_obj);
         return -1;
@@ -718,6 +1617,10 @@ fn moduleExec(module_obj: ?*py.PyObject) callconv(.c) c_int {
         _ = moduleClear(module_obj);
         return -1;
     }
+    if (py.PyModule_AddObjectRef(module, "Mixer", @ptrCast(@alignCast(state.mixer_type))) < 0) {
+        _ = moduleClear(module_obj);
+        return -1;
+    }
 
     return 0;
 }
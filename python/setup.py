@@ -54,7 +54,7 @@ _native = Extension(
 setup(
     ext_modules=[_native],
     cmdclass={"build_ext": CopyPrebuiltExtension},
-    data_files=[("bin", ["scripts/indexer", "scripts/ultar_httpd"])],
+    data_files=[("bin", ["scripts/indexer", "scripts/ultar_manifest", "scripts/ultar_httpd"])],
     options={
         "bdist_wheel": {
             "py_limited_api": "cp311",
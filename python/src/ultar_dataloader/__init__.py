@@ -12,13 +12,17 @@ from __future__ import annotations
 
 from ultar_dataloader._version import __version__
 
-from collections.abc import Mapping
+import asyncio
+import os
+from collections.abc import Callable, Iterable, Mapping, Sequence
 from pathlib import Path
-from typing import TYPE_CHECKING, Iterator
+from typing import TYPE_CHECKING, Any, Iterator
 
 # Import from the native extension module
 from ultar_dataloader._native import DataLoader as _DataLoader
 from ultar_dataloader._native import LoadedRow as _LoadedRow
+from ultar_dataloader._native import Mixer as _Mixer
+from ultar_dataloader._native import build_index as _build_index
 
 if TYPE_CHECKING:
     import torch
@@ -49,6 +53,23 @@ class LoadedRow:
         """Return dict mapping keys to bytes."""
         return self._row.to_dict()
 
+    def view(self, key: str | int) -> memoryview:
+        """Read-only memoryview of one entry, without copying.
+
+        The view keeps the row alive; release it (or let it go out of scope)
+        so the loader can reuse the row's buffer.
+        """
+        return self._row.view(key)
+
+    def staged(self, key: str | int) -> int | None:
+        """Index of the ``DataLoader.register_buffers`` buffer an entry was read into.
+
+        None when the entry was read into the row's own memory instead, e.g.
+        because every registered buffer was still held by an earlier row. The
+        buffer is the loader's again once this row is released.
+        """
+        return self._row.staged(key)
+
     def __len__(self) -> int:
         return len(self._row)
 
@@ -70,6 +91,16 @@ class LoadedRow:
         return f"<LoadedRow with {len(self)} entries: {self.keys()}>"
 
 
+async def _wait_readable(fd: int) -> None:
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    loop.add_reader(fd, lambda: fut.done() or fut.set_result(None))
+    try:
+        await fut
+    finally:
+        loop.remove_reader(fd)
+
+
 class DataLoader:
     """
     High-performance async dataloader with Lua scripting.
@@ -106,9 +137,14 @@ class DataLoader:
         ... )
         >>> for row in loader:
         ...     print(row.keys())
+
+    Inside a coroutine, use ``async for row in loader`` instead. Rows are then
+    produced by a background thread and the event loop waits on a file
+    descriptor, so many loaders can share one loop. A loader iterates either
+    synchronously or asynchronously, never both.
     """
 
-    __slots__ = ("_loader",)
+    __slots__ = ("_loader", "_async_fd")
 
     def __init__(
         self,
@@ -117,6 +153,7 @@ class DataLoader:
         rank: int = 0,
         world_size: int = 1,
         debug: bool = False,
+        trace: bool = False,
     ):
         """
         Create a new DataLoader.
@@ -130,13 +167,17 @@ class DataLoader:
             rank: Current process rank (for distributed training).
             world_size: Total number of processes (for distributed training).
             debug: Enable debug mode with additional logging and checks.
+            trace: Record a pipeline trace for `dump_trace`. Setting the
+                   ``ULTAR_TRACE=1`` environment variable does the same.
         """
+        self._async_fd: int | None = None
         self._loader = _DataLoader(
             src=src,
             config=dict(config) if config is not None else None,
             rank=rank,
             world_size=world_size,
             debug=debug,
+            trace=trace,
         )
 
     @classmethod
@@ -147,6 +188,7 @@ class DataLoader:
         rank: int = 0,
         world_size: int = 1,
         debug: bool = False,
+        trace: bool = False,
     ) -> "DataLoader":
         """
         Create a DataLoader from a Lua script file.
@@ -158,23 +200,168 @@ class DataLoader:
             rank: Current process rank (for distributed training).
             world_size: Total number of processes (for distributed training).
             debug: Enable debug mode with additional logging and checks.
+            trace: Record a pipeline trace for `dump_trace`.
 
         Returns:
             DataLoader instance.
         """
         with open(script_path, "r") as f:
             src = f.read()
-        return cls(src=src, config=config, rank=rank, world_size=world_size, debug=debug)
+        return cls(src=src, config=config, rank=rank, world_size=world_size, debug=debug, trace=trace)
 
     def __iter__(self) -> Iterator[LoadedRow]:
+        if self._async_fd is not None:
+            raise RuntimeError("DataLoader is already being iterated with async for")
         for row in self._loader:
             yield LoadedRow(row)
 
+    def __aiter__(self) -> "DataLoader":
+        if self._async_fd is None:
+            self._async_fd = self._loader._async_fd()
+        return self
+
+    async def __anext__(self) -> LoadedRow:
+        if self._async_fd is None:
+            self._async_fd = self._loader._async_fd()
+        while True:
+            row = self._loader._try_next()
+            if row is not None:
+                return LoadedRow(row)
+            await _wait_readable(self._async_fd)
+
+    def register_buffers(self, key: str, buffers: Sequence[Any]) -> None:
+        """
+        Have reads for ``key`` land directly in caller-owned buffers.
+
+        ``buffers`` are writable, C-contiguous objects supporting the buffer
+        protocol: NumPy arrays, ``bytearray``, or ``tensor.numpy()`` of a
+        pinned CPU tensor. Up to 64 may be registered per key, before
+        iteration starts. Each ``add_entry`` for ``key`` claims a free buffer
+        at least as large as the entry and reads into its start; if none is
+        free it falls back to the row's own memory. ``row.staged(key)`` says
+        which buffer was used, and the buffer stays out of the pool until the
+        row is released. Don't write to a buffer while a row holds it.
+
+        Entries of memory-mapped files are views of the mapping and never
+        staged.
+        """
+        self._loader.register_buffers(key, list(buffers))
+
+    def dump_trace(self, path: str | Path) -> None:
+        """
+        Write the recent pipeline trace to ``path`` as Chrome trace JSON.
+
+        Open it in https://ui.perfetto.dev or chrome://tracing. Each pipeline
+        thread keeps its last 65536 events: Lua resumes, requests from enqueue
+        to completion, and rows from ``finish_row`` until they are handed back.
+        Requires ``trace=True`` or ``ULTAR_TRACE=1``.
+        """
+        self._loader._dump_trace(str(path))
+
     def __repr__(self) -> str:
         return "<DataLoader>"
 
 
+class MixedDataLoader:
+    """
+    Interleave rows from several DataLoaders with target sampling ratios.
+
+    Each source runs its own Lua script, config and IO thread, and prefetches
+    rows in the background. Turns are drawn from a seeded PRNG in proportion
+    to ``weights``. A source with no row ready on its turn lends it to one that
+    has, and is paid back as soon as it catches up, so a slow source never
+    stalls the others and the ratios still hold over time; the exact order
+    then depends on timing. With ``deterministic=True`` the mixer waits on
+    every drawn source instead, so the sequence depends only on the seed.
+    Exhausted sources drop out and the rest keep their relative weights.
+
+    The sources belong to the mixer once passed in; don't iterate them directly.
+
+    Example:
+        >>> mixed = MixedDataLoader(
+        ...     [DataLoader(script_a, config=cfg_a), DataLoader(script_b, config=cfg_b)],
+        ...     weights=[0.7, 0.3],
+        ...     seed=1234,
+        ... )
+        >>> for row in mixed:
+        ...     ...
+        >>> mixed.stats()
+    """
+
+    __slots__ = ("_sources", "_mixer")
+
+    def __init__(
+        self, sources: Sequence[DataLoader], weights: Sequence[float], seed: int = 0, deterministic: bool = False
+    ):
+        """
+        Create a mixer over ``sources``.
+
+        Args:
+            sources: DataLoaders to draw rows from.
+            weights: Non-negative sampling weight per source; need not sum to 1.
+            seed: Seed for the source sequence.
+            deterministic: Wait on every drawn source rather than lending its
+                turn, so the same seed always gives the same sequence.
+        """
+        self._sources = list(sources)
+        for source in self._sources:
+            if source._async_fd is None:
+                source._async_fd = source._loader._async_fd()
+        self._mixer = _Mixer([s._loader for s in self._sources], [float(w) for w in weights], seed, deterministic)
+
+    def __iter__(self) -> Iterator[LoadedRow]:
+        for row in self._mixer:
+            yield LoadedRow(row)
+
+    def stats(self) -> list[dict[str, Any]]:
+        """
+        Per-source stats, in the order of ``sources``.
+
+        Each dict has ``weight`` (0 once exhausted), ``rows``, ``bytes``,
+        ``wait_s`` (time spent blocked on its turns), ``lent`` (turns it had
+        no row ready for and gave to another source) and ``exhausted``.
+        """
+        return self._mixer.stats()
+
+    def __repr__(self) -> str:
+        return f"<MixedDataLoader with {len(self._sources)} sources>"
+
+
+def build_index(
+    paths: Iterable[str | os.PathLike[str]],
+    meta_rules: Sequence[str] = (),
+    fmt: str = "msgpack",
+    jobs: int = 4,
+    progress: Callable[[int, int], object] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Index tar shards in this process, as the ``indexer`` binary would.
+
+    Writes ``<path>.utix`` and ``<path>.utix.summary.json`` next to each shard.
+    The scan runs on ``jobs`` native threads with the GIL released.
+
+    Args:
+        paths: Tar files to index.
+        meta_rules: ``--meta-rule`` strings, e.g. ``".json:.caption;.size.w"``.
+        fmt: Index format, ``"msgpack"`` or ``"jsonl"``.
+        jobs: Shards indexed at once.
+        progress: Called as ``progress(bytes_scanned, bytes_total)`` about every
+                  100 ms and once at the end. An exception from it cancels
+                  indexing and propagates.
+
+    Returns:
+        One dict per shard, in the order of ``paths``, with ``path``, ``rows``
+        and ``bytes`` (the summed size of indexed members).
+
+    Raises:
+        RuntimeError: If any shard could not be indexed.
+    """
+    return _build_index([os.fspath(p) for p in paths], list(meta_rules), fmt, jobs, progress)
+
+
 __all__ = [
     "DataLoader",
     "LoadedRow",
+    "MixedDataLoader",
+    "build_index",
 ]
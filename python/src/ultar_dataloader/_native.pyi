@@ -1,6 +1,6 @@
 """Type stubs for the native ultar_dataloader extension module."""
 
-from typing import Iterator
+from typing import Any, Callable, Iterator, Sequence
 
 class LoadedRow:
     """A row of data from the DataLoader - supports dict-like access."""
@@ -17,6 +17,14 @@ class LoadedRow:
         """Return dict mapping keys to bytes."""
         ...
 
+    def view(self, key: str | int) -> memoryview:
+        """Return a read-only memoryview of one entry, without copying."""
+        ...
+
+    def staged(self, key: str | int) -> int | None:
+        """Return the index of the registered buffer an entry was read into, or None."""
+        ...
+
     def __len__(self) -> int:
         """Return number of entries in this row."""
         ...
@@ -39,6 +47,7 @@ class DataLoader:
         rank: int = 0,
         world_size: int = 1,
         debug: bool = False,
+        trace: bool = False,
     ) -> None:
         """
         Create a new DataLoader.
@@ -49,6 +58,7 @@ class DataLoader:
             rank: Current process rank (for distributed training).
             world_size: Total number of processes (for distributed training).
             debug: Enable debug mode.
+            trace: Record a pipeline trace for `_dump_trace`.
         """
         ...
 
@@ -60,6 +70,80 @@ class DataLoader:
         """Get the next row from the dataloader."""
         ...
 
+    def _async_fd(self) -> int:
+        """Switch to async mode and return a fd that is readable when rows are ready."""
+        ...
+
+    def _try_next(self) -> LoadedRow | None:
+        """Return the next ready row, or None if none is ready yet.
+
+        Raises StopAsyncIteration once the generator is exhausted.
+        """
+        ...
+
+    def _dump_trace(self, path: str) -> None:
+        """Write the pipeline trace to path in Chrome trace format."""
+        ...
+
+    def register_buffers(self, key: str, buffers: Sequence[Any]) -> None:
+        """Have reads for `key` land in the given writable buffers."""
+        ...
+
     def __repr__(self) -> str:
         """Return string representation."""
         ...
+
+class Mixer:
+    """Mixer - weighted interleaving of DataLoaders."""
+
+    def __init__(
+        self, sources: Sequence[DataLoader], weights: Sequence[float], seed: int = 0, deterministic: bool = False
+    ) -> None:
+        """
+        Create a mixer. Starts async mode on every source.
+
+        Args:
+            sources: DataLoaders to draw rows from.
+            weights: Non-negative sampling weight per source.
+            seed: Seed for the source sequence.
+            deterministic: Block on every drawn source instead of lending its turn.
+        """
+        ...
+
+    def __iter__(self) -> Iterator[LoadedRow]:
+        """Iterate over mixed rows."""
+        ...
+
+    def __next__(self) -> LoadedRow:
+        """Get the next row, from a ready source unless deterministic; blocks only when none is ready."""
+        ...
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Return per-source stats as a list of dicts."""
+        ...
+
+def build_index(
+    paths: Sequence[str],
+    meta_rules: Sequence[str] | None = None,
+    fmt: str = "msgpack",
+    jobs: int = 4,
+    progress: Callable[[int, int], object] | None = None,
+) -> list[dict[str, Any]]:
+    """Index tar shards in-process; returns per-shard row and byte counts."""
+    ...
+
+def _partition_rows(
+    rows: Sequence[int],
+    rank: int,
+    world_size: int,
+    epoch: int,
+    remaining: Sequence[Sequence[int]],
+) -> list[tuple[int, int, int]]:
+    """(rows, rank, world_size, epoch, remaining) -> [(shard, start_row, end_row)]"""
+    ...
+
+def _advance_cursor(
+    remaining: Sequence[Sequence[int]], world_size: int, consumed: int
+) -> list[tuple[int, int]]:
+    """(remaining, world_size, consumed) -> [(lo, hi)]"""
+    ...
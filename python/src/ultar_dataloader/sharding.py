@@ -0,0 +1,141 @@
+"""Byte-balanced shard assignment from indexer summaries.
+
+The indexer writes ``<tar>.utix.summary.json`` next to each index with the
+row count, payload bytes, per-key totals and a row-size histogram. The helpers
+here split a shard list across ``(rank, world_size)`` using only those files,
+so every rank computes the same split without opening any ``.utix``. They
+match the Lua ``ultar.sharding`` module.
+
+``partition_rows`` and ``advance_cursor`` split rows instead, from a cursor
+that can be checkpointed and resumed at a different world size.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Sequence
+from typing import Any
+
+from ultar_dataloader import _native
+
+SUMMARY_SUFFIX = ".utix.summary.json"
+
+
+def read_summary(tar_path: str | os.PathLike[str]) -> dict[str, Any]:
+    """Load the summary the indexer wrote for ``tar_path``."""
+    path = os.fspath(tar_path) + SUMMARY_SUFFIX
+    try:
+        with open(path, "rb") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"{path} not found; re-run the indexer on {os.fspath(tar_path)} to create it"
+        ) from None
+
+
+def _check_rank(rank: int, world_size: int) -> None:
+    if world_size <= 0 or not 0 <= rank < world_size:
+        raise ValueError(f"invalid rank {rank} for world_size {world_size}")
+
+
+def assign_shards(
+    paths: Sequence[str | os.PathLike[str]], rank: int, world_size: int
+) -> list[str | os.PathLike[str]]:
+    """Whole shards for ``rank``, greedily balanced by bytes.
+
+    Shards are taken largest first and each goes to the least-loaded rank
+    (lowest rank on ties). The result keeps the order of ``paths``.
+    """
+    _check_rank(rank, world_size)
+    sizes = [read_summary(p)["total_bytes"] for p in paths]
+    order = sorted(range(len(paths)), key=lambda i: (-sizes[i], i))
+    loads = [0] * world_size
+    owner = [0] * len(paths)
+    for i in order:
+        best = min(range(world_size), key=lambda r: (loads[r], r))
+        loads[best] += sizes[i]
+        owner[i] = best
+    return [p for i, p in enumerate(paths) if owner[i] == rank]
+
+
+def assign_row_ranges(
+    paths: Sequence[str | os.PathLike[str]], rank: int, world_size: int
+) -> list[tuple[str | os.PathLike[str], int, int]]:
+    """``(path, start_row, end_row)`` ranges covering ``rank``'s share of the bytes.
+
+    The shards are laid end to end and rank ``r`` gets the byte interval
+    ``[r * total // world_size, (r + 1) * total // world_size)``. Byte
+    positions map to rows assuming rows within a shard are of similar size.
+    Across all ranks the ranges are disjoint and cover every row.
+    """
+    _check_rank(rank, world_size)
+    summaries = [read_summary(p) for p in paths]
+    total = sum(s["total_bytes"] for s in summaries)
+    lo = rank * total // world_size
+    hi = (rank + 1) * total // world_size
+    last = rank == world_size - 1
+
+    out = []
+    start = 0
+    for path, s in zip(paths, summaries):
+        size, rows = s["total_bytes"], s["rows"]
+        span = None
+        if size == 0:
+            if lo <= start < hi or (last and start >= total):
+                span = (0, rows)
+        elif start < hi and lo < start + size:
+
+            def row_at(pos: int) -> int:
+                if pos >= start + size:
+                    return rows
+                return (pos - start) * rows // size
+
+            span = (row_at(max(lo, start)), row_at(min(hi, start + size)))
+        if span is not None and span[0] < span[1]:
+            out.append((path, *span))
+        start += size
+    return out
+
+
+def epoch_cursor(paths: Sequence[str | os.PathLike[str]], epoch: int = 0) -> dict[str, Any]:
+    """A cursor covering every row of ``paths`` for ``epoch``.
+
+    Cursors are plain dicts, ``{"epoch": int, "remaining": [[lo, hi], ...]}``,
+    so they go straight into a checkpoint as JSON.
+    """
+    total = sum(read_summary(p)["rows"] for p in paths)
+    return {"epoch": epoch, "remaining": [[0, total]] if total else []}
+
+
+def partition_rows(
+    paths: Sequence[str | os.PathLike[str]],
+    rank: int,
+    world_size: int,
+    cursor: dict[str, Any],
+) -> list[tuple[str | os.PathLike[str], int, int]]:
+    """``(path, start_row, end_row)`` spans for ``rank`` from what ``cursor`` has left.
+
+    Each epoch visits the shards in an order shuffled by the epoch and lays
+    their rows end to end; rank ``r`` gets the ``r``-th equal slice of the
+    remaining rows, in read order. Across all ranks the spans are disjoint and
+    cover the cursor. ``world_size`` need not match the one that produced the
+    cursor.
+    """
+    _check_rank(rank, world_size)
+    rows = [read_summary(p)["rows"] for p in paths]
+    spans = _native._partition_rows(rows, rank, world_size, cursor["epoch"], cursor["remaining"])
+    return [(paths[shard], start, end) for shard, start, end in spans]
+
+
+def advance_cursor(cursor: dict[str, Any], world_size: int, consumed: int) -> dict[str, Any]:
+    """The cursor after each of ``world_size`` ranks read ``consumed`` rows of its spans.
+
+    Ranks step in lockstep, so the per-rank count is enough: checkpoint the
+    result alongside the model and pass it to ``partition_rows`` on restart,
+    at any world size. An empty ``remaining`` means the epoch is done.
+    """
+    if world_size <= 0:
+        raise ValueError(f"invalid world_size {world_size}")
+    remaining = _native._advance_cursor(cursor["remaining"], world_size, consumed)
+    return {"epoch": cursor["epoch"], "remaining": [list(iv) for iv in remaining]}
@@ -0,0 +1,88 @@
+"""Shards, scripts and binaries shared by the loader tests.
+
+Shards are tarfiles built under `tmp_path` with members named
+`sample0000.txt`, `sample0000.bin`, ... Tests that need a `.utix` index or a
+server run the binaries in `zig-out/bin` and skip when they are not built.
+"""
+
+import io
+import itertools
+import subprocess
+import tarfile
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+INDEXER = REPO_ROOT / "zig-out" / "bin" / "indexer"
+HTTPD = REPO_ROOT / "zig-out" / "bin" / "ultar_httpd"
+MANIFEST = REPO_ROOT / "zig-out" / "bin" / "ultar_manifest"
+LOADER_SCRIPT = Path(__file__).with_name("loader_script.lua").read_text()
+
+# Emits one `.txt` row per `offset:size` pair in `ctx.members`.
+READ_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		local tar = loader:open_file(ctx.path)
+		for offset, size in ctx.members:gmatch("(%d+):(%d+)") do
+			loader:add_entry(tar, ".txt", tonumber(offset), tonumber(size))
+			loader:finish_row()
+		end
+		loader:close_file(tar)
+	end,
+}
+"""
+
+
+def write_tar(path: Path, rows: Iterable[Mapping[str, bytes]], stems: Iterable[str] | None = None) -> None:
+    """Write one member per suffix of each row, named `<stem><suffix>`."""
+    if stems is None:
+        stems = (f"sample{i:04d}" for i in itertools.count())
+    with tarfile.open(path, "w") as tar:
+        for stem, row in zip(stems, rows):
+            for suffix, data in row.items():
+                member = tarfile.TarInfo(stem + suffix)
+                member.size = len(data)
+                tar.addfile(member, io.BytesIO(data))
+
+
+def member_ranges(path: Path) -> str:
+    """`offset:size` of every member of the tar at `path`, as `READ_SCRIPT` expects."""
+    with tarfile.open(path) as tar:
+        return ",".join(f"{m.offset_data}:{m.size}" for m in tar.getmembers())
+
+
+def make_loader(path: Path, src: str = READ_SCRIPT, config: Mapping[str, str] | None = None, **kwargs) -> DataLoader:
+    """A loader over the members of the tar at `path`, passed as `ctx.path` and `ctx.members`."""
+    return DataLoader(src=src, config={"path": str(path), "members": member_ranges(path), **(config or {})}, **kwargs)
+
+
+def make_index_loader(
+    tar_path: Path | str, idx_path: Path | None = None, src: str = LOADER_SCRIPT, max_rows: int = -1, **kwargs
+) -> DataLoader:
+    """A loader over the rows of a shard's index; `tar_path` may be a URL when `idx_path` is given."""
+    idx_path = idx_path or Path(f"{tar_path}.utix")
+    config = {"tar_path": str(tar_path), "idx_path": str(idx_path), "max_rows": str(max_rows)}
+    return DataLoader(src=src, config=config, **kwargs)
+
+
+def require(*binaries: Path) -> None:
+    missing = [str(b.relative_to(REPO_ROOT)) for b in binaries if not b.exists()]
+    if missing:
+        pytest.skip(f"{', '.join(missing)} not built")
+
+
+def index(*tar_paths: Path, args: Sequence[str] = ()) -> None:
+    """Index each shard in place, passing `args` to the indexer."""
+    require(INDEXER)
+    subprocess.run([str(INDEXER), *args, *map(str, tar_paths)], cwd=Path(tar_paths[0]).parent, check=True)
+
@@ -0,0 +1,50 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import index, make_index_loader, write_tar
+
+
+@pytest.fixture
+def shard(tmp_path: Path) -> tuple[Path, Path]:
+    tar_path = tmp_path / "shard.tar"
+    write_tar(tar_path, ({".txt": f"row {i} text".encode()} for i in range(50)))
+    index(tar_path)
+    return tar_path, Path(f"{tar_path}.utix")
+
+
+async def collect(loader: DataLoader) -> list[bytes]:
+    return [row[".txt"] async for row in loader]
+
+
+def test_async_for_matches_sync(shard) -> None:
+    expected = [row[".txt"] for row in make_index_loader(*shard, max_rows=50)]
+    assert asyncio.run(collect(make_index_loader(*shard, max_rows=50))) == expected
+
+
+def test_loaders_share_one_loop(shard) -> None:
+    async def main() -> list[list[bytes]]:
+        return await asyncio.gather(
+            collect(make_index_loader(*shard, max_rows=50)),
+            collect(make_index_loader(*shard, max_rows=20)),
+            collect(make_index_loader(*shard, max_rows=5)),
+        )
+
+    a, b, c = asyncio.run(main())
+    assert a == [f"row {i} text".encode() for i in range(50)]
+    assert b == a[:20]
+    assert c == a[:5]
+
+
+def test_sync_iteration_refused_after_async(shard) -> None:
+    loader = make_index_loader(*shard, max_rows=10)
+
+    async def first() -> bytes:
+        return (await anext(aiter(loader)))[".txt"]
+
+    assert asyncio.run(first()) == b"row 0 text"
+    with pytest.raises(RuntimeError):
+        next(iter(loader))
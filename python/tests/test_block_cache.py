@@ -0,0 +1,78 @@
+import os
+import tarfile
+from pathlib import Path
+
+from .helpers import make_loader, write_tar
+
+
+# Reads every member once through the block cache, then emits the cache
+# counters as a final row once the populator has caught up.
+CACHED_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({ cache_dir = ctx.cache_dir, cache_size_mb = 64 })
+		local tar = loader:open_file(ctx.path)
+		for offset, size in ctx.members:gmatch("(%d+):(%d+)") do
+			loader:add_entry(tar, ".txt", tonumber(offset), tonumber(size))
+			loader:finish_row()
+		end
+		loader:close_file(tar)
+
+		while loader:cache_stats().populated + loader:cache_stats().hits == 0 do
+			loader:configure({})
+		end
+		local s = loader:cache_stats()
+		loader:add_entry_bytes(".stats", s.hits .. " " .. s.misses .. " " .. s.corrupt)
+		loader:finish_row()
+	end,
+}
+"""
+
+
+def make_shard(path: Path) -> list[tuple[int, int]]:
+    write_tar(path, ({".txt": f"row {i} ".encode() * 100} for i in range(50)))
+    with tarfile.open(path) as tar:
+        return [(m.offset_data, m.size) for m in tar.getmembers()]
+
+
+def run(path: Path, cache_dir: Path) -> tuple[list[bytes], list[int]]:
+    loader = make_loader(path, CACHED_SCRIPT, {"cache_dir": str(cache_dir)})
+    rows = [row.to_dict() for row in loader]
+    return [r[".txt"] for r in rows[:-1]], [int(x) for x in rows[-1][".stats"].split()]
+
+
+def test_second_epoch_hits_the_cache(tmp_path: Path) -> None:
+    shard = tmp_path / "shard.tar"
+    members = make_shard(shard)
+    expected = [f"row {i} ".encode() * 100 for i in range(50)]
+
+    rows, (hits, misses, corrupt) = run(shard, tmp_path / "blocks")
+    assert rows == expected
+    assert misses > 0 and corrupt == 0
+
+    # A new loader picks up the blocks the first one left behind.
+    rows, (hits, misses, corrupt) = run(shard, tmp_path / "blocks")
+    assert rows == expected
+    assert hits == len(members) and misses == 0
+
+
+def test_rewritten_shard_is_not_served_stale(tmp_path: Path) -> None:
+    shard = tmp_path / "shard.tar"
+    members = make_shard(shard)
+    run(shard, tmp_path / "blocks")
+
+    data = bytearray(shard.read_bytes())
+    offset, size = members[3]
+    data[offset : offset + size] = b"X" * size
+    shard.write_bytes(bytes(data))
+    # Same size; only the mtime tells the versions apart.
+    st = shard.stat()
+    os.utime(shard, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    rows, _ = run(shard, tmp_path / "blocks")
+    assert rows[3] == b"X" * size
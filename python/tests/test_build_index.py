@@ -0,0 +1,82 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import build_index
+
+from .helpers import write_tar
+
+
+def make_tar(path: Path, num_rows: int) -> int:
+    rows = [{".txt": f"{path.stem} {i}".encode(), ".json": json.dumps({"id": i}).encode()} for i in range(num_rows)]
+    write_tar(path, rows)
+    return sum(len(data) for row in rows for data in row.values())
+
+
+def test_build_index_matches_summaries(tmp_path: Path) -> None:
+    sizes = {"a": 5, "b": 0, "c": 17}
+    paths = [tmp_path / f"{name}.tar" for name in sizes]
+    payloads = [make_tar(p, sizes[p.stem]) for p in paths]
+    calls = []
+
+    result = build_index(paths, meta_rules=[".json:.id"], jobs=2, progress=lambda done, total: calls.append((done, total)))
+
+    assert [r["path"] for r in result] == [str(p) for p in paths]
+    assert [r["rows"] for r in result] == list(sizes.values())
+    assert [r["bytes"] for r in result] == payloads
+    for p, r in zip(paths, result):
+        assert Path(f"{p}.utix").exists()
+        summary = json.loads(Path(f"{p}.utix.summary.json").read_text())
+        assert summary["rows"] == r["rows"] and summary["total_bytes"] == r["bytes"]
+    total = sum(p.stat().st_size for p in paths)
+    assert calls and calls[-1][1] == total
+
+
+def test_build_index_jsonl_metadata(tmp_path: Path) -> None:
+    path = tmp_path / "shard.tar"
+    make_tar(path, 3)
+    build_index([path], meta_rules=[".json:.id"], fmt="jsonl")
+    rows = [json.loads(line) for line in Path(f"{path}.utix").read_text().splitlines()]
+    assert [r["metadata"][".id"] for r in rows] == [0, 1, 2]
+
+
+def test_build_index_errors(tmp_path: Path) -> None:
+    path = tmp_path / "shard.tar"
+    make_tar(path, 2)
+    with pytest.raises(ValueError):
+        build_index([path], meta_rules=["no-colon"])
+    with pytest.raises(ValueError):
+        build_index([path], fmt="xml")
+    with pytest.raises(RuntimeError, match="missing.tar"):
+        build_index([path, tmp_path / "missing.tar"])
+
+
+def test_progress_exception_cancels(tmp_path: Path) -> None:
+    path = tmp_path / "shard.tar"
+    make_tar(path, 2)
+
+    def boom(done: int, total: int) -> None:
+        raise KeyError("stop")
+
+    with pytest.raises(KeyError):
+        build_index([path], progress=boom)
+    # Shards stopped early must not leave an index that looks complete.
+    if Path(f"{path}.utix").exists():
+        summary = json.loads(Path(f"{path}.utix.summary.json").read_text())
+        assert summary["rows"] == 2
+
+
+def test_corrupt_shard_leaves_no_index(tmp_path: Path) -> None:
+    good = tmp_path / "good.tar"
+    make_tar(good, 3)
+    # Cut the archive after the first two members, before the end-of-archive marker.
+    bad = tmp_path / "bad.tar"
+    bad.write_bytes(good.read_bytes()[: 4 * 512])
+    Path(f"{bad}.utix").write_bytes(b"stale")
+
+    with pytest.raises(RuntimeError, match="bad.tar"):
+        build_index([good, bad])
+    assert Path(f"{good}.utix").exists()
+    assert not Path(f"{bad}.utix").exists()
+    assert not Path(f"{bad}.utix.summary.json").exists()
@@ -0,0 +1,63 @@
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import index, write_tar
+
+
+# Reopens a shard for every row, round-robin across shards.
+PER_ROW_SCRIPT = """
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({ max_open_files = tonumber(ctx.max_open_files) })
+		local rows = {}
+		for s = 1, tonumber(ctx.num_shards) do
+			local path = ctx.dir .. "/shard" .. s .. ".tar"
+			rows[s] = {}
+			for row in utix.open(path .. ".utix"):iter() do
+				table.insert(rows[s], { path = path, offset = row.offset + row.offsets[1], size = row.sizes[1] })
+			end
+		end
+		for i = 1, #rows[1] do
+			for s = 1, #rows do
+				local r = rows[s][i]
+				local tar = loader:open_file(r.path)
+				loader:add_entry(tar, ".txt", r.offset, r.size)
+				loader:close_file(tar)
+				loader:finish_row()
+			end
+		end
+	end,
+}
+"""
+
+
+@pytest.fixture
+def shards(tmp_path: Path) -> Path:
+    paths = [tmp_path / f"shard{s}.tar" for s in range(1, 4)]
+    for s, path in enumerate(paths, 1):
+        write_tar(path, ({".txt": f"shard {s} row {i}".encode()} for i in range(20)))
+    index(*paths)
+    return tmp_path
+
+
+def load(root: Path, max_open_files: int) -> list[bytes]:
+    loader = DataLoader(
+        src=PER_ROW_SCRIPT,
+        config={"dir": str(root), "num_shards": "3", "max_open_files": str(max_open_files)},
+    )
+    return [row[".txt"] for row in loader]
+
+
+@pytest.mark.parametrize("max_open_files", [0, 1, 2, 8])
+def test_handle_cache_preserves_rows(shards, max_open_files: int) -> None:
+    expected = [f"shard {s} row {i}".encode() for i in range(20) for s in range(1, 4)]
+    assert load(shards, max_open_files) == expected
@@ -0,0 +1,88 @@
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+from .helpers import HTTPD, INDEXER, index, make_index_loader, require, write_tar
+
+
+HTTP_SCRIPT = """
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({ http_concurrency = 4, http_retries = 2 })
+		local tar = loader:open_file(ctx.tar_path)
+		for row in utix.open(ctx.idx_path):iter() do
+			for i = 1, #row.keys do
+				loader:add_entry(tar, row.keys[i], row.offset + row.offsets[i], row.sizes[i])
+			end
+			loader:finish_row()
+		end
+		loader:close_file(tar)
+	end,
+}
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def httpd(tmp_path: Path):
+    require(INDEXER, HTTPD)
+    rows = ({".txt": f"row {i} text".encode(), ".bin": bytes((i + k) % 256 for k in range(1000 + i))} for i in range(64))
+    write_tar(tmp_path / "shard.tar", rows)
+    index(tmp_path / "shard.tar")
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [str(HTTPD), "--addr", "127.0.0.1", "--port", str(port), "--data", str(tmp_path)],
+        # Outside the repo, so there are no templates or static assets to find.
+        cwd=tmp_path,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        yield tmp_path, f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def load_rows(tar_path: str, idx_path: Path) -> list[dict[str, bytes]]:
+    return [row.to_dict() for row in make_index_loader(tar_path, idx_path, src=HTTP_SCRIPT)]
+
+
+def test_http_rows_match_local(httpd) -> None:
+    root, base_url = httpd
+    idx_path = root / "shard.tar.utix"
+
+    local = load_rows(str(root / "shard.tar"), idx_path)
+    remote = load_rows(f"{base_url}/map_file?file=shard.tar", idx_path)
+
+    assert len(local) == 64
+    assert remote == local
+
+
+def test_existing_script_reads_over_http(httpd) -> None:
+    root, base_url = httpd
+    loader = make_index_loader(f"{base_url}/map_file?file=shard.tar", root / "shard.tar.utix", max_rows=5)
+    texts = [row[".txt"] for row in loader]
+    assert texts == [f"row {i} text".encode() for i in range(5)]
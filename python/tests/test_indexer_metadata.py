@@ -6,6 +6,8 @@ from pathlib import Path
 
 from ultar_dataloader import DataLoader
 
+from .helpers import write_tar
+
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 INDEXER = REPO_ROOT / "zig-out" / "bin" / "indexer"
@@ -128,3 +130,113 @@ return {
         b"4888|375|500|n03615563_10371.JPEG\0tail",
         b"123|224|224|n02469248_2525.JPEG\0tail",
     ]
+
+
+def test_dataloader_row_view_reads_sizes_and_metadata(tmp_path: Path) -> None:
+    tar_path = tmp_path / "metadata.tar"
+    make_metadata_tar(tar_path)
+
+    subprocess.run(
+        [str(INDEXER), "--meta-rule", META_RULE, str(tar_path)],
+        cwd=REPO_ROOT,
+        check=True,
+    )
+
+    lua_script = r"""
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+
+return {
+  init_ctx = function(rank, world_size, config)
+    return { idx_path = config.idx_path }
+  end,
+
+  row_generator = function(ctx)
+    local idx = utix.open(ctx.idx_path)
+    for row in idx:rows() do
+      local payload = table.concat({
+        string.format("%d", #row),
+        string.format("%.0f", row:size(".json")),
+        tostring(row:abs_offset(".json") - row:rel_offset(".json") == row:base_offset()),
+        tostring(row:has(".nope")),
+        string.format("%.0f", row:meta(".width")),
+        tostring(row:meta(".filename")),
+      }, "|")
+      loader:add_entry_bytes(".view.txt", payload)
+      loader:finish_row()
+    end
+  end,
+}
+"""
+
+    loader = DataLoader(src=lua_script, config={"idx_path": f"{tar_path}.utix"})
+    got = [row[".view.txt"] for row in loader]
+
+    json_sizes = [
+        len(json.dumps(meta, separators=(",", ":")))
+        for meta in (
+            {"label": 4888, "width": 375, "height": 500, "filename": "n03615563_10371.JPEG"},
+            {"label": 123, "width": 224, "height": 224, "filename": "n02469248_2525.JPEG"},
+        )
+    ]
+    assert got == [
+        f"3|{json_sizes[0]}|true|false|375|n03615563_10371.JPEG".encode(),
+        f"3|{json_sizes[1]}|true|false|224|n02469248_2525.JPEG".encode(),
+    ]
+
+
+def test_indexer_metadata_from_nested_json_labels_and_msgpack(tmp_path: Path) -> None:
+    tar_path = tmp_path / "mixed.tar"
+    caption = "a photo of " + "many words " * 2000
+    meta = {"caption": caption, "size": {"w": 640, "h": 480}, "tags": ["cat", "sofa"]}
+    # {"aesthetic": 6, "source": "laion"} as msgpack
+    mpk = b"\x82\xa9aesthetic\x06\xa6source\xa5laion"
+    write_tar(tar_path, [{".cls": b"  17\n", ".json": json.dumps(meta).encode(), ".mpk": mpk}])
+
+    subprocess.run(
+        [
+            str(INDEXER),
+            "--fmt",
+            "jsonl",
+            "--meta-rule",
+            ".json:.size.w;.tags[1];.missing",
+            "--meta-rule",
+            ".cls:.",
+            "--meta-rule",
+            ".mpk:.source",
+            str(tar_path),
+        ],
+        cwd=REPO_ROOT,
+        check=True,
+    )
+
+    rows = read_jsonl(Path(f"{tar_path}.utix"))
+    assert rows[0]["metadata"] == {
+        ".size.w": 640,
+        ".tags[1]": "sofa",
+        ".missing": None,
+        ".": 17,
+        ".source": "laion",
+    }
+
+
+def test_indexer_metadata_from_json_member_without_json_suffix(tmp_path: Path) -> None:
+    tar_path = tmp_path / "meta.tar"
+    data = json.dumps({"caption": "a cat", "size": {"w": 640}}).encode()
+    write_tar(tar_path, [{".meta": data}])
+
+    subprocess.run(
+        [
+            str(INDEXER),
+            "--fmt",
+            "jsonl",
+            "--meta-rule",
+            ".meta:.caption;.size.w",
+            str(tar_path),
+        ],
+        cwd=REPO_ROOT,
+        check=True,
+    )
+
+    rows = read_jsonl(Path(f"{tar_path}.utix"))
+    assert rows[0]["metadata"] == {".caption": "a cat", ".size.w": 640}
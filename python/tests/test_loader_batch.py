@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+
+from .helpers import index, make_index_loader, write_tar
+
+
+BATCH_SCRIPT = """
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		local tar = loader:open_file(ctx.tar_path)
+		local batch = loader:batch()
+		for row in utix.open(ctx.idx_path):iter() do
+			for i = 1, #row.keys do
+				if row.sizes[i] > 0 then
+					batch:add(tar, batch:key(row.keys[i]), row.offset + row.offsets[i], row.sizes[i])
+				end
+			end
+			batch:finish_row()
+		end
+		batch:flush()
+		loader:close_file(tar)
+	end,
+}
+"""
+
+
+@pytest.fixture
+def batch_shard(tmp_path: Path) -> Path:
+    tar_path = tmp_path / "shard.tar"
+    # Enough rows to wrap the native batch buffer several times.
+    rows = ({".txt": f"row {i}".encode(), ".bin": bytes((i + k) % 256 for k in range(64 + i % 7))} for i in range(300))
+    write_tar(tar_path, rows)
+    index(tar_path)
+    return tar_path
+
+
+def load(tar_path: Path, **kwargs) -> list[dict[str, bytes]]:
+    return [row.to_dict() for row in make_index_loader(tar_path, **kwargs)]
+
+
+def test_batch_matches_per_call_api(batch_shard: Path) -> None:
+    expected = load(batch_shard)
+    got = load(batch_shard, src=BATCH_SCRIPT)
+    assert len(expected) == 300
+    assert got == expected
+
+
+def test_unflushed_batch_is_drained_when_the_generator_returns(batch_shard: Path) -> None:
+    # 300 rows of three entries leave a partial batch of 132 behind.
+    script = BATCH_SCRIPT.replace("\t\tbatch:flush()\n\t\tloader:close_file(tar)\n", "")
+    assert "batch:flush()" not in script
+    expected = load(batch_shard)
+    got = load(batch_shard, src=script)
+    assert got == expected
@@ -0,0 +1,121 @@
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import HTTPD, INDEXER, MANIFEST, REPO_ROOT, index, require, write_tar
+
+
+SHARD_ROWS = {"a": 7, "empty": 0, "b": 3, "c": 12}
+
+# Emits the `.txt` of each requested global row, looked up through the manifest.
+LOOKUP_SCRIPT = """
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+local manifest = require("ultar.manifest")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		local rows = {}
+		for r in config.rows:gmatch("%d+") do rows[#rows + 1] = tonumber(r) end
+		return { path = config.manifest, rows = rows }
+	end,
+	row_generator = function(ctx)
+		local m = manifest.open(ctx.path)
+		for _, g in ipairs(ctx.rows) do
+			local path, local_row = m:locate(g)
+			local tar = loader:open_file(path)
+			local i = 0
+			for row in utix.open(path .. ".utix"):iter() do
+				if i == local_row then
+					for k = 1, #row.keys do
+						if row.keys[k] == ".txt" then
+							loader:add_entry(tar, ".txt", row.offset + row.offsets[k], row.sizes[k])
+						end
+					end
+					loader:finish_row()
+					break
+				end
+				i = i + 1
+			end
+			loader:close_file(tar)
+		end
+		assert(m:locate(m:num_rows()) == nil)
+	end,
+}
+"""
+
+
+@pytest.fixture
+def dataset(tmp_path: Path) -> Path:
+    require(INDEXER, MANIFEST)
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    paths = []
+    for name, rows in SHARD_ROWS.items():
+        write_tar(shards / f"{name}.tar", ({".txt": f"{name} {i}".encode()} for i in range(rows)))
+        paths.append(shards / f"{name}.tar")
+    index(*paths)
+    subprocess.run([str(MANIFEST), "-o", "dataset.utmf", *paths], cwd=tmp_path, check=True)
+    return tmp_path
+
+
+def global_rows() -> list[str]:
+    return [f"{name} {i}" for name, rows in SHARD_ROWS.items() for i in range(rows)]
+
+
+def test_lua_locates_global_rows(dataset: Path) -> None:
+    expected = global_rows()
+    wanted = [0, 6, 7, 9, 10, len(expected) - 1, 3]
+    loader = DataLoader(
+        src=LOOKUP_SCRIPT,
+        config={"manifest": str(dataset / "dataset.utmf"), "rows": ",".join(map(str, wanted))},
+    )
+    assert [row[".txt"].decode() for row in loader] == [expected[g] for g in wanted]
+
+
+def test_httpd_manifest_endpoint(dataset: Path) -> None:
+    require(HTTPD)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [str(HTTPD), "--addr", "127.0.0.1", "--port", str(port), "--data", str(dataset)],
+        cwd=REPO_ROOT,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+        def get(query: str) -> dict:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/manifest?{query}") as resp:
+                return json.load(resp)
+
+        total = len(global_rows())
+        assert get("file=dataset.utmf") == {"num_shards": 4, "total_rows": total, "metadata": False}
+        assert get("file=dataset.utmf&row=8") == {
+            "row": 8,
+            "shard": 2,
+            "path": "shards/b.tar",
+            "local_row": 1,
+            "metadata": None,
+        }
+        with pytest.raises(urllib.error.HTTPError) as exc:
+            get(f"file=dataset.utmf&row={total}")
+        assert exc.value.code == 404
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import make_loader, write_tar
+
+
+MAPPED_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({ mmap = ctx.mmap == "1", on_read_error = "skip_row" })
+		local tar = loader:open_file(ctx.path)
+		for offset, size in ctx.members:gmatch("(%d+):(%d+)") do
+			loader:add_entry(tar, ".txt", tonumber(offset), tonumber(size))
+			loader:finish_row()
+		end
+		-- Past the end of the file: fails like a short read and is skipped.
+		loader:add_entry(tar, ".txt", 1073741824, 16)
+		loader:finish_row()
+		loader:close_file(tar)
+	end,
+}
+"""
+
+
+def make_mapped_loader(tmp_path: Path, mmap: bool) -> DataLoader:
+    path = tmp_path / "shard.tar"
+    write_tar(path, ({".txt": f"row {i} ".encode() * 50} for i in range(100)))
+    return make_loader(path, MAPPED_SCRIPT, {"mmap": "1" if mmap else "0"})
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_rows_match_with_and_without_mmap(tmp_path: Path, mmap: bool) -> None:
+    rows = [row[".txt"] for row in make_mapped_loader(tmp_path, mmap)]
+    assert rows == [f"row {i} ".encode() * 50 for i in range(100)]
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_view_keeps_the_row_alive(tmp_path: Path, mmap: bool) -> None:
+    views = []
+    for i, row in enumerate(make_mapped_loader(tmp_path, mmap)):
+        view = row.view(".txt")
+        assert view.readonly
+        assert view == row[".txt"]
+        if i % 10 == 0:
+            # Outlives the row and the loader; must still read the right bytes.
+            views.append((i, view))
+        else:
+            view.release()
+        del row
+        # Hold fewer views than the loader's floating-row limit.
+        if len(views) == 8:
+            break
+    for i, view in views:
+        assert bytes(view) == f"row {i} ".encode() * 50
+
+    with pytest.raises(KeyError):
+        next(iter(make_mapped_loader(tmp_path, mmap))).view(".missing")
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+import pytest
+
+from .helpers import make_loader, write_tar
+
+
+# Peeks each member's first 4 bytes and only reads on from "keep" members:
+# the whole member as `.txt` and bytes [5, 9) of it as `.mid`.
+PEEK_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({ mmap = ctx.mmap == "1" })
+		local tar = loader:open_file(ctx.path)
+		for offset, size in ctx.members:gmatch("(%d+):(%d+)") do
+			offset, size = tonumber(offset), tonumber(size)
+			if loader:peek(tar, offset, 4) == "keep" then
+				loader:add_entry(tar, ".txt", offset, size)
+				loader:add_entry_range(tar, ".mid", offset, size, 5, 4)
+				loader:add_entry_range(tar, ".tail", offset, size, size - 2, 100)
+				loader:finish_row()
+			end
+		end
+		loader:add_entry_bytes(".past_end", tostring(loader:peek(tar, 1073741824, 4)))
+		loader:finish_row()
+		loader:close_file(tar)
+	end,
+}
+"""
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_peek_filters_and_ranges_slice(tmp_path: Path, mmap: bool) -> None:
+    path = tmp_path / "shard.tar"
+    payloads = [(b"keep" if i % 3 == 0 else b"drop") + f" {i:03d} ".encode() * 20 for i in range(30)]
+    write_tar(path, ({".txt": data} for data in payloads))
+
+    loader = make_loader(path, PEEK_SCRIPT, {"mmap": "1" if mmap else "0"})
+    rows = [row.to_dict() for row in loader]
+
+    kept = [p for p in payloads if p.startswith(b"keep")]
+    assert [r[".txt"] for r in rows[:-1]] == kept
+    assert [r[".mid"] for r in rows[:-1]] == [p[5:9] for p in kept]
+    assert [r[".tail"] for r in rows[:-1]] == [p[-2:] for p in kept]
+    assert rows[-1] == {".past_end": b"nil"}
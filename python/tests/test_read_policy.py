@@ -0,0 +1,115 @@
+import tarfile
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import write_tar
+
+
+# Emits one row per `;`-separated group of `key:offset:size` entries, then a
+# final row listing the failures reported by `loader:read_errors()`.
+POLICY_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		loader:configure({
+			on_read_error = ctx.on_read_error,
+			out_of_order = ctx.out_of_order == "1",
+			read_deadline_ms = tonumber(ctx.read_deadline_ms),
+			hedge_reads = ctx.hedge_reads == "1",
+		})
+		local tar = loader:open_file(ctx.path)
+		local expected_errors = 0
+		for group in ctx.rows:gmatch("[^;]+") do
+			for key, offset, size in group:gmatch("([^:,]+):(%d+):(%d+)") do
+				loader:add_entry(tar, key, tonumber(offset), tonumber(size))
+				if key == ".bad" then expected_errors = expected_errors + 1 end
+			end
+			loader:finish_row()
+		end
+		loader:close_file(tar)
+
+		if ctx.on_read_error == "fail" then return end
+		local failures = {}
+		while #failures < expected_errors do
+			for _, f in ipairs(loader:read_errors()) do
+				failures[#failures + 1] = f.err .. " " .. f.key .. " " .. f.size
+			end
+			loader:configure({})
+		end
+		loader:add_entry_bytes(".errors", table.concat(failures, "\\n"))
+		loader:finish_row()
+	end,
+}
+"""
+
+
+@pytest.fixture
+def small_shard(tmp_path: Path) -> tuple[Path, list[tuple[int, int]]]:
+    path = tmp_path / "shard.tar"
+    write_tar(path, ({".txt": f"row {i}".encode()} for i in range(8)))
+    with tarfile.open(path) as tar:
+        members = [(m.offset_data, m.size) for m in tar.getmembers()]
+    return path, members
+
+
+def load(shard, bad_rows: set[int], **config: str) -> list[dict[str, bytes]]:
+    path, members = shard
+    past_eof = path.stat().st_size - 8
+    groups = []
+    for i, (offset, size) in enumerate(members):
+        group = f".txt:{offset}:{size}"
+        if i in bad_rows:
+            group += f",.bad:{past_eof}:64"
+        groups.append(group)
+    loader = DataLoader(
+        src=POLICY_SCRIPT,
+        config={
+            "path": str(path),
+            "rows": ";".join(groups),
+            "on_read_error": "fail",
+            "out_of_order": "0",
+            "read_deadline_ms": "0",
+            "hedge_reads": "0",
+            **config,
+        },
+    )
+    return [row.to_dict() for row in loader]
+
+
+def test_drop_entry_keeps_the_row(small_shard) -> None:
+    rows = load(small_shard, {2, 5}, on_read_error="drop_entry")
+    assert [r[".txt"] for r in rows[:-1]] == [f"row {i}".encode() for i in range(8)]
+    assert all(".bad" not in r for r in rows)
+    assert rows[-1][".errors"] == b"ReadError .bad 64\nReadError .bad 64"
+
+
+def test_skip_row_drops_the_row(small_shard) -> None:
+    rows = load(small_shard, {2, 5}, on_read_error="skip_row")
+    assert [r[".txt"] for r in rows[:-1]] == [f"row {i}".encode() for i in range(8) if i not in (2, 5)]
+    assert rows[-1][".errors"].count(b"ReadError") == 2
+
+
+def test_fail_ends_iteration(small_shard) -> None:
+    rows = load(small_shard, {2}, on_read_error="fail")
+    # Rows queued behind the failure may or may not have been handed out.
+    assert [r[".txt"] for r in rows] == [b"row 0", b"row 1"][: len(rows)]
+
+
+def test_deadline_and_hedging_keep_every_row(small_shard) -> None:
+    rows = load(
+        small_shard,
+        set(),
+        on_read_error="skip_row",
+        out_of_order="1",
+        read_deadline_ms="10000",
+        hedge_reads="1",
+    )
+    assert sorted(r[".txt"] for r in rows[:-1]) == [f"row {i}".encode() for i in range(8)]
+    assert rows[-1][".errors"] == b""
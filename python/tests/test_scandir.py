@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from ultar_dataloader import DataLoader
+
+
+# Emits one row per path `scandir.walk` returns.
+WALK_SCRIPT = """
+local loader = require("ultar.loader")
+local scandir = require("ultar.scandir")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		local opts = { ext = ".tar", recursive = ctx.recursive, cache = ctx.cache }
+		for _, path in ipairs(scandir.walk(ctx.root, opts)) do
+			loader:add_entry_bytes(".path", path)
+			loader:finish_row()
+		end
+	end,
+}
+"""
+
+
+def walk(root: Path, cache: Path, recursive: bool = True) -> list[str]:
+    loader = DataLoader(src=WALK_SCRIPT, config={"root": str(root), "cache": str(cache), "recursive": recursive})
+    return [row[".path"].decode() for row in loader]
+
+
+def test_walk_filters_and_reuses_the_listing(tmp_path: Path) -> None:
+    root = (tmp_path / "data").resolve()
+    for rel in ["b/y.tar", "a/deep/x.tar", "top.tar", "top.tar.utix", "b/notes.txt"]:
+        (root / rel).parent.mkdir(parents=True, exist_ok=True)
+        (root / rel).write_bytes(b"")
+    cache = tmp_path / "listing"
+
+    expected = [str(root / rel) for rel in ["a/deep/x.tar", "b/y.tar", "top.tar"]]
+    assert walk(root, cache) == expected
+    assert cache.exists()
+    assert walk(root, cache) == expected
+    assert walk(root, tmp_path / "flat", recursive=False) == [str(root / "top.tar")]
+
+    # A new shard changes its directory's mtime, so the listing is rebuilt.
+    (root / "b" / "z.tar").write_bytes(b"")
+    assert walk(root, cache) == expected[:2] + [str(root / "b/z.tar"), str(root / "top.tar")]
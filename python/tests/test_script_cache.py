@@ -0,0 +1,107 @@
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+
+MEMO_SCRIPT = """
+local cache = require("ultar.cache")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		local value = cache.memo("test:" .. config.name, function()
+			local f = io.open(config.counter, "a")
+			f:write("x")
+			f:close()
+			return { shards = { "a.tar", "b.tar" }, n = 2, nested = { ok = true } }
+		end)
+		return { value = value }
+	end,
+	row_generator = function(ctx)
+		local v = ctx.value
+		assert(v.shards[1] == "a.tar" and v.shards[2] == "b.tar")
+		assert(v.n == 2 and v.nested.ok == true)
+		require("ultar.loader"):add_entry_bytes(".dir", tostring(require("ultar.cache").dir))
+		require("ultar.loader"):finish_row()
+	end,
+}
+"""
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    d = tmp_path / "cache"
+    monkeypatch.setenv("ULTAR_CACHE_DIR", str(d))
+    return d
+
+
+def run(tmp_path: Path, name: str) -> list[bytes]:
+    loader = DataLoader(
+        src=MEMO_SCRIPT,
+        config={"name": name, "counter": str(tmp_path / f"{name}.count")},
+    )
+    return [row[".dir"] for row in loader]
+
+
+def test_memo_computes_once(tmp_path: Path, cache_dir: Path) -> None:
+    assert run(tmp_path, "a") == [str(cache_dir).encode()]
+    assert run(tmp_path, "a") == [str(cache_dir).encode()]
+    assert (tmp_path / "a.count").read_text() == "x"
+
+    run(tmp_path, "b")
+    assert (tmp_path / "b.count").read_text() == "x"
+
+
+def test_bytecode_is_cached_and_reused(tmp_path: Path, cache_dir: Path) -> None:
+    run(tmp_path, "c")
+    entries = list(cache_dir.glob("*.bc"))
+    assert len(entries) == 1
+    mtime = entries[0].stat().st_mtime_ns
+
+    # A hit must not rewrite the entry.
+    assert run(tmp_path, "c") == [str(cache_dir).encode()]
+    assert entries[0].stat().st_mtime_ns == mtime
+
+
+def test_corrupt_bytecode_falls_back_to_source(tmp_path: Path, cache_dir: Path) -> None:
+    run(tmp_path, "d")
+    for entry in cache_dir.glob("*.bc"):
+        entry.write_bytes(b"not bytecode")
+    assert run(tmp_path, "d") == [str(cache_dir).encode()]
+
+
+def test_cache_can_be_disabled(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ULTAR_CACHE_DIR", "")
+    assert run(tmp_path, "e") == [b"nil"]
+    assert run(tmp_path, "e") == [b"nil"]
+    assert (tmp_path / "e.count").read_text() == "xx"
+
+
+def test_cache_is_off_by_default(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ULTAR_CACHE_DIR", raising=False)
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    assert run(tmp_path, "h") == [b"nil"]
+    assert run(tmp_path, "h") == [b"nil"]
+    assert (tmp_path / "h.count").read_text() == "xx"
+    assert not (tmp_path / "home").exists() and not (tmp_path / "xdg").exists()
+
+
+def test_relative_cache_dir_is_made_absolute(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ULTAR_CACHE_DIR", ".cache")
+    expected = str((tmp_path / ".cache").resolve()).encode()
+    assert run(tmp_path, "f") == [expected]
+    assert run(tmp_path, "f") == [expected]
+    assert len(list((tmp_path / ".cache").glob("*.bc"))) == 1
+
+
+def test_shared_writable_dir_skips_bytecode(tmp_path: Path, cache_dir: Path) -> None:
+    cache_dir.mkdir()
+    cache_dir.chmod(0o777)
+    run(tmp_path, "g")
+    assert list(cache_dir.glob("*.bc")) == []
+    # Data memoised by `cache.memo` is still shared.
+    run(tmp_path, "g")
+    assert (tmp_path / "g.count").read_text() == "x"
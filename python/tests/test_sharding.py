@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+from ultar_dataloader.sharding import (
+    advance_cursor,
+    assign_row_ranges,
+    assign_shards,
+    epoch_cursor,
+    partition_rows,
+    read_summary,
+)
+
+from .helpers import index, write_tar
+
+
+# Each rank emits the `.txt` of every row in its assigned ranges.
+SHARDED_SCRIPT = """
+local loader = require("ultar.loader")
+local utix = require("ultar.utix")
+local sharding = require("ultar.sharding")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		local paths = {}
+		for p in config.paths:gmatch("[^;]+") do paths[#paths + 1] = p end
+		return { ranges = sharding.assign_row_ranges(paths, rank, world_size) }
+	end,
+	row_generator = function(ctx)
+		for _, r in ipairs(ctx.ranges) do
+			local tar = loader:open_file(r.path)
+			local i = 0
+			for row in utix.open(r.path .. ".utix"):iter() do
+				if i >= r.end_row then break end
+				if i >= r.start_row then
+					for k = 1, #row.keys do
+						if row.keys[k] == ".txt" then
+							loader:add_entry(tar, ".txt", row.offset + row.offsets[k], row.sizes[k])
+						end
+					end
+					loader:finish_row()
+				end
+				i = i + 1
+			end
+			loader:close_file(tar)
+		end
+	end,
+}
+"""
+
+
+def write_summary(tar_path: Path, rows: int, total_bytes: int) -> None:
+    summary = {"version": 1, "rows": rows, "total_bytes": total_bytes, "keys": {}, "row_size_hist": []}
+    Path(str(tar_path) + ".utix.summary.json").write_text(json.dumps(summary))
+
+
+def make_tar(path: Path, num_rows: int, payload: int) -> None:
+    write_tar(path, ({".txt": f"{path.stem} {i}".encode(), ".bin": bytes(payload)} for i in range(num_rows)))
+
+
+def test_assign_shards_balances_bytes(tmp_path: Path) -> None:
+    sizes = [900, 500, 400, 300, 300, 100]
+    paths = []
+    for i, size in enumerate(sizes):
+        paths.append(str(tmp_path / f"{i}.tar"))
+        write_summary(tmp_path / f"{i}.tar", 10, size)
+
+    owned = [assign_shards(paths, r, 3) for r in range(3)]
+    assert sorted(p for ps in owned for p in ps) == sorted(paths)
+    loads = [sum(sizes[paths.index(p)] for p in ps) for ps in owned]
+    assert max(loads) - min(loads) <= 100
+    assert all(ps == sorted(ps, key=paths.index) for ps in owned)
+
+
+def test_row_ranges_are_disjoint_and_cover(tmp_path: Path) -> None:
+    shards = [(100, 10_000), (7, 20_000), (0, 0), (33, 3_000), (50, 0)]
+    paths = []
+    for i, (rows, size) in enumerate(shards):
+        paths.append(str(tmp_path / f"{i}.tar"))
+        write_summary(tmp_path / f"{i}.tar", rows, size)
+
+    for world_size in (1, 2, 3, 8, 64):
+        seen = {p: [] for p in paths}
+        for rank in range(world_size):
+            for path, start, end in assign_row_ranges(paths, rank, world_size):
+                seen[path].extend(range(start, end))
+        for path, (rows, _) in zip(paths, shards):
+            assert sorted(seen[path]) == list(range(rows))
+
+
+def test_partition_resumes_at_a_new_world_size(tmp_path: Path) -> None:
+    shard_rows = [100, 7, 0, 33, 50]
+    paths = []
+    for i, rows in enumerate(shard_rows):
+        paths.append(str(tmp_path / f"{i}.tar"))
+        write_summary(tmp_path / f"{i}.tar", rows, rows * 10)
+
+    cursor = epoch_cursor(paths, epoch=5)
+    read = {p: [] for p in paths}
+    # 8 ranks read 6 rows each, checkpoint, and the job comes back with 3.
+    for rank in range(8):
+        rows = [(path, i) for path, start, end in partition_rows(paths, rank, 8, cursor) for i in range(start, end)]
+        for path, i in rows[:6]:
+            read[path].append(i)
+    cursor = json.loads(json.dumps(advance_cursor(cursor, 8, 6)))
+    assert sum(hi - lo for lo, hi in cursor["remaining"]) == sum(shard_rows) - 48
+
+    for rank in range(3):
+        for path, start, end in partition_rows(paths, rank, 3, cursor):
+            read[path].extend(range(start, end))
+    for path, rows in zip(paths, shard_rows):
+        assert sorted(read[path]) == list(range(rows))
+
+    assert advance_cursor(cursor, 3, 1000)["remaining"] == []
+
+
+def test_partition_order_depends_on_epoch(tmp_path: Path) -> None:
+    paths = []
+    for i in range(8):
+        paths.append(str(tmp_path / f"{i}.tar"))
+        write_summary(tmp_path / f"{i}.tar", 10, 100)
+
+    orders = {tuple(p for p, _, _ in partition_rows(paths, 0, 1, epoch_cursor(paths, e))) for e in range(4)}
+    assert len(orders) > 1
+    with pytest.raises(ValueError):
+        partition_rows(paths, 0, 1, {"epoch": 0, "remaining": [[0, 81]]})
+
+
+def test_missing_summary_names_the_file(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError, match="shard.tar.utix.summary.json"):
+        read_summary(tmp_path / "shard.tar")
+
+
+def test_indexer_writes_summary(tmp_path: Path) -> None:
+    make_tar(tmp_path / "a.tar", 20, 1000)
+    index(tmp_path / "a.tar")
+
+    summary = read_summary(tmp_path / "a.tar")
+    assert summary["rows"] == 20
+    assert summary["keys"][".bin"] == {"count": 20, "bytes": 20_000}
+    assert summary["keys"][".txt"]["count"] == 20
+    assert summary["total_bytes"] == 20_000 + summary["keys"][".txt"]["bytes"]
+    assert sum(count for _, count in summary["row_size_hist"]) == 20
+
+
+def test_lua_ranges_match_python(tmp_path: Path) -> None:
+    paths = []
+    for name, rows, payload in (("a", 40, 4000), ("b", 10, 500), ("c", 25, 2000)):
+        make_tar(tmp_path / f"{name}.tar", rows, payload)
+        paths.append(str(tmp_path / f"{name}.tar"))
+    index(*map(Path, paths))
+
+    world_size = 3
+    for rank in range(world_size):
+        loader = DataLoader(
+            src=SHARDED_SCRIPT,
+            rank=rank,
+            world_size=world_size,
+            config={"paths": ";".join(paths)},
+        )
+        got = [row[".txt"].decode() for row in loader]
+        expected = [
+            f"{Path(path).stem} {i}"
+            for path, start, end in assign_row_ranges(paths, rank, world_size)
+            for i in range(start, end)
+        ]
+        assert got == expected
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import make_loader, write_tar
+
+
+# Reads every member twice, as `.txt` and `.other`.
+STAGED_SCRIPT = """
+local loader = require("ultar.loader")
+
+return {
+	init_ctx = function(rank, world_size, config)
+		return config
+	end,
+	row_generator = function(ctx)
+		local tar = loader:open_file(ctx.path)
+		for offset, size in ctx.members:gmatch("(%d+):(%d+)") do
+			loader:add_entry(tar, ".txt", tonumber(offset), tonumber(size))
+			loader:add_entry(tar, ".other", tonumber(offset), tonumber(size))
+			loader:finish_row()
+		end
+		loader:close_file(tar)
+	end,
+}
+"""
+
+EXPECTED = [f"row {i:02d}".encode() for i in range(40)]
+
+
+def make_staged_loader(tmp_path: Path) -> DataLoader:
+    path = tmp_path / "shard.tar"
+    write_tar(path, ({".txt": data} for data in EXPECTED))
+    return make_loader(path, STAGED_SCRIPT)
+
+
+def test_reads_land_in_registered_buffers(tmp_path: Path) -> None:
+    loader = make_staged_loader(tmp_path)
+    buffers = [bytearray(16) for _ in range(8)]
+    loader.register_buffers(".txt", buffers)
+
+    staged = 0
+    for row, expected in zip(loader, EXPECTED, strict=True):
+        assert row[".txt"] == expected
+        assert row.staged(".other") is None
+        i = row.staged(".txt")
+        if i is not None:
+            assert bytes(buffers[i][: len(expected)]) == expected
+            staged += 1
+        del row
+    assert staged > 0
+
+
+def test_held_rows_keep_their_buffers(tmp_path: Path) -> None:
+    loader = make_staged_loader(tmp_path)
+    loader.register_buffers(".txt", [bytearray(16) for _ in range(2)])
+
+    rows = list(loader)
+    assert [row[".txt"] for row in rows] == EXPECTED
+    held = [row.staged(".txt") for row in rows if row.staged(".txt") is not None]
+    # Nothing was released, so each buffer went to one row only.
+    assert sorted(held) == [0, 1]
+
+
+def test_register_buffers_checks_its_arguments(tmp_path: Path) -> None:
+    loader = make_staged_loader(tmp_path)
+    with pytest.raises(BufferError):
+        loader.register_buffers(".txt", [b"read-only"])
+    with pytest.raises(ValueError):
+        loader.register_buffers(".txt", [])
+    loader.register_buffers(".txt", [bytearray(16)])
+    with pytest.raises(ValueError):
+        loader.register_buffers(".txt", [bytearray(16)])
+
+    next(iter(loader))
+    with pytest.raises(RuntimeError):
+        loader.register_buffers(".other", [bytearray(16)])
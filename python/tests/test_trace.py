@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from ultar_dataloader import DataLoader
+
+from .helpers import make_loader, write_tar
+
+
+def make_traced_loader(tmp_path: Path, **kwargs) -> DataLoader:
+    path = tmp_path / "shard.tar"
+    write_tar(path, ({".txt": f"row {i}".encode()} for i in range(10)))
+    return make_loader(path, **kwargs)
+
+
+def test_dump_trace_covers_the_pipeline(tmp_path: Path) -> None:
+    loader = make_traced_loader(tmp_path, trace=True)
+    rows = []
+    for row in loader:
+        rows.append(row.to_dict())
+        del row
+    assert len(rows) == 10
+
+    out = tmp_path / "trace.json"
+    loader.dump_trace(out)
+    events = json.loads(out.read_text())["traceEvents"]
+
+    threads = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert threads == {"lua", "io", "consumer"}
+    names = {(e["name"], e["ph"]) for e in events}
+    for expected in [
+        ("lua_resume", "X"),
+        ("request", "b"),
+        ("submit", "i"),
+        ("request", "e"),
+        ("response", "i"),
+        ("row", "b"),
+        ("row_ready", "i"),
+        ("next_row", "X"),
+        ("row_handed", "i"),
+        ("row", "e"),
+    ]:
+        assert expected in names
+
+    # Every row is finished once and handed out once.
+    handed = sorted(e["args"]["id"] for e in events if e["name"] == "row_handed")
+    assert handed == list(range(1, 11))
+
+
+def test_dump_trace_needs_tracing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ULTAR_TRACE", raising=False)
+    loader = make_traced_loader(tmp_path)
+    with pytest.raises(RuntimeError):
+        loader.dump_trace(tmp_path / "trace.json")
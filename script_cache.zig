@@ -0,0 +1,227 @@
+//! On-disk cache for compiled loader scripts and memoised `init_ctx` values.
+//!
+//! The cache is opt-in: entries live under `$ULTAR_CACHE_DIR`, and nothing is
+//! cached while it is unset or empty. Entries are never evicted, so the
+//! directory is the caller's to size and clean. Writes go to a temporary file
+//! that is renamed into place, so concurrent ranks sharing a cache directory
+//! never observe partial entries.
+//!
+//! Entries that are executed rather than parsed (bytecode) are sealed with a
+//! digest of what they were built from, and are only trusted from a
+//! directory that no other user can write to.
+
+const std = @import("std");
+
+const logger = std.log.scoped(.script_cache);
+
+pub const Key = [32]u8;
+
+/// Resolve the cache directory as an absolute path, creating it if needed.
+/// Returns null when the cache is disabled or no directory can be determined.
+pub fn dir(alloc: std.mem.Allocator, io: std.Io) ?[]u8 {
+    const path = resolveDir(alloc) catch return null;
+    const p = path orelse return null;
+    defer alloc.free(p);
+    const cwd = std.Io.Dir.cwd();
+    cwd.createDirPath(io, p) catch |err| {
+        logger.debug("cache dir {s} unavailable: {}", .{ p, err });
+        return null;
+    };
+    // `ULTAR_CACHE_DIR` may be relative; everything downstream opens the
+    // directory by absolute path.
+    var buf: [std.fs.max_path_bytes]u8 = undefined;
+    const n = cwd.realPathFile(io, p, &buf) catch |err| {
+        logger.debug("cache dir {s} unavailable: {}", .{ p, err });
+        return null;
+    };
+    return alloc.dupe(u8, buf[0..n]) catch null;
+}
+
+/// True when `cache_dir` is owned by this user and not writable by anyone
+/// else, so code cached there can't have been planted by another account.
+pub fn trusted(io: std.Io, cache_dir: []const u8) bool {
+    if (@import("builtin").os.tag == .windows) return false;
+    var d = std.Io.Dir.openDirAbsolute(io, cache_dir, .{}) catch return false;
+    defer d.close(io);
+    const owner, const mode = ownerAndMode(d.handle) orelse return false;
+    return owner == std.c.geteuid() and mode & 0o022 == 0;
+}
+
+fn ownerAndMode(fd: std.posix.fd_t) ?struct { std.c.uid_t, u32 } {
+    if (@import("builtin").os.tag == .linux) {
+        const linux = std.os.linux;
+        var sx: linux.Statx = undefined;
+        const rc = linux.statx(fd, "", linux.AT.EMPTY_PATH, .{ .UID = true, .MODE = true }, &sx);
+        if (linux.errno(rc) != .SUCCESS) return null;
+        return .{ sx.uid, sx.mode };
+    }
+    var st: std.c.Stat = undefined;
+    if (std.c.fstat(fd, &st) != 0) return null;
+    return .{ st.uid, @intCast(st.mode) };
+}
+
+fn resolveDir(alloc: std.mem.Allocator) !?[]u8 {
+    const d = std.c.getenv("ULTAR_CACHE_DIR") orelse return null;
+    const s = std.mem.span(d);
+    if (s.len == 0) return null;
+    return try alloc.dupe(u8, s);
+}
+
+const Sha256 = std.crypto.hash.sha2.Sha256;
+
+/// Feed `parts` to `h`, each length-prefixed so boundaries can't collide.
+fn hashParts(h: *Sha256, parts: []const []const u8) void {
+    for (parts) |p| {
+        var len: [8]u8 = undefined;
+        std.mem.writeInt(u64, &len, p.len, .little);
+        h.update(&len);
+        h.update(p);
+    }
+}
+
+/// Hex SHA-256 over `parts`, truncated to 128 bits.
+pub fn key(parts: []const []const u8) Key {
+    var h = Sha256.init(.{});
+    hashParts(&h, parts);
+    var digest: [32]u8 = undefined;
+    h.final(&digest);
+    var out: Key = undefined;
+    _ = std.fmt.bufPrint(&out, "{x}", .{digest[0..16]}) catch unreachable;
+    return out;
+}
+
+/// Full SHA-256 over `parts` and then `bytes`; the header of a sealed entry.
+fn seal(parts: []const []const u8, bytes: []const u8) [Sha256.digest_length]u8 {
+    var h = Sha256.init(.{});
+    hashParts(&h, parts);
+    hashParts(&h, &.{bytes});
+    var digest: [Sha256.digest_length]u8 = undefined;
+    h.final(&digest);
+    return digest;
+}
+
+/// Read `<dir>/<name>`; null if missing or unreadable.
+pub fn load(alloc: std.mem.Allocator, io: std.Io, cache_dir: []const u8, name: []const u8) ?[]u8 {
+    var d = std.Io.Dir.openDirAbsolute(io, cache_dir, .{}) catch return null;
+    defer d.close(io);
+    return d.readFileAlloc(io, name, alloc, .limited(1 << 30)) catch |err| {
+        if (err != error.FileNotFound) logger.debug("cache read {s} failed: {}", .{ name, err });
+        return null;
+    };
+}
+
+/// Read an entry written by `storeSealed` with the same `parts`; null if
+/// missing, truncated, or built from anything else.
+pub fn loadSealed(alloc: std.mem.Allocator, io: std.Io, cache_dir: []const u8, name: []const u8, parts: []const []const u8) ?[]u8 {
+    const raw = load(alloc, io, cache_dir, name) orelse return null;
+    defer alloc.free(raw);
+    const n = Sha256.digest_length;
+    if (raw.len < n) return null;
+    const expected = seal(parts, raw[n..]);
+    if (!std.mem.eql(u8, raw[0..n], &expected)) {
+        logger.debug("cache entry {s} failed verification", .{name});
+        return null;
+    }
+    return alloc.dupe(u8, raw[n..]) catch null;
+}
+
+/// Like `store`, prefixing `bytes` with a digest of `parts` and `bytes`.
+pub fn storeSealed(alloc: std.mem.Allocator, io: std.Io, cache_dir: []const u8, name: []const u8, parts: []const []const u8, bytes: []const u8) void {
+    const buf = std.mem.concat(alloc, u8, &.{ &seal(parts, bytes), bytes }) catch return;
+    defer alloc.free(buf);
+    store(io, cache_dir, name, buf);
+}
+
+/// Atomically write `<dir>/<name>`. Failures are logged and otherwise ignored.
+pub fn store(io: std.Io, cache_dir: []const u8, name: []const u8, bytes: []const u8) void {
+    storeImpl(io, cache_dir, name, bytes) catch |err| {
+        logger.debug("cache write {s} failed: {}", .{ name, err });
+    };
+}
+
+fn storeImpl(io: std.Io, cache_dir: []const u8, name: []const u8, bytes: []const u8) !void {
+    var d = try std.Io.Dir.openDirAbsolute(io, cache_dir, .{});
+    defer d.close(io);
+
+    var tmp_buf: [std.fs.max_name_bytes]u8 = undefined;
+    var rng: [8]u8 = undefined;
+    io.random(&rng);
+    const tmp_name = try std.fmt.bufPrint(&tmp_buf, "{s}.{x}.tmp", .{ name, &rng });
+
+    {
+        var f = try d.createFile(io, tmp_name, .{ .truncate = true });
+        defer f.close(io);
+        try f.writeStreamingAll(io, bytes);
+    }
+    errdefer d.deleteFile(io, tmp_name) catch {};
+    try d.rename(tmp_name, d, name, io);
+}
+
+test "key separates parts" {
+    try std.testing.expect(!std.mem.eql(u8, &key(&.{ "ab", "c" }), &key(&.{ "a", "bc" })));
+    try std.testing.expectEqualSlices(u8, &key(&.{ "x", "y" }), &key(&.{ "x", "y" }));
+}
+
+test "sealed entries only load for their own parts" {
+    const io = std.testing.io;
+    const alloc = std.testing.allocator;
+    var tmp = std.testing.tmpDir(.{});
+    defer tmp.cleanup();
+    const path = try tmp.dir.realPathFileAlloc(io, ".", alloc);
+    defer alloc.free(path);
+
+    storeSealed(alloc, io, path, "bc", &.{ "lua/5.4", "return 1" }, "\x1bLua");
+    const got = loadSealed(alloc, io, path, "bc", &.{ "lua/5.4", "return 1" }) orelse return error.TestUnexpectedResult;
+    defer alloc.free(got);
+    try std.testing.expectEqualStrings("\x1bLua", got);
+    try std.testing.expectEqual(null, loadSealed(alloc, io, path, "bc", &.{ "lua/5.4", "return 2" }));
+
+    // A planted or truncated entry without a matching seal is ignored.
+    store(io, path, "bc", "\x1bLua");
+    try std.testing.expectEqual(null, loadSealed(alloc, io, path, "bc", &.{ "lua/5.4", "return 1" }));
+}
+
+test "relative cache dir resolves to an absolute path" {
+    const io = std.testing.io;
+    const alloc = std.testing.allocator;
+    const rel = ".zig-cache/tmp/script-cache-rel-test";
+    _ = setenv("ULTAR_CACHE_DIR", rel, 1);
+    defer _ = unsetenv("ULTAR_CACHE_DIR");
+    defer std.Io.Dir.cwd().deleteTree(io, rel) catch {};
+
+    const got = dir(alloc, io) orelse return error.TestUnexpectedResult;
+    defer alloc.free(got);
+    try std.testing.expect(std.fs.path.isAbsolute(got));
+    try std.testing.expect(std.mem.endsWith(u8, got, "script-cache-rel-test"));
+    store(io, got, "entry", "x");
+    const back = load(alloc, io, got, "entry") orelse return error.TestUnexpectedResult;
+    alloc.free(back);
+    try std.testing.expect(trusted(io, got));
+}
+
+test "no cache dir unless one is configured" {
+    const io = std.testing.io;
+    const alloc = std.testing.allocator;
+    _ = unsetenv("ULTAR_CACHE_DIR");
+    try std.testing.expectEqual(null, dir(alloc, io));
+    _ = setenv("ULTAR_CACHE_DIR", "", 1);
+    defer _ = unsetenv("ULTAR_CACHE_DIR");
+    try std.testing.expectEqual(null, dir(alloc, io));
+}
+
+extern "c" fn setenv(name: [*:0]const u8, value: [*:0]const u8, overwrite: c_int) c_int;
+extern "c" fn unsetenv(name: [*:0]const u8) c_int;
+
+test "store then load round-trips" {
+    const io = std.testing.io;
+    var tmp = std.testing.tmpDir(.{});
+    defer tmp.cleanup();
+    const path = try tmp.dir.realPathFileAlloc(io, ".", std.testing.allocator);
+    defer std.testing.allocator.free(path);
+
+    try std.testing.expectEqual(null, load(std.testing.allocator, io, path, "missing"));
+    store(io, path, "entry", "bytecode\x00bytes");
+    const got = load(std.testing.allocator, io, path, "entry") orelse return error.TestUnexpectedResult;
+    defer std.testing.allocator.free(got);
+    try std.testing.expectEqualStrings("bytecode\x00bytes", got);
+}
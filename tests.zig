@@ -1,6 +1,18 @@
 pub const msgpack = @import("msgpack.zig");
 pub const concurrent_ring = @import("concurrent_ring.zig");
 pub const dataloader = @import("dataloader.zig");
+pub const BlockCache = @import("BlockCache.zig");
+pub const DatasetManifest = @import("DatasetManifest.zig");
+pub const dirwalk = @import("dirwalk.zig");
+pub const IndexSummary = @import("IndexSummary.zig");
+pub const meta_extract = @import("meta_extract.zig");
+pub const Mixer = @import("Mixer.zig");
+pub const partition = @import("partition.zig");
+pub const script_cache = @import("script_cache.zig");
+pub const Tracer = @import("Tracer.zig");
+pub const http_cache = @import("ultar_httpd/http_cache.zig");
+pub const PageCache = @import("ultar_httpd/PageCache.zig");
+pub const StaticAssets = @import("ultar_httpd/StaticAssets.zig");
 
 test {
     @import("std").testing.refAllDecls(@This());
@@ -6,6 +6,9 @@ const httpz = @import("httpz");
 
 const TemplateCache = @import("TemplateCache.zig");
 const IndexerWorker = @import("IndexerWorker.zig");
+const IndexCache = @import("IndexCache.zig");
+const PageCache = @import("PageCache.zig");
+const StaticAssets = @import("StaticAssets.zig");
 
 const App = @This();
 
@@ -14,6 +17,9 @@ io: std.Io,
 base_dir: []const u8,
 template_cache: *TemplateCache,
 indexer_worker: *IndexerWorker,
+index_cache: *IndexCache,
+page_cache: *PageCache,
+static_assets: *const StaticAssets,
 
 /// httpz lifecycle hook: logs the request and forwards to the route action.
 pub fn dispatch(self: *App, action: httpz.Action(*App), req: *httpz.Request, res: *httpz.Response) !void {
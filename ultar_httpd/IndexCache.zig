@@ -0,0 +1,243 @@
+//! LRU cache of `.utix` files for `/load`, bounded by a byte budget.
+//!
+//! An entry holds the raw index bytes plus a page-offset table built on first
+//! use, so rendering page N decodes only the rows of that page. Entries are
+//! keyed by path and revalidated against the file's mtime and size on every
+//! lookup; evicted entries stay alive until their last reader releases them.
+
+const std = @import("std");
+const msgpack = @import("msgpack");
+
+const utix = @import("utix.zig");
+
+const IndexCache = @This();
+
+pub const Entry = struct {
+    path: []const u8,
+    mtime: i96,
+    size: u64,
+    bytes: []u8,
+    rows_per_page: usize,
+    /// Byte offset of the first row of each page.
+    page_offsets: []u64,
+    total_rows: usize,
+    /// Sorted union of member keys across all rows.
+    keys: []const []const u8,
+    arena: std.heap.ArenaAllocator,
+    /// Guarded by the cache mutex.
+    refs: usize = 0,
+    /// False once removed from the map; freed when `refs` drops to zero.
+    cached: bool = false,
+    node: std.DoublyLinkedList.Node = .{},
+
+    fn cost(self: *const Entry) usize {
+        return self.bytes.len + self.arena.queryCapacity() + @sizeOf(Entry);
+    }
+
+    fn destroy(self: *Entry, alloc: std.mem.Allocator) void {
+        alloc.free(self.bytes);
+        self.arena.deinit();
+        alloc.destroy(self);
+    }
+
+    /// Decode the rows of `page` (clamped to the last page) into `arena`.
+    pub fn decodePage(self: *const Entry, arena: std.mem.Allocator, page: usize) ![]utix.UtixEntry {
+        if (self.total_rows == 0) return &[_]utix.UtixEntry{};
+        const p = @min(page, self.page_offsets.len - 1);
+        var reader = std.Io.Reader.fixed(self.bytes[self.page_offsets[p]..]);
+        var scanner = msgpack.Scanner.init(&reader, arena);
+        defer scanner.deinit();
+
+        const n = @min(self.rows_per_page, self.total_rows - p * self.rows_per_page);
+        const rows = try arena.alloc(utix.UtixEntry, n);
+        for (rows) |*row| {
+            row.* = (try utix.readEntry(arena, &scanner, .{})) orelse return error.InvalidFormat;
+        }
+        return rows;
+    }
+};
+
+alloc: std.mem.Allocator,
+io: std.Io,
+mutex: std.Io.Mutex,
+map: std.StringHashMapUnmanaged(*Entry),
+/// Least recently used first.
+lru: std.DoublyLinkedList,
+budget_bytes: usize,
+used_bytes: usize,
+
+pub fn init(self: *IndexCache, allocator: std.mem.Allocator, io: std.Io, budget_bytes: usize) void {
+    self.* = .{
+        .alloc = allocator,
+        .io = io,
+        .mutex = .init,
+        .map = .empty,
+        .lru = .{},
+        .budget_bytes = budget_bytes,
+        .used_bytes = 0,
+    };
+}
+
+pub fn deinit(self: *IndexCache) void {
+    while (self.lru.popFirst()) |node| {
+        const entry: *Entry = @alignCast(@fieldParentPtr("node", node));
+        std.debug.assert(entry.refs == 0);
+        entry.destroy(self.alloc);
+    }
+    self.map.deinit(self.alloc);
+}
+
+/// Return a referenced entry for `path`, parsing it if absent or stale.
+/// Callers must `release` the entry once done with it.
+pub fn acquire(self: *IndexCache, path: []const u8, rows_per_page: usize) !*Entry {
+    const stat = blk: {
+        var file = try std.Io.Dir.openFileAbsolute(self.io, path, .{ .mode = .read_only });
+        defer file.close(self.io);
+        break :blk try file.stat(self.io);
+    };
+
+    if (self.lookup(path, stat.mtime.nanoseconds, stat.size, rows_per_page)) |entry| return entry;
+
+    // Parse outside the lock so a large index doesn't stall other pages.
+    const entry = try build(self.alloc, self.io, path, rows_per_page);
+    errdefer entry.destroy(self.alloc);
+
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+
+    if (self.map.get(path)) |existing| {
+        if (existing.mtime == entry.mtime and existing.size == entry.size and existing.rows_per_page == rows_per_page) {
+            // Another request won the race; keep its copy.
+            entry.destroy(self.alloc);
+            self.touch(existing);
+            return existing;
+        }
+        self.detach(existing);
+    }
+
+    entry.refs = 1;
+    if (entry.cost() > self.budget_bytes) {
+        // Too large to retain; served once and freed on release.
+        return entry;
+    }
+    try self.map.put(self.alloc, entry.path, entry);
+    entry.cached = true;
+    self.lru.append(&entry.node);
+    self.used_bytes += entry.cost();
+    self.evictOverBudget();
+    return entry;
+}
+
+pub fn release(self: *IndexCache, entry: *Entry) void {
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    entry.refs -= 1;
+    if (entry.refs == 0 and !entry.cached) entry.destroy(self.alloc);
+}
+
+fn lookup(self: *IndexCache, path: []const u8, mtime: i96, size: u64, rows_per_page: usize) ?*Entry {
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    const entry = self.map.get(path) orelse return null;
+    if (entry.mtime != mtime or entry.size != size or entry.rows_per_page != rows_per_page) {
+        self.detach(entry);
+        return null;
+    }
+    self.touch(entry);
+    return entry;
+}
+
+/// Mark `entry` most recently used and take a reference. Caller holds the mutex.
+fn touch(self: *IndexCache, entry: *Entry) void {
+    self.lru.remove(&entry.node);
+    self.lru.append(&entry.node);
+    entry.refs += 1;
+}
+
+/// Drop `entry` from the cache, freeing it now if unreferenced. Caller holds the mutex.
+fn detach(self: *IndexCache, entry: *Entry) void {
+    std.debug.assert(entry.cached);
+    _ = self.map.remove(entry.path);
+    self.lru.remove(&entry.node);
+    self.used_bytes -= entry.cost();
+    entry.cached = false;
+    if (entry.refs == 0) entry.destroy(self.alloc);
+}
+
+fn evictOverBudget(self: *IndexCache) void {
+    while (self.used_bytes > self.budget_bytes) {
+        const node = self.lru.first orelse break;
+        const entry: *Entry = @alignCast(@fieldParentPtr("node", node));
+        std.log.scoped(.index_cache).debug("evicting {s} ({d} bytes)", .{ entry.path, entry.cost() });
+        self.detach(entry);
+    }
+}
+
+fn build(alloc: std.mem.Allocator, io: std.Io, path: []const u8, rows_per_page: usize) !*Entry {
+    const entry = try alloc.create(Entry);
+    errdefer alloc.destroy(entry);
+    entry.* = .{
+        .path = undefined,
+        .mtime = undefined,
+        .size = undefined,
+        .bytes = &[_]u8{},
+        .rows_per_page = rows_per_page,
+        .page_offsets = undefined,
+        .total_rows = 0,
+        .keys = undefined,
+        .arena = .init(alloc),
+    };
+    errdefer entry.arena.deinit();
+    const ea = entry.arena.allocator();
+    entry.path = try ea.dupe(u8, path);
+
+    {
+        var file = try std.Io.Dir.openFileAbsolute(io, path, .{ .mode = .read_only });
+        defer file.close(io);
+        const stat = try file.stat(io);
+        entry.mtime = stat.mtime.nanoseconds;
+        entry.size = stat.size;
+        entry.bytes = try alloc.alloc(u8, stat.size);
+        errdefer alloc.free(entry.bytes);
+        const n = try file.readPositionalAll(io, entry.bytes, 0);
+        if (n != stat.size) return error.FileChangedWhileReading;
+    }
+    errdefer alloc.free(entry.bytes);
+
+    var row_arena = std.heap.ArenaAllocator.init(alloc);
+    defer row_arena.deinit();
+    var reader = std.Io.Reader.fixed(entry.bytes);
+    var scanner = msgpack.Scanner.init(&reader, alloc);
+    defer scanner.deinit();
+
+    var page_offsets: std.ArrayList(u64) = .empty;
+    var key_set: std.StringHashMapUnmanaged(void) = .empty;
+    defer key_set.deinit(alloc);
+
+    while (true) {
+        // Between rows the scanner sits at depth 0 with nothing buffered, so `seek` is the row start.
+        const row_start = reader.seek;
+        _ = row_arena.reset(.retain_capacity);
+        const row = (try utix.readEntry(row_arena.allocator(), &scanner, .{ .metadata = false })) orelse break;
+        if (entry.total_rows % rows_per_page == 0) try page_offsets.append(ea, row_start);
+        entry.total_rows += 1;
+        for (row.keys) |k| {
+            if (key_set.contains(k)) continue;
+            try key_set.put(alloc, try ea.dupe(u8, k), {});
+        }
+    }
+
+    const keys = try ea.alloc([]const u8, key_set.count());
+    var it = key_set.keyIterator();
+    var i: usize = 0;
+    while (it.next()) |k| : (i += 1) keys[i] = k.*;
+    std.mem.sort([]const u8, keys, {}, struct {
+        fn lessThan(_: void, a: []const u8, b: []const u8) bool {
+            return std.mem.lessThan(u8, a, b);
+        }
+    }.lessThan);
+
+    entry.keys = keys;
+    entry.page_offsets = try page_offsets.toOwnedSlice(ea);
+    return entry;
+}
@@ -13,7 +13,7 @@ const logger = std.log.scoped(.IndexerWorker);
 const needs_thread_pool = @import("builtin").os.tag != .linux;
 const ThreadPoolStorage = if (needs_thread_pool) xev.ThreadPool else void;
 
-pub const JobStatus = enum { queued, running, done, @"error" };
+pub const JobStatus = enum { queued, running, done, cancelled, @"error" };
 
 /// Heap-owned per-tar record. Lives in `jobs` from submission until the next
 /// `getStatus` purge after completion.
@@ -24,8 +24,12 @@ pub const Job = struct {
     error_msg: ?[]const u8 = null,
     bytes_total: u64 = 0,
     bytes_scanned: usize = 0,
-    done_event: std.Io.Event = .unset,
+    /// Checked by the scanner between tar entries.
+    cancel_requested: std.atomic.Value(bool) = .init(false),
+    started_at: ?std.Io.Clock.Timestamp = null,
+    finished_at: ?std.Io.Clock.Timestamp = null,
     scanner: ?*Indexer = null,
+    lane: ?*Lane = null,
     worker: *Self,
 };
 
@@ -35,128 +39,291 @@ pub const JobSnapshot = struct {
     error_msg: ?[]const u8,
     bytes_scanned: u64 = 0,
     bytes_total: u64 = 0,
+    /// Average scan rate since the job started; 0 while queued.
+    bytes_per_sec: u64 = 0,
+};
+
+/// One xev loop and thread. A lane runs up to `jobs_per_lane` scanners at a
+/// time and pulls the next job from the shared queue whenever one finishes.
+const Lane = struct {
+    worker: *Self,
+    thread: std.Thread,
+    thread_pool: ThreadPoolStorage,
+    loop: xev.Loop,
+    notify_async: xev.Async,
+    notify_completion: xev.Completion,
+    /// Completed jobs whose scanner must be freed on this lane's thread. Protected by `worker.mutex`.
+    to_cleanup: std.ArrayListUnmanaged(*Job),
+    /// Protected by `worker.mutex`.
+    active: usize,
 };
 
 allocator: std.mem.Allocator,
 threaded: std.Io.Threaded,
 io: std.Io,
 mutex: std.Io.Mutex,
-group: std.Io.Group,
 
-xev_thread: std.Thread,
-thread_pool: ThreadPoolStorage,
-loop: xev.Loop,
-notify_async: xev.Async,
-notify_completion: xev.Completion,
+lanes: []Lane,
+jobs_per_lane: usize,
 
 /// All submitted jobs. Protected by `mutex`.
 jobs: std.ArrayListUnmanaged(*Job),
-/// Jobs awaiting `startJob` on the xev thread. Protected by `mutex`.
+/// Jobs awaiting a lane, largest first. Protected by `mutex`.
 pending: std.ArrayListUnmanaged(*Job),
-/// Completed jobs whose scanner must be freed on the xev thread. Protected by `mutex`.
-to_cleanup: std.ArrayListUnmanaged(*Job),
-active: usize,
 shutdown: bool,
 
-/// Initialize in place. Spawns the xev thread; caller must pair with `deinit`.
-pub fn init(self: *Self, allocator: std.mem.Allocator) !void {
+pub const Options = struct {
+    /// Number of xev loops/threads.
+    lanes: usize = 4,
+    /// Concurrent scanners per loop.
+    jobs_per_lane: usize = 2,
+};
+
+/// Initialize in place. Spawns the lane threads; caller must pair with `deinit`.
+pub fn init(self: *Self, allocator: std.mem.Allocator, opts: Options) !void {
     self.allocator = allocator;
     self.mutex = .init;
-    self.group = .init;
     self.jobs = .empty;
     self.pending = .empty;
-    self.to_cleanup = .empty;
-    self.active = 0;
     self.shutdown = false;
+    self.jobs_per_lane = @max(1, opts.jobs_per_lane);
 
     self.threaded = .init(allocator, .{});
     errdefer self.threaded.deinit();
     self.io = self.threaded.io();
 
+    self.lanes = try allocator.alloc(Lane, @max(1, opts.lanes));
+    errdefer allocator.free(self.lanes);
+
+    var started: usize = 0;
+    errdefer {
+        {
+            self.mutex.lockUncancelable(self.io);
+            defer self.mutex.unlock(self.io);
+            self.shutdown = true;
+        }
+        for (self.lanes[0..started]) |*lane| {
+            lane.notify_async.notify() catch {};
+            lane.thread.join();
+            deinitLane(lane);
+        }
+    }
+    for (self.lanes) |*lane| {
+        try self.initLane(lane);
+        started += 1;
+    }
+}
+
+fn initLane(self: *Self, lane: *Lane) !void {
+    lane.worker = self;
+    lane.to_cleanup = .empty;
+    lane.active = 0;
+
     if (needs_thread_pool) {
-        self.thread_pool = .init(.{});
+        lane.thread_pool = .init(.{});
     } else {
-        self.thread_pool = {};
+        lane.thread_pool = {};
     }
     errdefer if (needs_thread_pool) {
-        self.thread_pool.shutdown();
-        self.thread_pool.deinit();
+        lane.thread_pool.shutdown();
+        lane.thread_pool.deinit();
     };
 
-    self.loop = try xev.Loop.init(.{
-        .thread_pool = if (needs_thread_pool) &self.thread_pool else null,
+    lane.loop = try xev.Loop.init(.{
+        .thread_pool = if (needs_thread_pool) &lane.thread_pool else null,
     });
-    errdefer self.loop.deinit();
+    errdefer lane.loop.deinit();
 
-    self.notify_async = try xev.Async.init();
-    errdefer self.notify_async.deinit();
-    self.notify_async.wait(&self.loop, &self.notify_completion, Self, self, onNotify);
+    lane.notify_async = try xev.Async.init();
+    errdefer lane.notify_async.deinit();
+    lane.notify_async.wait(&lane.loop, &lane.notify_completion, Lane, lane, onNotify);
 
-    self.xev_thread = try std.Thread.spawn(.{}, xevLoop, .{self});
+    lane.thread = try std.Thread.spawn(.{}, xevLoop, .{lane});
 }
 
-/// Awaits in-flight submitters, joins the xev thread, frees all registered jobs.
-pub fn deinit(self: *Self) void {
-    self.group.await(self.io) catch {};
+fn deinitLane(lane: *Lane) void {
+    lane.notify_async.deinit();
+    lane.loop.deinit();
+    if (needs_thread_pool) {
+        lane.thread_pool.shutdown();
+        lane.thread_pool.deinit();
+    }
+    lane.to_cleanup.deinit(lane.worker.allocator);
+}
 
+/// Lets queued and running jobs finish, joins the lane threads, frees all registered jobs.
+pub fn deinit(self: *Self) void {
     {
         self.mutex.lockUncancelable(self.io);
         defer self.mutex.unlock(self.io);
         self.shutdown = true;
     }
-    self.notify_async.notify() catch {};
-    self.xev_thread.join();
-
-    self.notify_async.deinit();
-    self.loop.deinit();
-    if (needs_thread_pool) {
-        self.thread_pool.shutdown();
-        self.thread_pool.deinit();
+    for (self.lanes) |*lane| lane.notify_async.notify() catch {};
+    for (self.lanes) |*lane| {
+        lane.thread.join();
+        deinitLane(lane);
     }
+    self.allocator.free(self.lanes);
 
-    for (self.jobs.items) |job| {
-        self.allocator.free(job.abs_path);
-        self.allocator.free(job.rel_path);
-        if (job.error_msg) |msg| self.allocator.free(msg);
-        self.allocator.destroy(job);
-    }
+    for (self.jobs.items) |job| self.destroyJob(job);
     self.jobs.deinit(self.allocator);
     self.pending.deinit(self.allocator);
-    self.to_cleanup.deinit(self.allocator);
 
     self.threaded.deinit();
 }
 
+fn destroyJob(self: *Self, job: *Job) void {
+    self.allocator.free(job.abs_path);
+    self.allocator.free(job.rel_path);
+    if (job.error_msg) |msg| self.allocator.free(msg);
+    self.allocator.destroy(job);
+}
+
 /// Schedule a tar file for indexing. Path slices are copied; caller retains its own.
-pub fn enqueue(self: *Self, abs_path: []const u8, rel_path: []const u8) !void {
+/// Returns false if the same file is already queued or running.
+pub fn enqueue(self: *Self, abs_path: []const u8, rel_path: []const u8) !bool {
+    // Sized up front so the queue can hand the biggest tars out first.
+    const file_size: u64 = if (std.Io.Dir.openFileAbsolute(self.io, abs_path, .{ .mode = .read_only })) |f| sz: {
+        defer f.close(self.io);
+        const st = f.stat(self.io) catch break :sz 0;
+        break :sz st.size;
+    } else |_| 0;
+
+    const job = try self.allocator.create(Job);
+    errdefer self.allocator.destroy(job);
+    job.* = .{
+        .abs_path = try self.allocator.dupe(u8, abs_path),
+        .rel_path = undefined,
+        .status = .queued,
+        .bytes_total = file_size,
+        .worker = self,
+    };
+    errdefer self.allocator.free(job.abs_path);
+    job.rel_path = try self.allocator.dupe(u8, rel_path);
+    errdefer self.allocator.free(job.rel_path);
+
     {
         self.mutex.lockUncancelable(self.io);
         defer self.mutex.unlock(self.io);
         if (self.shutdown) return error.Shutdown;
+
+        for (self.jobs.items) |existing| {
+            if (std.mem.eql(u8, existing.abs_path, abs_path) and
+                (existing.status == .queued or existing.status == .running))
+            {
+                self.allocator.free(job.rel_path);
+                self.allocator.free(job.abs_path);
+                self.allocator.destroy(job);
+                return false;
+            }
+        }
+
+        try self.jobs.append(self.allocator, job);
+        errdefer _ = self.jobs.pop();
+
+        // Largest first: long scans start early instead of trailing the batch.
+        var pos: usize = 0;
+        while (pos < self.pending.items.len and self.pending.items[pos].bytes_total >= file_size) pos += 1;
+        try self.pending.insert(self.allocator, pos, job);
     }
 
-    const owned_abs = try self.allocator.dupe(u8, abs_path);
-    errdefer self.allocator.free(owned_abs);
-    const owned_rel = try self.allocator.dupe(u8, rel_path);
-    errdefer self.allocator.free(owned_rel);
+    self.wakeLanes();
+    return true;
+}
+
+/// Queue every `.tar` under `abs_dir` that has no `.utix` next to it. `rel_dir`
+/// is the same directory relative to the served root. Returns the number of
+/// newly queued files.
+pub fn enqueueDir(self: *Self, abs_dir: []const u8, rel_dir: []const u8, recursive: bool) !usize {
+    var arena_state = std.heap.ArenaAllocator.init(self.allocator);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    const Pending = struct { abs: []const u8, rel: []const u8 };
+    var dirs: std.ArrayListUnmanaged(Pending) = .empty;
+    try dirs.append(arena, .{ .abs = abs_dir, .rel = rel_dir });
+
+    var queued: usize = 0;
+    while (dirs.pop()) |d| {
+        var dir = std.Io.Dir.openDirAbsolute(self.io, d.abs, .{ .iterate = true }) catch |err| {
+            logger.warn("cannot open {s}: {}", .{ d.abs, err });
+            continue;
+        };
+        defer dir.close(self.io);
+
+        var names: std.StringHashMapUnmanaged(std.Io.File.Kind) = .empty;
+        var iter = dir.iterate();
+        while (try iter.next(self.io)) |entry| {
+            try names.put(arena, try arena.dupe(u8, entry.name), entry.kind);
+        }
 
-    try self.group.concurrent(self.io, runJob, .{ self, owned_abs, owned_rel });
+        var it = names.iterator();
+        while (it.next()) |kv| {
+            const name = kv.key_ptr.*;
+            const rel = if (d.rel.len == 0) name else try std.fs.path.join(arena, &.{ d.rel, name });
+            const abs = try std.fs.path.join(arena, &.{ d.abs, name });
+            switch (kv.value_ptr.*) {
+                .directory => if (recursive) try dirs.append(arena, .{ .abs = abs, .rel = rel }),
+                .file => if (std.mem.endsWith(u8, name, ".tar")) {
+                    const utix_name = try std.mem.concat(arena, u8, &.{ name, ".utix" });
+                    if (names.contains(utix_name)) continue;
+                    if (try self.enqueue(abs, rel)) queued += 1;
+                },
+                else => {},
+            }
+        }
+    }
+    return queued;
+}
+
+/// Cancel a queued or running job. Running scanners stop at the next tar
+/// entry and their partial `.utix` is removed. Returns false if no such active job exists.
+pub fn cancel(self: *Self, rel_path: []const u8) bool {
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    for (self.jobs.items) |job| {
+        if (!std.mem.eql(u8, job.rel_path, rel_path)) continue;
+        switch (job.status) {
+            .queued => {
+                for (self.pending.items, 0..) |p, i| if (p == job) {
+                    _ = self.pending.orderedRemove(i);
+                    break;
+                };
+                job.status = .cancelled;
+                return true;
+            },
+            .running => {
+                job.cancel_requested.store(true, .release);
+                return true;
+            },
+            else => {},
+        }
+    }
+    return false;
 }
 
 /// Snapshot all jobs into `arena`, then purge completed entries from `jobs`.
 pub fn getStatus(self: *Self, arena: std.mem.Allocator) ![]JobSnapshot {
+    const now = std.Io.Clock.Timestamp.now(self.io, .awake);
+
     self.mutex.lockUncancelable(self.io);
     defer self.mutex.unlock(self.io);
 
     var snapshots = try std.ArrayListUnmanaged(JobSnapshot).initCapacity(arena, self.jobs.items.len);
     for (self.jobs.items) |job| {
         const bs = @atomicLoad(usize, &job.bytes_scanned, .monotonic);
+        const rate: u64 = if (job.started_at) |start| rate: {
+            const ns = start.durationTo(job.finished_at orelse now).raw.nanoseconds;
+            if (ns <= 0) break :rate 0;
+            break :rate @intCast(@divTrunc(@as(i128, bs) * std.time.ns_per_s, ns));
+        } else 0;
         try snapshots.append(arena, .{
             .rel_path = try arena.dupe(u8, job.rel_path),
             .status = job.status,
             .error_msg = if (job.error_msg) |msg| try arena.dupe(u8, msg) else null,
             .bytes_scanned = bs,
             .bytes_total = job.bytes_total,
+            .bytes_per_sec = rate,
         });
     }
 
@@ -164,118 +331,69 @@ pub fn getStatus(self: *Self, arena: std.mem.Allocator) ![]JobSnapshot {
     while (i > 0) {
         i -= 1;
         const job = self.jobs.items[i];
-        if (job.status != .done and job.status != .@"error") continue;
-        // Scanner is already freed on the xev thread before status transitions to .done;
-        // .@"error" paths never leave a live scanner attached.
-        self.allocator.free(job.abs_path);
-        self.allocator.free(job.rel_path);
-        if (job.error_msg) |msg| self.allocator.free(msg);
-        self.allocator.destroy(job);
+        switch (job.status) {
+            // Scanner is already freed on its lane before status leaves .running;
+            // .@"error" paths never leave a live scanner attached.
+            .done, .cancelled, .@"error" => {},
+            else => continue,
+        }
+        self.destroyJob(job);
         _ = self.jobs.orderedRemove(i);
     }
 
     return snapshots.items;
 }
 
-/// Submitter task body. Takes ownership of `owned_abs`/`owned_rel`; blocks
-/// the submitter until the scanner signals `done_event`.
-fn runJob(self: *Self, owned_abs: []const u8, owned_rel: []const u8) void {
-    // Job is heap-allocated so `&bytes_scanned` and `&done_event` stay stable
-    // for the scanner across `jobs` ArrayList growth.
-    const job = self.allocator.create(Job) catch {
-        self.allocator.free(owned_abs);
-        self.allocator.free(owned_rel);
-        return;
-    };
-    job.* = .{
-        .abs_path = owned_abs,
-        .rel_path = owned_rel,
-        .status = .queued,
-        .worker = self,
-    };
-
-    const registered = register: {
-        self.mutex.lockUncancelable(self.io);
-        defer self.mutex.unlock(self.io);
-
-        // Dedup against any still-active job for the same path.
-        for (self.jobs.items) |existing| {
-            if (std.mem.eql(u8, existing.abs_path, owned_abs) and
-                (existing.status == .queued or existing.status == .running))
-            {
-                break :register false;
-            }
-        }
-
-        self.jobs.append(self.allocator, job) catch break :register false;
-        self.pending.append(self.allocator, job) catch {
-            _ = self.jobs.pop();
-            break :register false;
-        };
-        break :register true;
-    };
-
-    if (!registered) {
-        self.allocator.free(owned_abs);
-        self.allocator.free(owned_rel);
-        self.allocator.destroy(job);
-        return;
-    }
-
-    self.notify_async.notify() catch {};
-    job.done_event.waitUncancelable(self.io);
+fn wakeLanes(self: *Self) void {
+    for (self.lanes) |*lane| lane.notify_async.notify() catch {};
 }
 
-fn xevLoop(self: *Self) void {
-    self.loop.run(.until_done) catch |err| {
+fn xevLoop(lane: *Lane) void {
+    lane.loop.run(.until_done) catch |err| {
         logger.err("xev loop error: {}", .{err});
     };
 }
 
-fn onNotify(self_opt: ?*Self, l: *xev.Loop, c: *xev.Completion, r: xev.Async.WaitError!void) xev.CallbackAction {
+fn onNotify(lane_opt: ?*Lane, l: *xev.Loop, c: *xev.Completion, r: xev.Async.WaitError!void) xev.CallbackAction {
     _ = c;
     _ = r catch {};
-    const self = self_opt.?;
+    const lane = lane_opt.?;
+    const self = lane.worker;
 
-    var pending_drain: []*Job = &.{};
     var cleanup_drain: []*Job = &.{};
     {
         self.mutex.lockUncancelable(self.io);
         defer self.mutex.unlock(self.io);
-        if (self.pending.items.len > 0) {
-            pending_drain = self.pending.toOwnedSlice(self.allocator) catch &.{};
-        }
-        if (self.to_cleanup.items.len > 0) {
-            cleanup_drain = self.to_cleanup.toOwnedSlice(self.allocator) catch &.{};
+        if (lane.to_cleanup.items.len > 0) {
+            cleanup_drain = lane.to_cleanup.toOwnedSlice(self.allocator) catch &.{};
         }
     }
 
-    for (cleanup_drain) |job| {
-        if (job.scanner) |sc| {
-            sc.state.deinit();
-            sc.deinit(self.io);
-            self.allocator.destroy(sc);
-            job.scanner = null;
-        }
-        self.mutex.lockUncancelable(self.io);
-        if (job.status == .running) job.status = .done;
-        self.active -= 1;
-        self.mutex.unlock(self.io);
-        job.done_event.set(self.io);
-    }
+    for (cleanup_drain) |job| self.finishJob(lane, job);
     if (cleanup_drain.len > 0) self.allocator.free(cleanup_drain);
 
-    for (pending_drain) |job| {
+    // Pull work until this lane is saturated; other lanes compete for the rest.
+    while (true) {
+        const job = blk: {
+            self.mutex.lockUncancelable(self.io);
+            defer self.mutex.unlock(self.io);
+            if (lane.active >= self.jobs_per_lane or self.pending.items.len == 0) break :blk null;
+            const j = self.pending.orderedRemove(0);
+            j.status = .running;
+            j.lane = lane;
+            j.started_at = std.Io.Clock.Timestamp.now(self.io, .awake);
+            lane.active += 1;
+            break :blk j;
+        } orelse break;
         self.startJob(l, job) catch |err| self.markError(job, err);
     }
-    if (pending_drain.len > 0) self.allocator.free(pending_drain);
 
     var stop_loop = false;
     {
         self.mutex.lockUncancelable(self.io);
         defer self.mutex.unlock(self.io);
-        if (self.shutdown and self.active == 0 and
-            self.pending.items.len == 0 and self.to_cleanup.items.len == 0)
+        if (self.shutdown and lane.active == 0 and
+            self.pending.items.len == 0 and lane.to_cleanup.items.len == 0)
         {
             stop_loop = true;
         }
@@ -287,6 +405,35 @@ fn onNotify(self_opt: ?*Self, l: *xev.Loop, c: *xev.Completion, r: xev.Async.Wai
     return .rearm;
 }
 
+/// Free a finished job's scanner on its lane thread and publish the final status.
+fn finishJob(self: *Self, lane: *Lane, job: *Job) void {
+    const cancelled = job.cancel_requested.load(.acquire);
+    if (job.scanner) |sc| {
+        sc.state.deinit();
+        sc.deinit(self.io);
+        self.allocator.destroy(sc);
+        job.scanner = null;
+    }
+    if (cancelled) self.removePartialIndex(job);
+
+    const now = std.Io.Clock.Timestamp.now(self.io, .awake);
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    if (job.status == .running) job.status = if (cancelled) .cancelled else .done;
+    job.finished_at = now;
+    lane.active -= 1;
+}
+
+fn removePartialIndex(self: *Self, job: *Job) void {
+    var buf: [std.fs.max_path_bytes]u8 = undefined;
+    for ([_][]const u8{ ".utix", indexer_mod.IndexSummary.sidecar_suffix }) |ext| {
+        const out_path = std.fmt.bufPrint(&buf, "{s}{s}", .{ job.abs_path, ext }) catch return;
+        std.Io.Dir.deleteFileAbsolute(self.io, out_path) catch |err| {
+            if (err != error.FileNotFound) logger.warn("failed to remove partial index {s}: {}", .{ out_path, err });
+        };
+    }
+}
+
 /// Build a `WdsIndexingState` writing to `<abs_path>.utix`. On success the
 /// output file is owned by the returned state.
 fn createIndexingState(self: *Self, l: *xev.Loop, abs_path: []const u8) !WdsIndexingState {
@@ -302,25 +449,6 @@ fn createIndexingState(self: *Self, l: *xev.Loop, abs_path: []const u8) !WdsInde
 fn startJob(self: *Self, l: *xev.Loop, job: *Job) !void {
     const abs_path = job.abs_path;
 
-    const file_size: u64 = if (std.Io.Dir.openFileAbsolute(self.io, abs_path, .{ .mode = .read_only })) |f| sz: {
-        defer f.close(self.io);
-        const st = f.stat(self.io) catch break :sz 0;
-        break :sz st.size;
-    } else |_| 0;
-
-    {
-        self.mutex.lockUncancelable(self.io);
-        defer self.mutex.unlock(self.io);
-        job.bytes_total = file_size;
-        job.status = .running;
-        self.active += 1;
-    }
-    errdefer {
-        self.mutex.lockUncancelable(self.io);
-        self.active -= 1;
-        self.mutex.unlock(self.io);
-    }
-
     var state = try self.createIndexingState(l, abs_path);
     var state_owned_by_scanner = false;
     errdefer if (!state_owned_by_scanner) state.deinit();
@@ -336,7 +464,7 @@ fn startJob(self: *Self, l: *xev.Loop, job: *Job) !void {
     }
 
     scanner.state.progress_ptr = &job.bytes_scanned;
-    scanner.state.done_event_ptr = &job.done_event;
+    scanner.state.cancel_ptr = &job.cancel_requested;
     scanner.state.done_notify_cb = onJobDone;
     scanner.state.done_notify_ctx = job;
 
@@ -361,23 +489,26 @@ fn onJobDone(ctx: *anyopaque) void {
 
 /// Fired once the ostream's `pending_writes` reaches zero. Still runs inside
 /// a callback (writeCb or onJobDone), so we only enqueue the job for the
-/// xev thread to free on a later tick.
+/// lane thread to free on a later tick.
 fn onOstreamDrained(ctx: *anyopaque) void {
     const job: *Job = @ptrCast(@alignCast(ctx));
     const self = job.worker;
+    const lane = job.lane.?;
     {
         self.mutex.lockUncancelable(self.io);
         defer self.mutex.unlock(self.io);
-        self.to_cleanup.append(self.allocator, job) catch {};
+        lane.to_cleanup.append(self.allocator, job) catch {};
     }
-    self.notify_async.notify() catch {};
+    lane.notify_async.notify() catch {};
 }
 
 fn markError(self: *Self, job: *Job, err: anyerror) void {
     const msg = std.fmt.allocPrint(self.allocator, "indexing failed: {}", .{err}) catch null;
+    const now = std.Io.Clock.Timestamp.now(self.io, .awake);
     self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
     job.status = .@"error";
     job.error_msg = msg;
-    self.mutex.unlock(self.io);
-    job.done_event.set(self.io);
+    job.finished_at = now;
+    if (job.lane) |lane| lane.active -= 1;
 }
@@ -0,0 +1,138 @@
+//! LRU cache of rendered `/browse` and `/load` fragments, bounded by a byte budget.
+//!
+//! Entries are keyed by request and carry the ETag they were rendered under.
+//! Handlers derive that ETag from the inputs' mtimes and the template
+//! generation, so a lookup only hits while nothing the fragment depends on has
+//! changed; a stale entry is replaced by the next render. Bodies are copied out
+//! under the lock, so entries never need reference counting.
+
+const std = @import("std");
+
+const PageCache = @This();
+
+const Entry = struct {
+    key: []const u8,
+    etag: []const u8,
+    body: []const u8,
+    node: std.DoublyLinkedList.Node = .{},
+
+    fn cost(self: *const Entry) usize {
+        return self.key.len + self.etag.len + self.body.len + @sizeOf(Entry);
+    }
+
+    fn destroy(self: *Entry, alloc: std.mem.Allocator) void {
+        alloc.free(self.key);
+        alloc.free(self.etag);
+        alloc.free(self.body);
+        alloc.destroy(self);
+    }
+};
+
+alloc: std.mem.Allocator,
+io: std.Io,
+mutex: std.Io.Mutex,
+map: std.StringHashMapUnmanaged(*Entry),
+/// Least recently used first.
+lru: std.DoublyLinkedList,
+budget_bytes: usize,
+used_bytes: usize,
+
+pub fn init(self: *PageCache, allocator: std.mem.Allocator, io: std.Io, budget_bytes: usize) void {
+    self.* = .{
+        .alloc = allocator,
+        .io = io,
+        .mutex = .init,
+        .map = .empty,
+        .lru = .{},
+        .budget_bytes = budget_bytes,
+        .used_bytes = 0,
+    };
+}
+
+pub fn deinit(self: *PageCache) void {
+    while (self.lru.popFirst()) |node| {
+        const entry: *Entry = @alignCast(@fieldParentPtr("node", node));
+        entry.destroy(self.alloc);
+    }
+    self.map.deinit(self.alloc);
+}
+
+/// Copy of the body cached for `key` into `arena`, if it was rendered under `etag`.
+pub fn get(self: *PageCache, arena: std.mem.Allocator, key: []const u8, etag: []const u8) !?[]const u8 {
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    const entry = self.map.get(key) orelse return null;
+    if (!std.mem.eql(u8, entry.etag, etag)) return null;
+    self.lru.remove(&entry.node);
+    self.lru.append(&entry.node);
+    return try arena.dupe(u8, entry.body);
+}
+
+/// Store `body` for `key` under `etag`, replacing whatever was cached for it.
+pub fn put(self: *PageCache, key: []const u8, etag: []const u8, body: []const u8) !void {
+    const entry = try self.alloc.create(Entry);
+    errdefer self.alloc.destroy(entry);
+    entry.* = .{ .key = undefined, .etag = undefined, .body = undefined };
+    entry.key = try self.alloc.dupe(u8, key);
+    errdefer self.alloc.free(entry.key);
+    entry.etag = try self.alloc.dupe(u8, etag);
+    errdefer self.alloc.free(entry.etag);
+    entry.body = try self.alloc.dupe(u8, body);
+    errdefer self.alloc.free(entry.body);
+
+    // Too large to retain; the caller already has the body.
+    if (entry.cost() > self.budget_bytes) {
+        entry.destroy(self.alloc);
+        return;
+    }
+
+    self.mutex.lockUncancelable(self.io);
+    defer self.mutex.unlock(self.io);
+    if (self.map.get(key)) |existing| self.remove(existing);
+    try self.map.put(self.alloc, entry.key, entry);
+    self.lru.append(&entry.node);
+    self.used_bytes += entry.cost();
+    while (self.used_bytes > self.budget_bytes) {
+        const node = self.lru.first orelse break;
+        self.remove(@alignCast(@fieldParentPtr("node", node)));
+    }
+}
+
+/// Drop and free `entry`. Caller holds the mutex.
+fn remove(self: *PageCache, entry: *Entry) void {
+    _ = self.map.remove(entry.key);
+    self.lru.remove(&entry.node);
+    self.used_bytes -= entry.cost();
+    entry.destroy(self.alloc);
+}
+
+test "hits only under the same etag and evicts least recently used" {
+    const alloc = std.testing.allocator;
+    var cache: PageCache = undefined;
+    // Room for two small entries.
+    cache.init(alloc, std.testing.io, 2 * (@sizeOf(Entry) + 16));
+    defer cache.deinit();
+
+    var arena_state: std.heap.ArenaAllocator = .init(alloc);
+    defer arena_state.deinit();
+    const arena = arena_state.allocator();
+
+    try cache.put("a", "\"1\"", "<p>a</p>");
+    try std.testing.expectEqualStrings("<p>a</p>", (try cache.get(arena, "a", "\"1\"")).?);
+    try std.testing.expectEqual(@as(?[]const u8, null), try cache.get(arena, "a", "\"2\""));
+
+    try cache.put("a", "\"2\"", "<p>A</p>");
+    try std.testing.expectEqual(@as(?[]const u8, null), try cache.get(arena, "a", "\"1\""));
+    try std.testing.expectEqualStrings("<p>A</p>", (try cache.get(arena, "a", "\"2\"")).?);
+
+    try cache.put("b", "\"1\"", "<p>b</p>");
+    // Touch `a` so `b` is the one evicted by `c`.
+    _ = try cache.get(arena, "a", "\"2\"");
+    try cache.put("c", "\"1\"", "<p>c</p>");
+    try std.testing.expectEqual(@as(?[]const u8, null), try cache.get(arena, "b", "\"1\""));
+    try std.testing.expect((try cache.get(arena, "a", "\"2\"")) != null);
+    try std.testing.expect((try cache.get(arena, "c", "\"1\"")) != null);
+
+    try cache.put("big", "\"1\"", &([_]u8{'x'} ** 256));
+    try std.testing.expectEqual(@as(?[]const u8, null), try cache.get(arena, "big", "\"1\""));
+}
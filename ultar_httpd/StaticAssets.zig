@@ -0,0 +1,106 @@
+//! `/static/` assets, loaded and gzip-compressed once at startup.
+//!
+//! Each asset carries a content-hash ETag, and `version` hashes all of them
+//! so `base.html` can reference `?v=<version>` URLs that browsers may cache
+//! indefinitely. Edits to the static directory take effect on restart.
+
+const std = @import("std");
+const flate = std.compress.flate;
+
+const mime = @import("mime.zig");
+
+const StaticAssets = @This();
+
+pub const Asset = struct {
+    content_type: []const u8,
+    etag: []const u8,
+    body: []const u8,
+    /// Gzip encoding of `body`; null when it would not be smaller.
+    gzip: ?[]const u8,
+    /// The gzip body is a different representation, so it needs its own strong ETag.
+    gzip_etag: []const u8,
+};
+
+arena: std.heap.ArenaAllocator,
+map: std.StringHashMapUnmanaged(Asset),
+/// Hex digest over every asset's name and contents.
+version: []const u8,
+
+/// Load every regular file directly under `dir_path`.
+pub fn init(self: *StaticAssets, allocator: std.mem.Allocator, io: std.Io, dir_path: []const u8) !void {
+    self.* = .{ .arena = .init(allocator), .map = .empty, .version = "" };
+    errdefer self.arena.deinit();
+    const arena = self.arena.allocator();
+
+    var dir = try std.Io.Dir.cwd().openDir(io, dir_path, .{ .iterate = true });
+    defer dir.close(io);
+
+    var names: std.ArrayList([]const u8) = .empty;
+    var iter = dir.iterate();
+    while (try iter.next(io)) |entry| {
+        if (entry.kind != .file) continue;
+        try names.append(arena, try arena.dupe(u8, entry.name));
+    }
+    // Iteration order is filesystem-defined; sort so `version` is stable.
+    std.mem.sort([]const u8, names.items, {}, struct {
+        fn lessThan(_: void, a: []const u8, b: []const u8) bool {
+            return std.mem.lessThan(u8, a, b);
+        }
+    }.lessThan);
+
+    var version_hash: std.hash.Wyhash = .init(0);
+    for (names.items) |name| {
+        const body = try dir.readFileAlloc(io, name, arena, .limited(2 * 1024 * 1024));
+        const digest = std.hash.Wyhash.hash(0, body);
+        const gz = try gzipAlloc(arena, body);
+        try self.map.put(arena, name, .{
+            .content_type = mime.forStaticExt(std.fs.path.extension(name)),
+            .etag = try std.fmt.allocPrint(arena, "\"{x:0>16}\"", .{digest}),
+            .body = body,
+            .gzip = if (gz.len < body.len) gz else null,
+            .gzip_etag = try std.fmt.allocPrint(arena, "\"{x:0>16}-gz\"", .{digest}),
+        });
+        version_hash.update(name);
+        version_hash.update(std.mem.asBytes(&digest));
+    }
+    self.version = try std.fmt.allocPrint(arena, "{x:0>16}", .{version_hash.final()});
+}
+
+/// No assets; every `/static/` request 404s. For when the directory is missing.
+pub fn empty(allocator: std.mem.Allocator) StaticAssets {
+    return .{ .arena = .init(allocator), .map = .empty, .version = "" };
+}
+
+pub fn deinit(self: *StaticAssets) void {
+    self.arena.deinit();
+}
+
+pub fn get(self: *const StaticAssets, name: []const u8) ?*const Asset {
+    return self.map.getPtr(name);
+}
+
+/// Compress `data` into a gzip member at the highest level; runs once per asset.
+pub fn gzipAlloc(alloc: std.mem.Allocator, data: []const u8) ![]u8 {
+    var out: std.Io.Writer.Allocating = try .initCapacity(alloc, data.len / 2 + 64);
+    errdefer out.deinit();
+    const window = try alloc.alloc(u8, flate.max_window_len);
+    defer alloc.free(window);
+    var compress: flate.Compress = try .init(&out.writer, window, .gzip, .best);
+    try compress.writer.writeAll(data);
+    try compress.finish();
+    return out.toOwnedSlice();
+}
+
+test "gzip round trip" {
+    const alloc = std.testing.allocator;
+    const text = "function f() { return 1; }\n" ** 64;
+    const gz = try gzipAlloc(alloc, text);
+    defer alloc.free(gz);
+    try std.testing.expect(gz.len < text.len);
+
+    var reader: std.Io.Reader = .fixed(gz);
+    var decompress: flate.Decompress = .init(&reader, .gzip, &.{});
+    const plain = try decompress.reader.allocRemaining(alloc, .unlimited);
+    defer alloc.free(plain);
+    try std.testing.expectEqualStrings(text, plain);
+}
@@ -10,6 +10,8 @@ threaded: std.Io.Threaded,
 io: std.Io,
 mutex: std.Io.Mutex,
 map: std.StringHashMapUnmanaged([]const u8),
+/// Bumped on every invalidation; part of the ETag of anything rendered from a template.
+generation: std.atomic.Value(u64),
 watcher: Watcher,
 
 /// TemplateCache.init : Initializes a TemplateCache in-place.
@@ -18,6 +20,7 @@ pub fn init(self: *TemplateCache, allocator: std.mem.Allocator) !void {
     self.alloc = allocator;
     self.mutex = .init;
     self.map = .empty;
+    self.generation = .init(0);
     self.watcher = .{};
     self.threaded = .init(allocator, .{});
     errdefer self.threaded.deinit();
@@ -49,6 +52,7 @@ fn invalidateAll(self: *TemplateCache) void {
         self.alloc.free(kv.value_ptr.*);
     }
     self.map.clearRetainingCapacity();
+    _ = self.generation.fetchAdd(1, .release);
     std.debug.print("Template cache invalidated\n", .{});
 }
 
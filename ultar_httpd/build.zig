@@ -50,6 +50,11 @@ pub fn addWebapp(b: *std.Build, opts: WebappOptions) *std.Build.Step.Compile {
     indexer_mod.addImport("xev", opts.xev);
     indexer_mod.addImport("msgpack", opts.msgpack);
     webapp.root_module.addImport("indexer", indexer_mod);
+    webapp.root_module.addImport("dataset_manifest", b.createModule(.{
+        .root_source_file = b.path("DatasetManifest.zig"),
+        .target = opts.target,
+        .optimize = opts.optimize,
+    }));
 
     webapp.root_module.linkLibrary(mustach_lib);
     webapp.root_module.addIncludePath(opts.mustach.path("."));
@@ -6,15 +6,19 @@
 
 const std = @import("std");
 const httpz = @import("httpz");
-const msgpack = @import("msgpack");
 
 const App = @import("App.zig");
 const mime = @import("mime.zig");
 const mustach_render = @import("mustach_render.zig");
 const IndexerWorker = @import("IndexerWorker.zig");
+const IndexCache = @import("IndexCache.zig");
+const http_cache = @import("http_cache.zig");
+const DatasetManifest = @import("dataset_manifest");
 const urlEncodeAlloc = @import("encodings.zig").urlEncodeAlloc;
 
 const ROWS_PER_PAGE: usize = 500;
+/// Upper bound on memory held per `/map_file` response while streaming.
+const MAP_FILE_CHUNK_SIZE: usize = 256 * 1024;
 
 const InvalidRangeStrError = error{
     invalid_base_offset,
@@ -131,221 +135,6 @@ fn listDirectory(arena: std.mem.Allocator, io: std.Io, base_dir: []const u8, pat
     return entries.toOwnedSlice(arena);
 }
 
-const UtixEntry = struct {
-    str_idx: []const u8,
-    iidx: u64,
-    offset: u64,
-    keys: [][]const u8,
-    offsets: []u64,
-    sizes: []u64,
-    metadata: ?[]const u8 = null,
-};
-
-const UtixField = enum { none, str_idx, iidx, offset, keys, offsets, sizes, metadata, unknown };
-
-fn utixFieldFromKey(key: []const u8) UtixField {
-    if (std.mem.eql(u8, key, "str_idx")) return .str_idx;
-    if (std.mem.eql(u8, key, "iidx")) return .iidx;
-    if (std.mem.eql(u8, key, "offset")) return .offset;
-    if (std.mem.eql(u8, key, "keys")) return .keys;
-    if (std.mem.eql(u8, key, "offsets")) return .offsets;
-    if (std.mem.eql(u8, key, "sizes")) return .sizes;
-    if (std.mem.eql(u8, key, "metadata")) return .metadata;
-    return .unknown;
-}
-
-fn writeJsonString(w: *std.Io.Writer, s: []const u8) !void {
-    try w.writeByte('"');
-    for (s) |c| switch (c) {
-        '"' => try w.writeAll("\\\""),
-        '\\' => try w.writeAll("\\\\"),
-        '\n' => try w.writeAll("\\n"),
-        '\r' => try w.writeAll("\\r"),
-        '\t' => try w.writeAll("\\t"),
-        else => if (c < 0x20) {
-            try w.print("\\u{X:0>4}", .{c});
-        } else {
-            try w.writeByte(c);
-        },
-    };
-    try w.writeByte('"');
-}
-
-fn writeJsonFromToken(scanner: *msgpack.Scanner, w: *std.Io.Writer, tok: msgpack.Scanner.Token) !void {
-    switch (tok) {
-        .nil => try w.writeAll("null"),
-        .boolean => |b| try w.writeAll(if (b) "true" else "false"),
-        .uint => |u| try w.print("{d}", .{u}),
-        .int => |i| try w.print("{d}", .{i}),
-        .float => |f| try w.print("{d}", .{f}),
-        .string => |s| try writeJsonString(w, s),
-        .array_begin => |len| {
-            try w.writeByte('[');
-            for (0..len) |i| {
-                if (i != 0) try w.writeByte(',');
-                try writeJsonFromToken(scanner, w, try scanner.next());
-            }
-            const end = try scanner.next();
-            if (end != .array_end) return error.InvalidFormat;
-            try w.writeByte(']');
-        },
-        .map_begin => |len| {
-            try w.writeByte('{');
-            for (0..len) |i| {
-                if (i != 0) try w.writeByte(',');
-                const key_tok = try scanner.next();
-                switch (key_tok) {
-                    .map_key => |key| try writeJsonString(w, key),
-                    else => return error.InvalidFormat,
-                }
-                try w.writeByte(':');
-                try writeJsonFromToken(scanner, w, try scanner.next());
-            }
-            const end = try scanner.next();
-            if (end != .map_end) return error.InvalidFormat;
-            try w.writeByte('}');
-        },
-        else => return error.InvalidFormat,
-    }
-}
-
-fn jsonFromMsgpackValue(arena: std.mem.Allocator, scanner: *msgpack.Scanner, tok: msgpack.Scanner.Token) ![]const u8 {
-    var w: std.Io.Writer.Allocating = .init(arena);
-    try writeJsonFromToken(scanner, &w.writer, tok);
-    return w.written();
-}
-
-fn parseUtixFile(arena: std.mem.Allocator, io: std.Io, file_path: []const u8) ![]UtixEntry {
-    var file = try std.Io.Dir.openFileAbsolute(io, file_path, .{ .mode = .read_only });
-    defer file.close(io);
-
-    const read_buf = try arena.alloc(u8, 16384);
-    var reader = file.readerStreaming(io, read_buf);
-    var scanner = msgpack.Scanner.init(&reader.interface, arena);
-    defer scanner.deinit();
-
-    var entries = try std.ArrayList(UtixEntry).initCapacity(arena, 0);
-    var current: ?UtixEntry = null;
-    var current_field: UtixField = .none;
-    var skip_depth: usize = 0;
-
-    while (true) {
-        const tok = try scanner.next();
-        if (skip_depth > 0) {
-            switch (tok) {
-                .map_begin, .array_begin => skip_depth += 1,
-                .map_end, .array_end => skip_depth -= 1,
-                else => {},
-            }
-            continue;
-        }
-        switch (tok) {
-            .end => break,
-            .map_begin => {
-                if (current_field == .metadata) {
-                    if (current) |*e| {
-                        e.metadata = try jsonFromMsgpackValue(arena, &scanner, tok);
-                    }
-                    current_field = .none;
-                    continue;
-                }
-                if (current_field == .unknown or current_field == .metadata) {
-                    skip_depth = 1;
-                    current_field = .none;
-                    continue;
-                }
-                current = UtixEntry{
-                    .str_idx = "",
-                    .iidx = 0,
-                    .offset = 0,
-                    .keys = &[_][]const u8{},
-                    .offsets = &[_]u64{},
-                    .sizes = &[_]u64{},
-                    .metadata = null,
-                };
-            },
-            .map_key => |key| {
-                current_field = utixFieldFromKey(key);
-            },
-            .map_end => {
-                if (current) |entry| {
-                    try entries.append(arena, entry);
-                    current = null;
-                }
-            },
-            .array_begin => |len| {
-                if (current_field == .unknown) {
-                    skip_depth = 1;
-                    current_field = .none;
-                    continue;
-                }
-                if (current == null) continue;
-                if (current_field == .keys) {
-                    var tmp = try std.ArrayList([]const u8).initCapacity(arena, len);
-                    var i: usize = 0;
-                    while (i < len) : (i += 1) {
-                        const it = try scanner.next();
-                        switch (it) {
-                            .string => |s| try tmp.append(arena, try arena.dupe(u8, s)),
-                            else => return error.InvalidFormat,
-                        }
-                    }
-                    _ = try scanner.next();
-                    current.?.keys = try tmp.toOwnedSlice(arena);
-                } else if (current_field == .offsets or current_field == .sizes) {
-                    var tmp = try std.ArrayList(u64).initCapacity(arena, len);
-                    var i: usize = 0;
-                    while (i < len) : (i += 1) {
-                        const it = try scanner.next();
-                        switch (it) {
-                            .uint => |u| try tmp.append(arena, u),
-                            .int => |iv| try tmp.append(arena, @intCast(iv)),
-                            else => return error.InvalidFormat,
-                        }
-                    }
-                    _ = try scanner.next();
-                    if (current_field == .offsets) {
-                        current.?.offsets = try tmp.toOwnedSlice(arena);
-                    } else {
-                        current.?.sizes = try tmp.toOwnedSlice(arena);
-                    }
-                } else {
-                    var i: usize = 0;
-                    while (i < len) : (i += 1) {
-                        _ = try scanner.next();
-                    }
-                    _ = try scanner.next();
-                }
-            },
-            .string => |s| {
-                if (current == null) continue;
-                if (current_field == .str_idx) {
-                    current.?.str_idx = try arena.dupe(u8, s);
-                }
-            },
-            .uint => |u| {
-                if (current == null) continue;
-                switch (current_field) {
-                    .iidx => current.?.iidx = u,
-                    .offset => current.?.offset = u,
-                    else => {},
-                }
-            },
-            .int => |iv| {
-                if (current == null) continue;
-                switch (current_field) {
-                    .iidx => current.?.iidx = @intCast(iv),
-                    .offset => current.?.offset = @intCast(iv),
-                    else => {},
-                }
-            },
-            else => {},
-        }
-    }
-
-    return entries.toOwnedSlice(arena);
-}
-
 fn renderBrowseHtml(
     arena: std.mem.Allocator,
     io: std.Io,
@@ -363,7 +152,9 @@ fn renderBrowseHtml(
 
     var items = try std.ArrayList(mustach_render.FileListItem).initCapacity(arena, entries.len);
     const enc_dir_param = try urlEncodeAlloc(arena, dir_param);
+    var has_unindexed = false;
     for (entries) |entry| {
+        has_unindexed = has_unindexed or entry.typ == .unindexed_tar;
         const enc_rel = try urlEncodeAlloc(arena, entry.rel_path);
         try items.append(arena, .{
             .is_dir = entry.typ == .dir,
@@ -379,6 +170,8 @@ fn renderBrowseHtml(
     try mustach_render.renderFileList(arena, list_tpl, .{
         .show_parent = show_parent,
         .parent = parent,
+        .has_unindexed = has_unindexed,
+        .dir_enc = enc_dir_param,
         .entries = items.items,
     }, &w.writer);
     return w.written();
@@ -388,6 +181,7 @@ fn renderLoadHtml(
     arena: std.mem.Allocator,
     io: std.Io,
     template_cache: anytype,
+    index_cache: *IndexCache,
     base_dir: []const u8,
     path_param: []const u8,
     page: usize,
@@ -397,10 +191,11 @@ fn renderLoadHtml(
     std.Io.Dir.accessAbsolute(io, full_path, .{}) catch
         return try arena.dupe(u8, "<p>File not found</p>");
 
-    const entries = parseUtixFile(arena, io, full_path) catch
+    const index = index_cache.acquire(full_path, ROWS_PER_PAGE) catch
         return try arena.dupe(u8, "<p>Error parsing index file</p>");
+    defer index_cache.release(index);
 
-    if (entries.len == 0)
+    if (index.total_rows == 0)
         return try arena.dupe(u8, "<p>No items found in the index file.</p>");
 
     const tar_path = if (std.mem.endsWith(u8, path_param, ".utix"))
@@ -408,34 +203,16 @@ fn renderLoadHtml(
     else
         path_param;
 
-    const total_rows = entries.len;
-    const total_pages = (total_rows + ROWS_PER_PAGE - 1) / ROWS_PER_PAGE;
+    const total_rows = index.total_rows;
+    const total_pages = index.page_offsets.len;
     const clamped_page = @min(page, total_pages - 1);
-    const start = clamped_page * ROWS_PER_PAGE;
-    const end = @min(start + ROWS_PER_PAGE, total_rows);
-    const page_entries = entries[start..end];
-
-    var key_set = std.StringHashMap(void).init(arena);
-    defer key_set.deinit();
-    for (entries) |e| {
-        for (e.keys) |k| {
-            if (!key_set.contains(k)) try key_set.put(k, {});
-        }
-    }
+    const page_entries = index.decodePage(arena, clamped_page) catch
+        return try arena.dupe(u8, "<p>Error parsing index file</p>");
 
-    var all_keys_list = try std.ArrayList([]const u8).initCapacity(arena, key_set.count());
-    var it = key_set.iterator();
-    while (it.next()) |kv| {
-        try all_keys_list.append(arena, kv.key_ptr.*);
-    }
-    std.mem.sort([]const u8, all_keys_list.items, {}, struct {
-        fn lessThan(_: void, a: []const u8, b: []const u8) bool {
-            return std.mem.lessThan(u8, a, b);
-        }
-    }.lessThan);
+    const all_keys = index.keys;
 
-    var headers = try std.ArrayList(mustach_render.LoadTableHeader).initCapacity(arena, all_keys_list.items.len);
-    for (all_keys_list.items) |k| {
+    var headers = try std.ArrayList(mustach_render.LoadTableHeader).initCapacity(arena, all_keys.len);
+    for (all_keys) |k| {
         try headers.append(arena, .{ .name = k, .enc_name = try urlEncodeAlloc(arena, k) });
     }
 
@@ -450,8 +227,8 @@ fn renderLoadHtml(
             try per_row.put(k, kidx);
         }
 
-        var cells = try std.ArrayList(mustach_render.LoadTableCell).initCapacity(arena, all_keys_list.items.len);
-        for (all_keys_list.items) |k| {
+        var cells = try std.ArrayList(mustach_render.LoadTableCell).initCapacity(arena, all_keys.len);
+        for (all_keys) |k| {
             if (per_row.get(k)) |kidx| {
                 if (kidx < entry.offsets.len and kidx < entry.sizes.len) {
                     const offset = entry.offset + entry.offsets[kidx];
@@ -516,6 +293,65 @@ fn renderLoadHtml(
     return w.written();
 }
 
+/// Cacheable HTML must be revalidated, which costs a `stat` and usually ends in a 304.
+const PAGE_CACHE_CONTROL = "no-cache";
+
+/// ETag of the `/browse` fragment for `dir_param`. The listing only changes
+/// when entries are added, removed or renamed, all of which bump the
+/// directory's mtime.
+fn browseEtag(app: *App, arena: std.mem.Allocator, dir_param: []const u8) ![]const u8 {
+    const full_path = if (dir_param.len == 0)
+        app.base_dir
+    else
+        try buildSafePathAlloc(arena, app.base_dir, dir_param);
+    var dir = try std.Io.Dir.openDirAbsolute(app.io, full_path, .{});
+    defer dir.close(app.io);
+    const stat = try dir.stat(app.io);
+    return std.fmt.allocPrint(arena, "\"b{x}-{x}\"", .{
+        @as(u64, @truncate(@as(u96, @bitCast(stat.mtime.nanoseconds)))),
+        app.template_cache.generation.load(.acquire),
+    });
+}
+
+/// ETag of the `/load` fragment for `path_param`, or null when the index
+/// can't be stat'ed (the rendered error message is not worth caching).
+fn loadEtag(app: *App, arena: std.mem.Allocator, path_param: []const u8) !?[]const u8 {
+    const full_path = try buildSafePathAlloc(arena, app.base_dir, path_param);
+    const stat = std.Io.Dir.cwd().statFile(app.io, full_path, .{}) catch return null;
+    return try std.fmt.allocPrint(arena, "\"l{x}-{x}-{x}\"", .{
+        stat.size,
+        @as(u64, @truncate(@as(u96, @bitCast(stat.mtime.nanoseconds)))),
+        app.template_cache.generation.load(.acquire),
+    });
+}
+
+fn browseHtml(app: *App, arena: std.mem.Allocator, dir_param: []const u8, etag: []const u8) ![]const u8 {
+    const key = try std.fmt.allocPrint(arena, "browse\x00{s}", .{dir_param});
+    if (try app.page_cache.get(arena, key, etag)) |html| return html;
+    const html = try renderBrowseHtml(arena, app.io, app.template_cache, app.base_dir, dir_param);
+    app.page_cache.put(key, etag, html) catch {};
+    return html;
+}
+
+fn loadHtml(app: *App, arena: std.mem.Allocator, path_param: []const u8, page: usize, etag: ?[]const u8) ![]const u8 {
+    const tag = etag orelse
+        return renderLoadHtml(arena, app.io, app.template_cache, app.index_cache, app.base_dir, path_param, page);
+    const key = try std.fmt.allocPrint(arena, "load\x00{d}\x00{s}", .{ page, path_param });
+    if (try app.page_cache.get(arena, key, tag)) |html| return html;
+    const html = try renderLoadHtml(arena, app.io, app.template_cache, app.index_cache, app.base_dir, path_param, page);
+    app.page_cache.put(key, tag, html) catch {};
+    return html;
+}
+
+/// Send the validators for `etag` and report whether the client's copy is current.
+fn revalidate(req: *httpz.Request, res: *httpz.Response, etag: []const u8) bool {
+    res.header("ETag", etag);
+    res.header("Cache-Control", PAGE_CACHE_CONTROL);
+    if (!http_cache.notModified(req.header("if-none-match"), null, etag, 0)) return false;
+    res.status = 304;
+    return true;
+}
+
 pub fn indexRoot(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     const arena = req.arena;
     const q = try req.query();
@@ -523,11 +359,29 @@ pub fn indexRoot(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     const initial_dir = q.get("dir") orelse "";
     const initial_file = q.get("file") orelse "";
     const page = std.fmt.parseInt(usize, q.get("page") orelse "0", 10) catch 0;
+    const has_table = initial_file.len > 5 and std.mem.endsWith(u8, initial_file, ".utix");
+
+    const browse_etag: ?[]const u8 = browseEtag(app, arena, initial_dir) catch null;
+    const table_etag: ?[]const u8 = if (has_table) loadEtag(app, arena, initial_file) catch null else null;
+
+    res.content_type = .HTML;
+    // Only a page whose every part is validated gets an ETag of its own.
+    if (browse_etag != null and (!has_table or table_etag != null)) {
+        var h: std.hash.Wyhash = .init(app.template_cache.generation.load(.acquire));
+        h.update(browse_etag.?);
+        h.update(table_etag orelse "");
+        h.update(app.static_assets.version);
+        const etag = try std.fmt.allocPrint(arena, "\"r{x}\"", .{h.final()});
+        if (revalidate(req, res, etag)) return;
+    }
 
-    const browse_html = renderBrowseHtml(arena, app.io, app.template_cache, app.base_dir, initial_dir) catch "";
+    const browse_html: []const u8 = if (browse_etag) |etag|
+        browseHtml(app, arena, initial_dir, etag) catch ""
+    else
+        "";
 
-    const table_html: []const u8 = if (initial_file.len > 5 and std.mem.endsWith(u8, initial_file, ".utix"))
-        renderLoadHtml(arena, app.io, app.template_cache, app.base_dir, initial_file, page) catch ""
+    const table_html: []const u8 = if (has_table)
+        loadHtml(app, arena, initial_file, page, table_etag) catch ""
     else
         "";
 
@@ -536,9 +390,9 @@ pub fn indexRoot(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     try mustach_render.renderBase(arena, tpl, .{
         .body = browse_html,
         .table_body = table_html,
+        .static_version = app.static_assets.version,
     }, &w.writer);
 
-    res.content_type = .HTML;
     res.body = w.written();
 }
 
@@ -546,9 +400,10 @@ pub fn browse(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     const arena = req.arena;
     const q = try req.query();
     const dir_param = q.get("dir") orelse "";
-    const html = try renderBrowseHtml(arena, app.io, app.template_cache, app.base_dir, dir_param);
+    const etag = try browseEtag(app, arena, dir_param);
     res.content_type = .HTML;
-    res.body = html;
+    if (revalidate(req, res, etag)) return;
+    res.body = try browseHtml(app, arena, dir_param, etag);
 }
 
 pub fn load(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
@@ -563,12 +418,14 @@ pub fn load(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     }
 
     const page = std.fmt.parseInt(usize, q.get("page") orelse "0", 10) catch 0;
-    const html = try renderLoadHtml(arena, app.io, app.template_cache, app.base_dir, path_param, page);
-    res.body = html;
+    const etag = try loadEtag(app, arena, path_param);
+    if (etag) |tag| {
+        if (revalidate(req, res, tag)) return;
+    }
+    res.body = try loadHtml(app, arena, path_param, page, etag);
 }
 
 pub fn staticAsset(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
-    const arena = req.arena;
     // httpz's `/*` glob does not populate a named param; extract the tail by stripping the static prefix.
     const path = req.url.path;
     const static_prefix = "/static/";
@@ -605,18 +462,32 @@ pub fn staticAsset(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
         }
     }
 
-    const full_path = try std.fs.path.join(arena, &[_][]const u8{ "ultar_httpd/static", tail });
-
-    const data = app.template_cache.get(full_path) catch {
+    const asset = app.static_assets.get(tail) orelse {
         res.status = 404;
         res.body = "Not Found";
         return;
     };
 
-    const ext = std.fs.path.extension(tail);
-    res.header("Content-Type", mime.forStaticExt(ext));
-    res.header("Cache-Control", "public, max-age=3600");
-    res.body = data;
+    res.header("Content-Type", asset.content_type);
+    res.header("Vary", "Accept-Encoding");
+    // `base.html` links `?v=<version>`, so a versioned URL never changes content.
+    const versioned = std.mem.eql(u8, (try req.query()).get("v") orelse "", app.static_assets.version);
+    res.header("Cache-Control", if (versioned) "public, max-age=31536000, immutable" else "public, max-age=3600");
+
+    const gzip = asset.gzip != null and http_cache.acceptsGzip(req.header("accept-encoding"));
+    const etag = if (gzip) asset.gzip_etag else asset.etag;
+    res.header("ETag", etag);
+    if (http_cache.notModified(req.header("if-none-match"), null, etag, 0)) {
+        res.status = 304;
+        return;
+    }
+
+    if (gzip) {
+        res.header("Content-Encoding", "gzip");
+        res.body = asset.gzip.?;
+    } else {
+        res.body = asset.body;
+    }
 }
 
 pub fn indexRequest(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
@@ -644,7 +515,31 @@ pub fn indexRequest(app: *App, req: *httpz.Request, res: *httpz.Response) !void
         return;
     };
 
-    app.indexer_worker.enqueue(abs_path, file_param) catch {
+    _ = app.indexer_worker.enqueue(abs_path, file_param) catch {
+        res.status = 500;
+        res.body = "failed to enqueue";
+        return;
+    };
+
+    const jobs = try app.indexer_worker.getStatus(arena);
+    const html = try renderIndexingPanel(arena, jobs);
+    res.content_type = .HTML;
+    res.body = html;
+}
+
+/// Queue every unindexed tar in `dir` (recursively with `recursive=1`).
+pub fn indexDir(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
+    const arena = req.arena;
+    const q = try req.query();
+    const dir_param = q.get("dir") orelse "";
+    const recursive = std.mem.eql(u8, q.get("recursive") orelse "0", "1");
+
+    const abs_dir = if (dir_param.len == 0)
+        app.base_dir
+    else
+        try buildSafePathAlloc(arena, app.base_dir, dir_param);
+
+    _ = app.indexer_worker.enqueueDir(abs_dir, dir_param, recursive) catch {
         res.status = 500;
         res.body = "failed to enqueue";
         return;
@@ -656,6 +551,24 @@ pub fn indexRequest(app: *App, req: *httpz.Request, res: *httpz.Response) !void
     res.body = html;
 }
 
+pub fn indexCancel(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
+    const arena = req.arena;
+    const q = try req.query();
+    const file_param = q.get("file") orelse "";
+
+    if (file_param.len == 0) {
+        res.status = 400;
+        res.body = "missing file parameter";
+        return;
+    }
+    _ = app.indexer_worker.cancel(file_param);
+
+    const jobs = try app.indexer_worker.getStatus(arena);
+    const html = try renderIndexingPanel(arena, jobs);
+    res.content_type = .HTML;
+    res.body = html;
+}
+
 pub fn indexStatus(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     const arena = req.arena;
     const jobs = try app.indexer_worker.getStatus(arena);
@@ -676,6 +589,76 @@ pub fn indexStatus(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     res.body = html;
 }
 
+/// `/manifest?file=<x.utmf>[&row=N]`: manifest totals, or where global row
+/// `N` lives as `{shard, path, local_row, metadata}`. `path` is relative to
+/// the data root, ready for `/map_file`.
+pub fn manifest(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
+    const arena = req.arena;
+    const q = try req.query();
+    const file_param = q.get("file") orelse "";
+
+    if (!std.mem.endsWith(u8, file_param, DatasetManifest.file_ext)) {
+        res.status = 400;
+        res.body = "missing or invalid file parameter";
+        return;
+    }
+    const row: ?u64 = if (q.get("row")) |r| std.fmt.parseInt(u64, r, 10) catch {
+        res.status = 400;
+        res.body = "invalid row";
+        return;
+    } else null;
+
+    const abs_path = try buildSafePathAlloc(arena, app.base_dir, file_param);
+    var mapped = DatasetManifest.Mapped.open(app.io, abs_path) catch |err| switch (err) {
+        error.FileNotFound => {
+            res.status = 404;
+            res.body = "file not found";
+            return;
+        },
+        error.InvalidManifest, error.UnsupportedManifestVersion => {
+            res.status = 422;
+            res.body = "not a readable manifest";
+            return;
+        },
+        else => return err,
+    };
+    defer mapped.close();
+    const m = &mapped.manifest;
+
+    var out: std.Io.Writer.Allocating = .init(arena);
+    var json: std.json.Stringify = .{ .writer = &out.writer };
+    try json.beginObject();
+    if (row) |r| {
+        const loc = m.locate(r) orelse {
+            res.status = 404;
+            res.body = "row out of range";
+            return;
+        };
+        const rel_dir = std.fs.path.dirname(file_param) orelse "";
+        try json.objectField("row");
+        try json.write(r);
+        try json.objectField("shard");
+        try json.write(loc.shard);
+        try json.objectField("path");
+        try json.write(try std.fs.path.join(arena, &.{ rel_dir, try m.shardPath(loc.shard) }));
+        try json.objectField("local_row");
+        try json.write(loc.local_row);
+        try json.objectField("metadata");
+        if (m.metadata(r)) |meta| try json.print("{s}", .{meta}) else try json.write(null);
+    } else {
+        try json.objectField("num_shards");
+        try json.write(m.numShards());
+        try json.objectField("total_rows");
+        try json.write(m.totalRows());
+        try json.objectField("metadata");
+        try json.write(m.hasMetadata());
+    }
+    try json.endObject();
+
+    res.content_type = .JSON;
+    res.body = out.written();
+}
+
 pub fn mapFile(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     mapFileImpl(app, req, res) catch |err| switch (err) {
         MapFileClientError.missing_parameters,
@@ -698,27 +681,48 @@ fn mapFileImpl(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
     const k_param = q.get("k") orelse "";
     const id_param: ?[]const u8 = q.get("id");
 
-    if (file_param.len == 0 or range_str.len <= 2 or k_param.len == 0) {
+    if (file_param.len == 0 or (range_str.len > 0 and range_str.len <= 2)) {
         return MapFileClientError.missing_parameters;
     }
 
-    const base_offset, const end_offset = try parseRangeStr(range_str);
-    if (end_offset <= base_offset) return MapFileClientError.invalid_offset_range;
+    // Without `range_str` the whole file is the representation, so range
+    // readers such as the dataloader's HTTP backend can address a tar directly.
+    const whole_file = range_str.len == 0;
+    var base_offset: u64 = 0;
+    var end_offset: u64 = 0;
+    if (!whole_file) {
+        base_offset, end_offset = try parseRangeStr(range_str);
+        if (end_offset <= base_offset) return MapFileClientError.invalid_offset_range;
+    }
 
     const full_path = try buildSafePathAlloc(arena, app.base_dir, file_param);
 
     var file = try std.Io.Dir.openFileAbsolute(app.io, full_path, .{});
     defer file.close(app.io);
 
-    const file_size = (try file.stat(app.io)).size;
-    if (end_offset > file_size) return MapFileClientError.invalid_offset_range;
-
-    const read_buf = try arena.alloc(u8, 16384);
-    var reader = file.reader(app.io, read_buf);
-    try reader.seekTo(base_offset);
-    const data = try reader.interface.readAlloc(arena, end_offset - base_offset);
-
-    res.header("Content-Type", mime.forFileExt(k_param));
+    const stat = try file.stat(app.io);
+    if (whole_file) {
+        end_offset = stat.size;
+        if (end_offset == 0) return MapFileClientError.invalid_offset_range;
+    }
+    if (end_offset > stat.size) return MapFileClientError.invalid_offset_range;
+
+    // The member bytes only change when the tar is rewritten, so size + mtime + range identify them.
+    const mtime_secs: u64 = @intCast(@max(0, @divFloor(stat.mtime.nanoseconds, std.time.ns_per_s)));
+    const etag = try std.fmt.allocPrint(arena, "\"{x}-{x}-{x}-{x}\"", .{
+        stat.size,
+        @as(u64, @truncate(@as(u96, @bitCast(stat.mtime.nanoseconds)))),
+        base_offset,
+        end_offset,
+    });
+    var date_buf: [http_cache.http_date_len]u8 = undefined;
+    const last_modified = try arena.dupe(u8, http_cache.formatHttpDate(&date_buf, mtime_secs));
+
+    res.header("Content-Type", mime.forFileExt(if (k_param.len > 0) k_param else std.fs.path.extension(file_param)));
+    res.header("Accept-Ranges", "bytes");
+    res.header("ETag", etag);
+    res.header("Last-Modified", last_modified);
+    res.header("Cache-Control", "private, max-age=0, must-revalidate");
 
     if (id_param) |id_val| {
         const cleaned_id = try sanitizeFilename(arena, id_val);
@@ -732,7 +736,52 @@ fn mapFileImpl(app: *App, req: *httpz.Request, res: *httpz.Response) !void {
         res.header("Content-Disposition", header_val);
     }
 
-    res.body = data;
+    if (http_cache.notModified(req.header("if-none-match"), req.header("if-modified-since"), etag, mtime_secs)) {
+        res.status = 304;
+        return;
+    }
+
+    const member_len = end_offset - base_offset;
+    // A stale `If-Range` validator means the client's partial copy is outdated: send everything.
+    const range_header = if (req.header("if-range")) |if_range|
+        (if (std.mem.eql(u8, if_range, etag) or std.mem.eql(u8, if_range, last_modified)) req.header("range") else null)
+    else
+        req.header("range");
+
+    var first: u64 = 0;
+    var last: u64 = member_len - 1;
+    switch (http_cache.parseRange(range_header, member_len)) {
+        .full => {},
+        .partial => |r| {
+            first = r.first;
+            last = r.last;
+            res.status = 206;
+            res.header("Content-Range", try std.fmt.allocPrint(arena, "bytes {d}-{d}/{d}", .{ first, last, member_len }));
+        },
+        .unsatisfiable => {
+            res.status = 416;
+            res.header("Content-Range", try std.fmt.allocPrint(arena, "bytes */{d}", .{member_len}));
+            return;
+        },
+    }
+
+    try streamFileRange(app.io, file, res, base_offset + first, last - first + 1, arena);
+}
+
+/// Send `len` bytes of `file` starting at `offset` as chunked transfer, never holding more than one chunk.
+fn streamFileRange(io: std.Io, file: std.Io.File, res: *httpz.Response, offset: u64, len: u64, arena: std.mem.Allocator) !void {
+    const buf = try arena.alloc(u8, @min(len, MAP_FILE_CHUNK_SIZE));
+    var pos = offset;
+    var remaining = len;
+    while (remaining > 0) {
+        const want: usize = @intCast(@min(remaining, buf.len));
+        const n = try file.readPositionalAll(io, buf[0..want], pos);
+        // The tar shrank underneath us; the headers are already out, so just end the body early.
+        if (n == 0) break;
+        try res.chunk(buf[0..n]);
+        pos += n;
+        remaining -= n;
+    }
 }
 
 /// Render the indexing-status panel fragment; HTMX attributes here are load-bearing for client polling.
@@ -762,13 +811,13 @@ fn renderIndexingPanel(arena: std.mem.Allocator, jobs: []const IndexerWorker.Job
         const pct: u64 = switch (job.status) {
             .done => 100,
             .running => if (job.bytes_total > 0) job.bytes_scanned * 100 / job.bytes_total else 0,
-            .@"error" => if (job.bytes_total > 0) job.bytes_scanned * 100 / job.bytes_total else 0,
+            .@"error", .cancelled => if (job.bytes_total > 0) job.bytes_scanned * 100 / job.bytes_total else 0,
             .queued => 0,
         };
 
         const cls: []const u8 = switch (job.status) {
             .done => " done",
-            .@"error" => " error",
+            .@"error", .cancelled => " error",
             else => "",
         };
 
@@ -790,6 +839,15 @@ fn renderIndexingPanel(arena: std.mem.Allocator, jobs: []const IndexerWorker.Job
                 try html.appendSlice(arena, " ");
                 try html.appendSlice(arena, pct_str);
                 try html.appendSlice(arena, "%");
+                if (job.bytes_per_sec > 0) {
+                    try html.appendSlice(arena, " @ ");
+                    try html.appendSlice(arena, try fmtRate(arena, job.bytes_per_sec));
+                }
+            },
+            .cancelled => {
+                try html.appendSlice(arena, "\xe2\x9c\x97 "); // ✗
+                try html.appendSlice(arena, fname);
+                try html.appendSlice(arena, " (cancelled)");
             },
             .done => {
                 try html.appendSlice(arena, "\xe2\x9c\x93 "); // ✓
@@ -805,9 +863,24 @@ fn renderIndexingPanel(arena: std.mem.Allocator, jobs: []const IndexerWorker.Job
             },
         }
 
-        try html.appendSlice(arena, "</span></div>");
+        try html.appendSlice(arena, "</span>");
+        if (job.status == .queued or job.status == .running) {
+            try html.appendSlice(arena, "<button class=\"idx-cancel\" hx-post=\"/index/cancel?file=");
+            try html.appendSlice(arena, try urlEncodeAlloc(arena, job.rel_path));
+            try html.appendSlice(arena, "\" hx-target=\"#indexing-panel\" hx-swap=\"outerHTML\">\xc3\x97</button>"); // ×
+        }
+        try html.appendSlice(arena, "</div>");
     }
 
     try html.appendSlice(arena, "</div>");
     return html.items;
 }
+
+/// Format a byte rate as e.g. `"12.3 MB/s"` (decimal units, like storage vendors quote).
+fn fmtRate(arena: std.mem.Allocator, bytes_per_sec: u64) ![]const u8 {
+    const units = [_][]const u8{ "B/s", "kB/s", "MB/s", "GB/s" };
+    var v: f64 = @floatFromInt(bytes_per_sec);
+    var u: usize = 0;
+    while (v >= 1000 and u + 1 < units.len) : (u += 1) v /= 1000;
+    return std.fmt.allocPrint(arena, "{d:.1} {s}", .{ v, units[u] });
+}
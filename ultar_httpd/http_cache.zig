@@ -0,0 +1,186 @@
+//! HTTP validator and byte-range helpers shared by handlers.
+//!
+//! Only the subset browsers and caching proxies actually send is supported:
+//! IMF-fixdate timestamps, `If-None-Match` entity-tag lists, a single
+//! `bytes=` range and `gzip` in `Accept-Encoding`. Anything else degrades to a plain 200 response, which RFC
+//! 9110 explicitly allows.
+
+const std = @import("std");
+const epoch = std.time.epoch;
+
+const day_names = [_][]const u8{ "Thu", "Fri", "Sat", "Sun", "Mon", "Tue", "Wed" };
+const month_names = [_][]const u8{ "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec" };
+
+pub const http_date_len = "Sun, 06 Nov 1994 08:49:37 GMT".len;
+
+/// Format `secs` since the Unix epoch as an IMF-fixdate (`Sun, 06 Nov 1994 08:49:37 GMT`).
+pub fn formatHttpDate(buf: *[http_date_len]u8, secs: u64) []const u8 {
+    const es = epoch.EpochSeconds{ .secs = secs };
+    const day = es.getEpochDay();
+    const yd = day.calculateYearDay();
+    const md = yd.calculateMonthDay();
+    const ds = es.getDaySeconds();
+    return std.fmt.bufPrint(buf, "{s}, {d:0>2} {s} {d:0>4} {d:0>2}:{d:0>2}:{d:0>2} GMT", .{
+        day_names[@intCast(day.day % 7)],
+        @as(u8, md.day_index) + 1,
+        month_names[md.month.numeric() - 1],
+        yd.year,
+        ds.getHoursIntoDay(),
+        ds.getMinutesIntoHour(),
+        ds.getSecondsIntoMinute(),
+    }) catch unreachable;
+}
+
+/// Parse an IMF-fixdate back into seconds since the Unix epoch.
+pub fn parseHttpDate(s: []const u8) ?u64 {
+    if (s.len != http_date_len) return null;
+    if (s[3] != ',' or s[4] != ' ' or s[7] != ' ' or s[11] != ' ' or s[16] != ' ') return null;
+    if (s[19] != ':' or s[22] != ':' or !std.mem.eql(u8, s[25..], " GMT")) return null;
+
+    const mday = std.fmt.parseInt(u32, s[5..7], 10) catch return null;
+    const year = std.fmt.parseInt(u32, s[12..16], 10) catch return null;
+    const hh = std.fmt.parseInt(u32, s[17..19], 10) catch return null;
+    const mm = std.fmt.parseInt(u32, s[20..22], 10) catch return null;
+    const ss = std.fmt.parseInt(u32, s[23..25], 10) catch return null;
+    const month: u32 = for (month_names, 1..) |name, i| {
+        if (std.mem.eql(u8, name, s[8..11])) break @intCast(i);
+    } else return null;
+    if (year < epoch.epoch_year or mday == 0 or mday > 31 or hh > 23 or mm > 59 or ss > 60) return null;
+
+    var days: u64 = 0;
+    var y: epoch.Year = epoch.epoch_year;
+    while (y < year) : (y += 1) days += epoch.getDaysInYear(y);
+    var m: u4 = 1;
+    while (m < month) : (m += 1) days += epoch.getDaysInMonth(@intCast(year), @enumFromInt(m));
+    days += mday - 1;
+    return days * epoch.secs_per_day + hh * 3600 + mm * 60 + ss;
+}
+
+/// True when an `If-None-Match` header value lists `etag` (weak comparison) or is `*`.
+pub fn etagMatches(if_none_match: []const u8, etag: []const u8) bool {
+    const want = stripWeak(etag);
+    var it = std.mem.splitScalar(u8, if_none_match, ',');
+    while (it.next()) |raw| {
+        const tag = std.mem.trim(u8, raw, " \t");
+        if (std.mem.eql(u8, tag, "*")) return true;
+        if (std.mem.eql(u8, stripWeak(tag), want)) return true;
+    }
+    return false;
+}
+
+fn stripWeak(tag: []const u8) []const u8 {
+    return if (std.mem.startsWith(u8, tag, "W/")) tag[2..] else tag;
+}
+
+/// Decide whether a conditional GET can be answered with 304.
+///
+/// `If-None-Match` takes precedence over `If-Modified-Since` when both are present.
+pub fn notModified(if_none_match: ?[]const u8, if_modified_since: ?[]const u8, etag: []const u8, mtime_secs: u64) bool {
+    if (if_none_match) |inm| return etagMatches(inm, etag);
+    if (if_modified_since) |ims| {
+        const since = parseHttpDate(ims) orelse return false;
+        return mtime_secs <= since;
+    }
+    return false;
+}
+
+/// True when an `Accept-Encoding` header value accepts `gzip` (explicitly or via `*`) with a non-zero q.
+pub fn acceptsGzip(accept_encoding: ?[]const u8) bool {
+    var it = std.mem.splitScalar(u8, accept_encoding orelse return false, ',');
+    while (it.next()) |raw| {
+        var params = std.mem.splitScalar(u8, raw, ';');
+        const coding = std.mem.trim(u8, params.first(), " \t");
+        if (!std.ascii.eqlIgnoreCase(coding, "gzip") and !std.mem.eql(u8, coding, "*")) continue;
+        const rejected = while (params.next()) |p| {
+            const param = std.mem.trim(u8, p, " \t");
+            if (std.mem.startsWith(u8, param, "q=")) {
+                const q = std.fmt.parseFloat(f32, param[2..]) catch break false;
+                break q == 0;
+            }
+        } else false;
+        if (!rejected) return true;
+    }
+    return false;
+}
+
+pub const ByteRange = union(enum) {
+    /// No usable `Range` header; serve the full representation.
+    full,
+    /// Inclusive `[first, last]` within the representation.
+    partial: struct { first: u64, last: u64 },
+    /// Syntactically valid but outside the representation; answer 416.
+    unsatisfiable,
+};
+
+/// Resolve a `Range` header against a representation of `len` bytes.
+///
+/// Multi-range requests and unknown units are answered with the full body.
+pub fn parseRange(header: ?[]const u8, len: u64) ByteRange {
+    const h = std.mem.trim(u8, header orelse return .full, " \t");
+    const prefix = "bytes=";
+    if (!std.mem.startsWith(u8, h, prefix)) return .full;
+    const spec = std.mem.trim(u8, h[prefix.len..], " \t");
+    if (std.mem.indexOfScalar(u8, spec, ',') != null) return .full;
+    const dash = std.mem.indexOfScalar(u8, spec, '-') orelse return .full;
+    const first_s = std.mem.trim(u8, spec[0..dash], " \t");
+    const last_s = std.mem.trim(u8, spec[dash + 1 ..], " \t");
+
+    if (first_s.len == 0) {
+        // Suffix range: the final N bytes.
+        const suffix = std.fmt.parseInt(u64, last_s, 10) catch return .full;
+        if (suffix == 0 or len == 0) return .unsatisfiable;
+        const n = @min(suffix, len);
+        return .{ .partial = .{ .first = len - n, .last = len - 1 } };
+    }
+
+    const first = std.fmt.parseInt(u64, first_s, 10) catch return .full;
+    var last: u64 = if (last_s.len == 0)
+        len -| 1
+    else
+        std.fmt.parseInt(u64, last_s, 10) catch return .full;
+    if (last_s.len > 0 and last < first) return .full;
+    if (first >= len) return .unsatisfiable;
+    last = @min(last, len - 1);
+    return .{ .partial = .{ .first = first, .last = last } };
+}
+
+test "http date round trip" {
+    var buf: [http_date_len]u8 = undefined;
+    try std.testing.expectEqualStrings("Sun, 06 Nov 1994 08:49:37 GMT", formatHttpDate(&buf, 784111777));
+    try std.testing.expectEqualStrings("Thu, 01 Jan 1970 00:00:00 GMT", formatHttpDate(&buf, 0));
+    try std.testing.expectEqual(@as(?u64, 784111777), parseHttpDate("Sun, 06 Nov 1994 08:49:37 GMT"));
+    try std.testing.expectEqual(@as(?u64, 1709251199), parseHttpDate(formatHttpDate(&buf, 1709251199)));
+    try std.testing.expectEqual(@as(?u64, null), parseHttpDate("Sunday, 06-Nov-94 08:49:37 GMT"));
+}
+
+test "etag matching" {
+    try std.testing.expect(etagMatches("\"abc\"", "\"abc\""));
+    try std.testing.expect(etagMatches("\"x\", W/\"abc\"", "\"abc\""));
+    try std.testing.expect(etagMatches("*", "\"abc\""));
+    try std.testing.expect(!etagMatches("\"abd\"", "\"abc\""));
+    try std.testing.expect(notModified(null, "Sun, 06 Nov 1994 08:49:37 GMT", "\"e\"", 784111777));
+    try std.testing.expect(!notModified("\"other\"", "Sun, 06 Nov 1994 08:49:37 GMT", "\"e\"", 784111777));
+}
+
+test "accept encoding" {
+    try std.testing.expect(acceptsGzip("gzip, deflate, br"));
+    try std.testing.expect(acceptsGzip("br;q=1.0, GZIP;q=0.5"));
+    try std.testing.expect(acceptsGzip("*"));
+    try std.testing.expect(!acceptsGzip("gzip;q=0"));
+    try std.testing.expect(!acceptsGzip("br, identity"));
+    try std.testing.expect(!acceptsGzip(null));
+}
+
+test "byte ranges" {
+    const eq = std.testing.expectEqualDeep;
+    try eq(ByteRange.full, parseRange(null, 100));
+    try eq(ByteRange{ .partial = .{ .first = 0, .last = 9 } }, parseRange("bytes=0-9", 100));
+    try eq(ByteRange{ .partial = .{ .first = 90, .last = 99 } }, parseRange("bytes=90-", 100));
+    try eq(ByteRange{ .partial = .{ .first = 50, .last = 99 } }, parseRange("bytes=50-1000", 100));
+    try eq(ByteRange{ .partial = .{ .first = 80, .last = 99 } }, parseRange("bytes=-20", 100));
+    try eq(ByteRange{ .partial = .{ .first = 0, .last = 99 } }, parseRange("bytes=-200", 100));
+    try eq(ByteRange.unsatisfiable, parseRange("bytes=100-", 100));
+    try eq(ByteRange.full, parseRange("bytes=0-1,5-6", 100));
+    try eq(ByteRange.full, parseRange("items=0-1", 100));
+    try eq(ByteRange.full, parseRange("bytes=9-3", 100));
+}
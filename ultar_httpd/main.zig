@@ -8,6 +8,9 @@ const App = @import("App.zig");
 const handlers = @import("handlers.zig");
 const TemplateCache = @import("TemplateCache.zig");
 const IndexerWorker = @import("IndexerWorker.zig");
+const IndexCache = @import("IndexCache.zig");
+const PageCache = @import("PageCache.zig");
+const StaticAssets = @import("StaticAssets.zig");
 
 /// Shared between `main` and `shutdown`; non-null only while the server is listening.
 var server_instance: ?*httpz.Server(*App) = null;
@@ -71,6 +74,10 @@ pub fn main(init: std.process.Init) !void {
         \\-p, --port <PORT>     Port to listen on (default 3000).
         \\-d, --data <DIR>     Data root directory (overrides DATA_PATH).
         \\-t, --threads <INT>  Number of threads (default 4).
+        \\--index-cache-mb <INT>  Memory budget for parsed .utix files (default 512).
+        \\--page-cache-mb <INT>  Memory budget for rendered /browse and /load pages (default 64).
+        \\--index-lanes <INT>  Indexing loops/threads (default 4).
+        \\--index-jobs-per-lane <INT>  Concurrent tar scans per indexing loop (default 2).
         \\
     );
     const parsers = comptime .{
@@ -95,6 +102,10 @@ pub fn main(init: std.process.Init) !void {
     const addr_flag = res.args.addr orelse "0.0.0.0";
     const port: u16 = res.args.port orelse 3000;
     const threads: u32 = res.args.threads orelse 4;
+    const index_cache_mb: u32 = res.args.@"index-cache-mb" orelse 512;
+    const page_cache_mb: u32 = res.args.@"page-cache-mb" orelse 64;
+    const index_lanes: u32 = res.args.@"index-lanes" orelse 4;
+    const index_jobs_per_lane: u32 = res.args.@"index-jobs-per-lane" orelse 2;
 
     std.log.info("Launching with addr={s}:{} data={s} threads={d}", .{ addr_flag, port, res.args.data orelse "?", threads });
 
@@ -108,15 +119,35 @@ pub fn main(init: std.process.Init) !void {
     defer template_cache.deinit();
 
     var indexer_worker: IndexerWorker = undefined;
-    try indexer_worker.init(init.gpa);
+    try indexer_worker.init(init.gpa, .{ .lanes = index_lanes, .jobs_per_lane = index_jobs_per_lane });
     defer indexer_worker.deinit();
 
+    var index_cache: IndexCache = undefined;
+    index_cache.init(init.gpa, init.io, @as(usize, index_cache_mb) * 1024 * 1024);
+    defer index_cache.deinit();
+
+    var page_cache: PageCache = undefined;
+    page_cache.init(init.gpa, init.io, @as(usize, page_cache_mb) * 1024 * 1024);
+    defer page_cache.deinit();
+
+    var static_assets: StaticAssets = undefined;
+    // Relative to the cwd like the templates; a server run elsewhere (e.g. as
+    // a /map_file backend) still starts, it just has no UI assets.
+    static_assets.init(init.gpa, init.io, "ultar_httpd/static") catch |err| {
+        std.log.warn("static assets unavailable ({s}); /static/ will 404", .{@errorName(err)});
+        static_assets = .empty(init.gpa);
+    };
+    defer static_assets.deinit();
+
     var app = App{
         .gpa = init.gpa,
         .io = init.io,
         .base_dir = base_dir,
         .template_cache = &template_cache,
         .indexer_worker = &indexer_worker,
+        .index_cache = &index_cache,
+        .page_cache = &page_cache,
+        .static_assets = &static_assets,
     };
 
     var server = try httpz.Server(*App).init(init.io, init.gpa, .{
@@ -135,7 +166,10 @@ pub fn main(init: std.process.Init) !void {
     router.post("/index", handlers.indexRequest, .{});
     router.get("/index", handlers.indexRequest, .{});
     router.get("/index/status", handlers.indexStatus, .{});
+    router.post("/index/dir", handlers.indexDir, .{});
+    router.post("/index/cancel", handlers.indexCancel, .{});
     router.get("/map_file", handlers.mapFile, .{});
+    router.get("/manifest", handlers.manifest, .{});
 
     var sigact: std.posix.Sigaction = .{
         .handler = .{ .handler = shutdown },
@@ -19,6 +19,9 @@ pub const FileListItem = struct {
 pub const FileListData = struct {
     show_parent: bool,
     parent: []const u8,
+    /// Enables the directory-level "Index all" button.
+    has_unindexed: bool = false,
+    dir_enc: []const u8 = "",
     entries: []const FileListItem,
 };
 
@@ -65,6 +68,8 @@ pub const LoadTableData = struct {
 pub const BaseData = struct {
     body: []const u8,
     table_body: []const u8,
+    /// `?v=` cache-buster for `/static/` URLs.
+    static_version: []const u8,
 };
 
 pub const RenderError = error{
@@ -202,6 +207,9 @@ fn enterImpl(ctx: *MustachContext, key: []const u8) c_int {
                 if (std.mem.eql(u8, key, "show_parent")) {
                     return pushBoolFrame(ctx, fl.show_parent);
                 }
+                if (std.mem.eql(u8, key, "has_unindexed")) {
+                    return pushBoolFrame(ctx, fl.has_unindexed);
+                }
                 if (std.mem.eql(u8, key, "entries")) {
                     return pushArrayFrame(ctx, .file_list_entry, fl.entries.len);
                 }
@@ -296,6 +304,7 @@ fn resolveScalar(ctx: *MustachContext, key: []const u8) ?[]const u8 {
             const b = ctx.base orelse return null;
             if (std.mem.eql(u8, key, "body")) return b.body;
             if (std.mem.eql(u8, key, "table_body")) return b.table_body;
+            if (std.mem.eql(u8, key, "static_version")) return b.static_version;
             return null;
         },
         .file_list => {
@@ -303,6 +312,7 @@ fn resolveScalar(ctx: *MustachContext, key: []const u8) ?[]const u8 {
             switch (data_frame.tag) {
                 .file_list_root => {
                     if (std.mem.eql(u8, key, "parent")) return fl.parent;
+                    if (std.mem.eql(u8, key, "dir_enc")) return fl.dir_enc;
                     return null;
                 },
                 .file_list_entry => {
@@ -0,0 +1,192 @@
+//! Decoding of `.utix` rows for display. Each row is a top-level msgpack map
+//! written by the indexer; unknown fields are skipped so newer indexes still render.
+
+const std = @import("std");
+const msgpack = @import("msgpack");
+
+pub const UtixEntry = struct {
+    str_idx: []const u8,
+    iidx: u64,
+    offset: u64,
+    keys: [][]const u8,
+    offsets: []u64,
+    sizes: []u64,
+    metadata: ?[]const u8 = null,
+};
+
+const UtixField = enum { str_idx, iidx, offset, keys, offsets, sizes, metadata, unknown };
+
+fn utixFieldFromKey(key: []const u8) UtixField {
+    if (std.mem.eql(u8, key, "str_idx")) return .str_idx;
+    if (std.mem.eql(u8, key, "iidx")) return .iidx;
+    if (std.mem.eql(u8, key, "offset")) return .offset;
+    if (std.mem.eql(u8, key, "keys")) return .keys;
+    if (std.mem.eql(u8, key, "offsets")) return .offsets;
+    if (std.mem.eql(u8, key, "sizes")) return .sizes;
+    if (std.mem.eql(u8, key, "metadata")) return .metadata;
+    return .unknown;
+}
+
+pub fn writeJsonString(w: *std.Io.Writer, s: []const u8) !void {
+    try w.writeByte('"');
+    for (s) |c| switch (c) {
+        '"' => try w.writeAll("\\\""),
+        '\\' => try w.writeAll("\\\\"),
+        '\n' => try w.writeAll("\\n"),
+        '\r' => try w.writeAll("\\r"),
+        '\t' => try w.writeAll("\\t"),
+        else => if (c < 0x20) {
+            try w.print("\\u{X:0>4}", .{c});
+        } else {
+            try w.writeByte(c);
+        },
+    };
+    try w.writeByte('"');
+}
+
+fn writeJsonFromToken(scanner: *msgpack.Scanner, w: *std.Io.Writer, tok: msgpack.Scanner.Token) !void {
+    switch (tok) {
+        .nil => try w.writeAll("null"),
+        .boolean => |b| try w.writeAll(if (b) "true" else "false"),
+        .uint => |u| try w.print("{d}", .{u}),
+        .int => |i| try w.print("{d}", .{i}),
+        .float => |f| try w.print("{d}", .{f}),
+        .string => |s| try writeJsonString(w, s),
+        .array_begin => |len| {
+            try w.writeByte('[');
+            for (0..len) |i| {
+                if (i != 0) try w.writeByte(',');
+                try writeJsonFromToken(scanner, w, try scanner.next());
+            }
+            const end = try scanner.next();
+            if (end != .array_end) return error.InvalidFormat;
+            try w.writeByte(']');
+        },
+        .map_begin => |len| {
+            try w.writeByte('{');
+            for (0..len) |i| {
+                if (i != 0) try w.writeByte(',');
+                const key_tok = try scanner.next();
+                switch (key_tok) {
+                    .map_key => |key| try writeJsonString(w, key),
+                    else => return error.InvalidFormat,
+                }
+                try w.writeByte(':');
+                try writeJsonFromToken(scanner, w, try scanner.next());
+            }
+            const end = try scanner.next();
+            if (end != .map_end) return error.InvalidFormat;
+            try w.writeByte('}');
+        },
+        else => return error.InvalidFormat,
+    }
+}
+
+fn jsonFromMsgpackValue(arena: std.mem.Allocator, scanner: *msgpack.Scanner, tok: msgpack.Scanner.Token) ![]const u8 {
+    var w: std.Io.Writer.Allocating = .init(arena);
+    try writeJsonFromToken(scanner, &w.writer, tok);
+    return w.written();
+}
+
+/// Consume the remainder of a value whose first token is `tok`.
+fn skipValue(scanner: *msgpack.Scanner, tok: msgpack.Scanner.Token) !void {
+    var depth: usize = switch (tok) {
+        .map_begin, .array_begin => 1,
+        else => return,
+    };
+    while (depth > 0) {
+        switch (try scanner.next()) {
+            .map_begin, .array_begin => depth += 1,
+            .map_end, .array_end => depth -= 1,
+            .end => return error.InvalidFormat,
+            else => {},
+        }
+    }
+}
+
+fn readUint(tok: msgpack.Scanner.Token) !u64 {
+    return switch (tok) {
+        .uint => |u| u,
+        .int => |iv| std.math.cast(u64, iv) orelse error.InvalidFormat,
+        else => error.InvalidFormat,
+    };
+}
+
+fn readUintArray(arena: std.mem.Allocator, scanner: *msgpack.Scanner, len: usize) ![]u64 {
+    const out = try arena.alloc(u64, len);
+    for (out) |*v| v.* = try readUint(try scanner.next());
+    if (try scanner.next() != .array_end) return error.InvalidFormat;
+    return out;
+}
+
+pub const ReadOptions = struct {
+    /// Render the `metadata` field to JSON; skipped otherwise.
+    metadata: bool = true,
+};
+
+/// Decode the next top-level row, or return null at end of stream.
+///
+/// All returned slices are copied into `arena`.
+pub fn readEntry(arena: std.mem.Allocator, scanner: *msgpack.Scanner, opts: ReadOptions) !?UtixEntry {
+    const len = switch (try scanner.next()) {
+        .end => return null,
+        .map_begin => |n| n,
+        else => return error.InvalidFormat,
+    };
+
+    var entry = UtixEntry{
+        .str_idx = "",
+        .iidx = 0,
+        .offset = 0,
+        .keys = &[_][]const u8{},
+        .offsets = &[_]u64{},
+        .sizes = &[_]u64{},
+        .metadata = null,
+    };
+
+    for (0..len) |_| {
+        const field = switch (try scanner.next()) {
+            .map_key => |key| utixFieldFromKey(key),
+            else => return error.InvalidFormat,
+        };
+        const tok = try scanner.next();
+        switch (field) {
+            .str_idx => switch (tok) {
+                .string => |s| entry.str_idx = try arena.dupe(u8, s),
+                else => try skipValue(scanner, tok),
+            },
+            .iidx => entry.iidx = try readUint(tok),
+            .offset => entry.offset = try readUint(tok),
+            .keys => switch (tok) {
+                .array_begin => |n| {
+                    const keys = try arena.alloc([]const u8, n);
+                    for (keys) |*k| {
+                        k.* = switch (try scanner.next()) {
+                            .string => |s| try arena.dupe(u8, s),
+                            else => return error.InvalidFormat,
+                        };
+                    }
+                    if (try scanner.next() != .array_end) return error.InvalidFormat;
+                    entry.keys = keys;
+                },
+                else => try skipValue(scanner, tok),
+            },
+            .offsets, .sizes => switch (tok) {
+                .array_begin => |n| {
+                    const vals = try readUintArray(arena, scanner, n);
+                    if (field == .offsets) entry.offsets = vals else entry.sizes = vals;
+                },
+                else => try skipValue(scanner, tok),
+            },
+            .metadata => if (opts.metadata and tok == .map_begin) {
+                entry.metadata = try jsonFromMsgpackValue(arena, scanner, tok);
+            } else {
+                try skipValue(scanner, tok);
+            },
+            .unknown => try skipValue(scanner, tok),
+        }
+    }
+
+    if (try scanner.next() != .map_end) return error.InvalidFormat;
+    return entry;
+}